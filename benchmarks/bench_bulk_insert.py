@@ -0,0 +1,52 @@
+"""
+批次寫入效能測試：比較逐筆 add_stock_movement（每筆提交一次）與 bulk_add_stock_movements。
+逐筆寫入只量測前 SAMPLE 筆再推估總時間。
+執行方式：python benchmarks/bench_bulk_insert.py [筆數]
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from models import erp_database_schema
+from models.itemmaster_crud import add_item
+from models.stockmovement_crud import add_stock_movement, bulk_add_stock_movements
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+SAMPLE = 2000
+
+
+def movements(count):
+    for i in range(count):
+        yield (1 + i % 10, None, "IN" if i % 3 else "OUT", float(i % 97 + 1), "2025-01-01", f"B{i % 1000}")
+
+
+def main():
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as tmp:
+        erp_database_schema.DB_NAME = os.path.join(tmp, "bench.db")
+        erp_database_schema.create_tables()
+        for i in range(10):
+            add_item(f"原料{i}", "原料", "食品添加物", "kg")
+
+        start = time.perf_counter()
+        for row in movements(SAMPLE):
+            add_stock_movement(*row)
+        single = (time.perf_counter() - start) / SAMPLE
+
+        start = time.perf_counter()
+        result = bulk_add_stock_movements(movements(ROWS))
+        bulk = time.perf_counter() - start
+
+        print(f"筆數: {ROWS}  (設定檔: {erp_database_schema.DB_PROFILE})")
+        print(f"逐筆寫入: {single * 1e6:.1f} µs/筆，推估 {single * ROWS:.1f}s")
+        print(f"批次寫入: {bulk:.2f}s ({ROWS / bulk:,.0f} 筆/秒), {result}")
+        erp_database_schema.close_connections()
+
+
+if __name__ == "__main__":
+    main()
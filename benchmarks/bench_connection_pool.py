@@ -0,0 +1,50 @@
+"""
+連線池效能測試：比較「每次呼叫都新建連線」與共用連線池的差異。
+執行方式：python benchmarks/bench_connection_pool.py
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from models import erp_database_schema
+from models.itemmaster_crud import add_item, get_item_by_id
+
+CALLS = 5000
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        erp_database_schema.DB_NAME = os.path.join(tmp, "bench.db")
+        erp_database_schema.create_tables()
+        add_item("測試原料", "原料", "食品添加物", "公斤")
+
+        # 舊做法：每次查詢都 connect + PRAGMA + close
+        start = time.perf_counter()
+        for _ in range(CALLS):
+            conn = sqlite3.connect(erp_database_schema.DB_NAME)
+            conn.execute("PRAGMA foreign_keys = ON")
+            conn.execute("SELECT * FROM ItemMaster WHERE ItemID = ? AND Status = 'active'", (1,)).fetchone()
+            conn.close()
+        legacy = time.perf_counter() - start
+
+        # 新做法：共用連線池
+        start = time.perf_counter()
+        for _ in range(CALLS):
+            get_item_by_id(1)
+        pooled = time.perf_counter() - start
+
+        print(f"呼叫次數: {CALLS}")
+        print(f"每次新建連線: {legacy:.3f}s ({legacy / CALLS * 1e6:.1f} µs/次)")
+        print(f"連線池:       {pooled:.3f}s ({pooled / CALLS * 1e6:.1f} µs/次)")
+        print(f"加速倍數: {legacy / pooled:.1f}x")
+        print("連線池統計:", erp_database_schema.get_pool_stats())
+        erp_database_schema.close_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+效能設定檔測試：一個執行緒持續寫入庫存移動，同時三個執行緒讀取庫存彙總，
+比較 legacy（rollback journal）與 desktop（WAL）設定檔下的讀寫併發。
+執行方式：python benchmarks/bench_db_profile.py
+"""
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from models import erp_database_schema
+from models.erp_database_schema import get_connection
+from models.itemmaster_crud import add_item
+
+SEED_ROWS = 20000
+WRITES = 300
+READERS = 3
+
+STOCK_QUERY = '''
+    SELECT ItemID, SupplierID,
+           SUM(CASE WHEN MovementType = 'IN' THEN Quantity ELSE 0 END) -
+           SUM(CASE WHEN MovementType = 'OUT' THEN Quantity ELSE 0 END) AS StockQuantity
+    FROM StockMovement
+    GROUP BY ItemID, SupplierID
+'''
+
+
+def run(profile: str, tmp: str):
+    erp_database_schema.DB_NAME = os.path.join(tmp, f"bench_{profile}.db")
+    erp_database_schema.set_db_profile(profile)
+    erp_database_schema.create_tables()
+    add_item("測試原料", "原料", "食品添加物", "公斤")
+    with get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO StockMovement (ItemID, MovementType, Quantity, MovementDate) VALUES (1, 'IN', ?, '2025-01-01')",
+            ((i % 10 + 1,) for i in range(SEED_ROWS))
+        )
+        conn.commit()
+
+    done = threading.Event()
+    reads = [0] * READERS
+    errors = [0] * READERS
+
+    def writer():
+        for _ in range(WRITES):
+            with get_connection() as conn:
+                conn.execute(
+                    "INSERT INTO StockMovement (ItemID, MovementType, Quantity, MovementDate) VALUES (1, 'OUT', 1, '2025-01-02')"
+                )
+                # 模擬在交易中做其他處理
+                time.sleep(0.001)
+                conn.commit()
+        done.set()
+
+    def reader(index):
+        while not done.is_set():
+            try:
+                with get_connection() as conn:
+                    conn.execute(STOCK_QUERY).fetchall()
+                reads[index] += 1
+            except Exception:
+                errors[index] += 1
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(READERS)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    writer_thread = threading.Thread(target=writer)
+    writer_thread.start()
+    writer_thread.join()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    erp_database_schema.close_connections()
+    return elapsed, sum(reads), sum(errors)
+
+
+def main():
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in ("legacy", "desktop"):
+            elapsed, reads, errors = run(profile, tmp)
+            print(f"[{profile:8}] 寫入 {WRITES} 筆耗時 {elapsed:.2f}s，"
+                  f"同時完成讀取 {reads} 次（{reads / elapsed:.0f} 次/秒），讀取失敗 {errors} 次")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+資料列物件效能測試：比較 dict(zip(columns, row)) 與 __slots__ 資料列物件的記憶體用量與轉換速度。
+執行方式：python benchmarks/bench_row_objects.py [筆數]
+"""
+import os
+import sqlite3
+import sys
+import time
+import tracemalloc
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from models.records import make_records
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+
+
+def build_cursor():
+    """建立記憶體資料庫並填入 StockMovement 測試資料"""
+    conn = sqlite3.connect(":memory:")
+    conn.execute('''
+        CREATE TABLE StockMovement (
+            MovementID INTEGER PRIMARY KEY AUTOINCREMENT,
+            ItemID INTEGER NOT NULL,
+            MovementType TEXT NOT NULL,
+            Quantity REAL NOT NULL,
+            MovementDate DATE NOT NULL,
+            RefDocType TEXT,
+            RefDocID INTEGER,
+            BatchNo TEXT,
+            SupplierID INTEGER
+        )
+    ''')
+    conn.executemany(
+        "INSERT INTO StockMovement (ItemID, MovementType, Quantity, MovementDate, BatchNo, SupplierID) VALUES (?, ?, ?, ?, ?, ?)",
+        ((i % 500, "IN" if i % 3 else "OUT", float(i % 97), "2025-01-01", f"B{i % 1000}", i % 20) for i in range(ROWS)),
+    )
+    conn.commit()
+    return conn
+
+
+def measure(label, convert, conn):
+    cursor = conn.execute("SELECT * FROM StockMovement")
+    rows = cursor.fetchall()
+    tracemalloc.start()
+    start = time.perf_counter()
+    records = convert(cursor, rows)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    total = sum(record["Quantity"] for record in records)
+    access = time.perf_counter() - start
+
+    print(f"{label:<14} 轉換 {elapsed:.3f}s  存取 {access:.3f}s  記憶體 {current / 1024 / 1024:.1f} MiB  ({current / len(records):.0f} B/筆)")
+    del records
+    return total
+
+
+def as_dicts(cursor, rows):
+    columns = [col[0] for col in cursor.description]
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def main():
+    conn = build_cursor()
+    print(f"筆數: {ROWS}")
+    measure("dict(zip)", as_dicts, conn)
+    measure("__slots__", make_records, conn)
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
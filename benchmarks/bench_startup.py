@@ -0,0 +1,84 @@
+"""
+啟動時間測試：比較一次建立全部分頁（舊做法）與延遲建立分頁的主視窗顯示時間。
+每種模式在獨立的子程序中執行，以包含模組 import 的成本。
+執行方式：python benchmarks/bench_startup.py [BOM 數] [庫存移動筆數]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+CHILD = len(sys.argv) > 1 and sys.argv[1] == "--child"
+BOMS = int(sys.argv[1]) if len(sys.argv) > 1 and not CHILD else 200
+MOVEMENTS = int(sys.argv[2]) if len(sys.argv) > 2 and not CHILD else 50_000
+
+
+def seed(db_path):
+    from models import erp_database_schema
+    from models.erp_database_schema import get_connection
+    erp_database_schema.DB_NAME = db_path
+    erp_database_schema.create_tables()
+    with get_connection() as conn:
+        conn.execute("INSERT INTO Supplier (SupplierName) VALUES ('供應商A')")
+        conn.executemany("INSERT INTO ItemMaster (ItemName, ItemType, Unit) VALUES (?, '原料', 'g')",
+                         ((f"原料{i}",) for i in range(100)))
+        conn.executemany("INSERT INTO ItemMaster (ItemName, ItemType, Unit) VALUES (?, '成品', 'kg')",
+                         ((f"成品{i}",) for i in range(BOMS)))
+        conn.executemany("INSERT INTO BOMHeader (ProductID, Version, EffectiveDate, ProductWeight) VALUES (?, 'V1', '2025-01-01', 100)",
+                         ((101 + i,) for i in range(BOMS)))
+        conn.executemany("INSERT INTO BOMDetail (BOMID, ComponentItemID, Quantity, Unit, SupplierID, Price) VALUES (?, ?, 10, '%', 1, 0.5)",
+                         ((b + 1, c + 1) for b in range(BOMS) for c in range(b % 10, b % 10 + 10)))
+        conn.executemany("INSERT INTO StockMovement (ItemID, SupplierID, MovementType, Quantity, MovementDate) VALUES (?, 1, ?, ?, '2025-01-01')",
+                         ((i % 100 + 1, "IN" if i % 3 else "OUT", float(i % 50 + 1)) for i in range(MOVEMENTS)))
+        conn.commit()
+    erp_database_schema.close_connections()
+
+
+def run_child(mode, db_path):
+    """子程序：建立主視窗並量測到第一次繪製完成的時間"""
+    import logging
+    logging.disable(logging.INFO)
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    start = time.perf_counter()
+    from PyQt5.QtWidgets import QApplication, QMainWindow, QTabWidget
+    from models import erp_database_schema
+    erp_database_schema.DB_NAME = db_path
+    app = QApplication(sys.argv[:1])
+    if mode == "eager":
+        import importlib
+        from main_window import TAB_PAGES
+        window = QMainWindow()
+        tabs = QTabWidget()
+        window.setCentralWidget(tabs)
+        for module, class_name, title in TAB_PAGES:
+            page = getattr(importlib.import_module(module), class_name)()
+            page.load_data()      # 舊做法：建構時就載入資料
+            tabs.addTab(page, title)
+    else:
+        from main_window import MainWindow
+        window = MainWindow()
+    window.show()
+    app.processEvents()
+    print(f"{time.perf_counter() - start:.4f}")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        seed(db_path)
+        print(f"BOM: {BOMS}, 庫存移動: {MOVEMENTS}")
+        for mode in ("eager", "lazy"):
+            output = subprocess.run([sys.executable, __file__, "--child", mode, db_path],
+                                    capture_output=True, text=True, check=True, cwd=project_root).stdout
+            print(f"{mode:<6} 主視窗顯示: {float(output.strip().splitlines()[-1]) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    if CHILD:
+        run_child(sys.argv[2], sys.argv[3])
+    else:
+        main()
@@ -0,0 +1,60 @@
+"""
+逐批讀取效能測試：比較 get_stock_movements()（一次載入）與 iter_stock_movements()（fetchmany）
+的第一筆資料延遲與峰值記憶體。
+執行方式：python benchmarks/bench_streaming.py [筆數]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from models import erp_database_schema
+from models.erp_database_schema import get_connection
+from models.stockmovement_crud import get_stock_movements, iter_stock_movements
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+
+
+def seed():
+    with get_connection() as conn:
+        conn.execute("INSERT INTO ItemMaster (ItemName, ItemType) VALUES ('測試原料', '原料')")
+        conn.executemany(
+            "INSERT INTO StockMovement (ItemID, MovementType, Quantity, MovementDate, BatchNo) VALUES (1, ?, ?, '2025-01-01', ?)",
+            (("IN" if i % 3 else "OUT", float(i % 97), f"B{i % 1000}") for i in range(ROWS)),
+        )
+        conn.commit()
+
+
+def measure(label, rows):
+    tracemalloc.start()
+    start = time.perf_counter()
+    first = None
+    total = 0.0
+    for row in rows():
+        if first is None:
+            first = time.perf_counter() - start
+        total += row["Quantity"]
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<24} 第一筆 {first * 1000:8.1f} ms  總計 {elapsed:.3f}s  峰值記憶體 {peak / 1024 / 1024:7.1f} MiB")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        erp_database_schema.DB_NAME = os.path.join(tmp, "bench.db")
+        erp_database_schema.create_tables()
+        seed()
+        print(f"筆數: {ROWS}")
+        measure("get_stock_movements", get_stock_movements)
+        measure("iter_stock_movements", iter_stock_movements)
+        measure("iter (arraysize=10000)", lambda: iter_stock_movements(arraysize=10000))
+        erp_database_schema.close_connections()
+
+
+if __name__ == "__main__":
+    main()
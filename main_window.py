@@ -1,16 +1,28 @@
+import logging
 import sys
-from PyQt5.QtWidgets import QMainWindow, QTabWidget
-from ui.customer_page import CustomerPage
-from ui.supplier_page import SupplierPage
-from ui.itemmaster_page import ItemMasterPage
-from models.erp_database_schema import initialize_database
-from ui.SupplierItemMapPage import SupplierItemMapPage
-from ui.pricehistorypage import PriceHistoryPage
-from ui.bom_page import BOMPage
-from ui.bomhistory_page import CostHistoryPage
-from ui.stockmovement_page import StockMovementPage
-from ui.stock_page import StockPage
-from ui.salesorder_page import SalesOrderPage
+import time
+
+STARTUP_BEGIN = time.perf_counter()
+
+from PyQt5.QtWidgets import QMainWindow
+from models.erp_database_schema import initialize_database, close_connections
+from ui.lazy_tabs import LazyTabWidget
+from ui.low_stock_badge import LowStockBadge
+
+# 分頁清單：(模組, 類別, 標題)。頁面在第一次切換到該分頁時才 import 與建立
+TAB_PAGES = [
+    ("ui.customer_page", "CustomerPage", "客戶管理"),
+    ("ui.supplier_page", "SupplierPage", "供應商管理"),
+    ("ui.itemmaster_page", "ItemMasterPage", "物料管理"),
+    ("ui.SupplierItemMapPage", "SupplierItemMapPage", "供應商-物料關聯"),
+    ("ui.pricehistorypage", "PriceHistoryPage", "價格歷史"),
+    ("ui.bom_page", "BOMPage", "BOM管理"),
+    ("ui.bomhistory_page", "CostHistoryPage", "BOM歷史頁面"),
+    ("ui.where_used_page", "WhereUsedPage", "BOM反查"),
+    ("ui.stockmovement_page", "StockMovementPage", "進出庫存管理"),
+    ("ui.stock_page", "StockPage", "庫存管理"),
+    ("ui.salesorder_page", "SalesOrderPage", "訂單管理"),
+]
 
 
 class MainWindow(QMainWindow):
@@ -19,49 +31,44 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("ERP System")
         self.setGeometry(200, 100, 1024, 768)
         
-        self.tabs = QTabWidget()
+        self.tabs = LazyTabWidget()
         self.setCentralWidget(self.tabs)
-        
-        # 客戶分頁
-        self.customer_page = CustomerPage()
-        self.tabs.addTab(self.customer_page, "客戶管理")
-        
-        # 供應商分頁
-        self.supplier_page = SupplierPage()
-        self.tabs.addTab(self.supplier_page, "供應商管理")
-
-        # 物料分頁
-        self.item_page = ItemMasterPage()
-        self.tabs.addTab(self.item_page, "物料管理")
 
-        # 供應商-物料關聯分頁
-        self.supplier_item_map_page = SupplierItemMapPage()
-        self.tabs.addTab(self.supplier_item_map_page, "供應商-物料關聯")
+        for module, class_name, title in TAB_PAGES:
+            self.tabs.add_lazy_tab(module, class_name, title)
 
-        # 價格歷史分頁
-        self.price_history_page = PriceHistoryPage()
-        self.tabs.addTab(self.price_history_page, "價格歷史")
+        # 低庫存徽章：警示清單由資料庫觸發器即時維護，徽章只定期比對版本號
+        self.low_stock_badge = LowStockBadge(self)
+        self.low_stock_badge.clicked.connect(self.show_stock_page)
+        self.statusBar().addPermanentWidget(self.low_stock_badge)
 
-        # BOM分頁
-        self.bom_page = BOMPage()
-        self.tabs.addTab(self.bom_page, "BOM管理")
+    def show_stock_page(self):
+        for index, (_, class_name, _) in enumerate(TAB_PAGES):
+            if class_name == "StockPage":
+                self.tabs.setCurrentIndex(index)
+                return
 
-        self.bomhistory_page = CostHistoryPage()
-        self.tabs.addTab(self.bomhistory_page, "BOM歷史頁面")
 
-        self.stockmovement_page = StockMovementPage()
-        self.tabs.addTab(self.stockmovement_page, "進出庫存管理")
+def log_startup_time(window: MainWindow) -> float:
+    """記錄從程式啟動到主視窗第一次繪製完成的時間"""
+    elapsed = time.perf_counter() - STARTUP_BEGIN
+    logging.info("啟動時間 %.1f ms（已建立分頁：%s）", elapsed * 1000, ", ".join(window.tabs.build_times) or "無")
+    return elapsed
 
-        self.stock_page = StockPage()
-        self.tabs.addTab(self.stock_page, "庫存管理")   
 
-        self.salesorder_page = SalesOrderPage()
-        self.tabs.addTab(self.salesorder_page, "訂單管理")
-
-if __name__ == "__main__":
+def main() -> int:
+    """程式進入點（main.py 與直接執行本模組共用）"""
     initialize_database()
+    from PyQt5.QtCore import QTimer
     from PyQt5.QtWidgets import QApplication
-    app = QApplication(sys.argv)
+    # 沿用已存在的 QApplication（例如在互動式環境中重複執行）
+    app = QApplication.instance() or QApplication(sys.argv)
+    app.aboutToQuit.connect(close_connections)
     window = MainWindow()
     window.show()
-    sys.exit(app.exec_())
\ No newline at end of file
+    QTimer.singleShot(0, lambda: log_startup_time(window))
+    return app.exec_()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,364 @@
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import date
+from itertools import islice
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+from models.erp_database_schema import BOM_LINE_PRICE, after_rollback, get_connection
+from models.records import fetch_all
+
+# === 多階 BOM 展開 ===
+# 明細的 ComponentItemID 若在展開日期有生效中的 BOMHeader，即視為半成品並繼續往下展開：
+# 子 BOM 的用量依「父階需要量 / 子 BOM 的 ProductWeight」等比例換算（ProductWeight 為空或 0 時視為每單位用量），
+# 展開到沒有 BOM 的原料為止。每個 BOM 只讀取一階明細，半成品的展開結果記憶後再組合到引用它的成品中。成本只計算最底層原料的 用量 × 單價，半成品明細上的單價不重複計入。
+
+# 展開層數上限，超過時視為資料錯誤（正常的結構不會這麼深）
+MAX_BOM_DEPTH = 32
+# 一次讀取一階明細的 BOM 數量（IN 清單的參數個數）
+EXPLOSION_BATCH_SIZE = 500
+# 快取保留的展開結果數量
+EXPLOSION_CACHE_SIZE = 4096
+
+
+class BOMCycleError(ValueError):
+    """BOM 結構出現循環（成品直接或間接用到自己）"""
+
+    def __init__(self, path: List[int]):
+        self.path = path
+        super().__init__("BOM 結構出現循環: " + " -> ".join(str(bom_id) for bom_id in path))
+
+
+class ExplosionLine(NamedTuple):
+    level: int                  # 第幾階（根 BOM 的明細為 1）
+    bom_id: int                 # 此明細所屬的 BOM
+    component_item_id: int
+    quantity: float             # 換算到根 BOM 一份產品的需要量
+    price: Optional[float]      # 明細單價（每 g，與 BOMCost 相同：有供應商價格時用供應商目前價格）
+    sub_bom_id: Optional[int]   # 半成品展開所用的 BOM，原料為 None
+    path: Tuple[int, ...]       # 從根 BOM 到此明細所屬 BOM 的路徑
+
+
+class BOMExplosion(NamedTuple):
+    bom_id: int
+    as_of: str
+    lines: List[ExplosionLine]          # 依路徑排序的全部明細（含半成品）
+    requirements: Dict[int, float]      # 原料 ItemID -> 總需要量
+    total_cost: float
+
+    @property
+    def depth(self) -> int:
+        return max((line.level for line in self.lines), default=0)
+
+
+# 子 BOM：展開日期當天生效的版本中 EffectiveDate 最新者（使用 idx_bomheader_product）
+_ACTIVE_BOM = '''
+    (SELECT b.BOMID FROM BOMHeader b
+     WHERE b.ProductID = d.ComponentItemID AND b.EffectiveDate <= :as_of
+       AND (b.ExpireDate IS NULL OR b.ExpireDate >= :as_of)
+     ORDER BY b.EffectiveDate DESC, b.BOMID DESC LIMIT 1)
+'''
+
+# 明細的實際用量：% 依 BOM 的 ProductWeight 換算，其他單位即為數量
+_LINE_QUANTITY = "CASE WHEN d.Unit = '%' THEN IFNULL(h.ProductWeight, 0.0) * d.Quantity / 100.0 ELSE d.Quantity END"
+
+# 只展開一階：每個 BOM 的明細與其半成品所用的子 BOM，沒有明細的 BOM 也會有一列（ComponentItemID 為 NULL）
+_LEVEL_QUERY = f'''
+    SELECT h.BOMID, h.ProductWeight, d.ComponentItemID, {_LINE_QUANTITY} AS Quantity, {BOM_LINE_PRICE} AS Price,
+           {_ACTIVE_BOM} AS SubBOMID
+    FROM BOMHeader h
+    LEFT JOIN BOMDetail d ON d.BOMID = h.BOMID
+    WHERE h.BOMID IN ({{placeholders}})
+    ORDER BY h.BOMID, d.ComponentItemID
+'''
+
+
+class _Level(NamedTuple):
+    weight: float       # 子 BOM 用量的換算基準（ProductWeight 為空或 0 時為 1）
+    rows: list          # 一階明細
+
+
+def _fetch_levels(conn: sqlite3.Connection, bom_ids: List[int], as_of: str) -> Dict[int, _Level]:
+    """每 EXPLOSION_BATCH_SIZE 個 BOM 以一次查詢讀取一階明細"""
+    levels: Dict[int, _Level] = {}
+    pending = iter(bom_ids)
+    while True:
+        batch = list(islice(pending, EXPLOSION_BATCH_SIZE))
+        if not batch:
+            return levels
+        placeholders = ", ".join(f":b{i}" for i in range(len(batch)))
+        params = {"as_of": as_of, **{f"b{i}": bom_id for i, bom_id in enumerate(batch)}}
+        for row in fetch_all(conn.execute(_LEVEL_QUERY.format(placeholders=placeholders), params)):
+            level = levels.get(row["BOMID"])
+            if level is None:
+                weight = row["ProductWeight"]
+                level = levels[row["BOMID"]] = _Level(weight if weight and weight > 0 else 1.0, [])
+            if row["ComponentItemID"] is not None:
+                level.rows.append(row)
+
+
+class _Entry(NamedTuple):
+    explosion: BOMExplosion
+    boms: FrozenSet[int]        # 展開用到的所有 BOM（含自己）
+    items: FrozenSet[int]       # 展開中出現的元件；這些品項的 BOM 版本變動可能改變所選的子 BOM
+    weight: float               # 作為子 BOM 時的用量換算基準
+
+
+class _Composer:
+    """
+    由一階明細組合出多階展開：半成品的展開結果依 (BOMID, as_of) 記憶，
+    同一個子 BOM 不論被多少成品引用都只展開一次，再依父階需要量等比例換算後併入。
+    """
+
+    def __init__(self, as_of: str, levels: Dict[int, _Level], known: Dict[int, _Entry]):
+        self.as_of = as_of
+        self.levels = levels
+        self.known = known          # 已展開（含快取取得）的 BOM
+        self.stack: List[int] = []
+
+    def explode(self, bom_id: int) -> _Entry:
+        entry = self.known.get(bom_id)
+        if entry is not None:
+            return entry
+        if len(self.stack) >= MAX_BOM_DEPTH:
+            raise ValueError(f"BOM {self.stack[0]} 展開超過 {MAX_BOM_DEPTH} 階")
+        self.stack.append(bom_id)
+        try:
+            entry = self._compose(bom_id)
+        finally:
+            self.stack.pop()
+        self.known[bom_id] = entry
+        return entry
+
+    def _compose(self, bom_id: int) -> _Entry:
+        level = self.levels[bom_id]
+        lines, subs, requirements, total_cost = [], [], {}, 0.0
+        boms, items = {bom_id}, set()
+        for row in level.rows:
+            sub_bom_id = row["SubBOMID"]
+            line = ExplosionLine(1, bom_id, row["ComponentItemID"], row["Quantity"], row["Price"],
+                                 sub_bom_id, (bom_id,))
+            lines.append(line)
+            items.add(line.component_item_id)
+            if sub_bom_id is None:
+                requirements[line.component_item_id] = requirements.get(line.component_item_id, 0.0) + line.quantity
+                total_cost += line.quantity * (line.price or 0.0)
+            elif sub_bom_id in self.stack:
+                raise BOMCycleError(self.stack + [sub_bom_id])
+            else:
+                subs.append(line)
+
+        # 與路徑字串 '/BOMID/子BOMID/…' 的排序一致：本階明細在前，子 BOM 依 ID 的字串順序
+        for line in sorted(subs, key=lambda line: f"{line.sub_bom_id}/"):
+            child = self.explode(line.sub_bom_id)
+            factor = line.quantity / child.weight
+            if child.explosion.depth + 1 > MAX_BOM_DEPTH:
+                raise ValueError(f"BOM {bom_id} 展開超過 {MAX_BOM_DEPTH} 階")
+            lines.extend(ExplosionLine(sub.level + 1, sub.bom_id, sub.component_item_id, sub.quantity * factor,
+                                       sub.price, sub.sub_bom_id, (bom_id,) + sub.path)
+                         for sub in child.explosion.lines)
+            for item_id, quantity in child.explosion.requirements.items():
+                requirements[item_id] = requirements.get(item_id, 0.0) + quantity * factor
+            total_cost += child.explosion.total_cost * factor
+            boms |= child.boms
+            items |= child.items
+        explosion = BOMExplosion(bom_id, self.as_of, lines, requirements, total_cost)
+        return _Entry(explosion, frozenset(boms), frozenset(items), level.weight)
+
+
+class ExplosionCache:
+    """
+    以 (資料庫, BOMID, 展開日期) 為鍵的展開結果快取（LRU），多執行緒共用；半成品的展開結果也各自快取，供其他成品組合使用。
+    每個資料庫各自記錄同步到的 BOMRevision，查詢前讀取，有變動時依 BOMChange 只移除該資料庫中用到被修改的 BOM、
+    或元件的 BOM 版本有變動（可能改選其他子 BOM）的展開結果。
+    工作單元回滾時整個快取清除：交易中寫入的 BOM 變更與據此展開的結果一起作廢。
+    """
+
+    def __init__(self, maxsize: int = EXPLOSION_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Tuple[str, int, str], _Entry]" = OrderedDict()
+        self._revisions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def sync(self, conn: sqlite3.Connection) -> Tuple[str, int]:
+        """依資料庫目前的 BOMRevision 移除該資料庫過期的結果，回傳 (資料庫, Revision)"""
+        database, revision = _bom_revision(conn)
+        with self._lock:
+            since = self._revisions.get(database)
+        if revision == since:
+            return database, revision
+        changes = None
+        if since is not None and revision > since:
+            changes = conn.execute("SELECT BOMID, ProductID FROM BOMChange WHERE Revision > ?", (since,)).fetchall()
+        with self._lock:
+            if self._revisions.get(database) != since:
+                return database, revision     # 其他執行緒已同步；put 會以 revision 比對，不會保存過期結果
+            if changes is None:
+                stale = [key for key in self._entries if key[0] == database]
+            else:
+                boms = {bom_id for bom_id, _ in changes}
+                products = {product_id for _, product_id in changes if product_id}
+                stale = [key for key, entry in self._entries.items()
+                         if key[0] == database
+                         and (not boms.isdisjoint(entry.boms) or not products.isdisjoint(entry.items))]
+            for key in stale:
+                del self._entries[key]
+            self._revisions[database] = revision
+        return database, revision
+
+    def get(self, key: Tuple[str, int, str]) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Tuple[str, int, str], entry: _Entry, revision: int):
+        with self._lock:
+            if revision != self._revisions.get(key[0]):
+                return      # 查詢期間 BOM 已被修改（或快取已清除），不保存過期結果
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._revisions.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_cache = ExplosionCache()
+
+
+def clear_explosion_cache():
+    _cache.clear()
+
+
+# 連線所屬的資料庫（主資料庫檔案路徑，記憶體資料庫為空字串）與目前的 BOMRevision，一次查詢取得
+_REVISION_QUERY = '''
+    SELECT (SELECT file FROM pragma_database_list WHERE name = 'main'),
+           IFNULL((SELECT Revision FROM BOMRevision WHERE ID = 1), 0)
+'''
+
+
+def _bom_revision(conn: sqlite3.Connection) -> Tuple[str, int]:
+    database, revision = conn.execute(_REVISION_QUERY).fetchone()
+    # 記憶體資料庫各連線互不相通，以連線區分
+    return database or f":memory:{id(conn)}", revision
+
+
+def explode_boms(bom_ids: Iterable[int], as_of: Optional[str] = None, use_cache: bool = True,
+                 skip_invalid: bool = False, conn: sqlite3.Connection = None) -> Dict[int, BOMExplosion]:
+    """
+    多階展開多個 BOM，回傳 BOMID -> BOMExplosion；as_of（YYYY-MM-DD，預設今天）決定半成品使用哪個版本的 BOM。
+    未快取的 BOM 逐階讀取一階明細（每 EXPLOSION_BATCH_SIZE 個一次查詢），共用的半成品只讀取並展開一次。
+    結構有循環時拋出 BOMCycleError，skip_invalid=True 時改為記錄警告並略過該 BOM。不存在的 BOMID 不會出現在結果中。
+    """
+    as_of = as_of or date.today().isoformat()
+    bom_ids = list(dict.fromkeys(bom_ids))
+    known: Dict[int, _Entry] = {}
+    with get_connection(conn) as conn:
+        database, revision = _cache.sync(conn) if use_cache else (None, None)
+
+        def cached(bom_id: int) -> bool:
+            if bom_id in known:
+                return True
+            entry = _cache.get((database, bom_id, as_of)) if use_cache else None
+            if entry is not None:
+                known[bom_id] = entry
+            return entry is not None
+
+        # 由根 BOM 逐階往下讀取尚未快取的 BOM，已讀過或已快取的子 BOM 不再讀取
+        levels: Dict[int, _Level] = {}
+        frontier = [bom_id for bom_id in bom_ids if not cached(bom_id)]
+        while frontier:
+            fetched = _fetch_levels(conn, frontier, as_of)
+            levels.update(fetched)
+            frontier = list(dict.fromkeys(
+                row["SubBOMID"] for level in fetched.values() for row in level.rows
+                if row["SubBOMID"] is not None and row["SubBOMID"] not in levels and not cached(row["SubBOMID"])))
+
+    composer = _Composer(as_of, levels, known)
+    results: Dict[int, BOMExplosion] = {}
+    for bom_id in bom_ids:
+        if bom_id not in known and bom_id not in levels:
+            continue        # BOMID 不存在
+        try:
+            results[bom_id] = composer.explode(bom_id).explosion
+        except ValueError as e:
+            if not skip_invalid:
+                raise
+            logging.warning("略過無法展開的 BOM %d: %s", bom_id, e)
+    if use_cache and levels:
+        for bom_id in levels:
+            if bom_id in known:
+                _cache.put((database, bom_id, as_of), known[bom_id], revision)
+        # 工作單元中展開的結果可能含未提交的 BOM 變更，回滾時一併清除
+        after_rollback(_cache.clear)
+    return results
+
+
+def explode_bom(bom_id: int, as_of: Optional[str] = None, use_cache: bool = True,
+                conn: sqlite3.Connection = None) -> Optional[BOMExplosion]:
+    """多階展開單一 BOM，BOMID 不存在時回傳 None"""
+    return explode_boms([bom_id], as_of, use_cache, conn=conn).get(bom_id)
+
+
+# === 反查（where-used）===
+# 由元件往上找出所有用到它的 BOM：第 1 階為直接使用該元件的 BOM，
+# 之後以上一階 BOM 的 ProductID 作為元件繼續往上（使用 idx_bomdetail_component），遇到循環即停止。
+_WHERE_USED_QUERY = '''
+    WITH RECURSIVE used(Level, BOMID, ProductID, ComponentItemID, Quantity, Unit, Path) AS (
+        SELECT 1, h.BOMID, h.ProductID, d.ComponentItemID, d.Quantity, d.Unit, '/' || h.BOMID || '/'
+        FROM BOMDetail d
+        JOIN BOMHeader h ON h.BOMID = d.BOMID
+        WHERE d.ComponentItemID = :item_id {seed_filter} {version_filter}
+        UNION ALL
+        SELECT u.Level + 1, h.BOMID, h.ProductID, d.ComponentItemID, d.Quantity, d.Unit, u.Path || h.BOMID || '/'
+        FROM used u
+        JOIN BOMDetail d ON d.ComponentItemID = u.ProductID
+        JOIN BOMHeader h ON h.BOMID = d.BOMID
+        WHERE instr(u.Path, '/' || h.BOMID || '/') = 0 AND u.Level < {max_depth} {version_filter}
+    )
+    SELECT u.Level, u.BOMID, u.ProductID, IFNULL(i.ItemName, '') AS ProductName, h.Version,
+           u.ComponentItemID, IFNULL(c.ItemName, '') AS ComponentName, u.Quantity, u.Unit, u.Path
+    FROM used u
+    JOIN BOMHeader h ON h.BOMID = u.BOMID
+    LEFT JOIN ItemMaster i ON i.ItemID = u.ProductID
+    LEFT JOIN ItemMaster c ON c.ItemID = u.ComponentItemID
+    ORDER BY u.Level, u.Path
+'''
+
+
+def where_used(item_id: int, as_of: Optional[str] = None, supplier_id: Optional[int] = None,
+               direct_only: bool = False, conn: sqlite3.Connection = None) -> List:
+    """
+    反查用到 item_id 的所有 BOM（含經由半成品間接使用者），每列含 Level、BOMID、ProductID、ProductName、
+    Version、ComponentItemID、ComponentName、Quantity、Unit 與 Path（從直接使用的 BOM 往上的路徑）。
+    as_of 指定時只看當天生效的 BOM 版本；supplier_id 指定時只從採用該供應商的明細開始反查
+    （評估供應商調價的影響範圍）；direct_only=True 時只回傳第 1 階。
+    """
+    params = {"item_id": item_id}
+    seed_filter = version_filter = ""
+    if supplier_id is not None:
+        seed_filter = "AND d.SupplierID = :supplier_id"
+        params["supplier_id"] = supplier_id
+    if as_of is not None:
+        version_filter = "AND h.EffectiveDate <= :as_of AND (h.ExpireDate IS NULL OR h.ExpireDate >= :as_of)"
+        params["as_of"] = as_of
+    query = _WHERE_USED_QUERY.format(seed_filter=seed_filter, version_filter=version_filter,
+                                     max_depth=1 if direct_only else MAX_BOM_DEPTH)
+    with get_connection(conn) as conn:
+        cursor = conn.execute(query, params)
+        return fetch_all(cursor)
+
+
+def affected_products(item_id: int, as_of: Optional[str] = None, supplier_id: Optional[int] = None,
+                      conn: sqlite3.Connection = None) -> List[int]:
+    """元件缺料或調價時受影響的成品／半成品 ItemID（依首次出現的階層排序，不重複）"""
+    rows = where_used(item_id, as_of, supplier_id, conn=conn)
+    return list(dict.fromkeys(row["ProductID"] for row in rows))
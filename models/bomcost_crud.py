@@ -0,0 +1,46 @@
+import sqlite3
+import logging
+from typing import Dict, Iterable, List, Optional
+from models.erp_database_schema import BOM_COST_REFRESH, get_connection
+from models.records import fetch_all, fetch_one
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# BOMCost 由觸發器維護（見 erp_database_schema.BOM_COST_SCHEMA），此模組只提供讀取與重建
+
+def get_bom_cost(bom_id: int, conn: sqlite3.Connection = None) -> Optional[Dict]:
+    """取得單一 BOM 目前的總成本與每克成本"""
+    with get_connection(conn) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT BOMID, TotalCost, CostPerGram, UpdatedAt FROM BOMCost WHERE BOMID = ?", (bom_id,))
+        return fetch_one(cursor)
+
+def get_bom_costs(bom_ids: Optional[Iterable[int]] = None, conn: sqlite3.Connection = None) -> List[Dict]:
+    """取得多個 BOM 的成本（未指定時為全部），依 BOMID 排序"""
+    query = "SELECT BOMID, TotalCost, CostPerGram, UpdatedAt FROM BOMCost"
+    params = []
+    if bom_ids is not None:
+        params = list(bom_ids)
+        if not params:
+            return []
+        query += f" WHERE BOMID IN ({', '.join('?' * len(params))})"
+    query += " ORDER BY BOMID"
+    with get_connection(conn) as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return fetch_all(cursor)
+
+def rebuild_bom_costs(bom_id: Optional[int] = None, conn: sqlite3.Connection = None) -> int:
+    """
+    依目前的 BOM 明細重新計算成本，回傳重算的 BOM 數量。
+    正常情況下觸發器已保持同步，僅在停用觸發器大量匯入或修復資料時使用。
+    """
+    with get_connection(conn) as conn:
+        if bom_id is None:
+            conn.execute("DELETE FROM BOMCost WHERE BOMID NOT IN (SELECT BOMID FROM BOMHeader)")
+            cursor = conn.execute(BOM_COST_REFRESH.format(where="1"))
+        else:
+            cursor = conn.execute(BOM_COST_REFRESH.format(where="h.BOMID = ?"), (bom_id,))
+        conn.commit()
+        logging.info("已重算 %d 筆 BOM 成本", cursor.rowcount)
+        return cursor.rowcount
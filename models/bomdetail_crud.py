@@ -1,6 +1,9 @@
 from contextlib import contextmanager
-from typing import Optional, List, Dict
+from typing import Iterable, Optional, List, Dict
 from models.erp_database_schema import get_connection, create_tables
+from models.pagination import Keyset, apply_keyset
+from models.records import fetch_all
+from models.bulk import REQUIRED, BulkResult, bulk_insert, row_args
 import sqlite3
 import logging
 from models.itemmaster_crud import add_item
@@ -11,14 +14,14 @@ logging.basicConfig(level=logging.INFO)
         
 # === CRUD Functions for BOMDetail ===
 def add_bom_detail(bom_id: int, component_item_id: int, quantity: float, unit: str, 
-                   scrap_rate: Optional[float] = None, supplier_id: Optional[int] = None, price: Optional[float] = None):
+                   scrap_rate: Optional[float] = None, supplier_id: Optional[int] = None, price: Optional[float] = None, conn: sqlite3.Connection = None):
     """新增 BOM 明細，包含供應商與價格資訊"""
     if quantity <= 0:
         raise ValueError("Quantity 必須為正數")
     if scrap_rate is not None and not (0.0 <= scrap_rate <= 1.0):
         raise ValueError("ScrapRate 必須在 0.0 到 1.0 之間")
 
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute('''
@@ -38,34 +41,61 @@ def add_bom_detail(bom_id: int, component_item_id: int, quantity: float, unit: s
             else:
                 raise
 
-
-def get_bom_details(bom_id: Optional[int] = None, component_item_id: Optional[int] = None) -> List[Dict]:
-    """取得 BOMDetail 記錄，支援條件篩選"""
+def bulk_add_bom_details(details: Iterable, on_conflict: Optional[str] = None, conn: sqlite3.Connection = None) -> BulkResult:
+    """
+    批次新增 BOM 明細，每筆為 (bom_id, component_item_id, quantity, unit, scrap_rate, supplier_id, price)
+    或同名參數的 dict。on_conflict="update" 時同一 BOM 的重複組件會改為更新數量、單位、損耗率、供應商與價格。
+    """
+    params = (("bom_id", REQUIRED), ("component_item_id", REQUIRED), ("quantity", REQUIRED), ("unit", REQUIRED),
+              ("scrap_rate", None), ("supplier_id", None), ("price", None))
+
+    def prepare(row):
+        values = row_args(row, params)
+        quantity, scrap_rate = values[2], values[4]
+        if quantity is None or quantity <= 0:
+            raise ValueError("Quantity 必須為正數")
+        if scrap_rate is not None and not (0.0 <= scrap_rate <= 1.0):
+            raise ValueError("ScrapRate 必須在 0.0 到 1.0 之間")
+        return values
+
+    return bulk_insert("BOMDetail", ("BOMID", "ComponentItemID", "Quantity", "Unit", "ScrapRate", "SupplierID", "Price"),
+                       details, prepare, on_conflict=on_conflict, conflict_keys=("BOMID", "ComponentItemID"),
+                       update_columns=("Quantity", "Unit", "ScrapRate", "SupplierID", "Price"), conn=conn)
+
+
+BOM_DETAIL_KEYSET = Keyset("BOMDetailID", {"BOMDetailID": "d.BOMDetailID", "BOMID": "d.BOMID",
+                                            "ComponentName": "i.ItemName", "Quantity": "d.Quantity",
+                                            "Price": "d.Price"},
+                           nullable=("Price",))
+
+def get_bom_details(bom_id: Optional[int] = None, component_item_id: Optional[int] = None, after_key=None,
+                    limit: Optional[int] = None, order_by: Optional[str] = None,
+                    conn: sqlite3.Connection = None) -> List[Dict]:
+    """取得 BOMDetail 記錄，支援條件篩選；after_key/limit/order_by 為 keyset 分頁參數（見 models.pagination）"""
     query = '''
         SELECT d.BOMDetailID, d.BOMID, d.ComponentItemID, d.Quantity, d.Unit, d.ScrapRate,
                d.SupplierID, d.Price,   -- 新增供應商與價格欄位
                i.ItemName AS ComponentName
         FROM BOMDetail d
         JOIN ItemMaster i ON d.ComponentItemID = i.ItemID
-        WHERE 1=1
     '''
-    params = []
+    conditions, params = [], []
     if bom_id is not None:
-        query += " AND d.BOMID = ?"
+        conditions.append("d.BOMID = ?")
         params.append(bom_id)
     if component_item_id is not None:
-        query += " AND d.ComponentItemID = ?"
+        conditions.append("d.ComponentItemID = ?")
         params.append(component_item_id)
+    query, params = apply_keyset(query, conditions, params, BOM_DETAIL_KEYSET, order_by, after_key, limit)
 
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute(query, tuple(params))
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return fetch_all(cursor)
 
 
 
-def update_bom_detail(bom_detail_id: int, **kwargs):
+def update_bom_detail(bom_detail_id: int, conn: sqlite3.Connection = None, **kwargs):
     """更新 BOM 明細"""
     allowed_fields = {
         "bom_id": "BOMID",
@@ -93,7 +123,7 @@ def update_bom_detail(bom_detail_id: int, **kwargs):
     query = f"UPDATE BOMDetail SET {', '.join(fields)} WHERE BOMDetailID = ?"
     values.append(bom_detail_id)
 
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute(query, tuple(values))
@@ -110,9 +140,9 @@ def update_bom_detail(bom_detail_id: int, **kwargs):
             else:
                 raise
 
-def delete_bom_detail(bom_detail_id: int):
+def delete_bom_detail(bom_detail_id: int, conn: sqlite3.Connection = None):
     """刪除 BOM 明細"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM BOMDetail WHERE BOMDetailID = ?", (bom_detail_id,))
         conn.commit()
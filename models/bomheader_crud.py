@@ -2,13 +2,16 @@ import sqlite3
 from contextlib import contextmanager
 from typing import List, Dict, Optional
 from models.erp_database_schema import get_connection, create_tables
+from models.records import fetch_all, fetch_one
+from models.pagination import Keyset, apply_keyset
+from models.search_crud import match_condition
 import logging
 from datetime import datetime
         
 # === 改進 1：新增前置外鍵檢查 ===
-def check_product_exists(product_id: int) -> bool:
+def check_product_exists(product_id: int, conn: sqlite3.Connection = None) -> bool:
     """檢查 ProductID 是否存在於 ItemMaster 表中"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT 1 FROM ItemMaster WHERE ItemID = ?", (product_id,))
         return cursor.fetchone() is not None
@@ -25,14 +28,14 @@ def validate_dates(effective_date: str, expire_date: Optional[str]):
 # === 增強的 CRUD 函數 ===
 
 # === Create ===
-def add_bom_header(product_id: int, version: str, effective_date: str, product_weight: float, expire_date: Optional[str] = None, remarks: Optional[str] = None):
-    """新增 BOMHeader 記錄"""
-    if not check_product_exists(product_id):
+def add_bom_header(product_id: int, version: str, effective_date: str, product_weight: float, expire_date: Optional[str] = None, remarks: Optional[str] = None, conn: sqlite3.Connection = None):
+    """新增 BOMHeader 記錄，返回新的 BOMID"""
+    if not check_product_exists(product_id, conn):
         raise ValueError(f"ProductID {product_id} 不存在於 ItemMaster 表中")
 
     validate_dates(effective_date, expire_date)
 
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute(
@@ -44,6 +47,7 @@ def add_bom_header(product_id: int, version: str, effective_date: str, product_w
             )
             conn.commit()
             logging.info("成功新增 BOMHeader: ProductID = %d, Version = %s", product_id, version)
+            return cursor.lastrowid
         except sqlite3.IntegrityError as e:
             conn.rollback()
             if "FOREIGN KEY" in str(e):
@@ -54,25 +58,72 @@ def add_bom_header(product_id: int, version: str, effective_date: str, product_w
                 raise
 
 # === Read ===
-def get_bom_headers() -> List[Dict]:
-    """取得所有 BOMHeader 記錄，返回字典格式"""
-    with get_connection() as conn:
+BOM_HEADER_KEYSET = Keyset("BOMID", {"ProductID": "ProductID", "Version": "Version",
+                                     "EffectiveDate": "EffectiveDate", "ProductWeight": "ProductWeight"},
+                           nullable=("ProductWeight",))
+
+def get_bom_headers(search: Optional[str] = None, after_key=None, limit: Optional[int] = None,
+                    order_by: Optional[str] = None, conn: sqlite3.Connection = None) -> List[Dict]:
+    """
+    取得 BOMHeader 記錄，返回字典格式；search 比對產品名稱、版本或備註，
+    可用 after_key/limit/order_by 分頁
+    """
+    conditions, params = [], []
+    with get_connection(conn) as conn:
+        if search:
+            bom_match, bom_params = match_condition("boms", search, conn=conn)
+            product_match, product_params = match_condition("items", search, ("ItemName",),
+                                                            key_expression="ProductID", conn=conn)
+            conditions.append(f"({bom_match}) OR ({product_match})")
+            params.extend(bom_params + product_params)
+        query, params = apply_keyset("SELECT * FROM BOMHeader", conditions, params, BOM_HEADER_KEYSET,
+                                     order_by, after_key, limit)
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM BOMHeader")
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        cursor.execute(query, params)
+        return fetch_all(cursor)
+
+BOM_COST_KEYSET = Keyset("BOMID", {"BOMID": "h.BOMID", "ProductName": "i.ItemName", "Version": "h.Version",
+                                   "EffectiveDate": "h.EffectiveDate", "ProductWeight": "h.ProductWeight"},
+                         nullable=("ProductName", "ProductWeight"))
+
+def get_bom_cost_summary(search: Optional[str] = None, after_key=None, limit: Optional[int] = None,
+                         order_by: Optional[str] = None, conn: sqlite3.Connection = None) -> List[Dict]:
+    """
+    取得每個 BOM 的產品名稱、重量、總成本、每克成本與備註。
+    成本由 BOMCost 依主鍵讀取（明細或價格變動時由觸發器重算，見 erp_database_schema.BOM_COST_SCHEMA），
+    明細單位為 % 時用量為 ProductWeight × Quantity / 100，否則 Quantity 即為用量。
+    search 與 get_bom_headers 相同，可用 after_key/limit/order_by 分頁
+    """
+    query = '''
+        SELECT h.BOMID, h.ProductID, IFNULL(i.ItemName, '') AS ProductName, h.Version, h.EffectiveDate,
+               IFNULL(h.ProductWeight, 0.0) AS ProductWeight, h.Remarks,
+               IFNULL(c.TotalCost, 0.0) AS TotalPrice, c.CostPerGram
+        FROM BOMHeader h
+        LEFT JOIN ItemMaster i ON i.ItemID = h.ProductID AND i.Status = 'active'
+        LEFT JOIN BOMCost c ON c.BOMID = h.BOMID
+    '''
+    conditions, params = [], []
+    with get_connection(conn) as conn:
+        if search:
+            bom_match, bom_params = match_condition("boms", search, key_expression="h.BOMID", conn=conn)
+            product_match, product_params = match_condition("items", search, ("ItemName",),
+                                                            key_expression="h.ProductID", conn=conn)
+            conditions.append(f"({bom_match}) OR ({product_match})")
+            params.extend(bom_params + product_params)
+        query, params = apply_keyset(query, conditions, params, BOM_COST_KEYSET, order_by, after_key, limit)
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return fetch_all(cursor)
 
-def get_bom_header_by_id(bom_id: int) -> Optional[Dict]:
+def get_bom_header_by_id(bom_id: int, conn: sqlite3.Connection = None) -> Optional[Dict]:
     """依 BOMID 查詢 BOMHeader 記錄"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM BOMHeader WHERE BOMID = ?", (bom_id,))
-        columns = [col[0] for col in cursor.description]
-        row = cursor.fetchone()
-        return dict(zip(columns, row)) if row else None
+        return fetch_one(cursor)
 
 # === Update ===
-def update_bom_header(bom_id: int, **kwargs):
+def update_bom_header(bom_id: int, conn: sqlite3.Connection = None, **kwargs):
     """更新 BOMHeader 記錄，支援多欄位更新並驗證日期"""
     allowed_fields = {
         "new_product_id": "ProductID",
@@ -101,16 +152,16 @@ def update_bom_header(bom_id: int, **kwargs):
     query = f"UPDATE BOMHeader SET {', '.join(fields)} WHERE BOMID = ?"
     values.append(bom_id)
 
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute(query, tuple(values))
         conn.commit()
         logging.info("成功更新 BOMHeader: BOMID = %d", bom_id)
 
 # === Delete ===
-def delete_bom_header(bom_id: int):
+def delete_bom_header(bom_id: int, conn: sqlite3.Connection = None):
     """刪除指定的 BOMHeader 記錄"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM BOMHeader WHERE BOMID = ?", (bom_id,))
         conn.commit()
@@ -0,0 +1,150 @@
+import logging
+import sqlite3
+from itertools import islice
+from typing import Any, Callable, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+from models.erp_database_schema import get_connection
+
+# 每批 executemany 的筆數；整批失敗時才退回逐筆執行找出錯誤列
+BULK_BATCH_SIZE = 5000
+ON_CONFLICT_MODES = (None, "ignore", "update")
+
+
+class _Required:
+    def __repr__(self):
+        return "REQUIRED"
+
+
+REQUIRED = _Required()   # row_args 參數清單中標記必填欄位
+
+
+class BulkError(NamedTuple):
+    index: int      # 在輸入資料中的位置（從 0 起算）
+    row: Any
+    message: str
+
+
+class BulkResult:
+    """批次寫入結果：affected 為實際新增或更新的筆數，errors 為被略過的資料列"""
+
+    def __init__(self):
+        self.affected = 0
+        self.errors: List[BulkError] = []
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def __repr__(self):
+        return f"BulkResult(affected={self.affected}, errors={len(self.errors)})"
+
+
+def row_args(row, params: Sequence[Tuple[str, Any]]) -> Tuple:
+    """
+    將一筆輸入轉成與單筆 add_* 函式相同順序的參數。
+    row 可為 tuple（依位置）或 dict（依參數名稱），未提供的參數使用預設值。
+    """
+    if isinstance(row, Mapping):
+        missing = [name for name, default in params if default is REQUIRED and name not in row]
+        if missing:
+            raise ValueError(f"缺少欄位: {', '.join(missing)}")
+        return tuple(row.get(name, default) for name, default in params)
+    row = tuple(row)
+    if len(row) > len(params):
+        raise ValueError(f"欄位數過多: {len(row)} > {len(params)}")
+    required = sum(1 for _, default in params if default is REQUIRED)
+    if len(row) < required:
+        raise ValueError(f"欄位數不足: {len(row)} < {required}")
+    return row + tuple(default for _, default in params[len(row):])
+
+
+def integrity_message(error: sqlite3.IntegrityError) -> str:
+    """將資料庫約束錯誤轉為中文訊息"""
+    text = str(error)
+    if "FOREIGN KEY" in text:
+        return "外鍵約束失敗：關聯資料不存在"
+    if "UNIQUE" in text:
+        return f"唯一性約束失敗：{text}"
+    if "CHECK" in text:
+        return f"檢查約束失敗：{text}"
+    if "NOT NULL" in text:
+        return f"必填欄位為空：{text}"
+    return text
+
+
+def build_insert_sql(table: str, columns: Sequence[str], on_conflict: Optional[str] = None,
+                     conflict_keys: Optional[Sequence[str]] = None,
+                     update_columns: Optional[Sequence[str]] = None) -> str:
+    """產生 INSERT 語句，依 on_conflict 附加 ON CONFLICT 子句"""
+    if on_conflict not in ON_CONFLICT_MODES:
+        raise ValueError(f"無效的 on_conflict: {on_conflict}, 合法值為 {ON_CONFLICT_MODES}")
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+    if on_conflict == "ignore":
+        sql += " ON CONFLICT DO NOTHING"
+    elif on_conflict == "update":
+        if not conflict_keys:
+            raise ValueError(f"{table} 沒有唯一鍵，無法使用 on_conflict='update'")
+        assignments = ", ".join(f"{col} = excluded.{col}" for col in update_columns)
+        sql += f" ON CONFLICT ({', '.join(conflict_keys)}) DO UPDATE SET {assignments}"
+    return sql
+
+
+def bulk_insert(table: str, columns: Sequence[str], rows: Iterable, prepare: Callable[[Any], Tuple],
+                on_conflict: Optional[str] = None, conflict_keys: Optional[Sequence[str]] = None,
+                update_columns: Optional[Sequence[str]] = None, batch_size: int = BULK_BATCH_SIZE,
+                conn: Optional[sqlite3.Connection] = None) -> BulkResult:
+    """
+    以 executemany 批次寫入，全部資料在同一個交易內提交。
+    prepare 負責驗證並回傳 SQL 參數，拋出 ValueError/TypeError 的資料列會被記錄並略過；
+    某批違反資料庫約束時回滾該批並改為逐筆寫入，只略過出錯的資料列。
+    若傳入的連線已在交易中（例如呼叫端自行管理交易），則不在此提交。
+    """
+    sql = build_insert_sql(table, columns, on_conflict, conflict_keys, update_columns)
+    result = BulkResult()
+
+    with get_connection(conn) as conn:
+        owns_transaction = not conn.in_transaction
+        if owns_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        try:
+            source = enumerate(rows)
+            while True:
+                chunk = list(islice(source, batch_size))
+                if not chunk:
+                    break
+                batch = []
+                for index, row in chunk:
+                    try:
+                        batch.append((index, row, prepare(row)))
+                    except (ValueError, TypeError) as e:
+                        result.errors.append(BulkError(index, row, str(e)))
+                _write_batch(conn, sql, batch, result)
+            if owns_transaction:
+                conn.commit()
+            result.errors.sort(key=lambda error: error.index)
+        except Exception:
+            if owns_transaction:
+                conn.rollback()
+            raise
+
+    logging.info("批次寫入 %s: 成功 %d 筆, 略過 %d 筆", table, result.affected, len(result.errors))
+    return result
+
+
+def _write_batch(conn: sqlite3.Connection, sql: str, batch: List[Tuple[int, Any, Tuple]], result: BulkResult):
+    if not batch:
+        return
+    cursor = conn.cursor()
+    conn.execute("SAVEPOINT bulk_batch")
+    try:
+        cursor.executemany(sql, [params for _, _, params in batch])
+        result.affected += cursor.rowcount
+    except sqlite3.IntegrityError:
+        # 單一 INSERT 失敗時 SQLite 只回滾該語句，逐筆重做即可保留其他資料列
+        conn.execute("ROLLBACK TO bulk_batch")
+        for index, row, params in batch:
+            try:
+                cursor.execute(sql, params)
+                result.affected += cursor.rowcount
+            except sqlite3.IntegrityError as e:
+                result.errors.append(BulkError(index, row, integrity_message(e)))
+    conn.execute("RELEASE bulk_batch")
@@ -0,0 +1,218 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+from models.db_profile import apply_db_profile, DEFAULT_PROFILE
+from models.unit_of_work import Session, UnitOfWork
+
+
+class PooledConnection(sqlite3.Connection):
+    """連線池建立的連線：行為與 sqlite3.Connection 相同，但可作為弱參照鍵（以連線為單位的快取）"""
+
+
+class ConnectionPool:
+    """
+    SQLite 連線池。
+    主執行緒（GUI）持有一條常駐連線；其他工作執行緒共用一組有上限的連線，
+    用完歸還而不關閉。同一執行緒內巢狀呼叫會重複使用同一條連線。
+    """
+
+    def __init__(self, database: str, profile: str = DEFAULT_PROFILE, max_worker_connections: int = 4, timeout: float = 5.0):
+        self.database = database
+        self.profile = profile
+        self.max_worker_connections = max_worker_connections
+        self.timeout = timeout
+
+        self._local = threading.local()      # 每個執行緒目前持有的連線與巢狀深度
+        self._cond = threading.Condition()
+        self._main_conn = None
+        self._main_in_use = False            # 主執行緒是否正持有常駐連線（關閉時延後到歸還才關閉）
+        self._idle = []                      # 閒置中的工作執行緒連線
+        self._worker_count = 0               # 已建立的工作執行緒連線數
+        self._closed = False
+
+        # 統計數據
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.wait_time = 0.0
+
+    # === 連線建立 ===
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.database, timeout=self.timeout, check_same_thread=False,
+                               factory=PooledConnection)
+        conn.execute("PRAGMA foreign_keys = ON")
+        apply_db_profile(conn, self.profile)
+        return conn
+
+    # === 取得 / 歸還 ===
+    @contextmanager
+    def connection(self):
+        """取得目前執行緒的連線，最後一個使用者離開時自動回滾未提交的交易並歸還"""
+        local = self._local
+        conn = getattr(local, "conn", None)
+        if conn is None:
+            conn = self._acquire()
+            local.conn = conn
+            local.depth = 0
+
+        # 巢狀呼叫沿用同一條連線；以計數決定歸還時機，
+        # 逐批讀取的 generator 即使比呼叫端晚結束也不會提早歸還
+        local.depth += 1
+        try:
+            unit = getattr(local, "unit", None)
+            if unit is None:
+                yield conn
+            else:
+                # 工作單元進行中：提交延後到工作單元結束，每次呼叫各自一個 savepoint
+                with unit.scope() as session:
+                    yield session
+        finally:
+            local.depth -= 1
+            if local.depth == 0:
+                local.conn = None
+                self._release(conn)
+
+    @contextmanager
+    def unit_of_work(self):
+        """
+        將區塊內所有 CRUD 呼叫合併為一個交易，正常結束時提交一次，例外時全部回滾。
+        巢狀使用時內層以 savepoint 執行，只回滾內層的變更。
+        """
+        local = self._local
+        if getattr(local, "unit", None) is not None:
+            with self.connection() as session:
+                yield session
+            return
+
+        with self.connection() as conn:
+            unit = UnitOfWork(conn)
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")
+            local.unit = unit
+            try:
+                yield Session(unit)
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                unit.run_after_rollback()
+                raise
+            finally:
+                local.unit = None
+        unit.run_after_commit()
+
+    def current_unit_of_work(self):
+        """回傳目前執行緒進行中的工作單元（沒有則為 None）"""
+        return getattr(self._local, "unit", None)
+
+    def current_connection(self):
+        """回傳目前執行緒正在使用的連線（沒有則為 None）"""
+        return getattr(self._local, "conn", None)
+
+    def _acquire(self) -> sqlite3.Connection:
+        if threading.current_thread() is threading.main_thread():
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("連線池已關閉")
+                if self._main_conn is None:
+                    self._main_conn = self._connect()
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                self._main_in_use = True
+                return self._main_conn
+
+        start = time.perf_counter()
+        deadline = start + self.timeout
+        waited = False
+        conn = None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("連線池已關閉")
+                if self._idle:
+                    conn = self._idle.pop()
+                    self.hits += 1
+                    break
+                if self._worker_count < self.max_worker_connections:
+                    self._worker_count += 1
+                    self.misses += 1
+                    break
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    raise sqlite3.OperationalError("連線池已滿，等待連線逾時")
+                waited = True
+                self._cond.wait(remaining)
+            if waited:
+                self.waits += 1
+                self.wait_time += time.perf_counter() - start
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._worker_count -= 1
+                    self._cond.notify()
+                raise
+        return conn
+
+    def _release(self, conn: sqlite3.Connection):
+        healthy = True
+        try:
+            # 未提交的變更一律捨棄，與過去「用完即關閉連線」的行為一致
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+        except sqlite3.Error:
+            healthy = False
+
+        with self._cond:
+            is_main = conn is self._main_conn
+            if is_main:
+                self._main_in_use = False
+                # 連線池在使用期間被關閉，或連線已損壞：歸還時才關閉主連線
+                close_main = self._closed or not healthy
+                if close_main:
+                    self._main_conn = None
+        if is_main:
+            if close_main:
+                conn.close()
+            return
+
+        with self._cond:
+            if self._closed or not healthy:
+                self._worker_count -= 1
+                conn.close()
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    # === 管理 ===
+    def stats(self) -> Dict:
+        """回傳連線池統計：命中、未命中（新建連線）、等待次數與累計等待秒數"""
+        with self._cond:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "waits": self.waits,
+                "wait_time": self.wait_time,
+                "worker_connections": self._worker_count,
+                "idle_connections": len(self._idle),
+            }
+
+    def close(self):
+        """關閉所有閒置連線；使用中的連線（包含主連線）在歸還時關閉"""
+        main_conn = None
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._worker_count -= len(idle)
+            if not self._main_in_use:
+                main_conn, self._main_conn = self._main_conn, None
+            self._cond.notify_all()
+        for conn in idle:
+            conn.close()
+        if main_conn is not None:
+            main_conn.close()
@@ -1,15 +1,18 @@
+import sqlite3
 import logging
 from models.erp_database_schema import get_connection
-from typing import List, Dict, Optional
+from models.pagination import Keyset, apply_keyset
+from models.records import DEFAULT_ARRAYSIZE, iter_records
+from typing import Iterator, List, Dict, Optional
 
 logging.basicConfig(level=logging.INFO)
 
-def add_cost_history(product_name: str, price: float):
+def add_cost_history(product_name: str, price: float, conn: sqlite3.Connection = None):
     """
     新增一筆 CostHistory 紀錄，product_name 為產品名稱，price 為本次更新價格。
     UpdateTime 欄位採用預設的 CURRENT_TIMESTAMP 自動填入。
     """
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute('''
             INSERT INTO CostHistory (ProductName, Price)
@@ -18,23 +21,35 @@ def add_cost_history(product_name: str, price: float):
         conn.commit()
         logging.info("成功新增 CostHistory 記錄：%s, 價格=%.2f", product_name, price)
 
-def get_cost_history(product_name: Optional[str] = None) -> List[Dict]:
-    """取得某產品的歷史價格記錄"""
-    with get_connection() as conn:
+COST_HISTORY_KEYSET = Keyset("CostHistoryID", {"ProductName": "ProductName", "Price": "Price",
+                                               "UpdateTime": "UpdateTime"})
+
+def iter_cost_history(product_name: Optional[str] = None, after_key=None, limit: Optional[int] = None,
+                      order_by: Optional[str] = "-UpdateTime", arraysize: int = DEFAULT_ARRAYSIZE,
+                      chunked: bool = False, conn: sqlite3.Connection = None) -> Iterator:
+    """
+    逐批讀取某產品的歷史價格記錄（預設最新的在前）；chunked=True 時每次產生一批（list），
+    after_key/limit/order_by 為 keyset 分頁參數（見 models.pagination）
+    """
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
+        cursor.arraysize = arraysize
 
         query = """
             SELECT CostHistoryID, ProductName, Price, UpdateTime
             FROM CostHistory
         """
-        params = []
+        conditions, params = [], []
 
         if product_name:
-            query += " WHERE ProductName LIKE ?"
+            conditions.append("ProductName LIKE ?")
             params.append(f"%{product_name}%")
 
-        query += " ORDER BY UpdateTime DESC"
-
+        query, params = apply_keyset(query, conditions, params, COST_HISTORY_KEYSET, order_by, after_key, limit)
         cursor.execute(query, params)
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        yield from iter_records(cursor, chunked)
+
+def get_cost_history(product_name: Optional[str] = None, after_key=None, limit: Optional[int] = None,
+                     order_by: Optional[str] = "-UpdateTime", conn: sqlite3.Connection = None) -> List[Dict]:
+    """取得某產品的歷史價格記錄（預設最新的在前）；可用 after_key/limit/order_by 分頁"""
+    return list(iter_cost_history(product_name, after_key, limit, order_by, conn=conn))
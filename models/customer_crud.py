@@ -1,8 +1,11 @@
 import sqlite3
 from contextlib import contextmanager
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional
 import logging
 from models.erp_database_schema import get_connection, create_tables
+from models.records import DEFAULT_ARRAYSIZE, fetch_all, fetch_one, iter_records
+from models.pagination import Keyset, apply_keyset
+from models.search_crud import match_condition
 import re
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -15,12 +18,12 @@ def validate_email(email: Optional[str]) -> bool:
     return True
 
 def add_customer(customer_name: str, address: Optional[str] = None, address2: Optional[str] = None,contact_person: Optional[str] = None,
-                 phone: Optional[str] = None, email: Optional[str] = None, tax_id: Optional[str] = None):
+                 phone: Optional[str] = None, email: Optional[str] = None, tax_id: Optional[str] = None, conn: sqlite3.Connection = None):
     """新增客戶資料，並驗證輸入"""
     if not customer_name:
         raise ValueError("客戶名稱不能為空")
 
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute('''
@@ -41,39 +44,48 @@ def add_customer(customer_name: str, address: Optional[str] = None, address2: Op
 # === Read ===
 from typing import List, Dict, Optional
 
-def get_customers(search_term: Optional[str] = None) -> List[Dict]:
+CUSTOMER_KEYSET = Keyset("CustomerID", {"CustomerName": "CustomerName", "TaxID": "TaxID",
+                                         "ContactPerson": "ContactPerson", "Phone": "Phone"},
+                         nullable=("TaxID", "ContactPerson", "Phone"))
+
+def iter_customers(search_term: Optional[str] = None, after_key=None, limit: Optional[int] = None,
+                   order_by: Optional[str] = None, arraysize: int = DEFAULT_ARRAYSIZE, chunked: bool = False,
+                   conn: sqlite3.Connection = None) -> Iterator:
+    """逐批讀取客戶資料；after_key/limit/order_by 為 keyset 分頁參數（見 models.pagination）"""
     query = "SELECT CustomerID, CustomerName, ContactPerson, Phone, Address, Address2 ,TaxID, Email FROM Customer"
-    params = []
+    conditions, params = [], []
 
-    if search_term:
-        query += " WHERE CustomerName LIKE ? OR Phone LIKE ?"
-        search_pattern = f"%{search_term}%"
-        params.extend([search_pattern, search_pattern])
+    with get_connection(conn) as conn:
+        if search_term:
+            condition, search_params = match_condition("customers", search_term, ("CustomerName", "Phone"), conn=conn)
+            conditions.append(condition)
+            params.extend(search_params)
 
-    query += " ORDER BY CustomerID"
+        query, params = apply_keyset(query, conditions, params, CUSTOMER_KEYSET, order_by, after_key, limit)
 
-    with get_connection() as conn:
         cursor = conn.cursor()
-        try:
-            cursor.execute(query, params)
-            columns = [col[0] for col in cursor.description]
-            return [dict(zip(columns, row)) for row in cursor.fetchall()]
-        except sqlite3.Error as e:
-            print(f"數據庫查詢錯誤: {e}")
-            return []
+        cursor.arraysize = arraysize
+        cursor.execute(query, params)
+        yield from iter_records(cursor, chunked)
+
+def get_customers(search_term: Optional[str] = None, after_key=None, limit: Optional[int] = None,
+                  order_by: Optional[str] = None, conn: sqlite3.Connection = None) -> List[Dict]:
+    try:
+        return list(iter_customers(search_term, after_key, limit, order_by, conn=conn))
+    except sqlite3.Error as e:
+        print(f"數據庫查詢錯誤: {e}")
+        return []
 
         
-def get_customer_by_id(customer_id: int) -> Optional[Dict]:
+def get_customer_by_id(customer_id: int, conn: sqlite3.Connection = None) -> Optional[Dict]:
     """依 CustomerID 查詢單筆客戶記錄"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM Customer WHERE CustomerID = ?", (customer_id,))
-        columns = [col[0] for col in cursor.description]
-        row = cursor.fetchone()
-        return dict(zip(columns, row)) if row else None
+        return fetch_one(cursor)
 
 # === Update ===
-def update_customer(customer_id: int, **kwargs):
+def update_customer(customer_id: int, conn: sqlite3.Connection = None, **kwargs):
     """更新客戶記錄"""
     allowed_fields = {
         "customer_name": "CustomerName",
@@ -98,15 +110,15 @@ def update_customer(customer_id: int, **kwargs):
     query = f"UPDATE Customer SET {', '.join(fields)} WHERE CustomerID = ?"
     values.append(customer_id)
 
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute(query, tuple(values))
         conn.commit()
         logging.info("成功更新客戶: CustomerID = %d", customer_id)
 
 # === Delete ===
-def delete_customer(customer_id: int):
-    with get_connection() as conn:
+def delete_customer(customer_id: int, conn: sqlite3.Connection = None):
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
 
         # ✅ 修正表名，查詢 `SalesOrderHeader` 是否仍有該客戶的訂單
@@ -1,282 +1,1070 @@
 from contextlib import contextmanager
 import sqlite3
+import threading
+from typing import Callable, Dict, Tuple
+from models.connection_pool import ConnectionPool
+from models.db_profile import resolve_profile_name
+from models.migrations import apply_migrations, add_column_if_missing, create_full_text_index
+from models.unit_of_work import Session
 
 DB_NAME = "erp_system.db"
+DB_PROFILE = resolve_profile_name()  # 可由環境變數 ERP_DB_PROFILE 指定
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """取得共用連線池，DB_NAME 或 DB_PROFILE 變更時自動重建"""
+    global _pool
+    pool = _pool
+    if pool is None or pool.database != DB_NAME or pool.profile != DB_PROFILE:
+        with _pool_lock:
+            if _pool is None or _pool.database != DB_NAME or _pool.profile != DB_PROFILE:
+                if _pool is not None:
+                    _pool.close()
+                _pool = ConnectionPool(DB_NAME, profile=DB_PROFILE)
+            pool = _pool
+    return pool
+
+def set_db_profile(name: str) -> str:
+    """切換效能設定檔（desktop / shared-drive / bulk-import / legacy），下次取得連線時生效"""
+    global DB_PROFILE
+    DB_PROFILE = resolve_profile_name(name)
+    return DB_PROFILE
 
 @contextmanager
-def get_connection():
-    """取得資料庫連接並啟用外鍵約束"""
-    conn = sqlite3.connect(DB_NAME)
-    conn.execute("PRAGMA foreign_keys = ON")
-    try:
+def get_connection(conn=None):
+    """
+    取得資料庫連接並啟用外鍵約束（由連線池提供，離開時歸還而非關閉）。
+    傳入 conn 時直接沿用；傳入的是工作單元的 session 則在其中開一個 savepoint。
+    """
+    if isinstance(conn, Session):
+        with conn.unit.scope() as session:
+            yield session
+    elif conn is not None:
         yield conn
-    finally:
-        conn.close()
+    else:
+        with get_pool().connection() as conn:
+            yield conn
+
+def unit_of_work():
+    """
+    工作單元：區塊內的 CRUD 呼叫共用同一個交易，結束時只提交一次。
+    同一執行緒內的 CRUD 函式會自動加入，也可將取得的 session 以 conn 參數傳入。
+    """
+    return get_pool().unit_of_work()
+
+def after_commit(callback: Callable[[], None]):
+    """在工作單元提交後執行 callback；不在工作單元內時立即執行"""
+    unit = get_pool().current_unit_of_work()
+    if unit is None:
+        callback()
+    else:
+        unit.after_commit(callback)
+
+def after_rollback(callback: Callable[[], None]):
+    """在工作單元（或其中的 savepoint）回滾後執行 callback；不在工作單元內時不登記"""
+    unit = get_pool().current_unit_of_work()
+    if unit is not None:
+        unit.after_rollback(callback)
+
+def get_data_version() -> Tuple[int, int]:
+    """
+    取得目前執行緒連線的資料版本：PRAGMA data_version 反映其他連線的提交，
+    total_changes 反映本連線的寫入。兩者都沒變表示資料自上次讀取後未變更。
+    """
+    with get_connection() as conn:
+        return conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes
+
+def get_pool_stats() -> Dict:
+    """取得連線池統計（hits / misses / waits / wait_time）"""
+    return get_pool().stats()
+
+def close_connections():
+    """關閉連線池中的所有連線（程式結束或切換資料庫時使用）"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+# === 版本 1：初始資料表 ===
+BASELINE_SCHEMA = [
+    # Create ItemMaster table
+    '''
+        CREATE TABLE IF NOT EXISTS ItemMaster (
+            ItemID INTEGER PRIMARY KEY AUTOINCREMENT,
+            ItemName TEXT NOT NULL,
+            ItemType TEXT NOT NULL,       -- 繼續使用文字欄位而不拆分表格
+            Category TEXT,               -- 繼續使用文字欄位而不拆分表格
+            Unit TEXT,
+            Status TEXT DEFAULT 'active',
+            UNIQUE(ItemName, ItemType)
+         );
+    ''',
+
+    # Create Customer table
+    '''
+        CREATE TABLE IF NOT EXISTS Customer (
+            CustomerID INTEGER PRIMARY KEY AUTOINCREMENT,
+            CustomerName TEXT NOT NULL,
+            Address TEXT,
+            Address2 TEXT,
+            TaxID TEXT , 
+            ContactPerson TEXT,
+            Phone TEXT,
+            Email TEXT,
+            UNIQUE(CustomerName, TaxID)  -- 防止相同名稱與稅號的客戶重複
+         );
+    ''',
+
+    # Create Stock table
+    '''
+        CREATE TABLE IF NOT EXISTS Stock (
+            StockID INTEGER PRIMARY KEY AUTOINCREMENT,
+            ItemID INTEGER NOT NULL,
+            WarehouseID INTEGER,
+            Quantity REAL NOT NULL CHECK(Quantity >= 0),
+            BatchNo TEXT,
+            ExpireDate DATE,
+            FOREIGN KEY (ItemID) REFERENCES ItemMaster(ItemID),
+            UNIQUE(ItemID, BatchNo, WarehouseID)
+         );
+    ''',
+
+    # Create StockMovement table
+    '''
+        CREATE TABLE IF NOT EXISTS StockMovement (
+            MovementID INTEGER PRIMARY KEY AUTOINCREMENT,
+            ItemID INTEGER NOT NULL,
+            MovementType TEXT NOT NULL,
+            Quantity REAL NOT NULL,
+            MovementDate DATE NOT NULL,
+            RefDocType TEXT,
+            RefDocID INTEGER,
+            BatchNo TEXT,
+            SupplierID INTEGER,  -- 新增欄位
+            FOREIGN KEY (ItemID) REFERENCES ItemMaster(ItemID)
+            FOREIGN KEY (SupplierID) REFERENCES Supplier(SupplierID)
+        );
+    ''',
+
+    # Create Supplier table
+    '''
+        CREATE TABLE IF NOT EXISTS Supplier (
+            SupplierID INTEGER PRIMARY KEY AUTOINCREMENT,
+            SupplierName TEXT NOT NULL,
+            Address TEXT,
+            ContactPerson TEXT,
+            Phone TEXT,
+            Email TEXT,
+            Website TEXT,
+            TaxID TEXT
+            
+        );
+    ''',
+
+    # Create SupplierItemMap table
+    '''
+        CREATE TABLE IF NOT EXISTS SupplierItemMap (
+            MappingID INTEGER PRIMARY KEY AUTOINCREMENT,
+            SupplierID INTEGER NOT NULL,
+            ItemID INTEGER NOT NULL,
+            MOQ INTEGER,
+            Price REAL,
+            LeadTime INTEGER,
+            SafetyStockLevel REAL DEFAULT 0.0,  -- 新增安全水位欄位，預設為 0
+            FOREIGN KEY (SupplierID) REFERENCES Supplier(SupplierID),
+            FOREIGN KEY (ItemID) REFERENCES ItemMaster(ItemID)
+            UNIQUE(SupplierID, ItemID)  -- 添加唯一性約束
+        );
+    ''',
+
+    # Create BOMHeader table
+    '''
+        CREATE TABLE IF NOT EXISTS BOMHeader (
+            BOMID INTEGER PRIMARY KEY AUTOINCREMENT,
+            ProductID INTEGER NOT NULL,
+            Version TEXT NOT NULL,
+            EffectiveDate DATE NOT NULL,
+            ProductWeight REAL,   -- 新增的欄位       
+            ExpireDate DATE,
+            Remarks TEXT,
+            FOREIGN KEY (ProductID) REFERENCES ItemMaster(ItemID)
+        );
+    ''',
+
+    # Create BOMDetail table
+    '''
+        CREATE TABLE IF NOT EXISTS BOMDetail (
+            BOMDetailID INTEGER PRIMARY KEY AUTOINCREMENT,
+            BOMID INTEGER NOT NULL,
+            ComponentItemID INTEGER NOT NULL,
+            Quantity REAL NOT NULL CHECK(Quantity > 0),
+            Unit TEXT,
+            ScrapRate REAL CHECK(ScrapRate BETWEEN 0.0 AND 1.0),
+            SupplierID INTEGER,    -- 新增欄位
+            Price REAL,            -- 新增欄位 (存每公克價格)
+            FOREIGN KEY (BOMID) REFERENCES BOMHeader(BOMID),
+            FOREIGN KEY (ComponentItemID) REFERENCES ItemMaster(ItemID),
+            UNIQUE(BOMID, ComponentItemID)
+        );
+    ''',
+
+    # Create SalesOrderHeader table
+    '''
+        CREATE TABLE IF NOT EXISTS SalesOrderHeader (
+            OrderID INTEGER PRIMARY KEY AUTOINCREMENT,
+            CustomerID INTEGER NOT NULL,
+            OrderDate DATE NOT NULL,
+            Status TEXT NOT NULL,
+            FOREIGN KEY (CustomerID) REFERENCES Customer(CustomerID)
+        );
+    ''',
+
+    # Create SalesOrderDetail table
+    '''
+        CREATE TABLE IF NOT EXISTS SalesOrderDetail (
+            OrderDetailID INTEGER PRIMARY KEY AUTOINCREMENT,
+            OrderID INTEGER NOT NULL,
+            ItemID INTEGER NOT NULL,
+            Quantity REAL NOT NULL,
+            Price REAL NOT NULL,
+            ShippedQuantity REAL DEFAULT 0.0,
+            IsDeleted BOOLEAN DEFAULT 0,
+            FOREIGN KEY (OrderID) REFERENCES SalesOrderHeader(OrderID),
+            FOREIGN KEY (ItemID) REFERENCES ItemMaster(ItemID),
+            UNIQUE(OrderID, ItemID)  -- 新增約束防止重複商品
+        );
+    ''',
+
+    # Create ProductionOrderHeader table
+    '''
+        CREATE TABLE IF NOT EXISTS ProductionOrderHeader (
+            ProductionOrderID INTEGER PRIMARY KEY AUTOINCREMENT,
+            ProductID INTEGER NOT NULL,
+            OrderDate DATE NOT NULL,
+            Status TEXT NOT NULL,
+            IsDeleted BOOLEAN DEFAULT 0,
+            FOREIGN KEY (ProductID) REFERENCES ItemMaster(ItemID)
+        );
+    ''',
+
+    # Create ProductionOrderDetail table
+    '''
+        CREATE TABLE IF NOT EXISTS ProductionOrderDetail (
+            ProductionDetailID INTEGER PRIMARY KEY AUTOINCREMENT,
+            ProductionOrderID INTEGER NOT NULL,
+            ItemID INTEGER NOT NULL,
+            PlannedQty REAL NOT NULL,
+            ActualQty REAL,
+            FOREIGN KEY (ProductionOrderID) REFERENCES ProductionOrderHeader(ProductionOrderID),
+            FOREIGN KEY (ItemID) REFERENCES ItemMaster(ItemID)
+        );
+    ''',
+
+    # Create PurchaseOrderHeader table
+    '''
+        CREATE TABLE IF NOT EXISTS PurchaseOrderHeader (
+            POID INTEGER PRIMARY KEY AUTOINCREMENT,
+            SupplierID INTEGER NOT NULL,
+            OrderDate DATE NOT NULL,
+            ExpectedDeliveryDate DATE,
+            Status TEXT NOT NULL,
+            FOREIGN KEY (SupplierID) REFERENCES Supplier(SupplierID)
+        );
+    ''',
+
+    # Create PurchaseOrderDetail table
+    '''
+        CREATE TABLE IF NOT EXISTS PurchaseOrderDetail (
+            PODetailID INTEGER PRIMARY KEY AUTOINCREMENT,
+            POID INTEGER NOT NULL,
+            ItemID INTEGER NOT NULL,
+            OrderedQty REAL NOT NULL,
+            ReceivedQty REAL,
+            Price REAL NOT NULL,
+            BatchNo TEXT,
+            ProductionDate DATE,
+            ExpiryDate DATE,
+            FOREIGN KEY (POID) REFERENCES PurchaseOrderHeader(POID),
+            FOREIGN KEY (ItemID) REFERENCES ItemMaster(ItemID)
+        );
+    ''',
+
+    # Create ShipmentHeader table
+    '''
+        CREATE TABLE IF NOT EXISTS ShipmentHeader (
+            ShipmentID INTEGER PRIMARY KEY AUTOINCREMENT,
+            OrderID INTEGER NOT NULL,
+            ShipmentDate DATE NOT NULL,
+            Status TEXT NOT NULL,
+            FOREIGN KEY (OrderID) REFERENCES SalesOrderHeader(OrderID)
+        );
+    ''',
+
+    # Create ShipmentDetail table
+    '''
+        CREATE TABLE IF NOT EXISTS ShipmentDetail (
+            ShipmentDetailID INTEGER PRIMARY KEY AUTOINCREMENT,
+            ShipmentID INTEGER NOT NULL,
+            ItemID INTEGER NOT NULL,
+            Quantity REAL NOT NULL,
+            FOREIGN KEY (ShipmentID) REFERENCES ShipmentHeader(ShipmentID),
+            FOREIGN KEY (ItemID) REFERENCES ItemMaster(ItemID)
+        );
+    ''',
+
+    # Create PriceHistory table (optional)
+    '''
+        CREATE TABLE IF NOT EXISTS PriceHistory (
+            PriceHistoryID INTEGER PRIMARY KEY AUTOINCREMENT,
+            ItemID INTEGER NOT NULL,
+            EffectiveDate DATE NOT NULL,
+            Price REAL NOT NULL CHECK(Price > 0),
+            LastUpdated DATETIME DEFAULT CURRENT_TIMESTAMP,  -- 新增此欄位
+            FOREIGN KEY (ItemID) REFERENCES ItemMaster(ItemID)
+        );
+    ''',
+
+    # [新增] 建立 CostHistory 資料表
+    '''
+        CREATE TABLE IF NOT EXISTS CostHistory (
+            CostHistoryID INTEGER PRIMARY KEY AUTOINCREMENT,
+            ProductName TEXT NOT NULL,
+            Price REAL NOT NULL,
+            UpdateTime DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+    ''',
+
+    # 添加索引
+    "CREATE INDEX IF NOT EXISTS idx_supplier_item_map_supplier ON SupplierItemMap(SupplierID)",
+    "CREATE INDEX IF NOT EXISTS idx_supplier_item_map_item ON SupplierItemMap(ItemID)",
+]
+
+# === 版本 2：舊資料庫補上後來新增的欄位 ===
+LEGACY_COLUMNS = [
+    add_column_if_missing("StockMovement", "SupplierID", "INTEGER REFERENCES Supplier(SupplierID)"),
+    add_column_if_missing("SupplierItemMap", "SafetyStockLevel", "REAL DEFAULT 0.0"),
+    add_column_if_missing("BOMHeader", "ProductWeight", "REAL"),
+    add_column_if_missing("BOMDetail", "SupplierID", "INTEGER"),
+    add_column_if_missing("BOMDetail", "Price", "REAL"),
+    # ALTER TABLE 不允許 CURRENT_TIMESTAMP 預設值，舊資料庫補上的欄位預設為 NULL
+    add_column_if_missing("PriceHistory", "LastUpdated", "DATETIME"),
+]
+
+# === 版本 3：熱門查詢路徑索引 ===
+# BOMDetail(BOMID)、SalesOrderDetail(OrderID, ItemID)、Stock(ItemID) 已由 UNIQUE 約束的自動索引涵蓋
+HOT_PATH_INDEXES = {
+    # 庫存彙總 GROUP BY ItemID, SupplierID 只需掃描此覆蓋索引，不必讀取整張表
+    "idx_stockmovement_item_supplier": "CREATE INDEX IF NOT EXISTS idx_stockmovement_item_supplier ON StockMovement(ItemID, SupplierID, MovementType, Quantity)",
+    "idx_stockmovement_supplier": "CREATE INDEX IF NOT EXISTS idx_stockmovement_supplier ON StockMovement(SupplierID)",
+    "idx_bomdetail_component": "CREATE INDEX IF NOT EXISTS idx_bomdetail_component ON BOMDetail(ComponentItemID, SupplierID)",
+    "idx_bomheader_product": "CREATE INDEX IF NOT EXISTS idx_bomheader_product ON BOMHeader(ProductID, EffectiveDate)",
+    "idx_pricehistory_item_date": "CREATE INDEX IF NOT EXISTS idx_pricehistory_item_date ON PriceHistory(ItemID, EffectiveDate)",
+    # 部分索引：只收錄未刪除的明細
+    "idx_salesorderdetail_open": "CREATE INDEX IF NOT EXISTS idx_salesorderdetail_open ON SalesOrderDetail(OrderID) WHERE IsDeleted = 0",
+    "idx_salesorderdetail_item_open": "CREATE INDEX IF NOT EXISTS idx_salesorderdetail_item_open ON SalesOrderDetail(ItemID, Quantity, ShippedQuantity) WHERE IsDeleted = 0",
+    "idx_salesorderheader_customer": "CREATE INDEX IF NOT EXISTS idx_salesorderheader_customer ON SalesOrderHeader(CustomerID)",
+    "idx_shipmentheader_order": "CREATE INDEX IF NOT EXISTS idx_shipmentheader_order ON ShipmentHeader(OrderID)",
+    "idx_shipmentdetail_shipment": "CREATE INDEX IF NOT EXISTS idx_shipmentdetail_shipment ON ShipmentDetail(ShipmentID)",
+    "idx_purchaseorderheader_supplier": "CREATE INDEX IF NOT EXISTS idx_purchaseorderheader_supplier ON PurchaseOrderHeader(SupplierID)",
+    "idx_purchaseorderdetail_po": "CREATE INDEX IF NOT EXISTS idx_purchaseorderdetail_po ON PurchaseOrderDetail(POID)",
+    "idx_productionorderdetail_order": "CREATE INDEX IF NOT EXISTS idx_productionorderdetail_order ON ProductionOrderDetail(ProductionOrderID)",
+    # 部分索引：只收錄有效物料，物料清單依名稱排序時使用
+    "idx_itemmaster_active_name": "CREATE INDEX IF NOT EXISTS idx_itemmaster_active_name ON ItemMaster(ItemName) WHERE Status = 'active'",
+    "idx_costhistory_time": "CREATE INDEX IF NOT EXISTS idx_costhistory_time ON CostHistory(UpdateTime)",
+}
+
+# 清單頁 keyset 分頁的排序索引（索引尾端隱含 rowid，即 (排序欄, 主鍵)，可直接做列值範圍掃描）
+KEYSET_INDEXES = {
+    "idx_customer_name": "CREATE INDEX IF NOT EXISTS idx_customer_name ON Customer(CustomerName)",
+    "idx_supplier_name": "CREATE INDEX IF NOT EXISTS idx_supplier_name ON Supplier(SupplierName)",
+    "idx_stockmovement_date": "CREATE INDEX IF NOT EXISTS idx_stockmovement_date ON StockMovement(MovementDate)",
+    "idx_salesorderheader_date": "CREATE INDEX IF NOT EXISTS idx_salesorderheader_date ON SalesOrderHeader(OrderDate)",
+}
+
+# === 版本 5：全文索引 ===
+# 索引名稱 -> (資料表, 主鍵, 索引欄位)；以 trigram 分詞，三個字以上的詞可在中文名稱中段比對而不掃描整表
+FULL_TEXT_INDEXES = {
+    "ItemSearch": ("ItemMaster", "ItemID", ("ItemName", "ItemType", "Category")),
+    "CustomerSearch": ("Customer", "CustomerID", ("CustomerName", "ContactPerson", "Phone", "TaxID")),
+    "SupplierSearch": ("Supplier", "SupplierID", ("SupplierName", "ContactPerson", "Phone", "TaxID")),
+    "BOMSearch": ("BOMHeader", "BOMID", ("Version", "Remarks")),
+}
+
+# === 版本 6：BOM 成本實體化 ===
+# BOMCost 保存每個 BOM 目前的總成本與每克成本，清單只需依主鍵讀取。
+# 觸發器在明細、產品重量或供應商價格變動時只重算受影響的 BOM；{where} 為篩選 BOMHeader h 的條件。
+# 版本 13 起改以供應商目前價格計算、不再改寫明細單價（見 BOM_COST_REFRESH），此處保留版本 6 的原始內容。
+BOM_COST_REFRESH_V6 = '''
+    INSERT INTO BOMCost (BOMID, TotalCost, CostPerGram, UpdatedAt)
+    SELECT BOMID, TotalCost, CASE WHEN ProductWeight > 0 THEN TotalCost / ProductWeight END, CURRENT_TIMESTAMP
+    FROM (
+        SELECT h.BOMID, h.ProductWeight,
+               IFNULL((SELECT SUM(CASE WHEN d.Unit = '%' THEN IFNULL(h.ProductWeight, 0.0) * d.Quantity / 100.0
+                                       ELSE d.Quantity END * IFNULL(d.Price, 0.0))
+                       FROM BOMDetail d WHERE d.BOMID = h.BOMID), 0.0) AS TotalCost
+        FROM BOMHeader h
+        WHERE {where}
+    ) WHERE true
+    ON CONFLICT(BOMID) DO UPDATE SET TotalCost = excluded.TotalCost, CostPerGram = excluded.CostPerGram,
+                                     UpdatedAt = excluded.UpdatedAt;
+'''
+
+BOM_COST_SCHEMA = [
+    '''
+        CREATE TABLE IF NOT EXISTS BOMCost (
+            BOMID INTEGER PRIMARY KEY REFERENCES BOMHeader(BOMID),
+            TotalCost REAL NOT NULL DEFAULT 0.0,
+            CostPerGram REAL,          -- ProductWeight 為空或 0 時為 NULL
+            UpdatedAt DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    f"""
+        CREATE TRIGGER IF NOT EXISTS bomcost_header_ai AFTER INSERT ON BOMHeader BEGIN
+            {BOM_COST_REFRESH_V6.format(where="h.BOMID = NEW.BOMID")}
+        END
+    """,
+    f"""
+        CREATE TRIGGER IF NOT EXISTS bomcost_header_au AFTER UPDATE OF ProductWeight ON BOMHeader BEGIN
+            {BOM_COST_REFRESH_V6.format(where="h.BOMID = NEW.BOMID")}
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS bomcost_header_ad AFTER DELETE ON BOMHeader BEGIN
+            DELETE FROM BOMCost WHERE BOMID = OLD.BOMID;
+        END
+    """,
+    f"""
+        CREATE TRIGGER IF NOT EXISTS bomcost_detail_ai AFTER INSERT ON BOMDetail BEGIN
+            {BOM_COST_REFRESH_V6.format(where="h.BOMID = NEW.BOMID")}
+        END
+    """,
+    f"""
+        CREATE TRIGGER IF NOT EXISTS bomcost_detail_au AFTER UPDATE OF BOMID, Quantity, Unit, Price ON BOMDetail BEGIN
+            {BOM_COST_REFRESH_V6.format(where="h.BOMID = NEW.BOMID")}
+            {BOM_COST_REFRESH_V6.format(where="h.BOMID = OLD.BOMID AND OLD.BOMID <> NEW.BOMID")}
+        END
+    """,
+    f"""
+        CREATE TRIGGER IF NOT EXISTS bomcost_detail_ad AFTER DELETE ON BOMDetail BEGIN
+            {BOM_COST_REFRESH_V6.format(where="h.BOMID = OLD.BOMID")}
+        END
+    """,
+    # 供應商價格（每 kg）變動時同步引用該供應商與原料的 BOM 明細單價（每 g），再由明細觸發器重算成本
+    """
+        CREATE TRIGGER IF NOT EXISTS bomcost_supplier_price_ai AFTER INSERT ON SupplierItemMap
+        WHEN NEW.Price IS NOT NULL BEGIN
+            UPDATE BOMDetail SET Price = NEW.Price / 1000.0
+            WHERE ComponentItemID = NEW.ItemID AND SupplierID = NEW.SupplierID AND Price IS NOT NEW.Price / 1000.0;
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS bomcost_supplier_price_au AFTER UPDATE OF Price, SupplierID, ItemID ON SupplierItemMap
+        WHEN NEW.Price IS NOT NULL BEGIN
+            UPDATE BOMDetail SET Price = NEW.Price / 1000.0
+            WHERE ComponentItemID = NEW.ItemID AND SupplierID = NEW.SupplierID AND Price IS NOT NEW.Price / 1000.0;
+        END
+    """,
+    # 既有資料一次補齊
+    BOM_COST_REFRESH_V6.format(where="1"),
+]
+
+# === 版本 7：BOM 結構版本號 ===
+# BOMHeader 或 BOMDetail 任何變動都會遞增 Revision，多階展開的快取（models.bom_explosion）據此判斷是否失效
+BOM_REVISION_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS BOMRevision (ID INTEGER PRIMARY KEY CHECK (ID = 1), Revision INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO BOMRevision (ID, Revision) VALUES (1, 0)",
+    "CREATE TRIGGER IF NOT EXISTS bomrevision_bomheader_ai AFTER INSERT ON BOMHeader BEGIN "
+    "UPDATE BOMRevision SET Revision = Revision + 1 WHERE ID = 1; END",
+    "CREATE TRIGGER IF NOT EXISTS bomrevision_bomheader_au AFTER UPDATE ON BOMHeader BEGIN "
+    "UPDATE BOMRevision SET Revision = Revision + 1 WHERE ID = 1; END",
+    "CREATE TRIGGER IF NOT EXISTS bomrevision_bomheader_ad AFTER DELETE ON BOMHeader BEGIN "
+    "UPDATE BOMRevision SET Revision = Revision + 1 WHERE ID = 1; END",
+    "CREATE TRIGGER IF NOT EXISTS bomrevision_bomdetail_ai AFTER INSERT ON BOMDetail BEGIN "
+    "UPDATE BOMRevision SET Revision = Revision + 1 WHERE ID = 1; END",
+    "CREATE TRIGGER IF NOT EXISTS bomrevision_bomdetail_au AFTER UPDATE ON BOMDetail BEGIN "
+    "UPDATE BOMRevision SET Revision = Revision + 1 WHERE ID = 1; END",
+    "CREATE TRIGGER IF NOT EXISTS bomrevision_bomdetail_ad AFTER DELETE ON BOMDetail BEGIN "
+    "UPDATE BOMRevision SET Revision = Revision + 1 WHERE ID = 1; END",
+]
+
+# === 版本 8：庫存餘額 ===
+# StockBalance 保存每個 (ItemID, SupplierID, WarehouseID, BatchNo) 的目前庫存（IN 減 OUT），
+# 由 StockMovement 的觸發器在新增、修改、刪除時增減，庫存頁只需讀取餘額而不必彙總整份異動記錄。
+# 主鍵欄位不可為 NULL（NULL 在唯一鍵中互不相等），未指定時分別存為 0、0、''，讀取時再轉回 NULL。
+# MovementCount 為該鍵的異動筆數，歸零時刪除該列，與直接彙總 StockMovement 的結果一致。
+STOCK_BALANCE_DELTA = '''
+    INSERT INTO StockBalance (ItemID, SupplierID, WarehouseID, BatchNo, Quantity, MovementCount)
+    VALUES ({row}.ItemID, IFNULL({row}.SupplierID, 0), IFNULL({row}.WarehouseID, 0), IFNULL({row}.BatchNo, ''),
+            {sign} * CASE {row}.MovementType WHEN 'IN' THEN {row}.Quantity WHEN 'OUT' THEN -{row}.Quantity ELSE 0 END,
+            {sign})
+    ON CONFLICT(ItemID, SupplierID, WarehouseID, BatchNo) DO UPDATE
+    SET Quantity = Quantity + excluded.Quantity, MovementCount = MovementCount + excluded.MovementCount;
+'''
+
+STOCK_BALANCE_CLEANUP = '''
+    DELETE FROM StockBalance
+    WHERE ItemID = OLD.ItemID AND SupplierID = IFNULL(OLD.SupplierID, 0)
+      AND WarehouseID = IFNULL(OLD.WarehouseID, 0) AND BatchNo = IFNULL(OLD.BatchNo, '') AND MovementCount <= 0;
+'''
+
+# 依 StockMovement 重新計算全部餘額（遷移回填與 stockbalance_crud.rebuild_stock_balance 使用）
+STOCK_BALANCE_REBUILD = [
+    "DELETE FROM StockBalance",
+    '''
+        INSERT INTO StockBalance (ItemID, SupplierID, WarehouseID, BatchNo, Quantity, MovementCount)
+        SELECT ItemID, IFNULL(SupplierID, 0), IFNULL(WarehouseID, 0), IFNULL(BatchNo, ''),
+               SUM(CASE MovementType WHEN 'IN' THEN Quantity WHEN 'OUT' THEN -Quantity ELSE 0 END), COUNT(*)
+        FROM StockMovement
+        GROUP BY 1, 2, 3, 4
+    ''',
+]
+
+STOCK_BALANCE_SCHEMA = [
+    add_column_if_missing("StockMovement", "WarehouseID", "INTEGER"),
+    '''
+        CREATE TABLE IF NOT EXISTS StockBalance (
+            ItemID INTEGER NOT NULL,
+            SupplierID INTEGER NOT NULL DEFAULT 0,   -- 0 表示未指定供應商
+            WarehouseID INTEGER NOT NULL DEFAULT 0,  -- 0 表示未指定倉庫
+            BatchNo TEXT NOT NULL DEFAULT '',
+            Quantity REAL NOT NULL DEFAULT 0.0,
+            MovementCount INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (ItemID, SupplierID, WarehouseID, BatchNo)
+        )
+    ''',
+    f"""
+        CREATE TRIGGER IF NOT EXISTS stockbalance_ai AFTER INSERT ON StockMovement BEGIN
+            {STOCK_BALANCE_DELTA.format(row="NEW", sign=1)}
+        END
+    """,
+    f"""
+        CREATE TRIGGER IF NOT EXISTS stockbalance_au
+        AFTER UPDATE OF ItemID, SupplierID, WarehouseID, BatchNo, MovementType, Quantity ON StockMovement BEGIN
+            {STOCK_BALANCE_DELTA.format(row="OLD", sign=-1)}
+            {STOCK_BALANCE_CLEANUP}
+            {STOCK_BALANCE_DELTA.format(row="NEW", sign=1)}
+        END
+    """,
+    f"""
+        CREATE TRIGGER IF NOT EXISTS stockbalance_ad AFTER DELETE ON StockMovement BEGIN
+            {STOCK_BALANCE_DELTA.format(row="OLD", sign=-1)}
+            {STOCK_BALANCE_CLEANUP}
+        END
+    """,
+    *STOCK_BALANCE_REBUILD,
+]
+
+# === 版本 9：庫存快照 ===
+# StockSnapshotHeader 記錄已建立的快照日期，StockSnapshot 保存當天結束時各鍵的庫存（鍵的格式同 StockBalance）。
+# 查詢某日庫存時只需讀取最近一次的快照，再以 idx_stockmovement_date 補上之後的異動。
+# 異動日期落在既有快照之前或當天（補登、修改、刪除舊資料）時，該日期起的快照全部失效並刪除（版本 18 改為依差額調整受影響的鍵）。
+STOCK_SNAPSHOT_SCHEMA = [
+    '''
+        CREATE TABLE IF NOT EXISTS StockSnapshotHeader (
+            SnapshotDate DATE PRIMARY KEY,
+            CreatedAt DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS StockSnapshot (
+            SnapshotDate DATE NOT NULL REFERENCES StockSnapshotHeader(SnapshotDate),
+            ItemID INTEGER NOT NULL,
+            SupplierID INTEGER NOT NULL DEFAULT 0,
+            WarehouseID INTEGER NOT NULL DEFAULT 0,
+            BatchNo TEXT NOT NULL DEFAULT '',
+            Quantity REAL NOT NULL,
+            PRIMARY KEY (SnapshotDate, ItemID, SupplierID, WarehouseID, BatchNo)
+        )
+    ''',
+    """
+        CREATE TRIGGER IF NOT EXISTS stocksnapshot_invalidate_ai AFTER INSERT ON StockMovement
+        WHEN EXISTS (SELECT 1 FROM StockSnapshotHeader WHERE SnapshotDate >= NEW.MovementDate) BEGIN
+            DELETE FROM StockSnapshot WHERE SnapshotDate >= NEW.MovementDate;
+            DELETE FROM StockSnapshotHeader WHERE SnapshotDate >= NEW.MovementDate;
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS stocksnapshot_invalidate_au AFTER UPDATE OF ItemID, SupplierID, WarehouseID, BatchNo, MovementType, Quantity, MovementDate ON StockMovement
+        WHEN EXISTS (SELECT 1 FROM StockSnapshotHeader WHERE SnapshotDate >= MIN(OLD.MovementDate, NEW.MovementDate)) BEGIN
+            DELETE FROM StockSnapshot WHERE SnapshotDate >= MIN(OLD.MovementDate, NEW.MovementDate);
+            DELETE FROM StockSnapshotHeader WHERE SnapshotDate >= MIN(OLD.MovementDate, NEW.MovementDate);
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS stocksnapshot_invalidate_ad AFTER DELETE ON StockMovement
+        WHEN EXISTS (SELECT 1 FROM StockSnapshotHeader WHERE SnapshotDate >= OLD.MovementDate) BEGIN
+            DELETE FROM StockSnapshot WHERE SnapshotDate >= OLD.MovementDate;
+            DELETE FROM StockSnapshotHeader WHERE SnapshotDate >= OLD.MovementDate;
+        END
+    """,
+]
+
+# === 版本 10：低庫存警示 ===
+# LowStockAlert 保存目前庫存（StockBalance 依 ItemID、SupplierID 加總）低於 SupplierItemMap.SafetyStockLevel
+# 的組合（未設定安全水位時視為 0，即只有負庫存會列入）。StockBalance 或安全水位變動時，
+# 觸發器只重算受影響的那一組 (ItemID, SupplierID)，不需重新比對全部庫存。
+# 成員增減時遞增 LowStockAlertRevision，介面可只讀取版本號判斷警示清單是否改變。
+LOW_STOCK_LEVEL = '''
+    SELECT b.ItemID, b.SupplierID, SUM(b.Quantity) AS Quantity, IFNULL(m.SafetyStockLevel, 0.0) AS SafetyStockLevel
+    FROM StockBalance b
+    LEFT JOIN SupplierItemMap m ON m.SupplierID = b.SupplierID AND m.ItemID = b.ItemID
+    WHERE {where}
+    GROUP BY b.ItemID, b.SupplierID
+    HAVING SUM(b.Quantity) < IFNULL(m.SafetyStockLevel, 0.0)
+'''
+
+LOW_STOCK_REFRESH = '''
+    DELETE FROM LowStockAlert
+    WHERE ItemID = {item} AND SupplierID = {supplier}
+      AND NOT EXISTS ({below});
+    INSERT INTO LowStockAlert (ItemID, SupplierID, Quantity, SafetyStockLevel)
+    {below}
+    ON CONFLICT(ItemID, SupplierID) DO UPDATE
+    SET Quantity = excluded.Quantity, SafetyStockLevel = excluded.SafetyStockLevel;
+'''
+
+def low_stock_refresh(item: str, supplier: str) -> str:
+    """重算單一 (ItemID, SupplierID) 警示的觸發器語句；item / supplier 為 SQL 運算式（如 NEW.ItemID）"""
+    below = LOW_STOCK_LEVEL.format(where=f"b.ItemID = {item} AND b.SupplierID = {supplier}")
+    return LOW_STOCK_REFRESH.format(item=item, supplier=supplier, below=below)
+
+# 依目前餘額重建全部警示（版本 10 回填；之後的重建見版本 15 的 LOW_STOCK_REBUILD）
+LOW_STOCK_REBUILD_V10 = [
+    "DELETE FROM LowStockAlert",
+    "INSERT INTO LowStockAlert (ItemID, SupplierID, Quantity, SafetyStockLevel) "
+    + LOW_STOCK_LEVEL.format(where="1"),
+]
+
+LOW_STOCK_SCHEMA = [
+    '''
+        CREATE TABLE IF NOT EXISTS LowStockAlert (
+            ItemID INTEGER NOT NULL,
+            SupplierID INTEGER NOT NULL,       -- 0 表示未指定供應商（同 StockBalance）
+            Quantity REAL NOT NULL,
+            SafetyStockLevel REAL NOT NULL,
+            PRIMARY KEY (ItemID, SupplierID)
+        )
+    ''',
+    "CREATE TABLE IF NOT EXISTS LowStockAlertRevision (ID INTEGER PRIMARY KEY CHECK (ID = 1), Revision INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO LowStockAlertRevision (ID, Revision) VALUES (1, 0)",
+    "CREATE TRIGGER IF NOT EXISTS lowstockrevision_ai AFTER INSERT ON LowStockAlert BEGIN "
+    "UPDATE LowStockAlertRevision SET Revision = Revision + 1 WHERE ID = 1; END",
+    "CREATE TRIGGER IF NOT EXISTS lowstockrevision_ad AFTER DELETE ON LowStockAlert BEGIN "
+    "UPDATE LowStockAlertRevision SET Revision = Revision + 1 WHERE ID = 1; END",
+    f"""
+        CREATE TRIGGER IF NOT EXISTS lowstock_balance_ai AFTER INSERT ON StockBalance BEGIN
+            {low_stock_refresh("NEW.ItemID", "NEW.SupplierID")}
+        END
+    """,
+    f"""
+        CREATE TRIGGER IF NOT EXISTS lowstock_balance_au AFTER UPDATE OF Quantity ON StockBalance BEGIN
+            {low_stock_refresh("NEW.ItemID", "NEW.SupplierID")}
+        END
+    """,
+    f"""
+        CREATE TRIGGER IF NOT EXISTS lowstock_balance_ad AFTER DELETE ON StockBalance BEGIN
+            {low_stock_refresh("OLD.ItemID", "OLD.SupplierID")}
+        END
+    """,
+    f"""
+        CREATE TRIGGER IF NOT EXISTS lowstock_safety_ai AFTER INSERT ON SupplierItemMap BEGIN
+            {low_stock_refresh("NEW.ItemID", "NEW.SupplierID")}
+        END
+    """,
+    f"""
+        CREATE TRIGGER IF NOT EXISTS lowstock_safety_au AFTER UPDATE OF SafetyStockLevel, SupplierID, ItemID ON SupplierItemMap BEGIN
+            {low_stock_refresh("OLD.ItemID", "OLD.SupplierID")}
+            {low_stock_refresh("NEW.ItemID", "NEW.SupplierID")}
+        END
+    """,
+    f"""
+        CREATE TRIGGER IF NOT EXISTS lowstock_safety_ad AFTER DELETE ON SupplierItemMap BEGIN
+            {low_stock_refresh("OLD.ItemID", "OLD.SupplierID")}
+        END
+    """,
+    *LOW_STOCK_REBUILD_V10,
+]
+
+# === 版本 11：批號先到期先出（FEFO）索引 ===
+# 出貨配貨依 ExpireDate 由近到遠讀取同一品項仍有數量的批號（models.lot_allocation），
+# 部分索引只收錄 Quantity > 0 的批號，用完的批號不佔索引空間，每取一個批號只需一次索引定位
+LOT_ALLOCATION_INDEXES = {
+    "idx_stock_fefo": "CREATE INDEX IF NOT EXISTS idx_stock_fefo ON Stock(ItemID, ExpireDate) WHERE Quantity > 0",
+}
+
+# === 版本 13：BOM 成本改用供應商目前價格 ===
+# 版本 6 在供應商價格變動時直接改寫所有 BOM（含歷史版本）的明細單價，並因此遞增 BOMRevision 使展開快取失效。
+# 改為不動 BOMDetail：明細有指定供應商且 SupplierItemMap 有價格（每 kg）時以該價格換算每 g 單價，
+# 否則使用明細自己的 Price；供應商價格變動時只重算引用該供應商與原料的 BOM 成本。
+# 先刪除再建立所有觸發器，遷移可重複執行。
+BOM_LINE_PRICE = '''COALESCE((SELECT m.Price / 1000.0 FROM SupplierItemMap m
+                                         WHERE m.SupplierID = d.SupplierID AND m.ItemID = d.ComponentItemID),
+                                        d.Price, 0.0)'''
+
+BOM_COST_REFRESH = f'''
+    INSERT INTO BOMCost (BOMID, TotalCost, CostPerGram, UpdatedAt)
+    SELECT BOMID, TotalCost, CASE WHEN ProductWeight > 0 THEN TotalCost / ProductWeight END, CURRENT_TIMESTAMP
+    FROM (
+        SELECT h.BOMID, h.ProductWeight,
+               IFNULL((SELECT SUM(CASE WHEN d.Unit = '%' THEN IFNULL(h.ProductWeight, 0.0) * d.Quantity / 100.0
+                                       ELSE d.Quantity END
+                                  * {BOM_LINE_PRICE})
+                       FROM BOMDetail d WHERE d.BOMID = h.BOMID), 0.0) AS TotalCost
+        FROM BOMHeader h
+        WHERE {{where}}
+    ) WHERE true
+    ON CONFLICT(BOMID) DO UPDATE SET TotalCost = excluded.TotalCost, CostPerGram = excluded.CostPerGram,
+                                     UpdatedAt = excluded.UpdatedAt;
+'''
+
+# 引用 {row} 這筆 SupplierItemMap 的 BOM（以 idx_bomdetail_component 定位）
+BOM_COST_SUPPLIER_WHERE = ("h.BOMID IN (SELECT BOMID FROM BOMDetail "
+                           "WHERE ComponentItemID = {row}.ItemID AND SupplierID = {row}.SupplierID)")
+
+BOM_SUPPLIER_COST_SCHEMA = [
+    "DROP TRIGGER IF EXISTS bomcost_supplier_price_ai",
+    "DROP TRIGGER IF EXISTS bomcost_supplier_price_au",
+    "DROP TRIGGER IF EXISTS bomcost_supplier_price_ad",
+    "DROP TRIGGER IF EXISTS bomcost_header_ai",
+    "DROP TRIGGER IF EXISTS bomcost_header_au",
+    "DROP TRIGGER IF EXISTS bomcost_detail_ai",
+    "DROP TRIGGER IF EXISTS bomcost_detail_au",
+    "DROP TRIGGER IF EXISTS bomcost_detail_ad",
+    f"""
+        CREATE TRIGGER bomcost_header_ai AFTER INSERT ON BOMHeader BEGIN
+            {BOM_COST_REFRESH.format(where="h.BOMID = NEW.BOMID")}
+        END
+    """,
+    f"""
+        CREATE TRIGGER bomcost_header_au AFTER UPDATE OF ProductWeight ON BOMHeader BEGIN
+            {BOM_COST_REFRESH.format(where="h.BOMID = NEW.BOMID")}
+        END
+    """,
+    f"""
+        CREATE TRIGGER bomcost_detail_ai AFTER INSERT ON BOMDetail BEGIN
+            {BOM_COST_REFRESH.format(where="h.BOMID = NEW.BOMID")}
+        END
+    """,
+    f"""
+        CREATE TRIGGER bomcost_detail_au
+        AFTER UPDATE OF BOMID, ComponentItemID, Quantity, Unit, SupplierID, Price ON BOMDetail BEGIN
+            {BOM_COST_REFRESH.format(where="h.BOMID = NEW.BOMID")}
+            {BOM_COST_REFRESH.format(where="h.BOMID = OLD.BOMID AND OLD.BOMID <> NEW.BOMID")}
+        END
+    """,
+    f"""
+        CREATE TRIGGER bomcost_detail_ad AFTER DELETE ON BOMDetail BEGIN
+            {BOM_COST_REFRESH.format(where="h.BOMID = OLD.BOMID")}
+        END
+    """,
+    f"""
+        CREATE TRIGGER bomcost_supplier_price_ai AFTER INSERT ON SupplierItemMap BEGIN
+            {BOM_COST_REFRESH.format(where=BOM_COST_SUPPLIER_WHERE.format(row="NEW"))}
+        END
+    """,
+    f"""
+        CREATE TRIGGER bomcost_supplier_price_au AFTER UPDATE OF Price, SupplierID, ItemID ON SupplierItemMap BEGIN
+            {BOM_COST_REFRESH.format(where=BOM_COST_SUPPLIER_WHERE.format(row="NEW"))}
+            {BOM_COST_REFRESH.format(where=BOM_COST_SUPPLIER_WHERE.format(row="OLD")
+                                     + " AND (OLD.SupplierID <> NEW.SupplierID OR OLD.ItemID <> NEW.ItemID)")}
+        END
+    """,
+    f"""
+        CREATE TRIGGER bomcost_supplier_price_ad AFTER DELETE ON SupplierItemMap BEGIN
+            {BOM_COST_REFRESH.format(where=BOM_COST_SUPPLIER_WHERE.format(row="OLD"))}
+        END
+    """,
+    # 既有成本改依新算法重算一次
+    BOM_COST_REFRESH.format(where="1"),
+]
+
+# === 版本 14：BOM 變更記錄 ===
+# 版本 7 的 BOMRevision 只有一個全域計數，展開快取無從得知改了哪個 BOM，只能整份清除。
+# BOMChange 記錄每個 BOM 最後一次變動時的 Revision（表頭變動另記 ProductID，明細變動記為 0），
+# 快取依「上次同步的 Revision 之後有變動的 BOMID 與 ProductID」只移除受影響的展開結果。
+# 每個 (BOMID, ProductID) 只保留一列，資料量不超過 BOM 數量。
+BOM_CHANGE_LOG = '''
+    INSERT INTO BOMChange (BOMID, ProductID, Revision)
+    VALUES ({bom_id}, {product_id}, (SELECT Revision FROM BOMRevision WHERE ID = 1))
+    ON CONFLICT(BOMID, ProductID) DO UPDATE SET Revision = excluded.Revision;
+'''
+
+BOM_REVISION_BUMP = "UPDATE BOMRevision SET Revision = Revision + 1 WHERE ID = 1;"
+
+
+def _bom_change_trigger(name: str, event: str, table: str, rows) -> str:
+    changes = "".join(BOM_CHANGE_LOG.format(bom_id=bom_id, product_id=product_id) for bom_id, product_id in rows)
+    return f"CREATE TRIGGER {name} AFTER {event} ON {table} BEGIN {BOM_REVISION_BUMP} {changes} END"
+
+
+BOM_CHANGE_SCHEMA = [
+    '''
+        CREATE TABLE IF NOT EXISTS BOMChange (
+            BOMID INTEGER NOT NULL,
+            ProductID INTEGER NOT NULL,
+            Revision INTEGER NOT NULL,
+            PRIMARY KEY (BOMID, ProductID)
+        ) WITHOUT ROWID
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_bomchange_revision ON BOMChange(Revision)",
+    *(f"DROP TRIGGER IF EXISTS bomrevision_{table.lower()}_{suffix}"
+      for table in ("BOMHeader", "BOMDetail") for suffix in ("ai", "au", "ad")),
+    _bom_change_trigger("bomrevision_bomheader_ai", "INSERT", "BOMHeader", [("NEW.BOMID", "NEW.ProductID")]),
+    _bom_change_trigger("bomrevision_bomheader_au", "UPDATE", "BOMHeader",
+                        [("OLD.BOMID", "OLD.ProductID"), ("NEW.BOMID", "NEW.ProductID")]),
+    _bom_change_trigger("bomrevision_bomheader_ad", "DELETE", "BOMHeader", [("OLD.BOMID", "OLD.ProductID")]),
+    _bom_change_trigger("bomrevision_bomdetail_ai", "INSERT", "BOMDetail", [("NEW.BOMID", "0")]),
+    _bom_change_trigger("bomrevision_bomdetail_au", "UPDATE", "BOMDetail", [("OLD.BOMID", "0"), ("NEW.BOMID", "0")]),
+    _bom_change_trigger("bomrevision_bomdetail_ad", "DELETE", "BOMDetail", [("OLD.BOMID", "0")]),
+]
+
+# === 版本 15：低庫存警示改用庫存總量 ===
+# 版本 10 的觸發器在每次 StockBalance 變動時重新加總該 (ItemID, SupplierID) 的全部餘額，
+# 大量匯入時成本隨倉庫、批號數量增加。StockTotal 保存每個 (ItemID, SupplierID) 的總量，
+# 由 StockBalance 的觸發器依差額增減（與 StockBalance 依 StockMovement 增減相同），
+# 警示觸發器只比對 StockTotal 與 SupplierItemMap 各一列。BalanceCount 為該組合的餘額筆數，歸零時刪除該列。
+# StockBalance 的鍵欄位只在新增、刪除時寫入，更新只改 Quantity / MovementCount，因此更新只需計入差額。
+STOCK_TOTAL_DELTA = '''
+    INSERT INTO StockTotal (ItemID, SupplierID, Quantity, BalanceCount)
+    VALUES ({row}.ItemID, {row}.SupplierID, {quantity}, {count})
+    ON CONFLICT(ItemID, SupplierID) DO UPDATE
+    SET Quantity = Quantity + excluded.Quantity, BalanceCount = BalanceCount + excluded.BalanceCount;
+'''
+
+STOCK_TOTAL_CLEANUP = '''
+    DELETE FROM StockTotal WHERE ItemID = OLD.ItemID AND SupplierID = OLD.SupplierID AND BalanceCount <= 0;
+'''
+
+LOW_STOCK_TOTAL_LEVEL = '''
+    SELECT t.ItemID, t.SupplierID, t.Quantity, IFNULL(m.SafetyStockLevel, 0.0) AS SafetyStockLevel
+    FROM StockTotal t
+    LEFT JOIN SupplierItemMap m ON m.SupplierID = t.SupplierID AND m.ItemID = t.ItemID
+    WHERE {where} AND t.Quantity < IFNULL(m.SafetyStockLevel, 0.0)
+'''
+
+def low_stock_check(item: str, supplier: str) -> str:
+    """比對單一 (ItemID, SupplierID) 總量與安全水位的觸發器語句；item / supplier 為 SQL 運算式（如 NEW.ItemID）"""
+    below = LOW_STOCK_TOTAL_LEVEL.format(where=f"t.ItemID = {item} AND t.SupplierID = {supplier}")
+    return LOW_STOCK_REFRESH.format(item=item, supplier=supplier, below=below)
+
+# 依 StockBalance 重建總量與全部警示（遷移回填與 stockalert_crud.rebuild_low_stock_alerts 使用）
+LOW_STOCK_REBUILD = [
+    "DELETE FROM StockTotal",
+    '''
+        INSERT INTO StockTotal (ItemID, SupplierID, Quantity, BalanceCount)
+        SELECT ItemID, SupplierID, SUM(Quantity), COUNT(*)
+        FROM StockBalance
+        GROUP BY ItemID, SupplierID
+    ''',
+    "DELETE FROM LowStockAlert",
+    "INSERT INTO LowStockAlert (ItemID, SupplierID, Quantity, SafetyStockLevel) "
+    + LOW_STOCK_TOTAL_LEVEL.format(where="1"),
+]
+
+LOW_STOCK_TOTAL_SCHEMA = [
+    '''
+        CREATE TABLE IF NOT EXISTS StockTotal (
+            ItemID INTEGER NOT NULL,
+            SupplierID INTEGER NOT NULL,       -- 0 表示未指定供應商（同 StockBalance）
+            Quantity REAL NOT NULL DEFAULT 0.0,
+            BalanceCount INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (ItemID, SupplierID)
+        )
+    ''',
+    *(f"DROP TRIGGER IF EXISTS {name}_{suffix}"
+      for name in ("lowstock_balance", "lowstock_total", "lowstock_safety") for suffix in ("ai", "au", "ad")),
+    f"""
+        CREATE TRIGGER lowstock_balance_ai AFTER INSERT ON StockBalance BEGIN
+            {STOCK_TOTAL_DELTA.format(row="NEW", quantity="NEW.Quantity", count=1)}
+        END
+    """,
+    f"""
+        CREATE TRIGGER lowstock_balance_au AFTER UPDATE OF Quantity ON StockBalance BEGIN
+            {STOCK_TOTAL_DELTA.format(row="NEW", quantity="NEW.Quantity - OLD.Quantity", count=0)}
+        END
+    """,
+    f"""
+        CREATE TRIGGER lowstock_balance_ad AFTER DELETE ON StockBalance BEGIN
+            {STOCK_TOTAL_DELTA.format(row="OLD", quantity="-OLD.Quantity", count=-1)}
+            {STOCK_TOTAL_CLEANUP}
+        END
+    """,
+    f"""
+        CREATE TRIGGER lowstock_total_ai AFTER INSERT ON StockTotal BEGIN
+            {low_stock_check("NEW.ItemID", "NEW.SupplierID")}
+        END
+    """,
+    f"""
+        CREATE TRIGGER lowstock_total_au AFTER UPDATE OF Quantity ON StockTotal BEGIN
+            {low_stock_check("NEW.ItemID", "NEW.SupplierID")}
+        END
+    """,
+    "CREATE TRIGGER lowstock_total_ad AFTER DELETE ON StockTotal BEGIN "
+    "DELETE FROM LowStockAlert WHERE ItemID = OLD.ItemID AND SupplierID = OLD.SupplierID; END",
+    f"""
+        CREATE TRIGGER lowstock_safety_ai AFTER INSERT ON SupplierItemMap BEGIN
+            {low_stock_check("NEW.ItemID", "NEW.SupplierID")}
+        END
+    """,
+    f"""
+        CREATE TRIGGER lowstock_safety_au AFTER UPDATE OF SafetyStockLevel, SupplierID, ItemID ON SupplierItemMap BEGIN
+            {low_stock_check("OLD.ItemID", "OLD.SupplierID")}
+            {low_stock_check("NEW.ItemID", "NEW.SupplierID")}
+        END
+    """,
+    f"""
+        CREATE TRIGGER lowstock_safety_ad AFTER DELETE ON SupplierItemMap BEGIN
+            {low_stock_check("OLD.ItemID", "OLD.SupplierID")}
+        END
+    """,
+    *LOW_STOCK_REBUILD,
+]
+
+# === 版本 16：批號來源供應商 ===
+# 批號配貨（models.lot_allocation）寫入的 OUT 異動需要與進貨的 IN 異動記在同一個 SupplierID 下，
+# 否則出貨會落在 SupplierID 0 的另一組 StockBalance / LowStockAlert。
+# 既有批號若同一 (ItemID, BatchNo, WarehouseID) 的 IN 異動只有一個供應商，以該供應商回填，其餘維持 NULL。
+LOT_SUPPLIER_SCHEMA = [
+    add_column_if_missing("Stock", "SupplierID", "INTEGER REFERENCES Supplier(SupplierID)"),
+    '''
+        UPDATE Stock SET SupplierID = (
+            SELECT MIN(m.SupplierID) FROM StockMovement m
+            WHERE m.ItemID = Stock.ItemID AND m.BatchNo IS Stock.BatchNo AND m.WarehouseID IS Stock.WarehouseID
+              AND m.MovementType = 'IN'
+            HAVING COUNT(DISTINCT IFNULL(m.SupplierID, 0)) = 1
+        )
+        WHERE SupplierID IS NULL
+    ''',
+]
+
+# === 版本 17：供應商價格變動時記錄 BOM 變更 ===
+# 多階展開與模擬成本（models.bom_explosion、models.what_if）與 BOMCost 一樣以 BOM_LINE_PRICE 計價，
+# 供應商價格變動時遞增 BOMRevision 並記錄引用該供應商與原料的 BOM，展開快取只移除這些 BOM 的結果。
+BOM_PRICE_CHANGE_LOG = '''
+    INSERT INTO BOMChange (BOMID, ProductID, Revision)
+    SELECT BOMID, 0, (SELECT Revision FROM BOMRevision WHERE ID = 1) FROM BOMDetail
+    WHERE ComponentItemID = {row}.ItemID AND SupplierID = {row}.SupplierID
+    ON CONFLICT(BOMID, ProductID) DO UPDATE SET Revision = excluded.Revision;
+'''
+
+BOM_PRICE_REFERENCED = ("EXISTS (SELECT 1 FROM BOMDetail "
+                        "WHERE ComponentItemID = {row}.ItemID AND SupplierID = {row}.SupplierID)")
+
+BOM_PRICE_CHANGE_SCHEMA = [
+    *(f"DROP TRIGGER IF EXISTS bomrevision_supplieritemmap_{suffix}" for suffix in ("ai", "au", "ad")),
+    f"""
+        CREATE TRIGGER bomrevision_supplieritemmap_ai AFTER INSERT ON SupplierItemMap
+        WHEN {BOM_PRICE_REFERENCED.format(row="NEW")} BEGIN
+            {BOM_REVISION_BUMP}
+            {BOM_PRICE_CHANGE_LOG.format(row="NEW")}
+        END
+    """,
+    f"""
+        CREATE TRIGGER bomrevision_supplieritemmap_au AFTER UPDATE OF Price, SupplierID, ItemID ON SupplierItemMap
+        WHEN {BOM_PRICE_REFERENCED.format(row="OLD")} OR {BOM_PRICE_REFERENCED.format(row="NEW")} BEGIN
+            {BOM_REVISION_BUMP}
+            {BOM_PRICE_CHANGE_LOG.format(row="OLD")}
+            {BOM_PRICE_CHANGE_LOG.format(row="NEW")}
+        END
+    """,
+    f"""
+        CREATE TRIGGER bomrevision_supplieritemmap_ad AFTER DELETE ON SupplierItemMap
+        WHEN {BOM_PRICE_REFERENCED.format(row="OLD")} BEGIN
+            {BOM_REVISION_BUMP}
+            {BOM_PRICE_CHANGE_LOG.format(row="OLD")}
+        END
+    """,
+]
+
+# === 版本 18：庫存快照依異動差額調整 ===
+# 版本 9 的觸發器在補登、修改、刪除舊異動時刪除該日期起的全部快照，之後的查詢只能從更早的快照重新累加。
+# 改為只對該日期起各快照中受影響的 (ItemID, SupplierID, WarehouseID, BatchNo) 加減異動的差額，
+# 與 StockBalance 依 StockMovement 增減相同；數量歸零的鍵自快照中刪除（快照不保存零庫存）。
+# 判斷歸零時容許浮點誤差 SNAPSHOT_ZERO。
+SNAPSHOT_ZERO = 1e-9
+
+STOCK_SNAPSHOT_KEY = ("{row}.ItemID, IFNULL({row}.SupplierID, 0), IFNULL({row}.WarehouseID, 0), "
+                      "IFNULL({row}.BatchNo, '')")
+
+STOCK_SNAPSHOT_DELTA = f'''
+    INSERT INTO StockSnapshot (SnapshotDate, ItemID, SupplierID, WarehouseID, BatchNo, Quantity)
+    SELECT SnapshotDate, {STOCK_SNAPSHOT_KEY},
+           {{sign}} * CASE {{row}}.MovementType WHEN 'IN' THEN {{row}}.Quantity WHEN 'OUT' THEN -{{row}}.Quantity ELSE 0 END
+    FROM StockSnapshotHeader
+    WHERE SnapshotDate >= {{row}}.MovementDate
+    ON CONFLICT(SnapshotDate, ItemID, SupplierID, WarehouseID, BatchNo) DO UPDATE
+    SET Quantity = Quantity + excluded.Quantity;
+    DELETE FROM StockSnapshot
+    WHERE SnapshotDate >= {{row}}.MovementDate
+      AND (ItemID, SupplierID, WarehouseID, BatchNo) = ({STOCK_SNAPSHOT_KEY})
+      AND ABS(Quantity) < {SNAPSHOT_ZERO};
+'''
+
+STOCK_SNAPSHOT_AFFECTED = "EXISTS (SELECT 1 FROM StockSnapshotHeader WHERE SnapshotDate >= {row}.MovementDate)"
+
+STOCK_SNAPSHOT_DELTA_SCHEMA = [
+    *(f"DROP TRIGGER IF EXISTS stocksnapshot_invalidate_{suffix}" for suffix in ("ai", "au", "ad")),
+    *(f"DROP TRIGGER IF EXISTS stocksnapshot_delta_{suffix}" for suffix in ("ai", "au", "ad")),
+    f"""
+        CREATE TRIGGER stocksnapshot_delta_ai AFTER INSERT ON StockMovement
+        WHEN {STOCK_SNAPSHOT_AFFECTED.format(row="NEW")} BEGIN
+            {STOCK_SNAPSHOT_DELTA.format(row="NEW", sign=1)}
+        END
+    """,
+    f"""
+        CREATE TRIGGER stocksnapshot_delta_au
+        AFTER UPDATE OF ItemID, SupplierID, WarehouseID, BatchNo, MovementType, Quantity, MovementDate ON StockMovement
+        WHEN {STOCK_SNAPSHOT_AFFECTED.format(row="OLD")} OR {STOCK_SNAPSHOT_AFFECTED.format(row="NEW")} BEGIN
+            {STOCK_SNAPSHOT_DELTA.format(row="OLD", sign=-1)}
+            {STOCK_SNAPSHOT_DELTA.format(row="NEW", sign=1)}
+        END
+    """,
+    f"""
+        CREATE TRIGGER stocksnapshot_delta_ad AFTER DELETE ON StockMovement
+        WHEN {STOCK_SNAPSHOT_AFFECTED.format(row="OLD")} BEGIN
+            {STOCK_SNAPSHOT_DELTA.format(row="OLD", sign=-1)}
+        END
+    """,
+    f"DELETE FROM StockSnapshot WHERE ABS(Quantity) < {SNAPSHOT_ZERO}",
+]
+
+# 依版本號遞增排列；新增結構變更時在最後加上一筆，不要修改已發佈的版本
+MIGRATIONS = [
+    (1, "初始資料表", BASELINE_SCHEMA),
+    (2, "補齊舊資料庫欄位", LEGACY_COLUMNS),
+    (3, "熱門查詢路徑索引", list(HOT_PATH_INDEXES.values())),
+    (4, "清單分頁排序索引", list(KEYSET_INDEXES.values())),
+    (5, "全文索引", [create_full_text_index(name, *spec) for name, spec in FULL_TEXT_INDEXES.items()]),
+    (6, "BOM 成本實體化", BOM_COST_SCHEMA),
+    (7, "BOM 結構版本號", BOM_REVISION_SCHEMA),
+    (8, "庫存餘額", STOCK_BALANCE_SCHEMA),
+    (9, "庫存快照", STOCK_SNAPSHOT_SCHEMA),
+    (10, "低庫存警示", LOW_STOCK_SCHEMA),
+    (11, "批號先到期先出索引", list(LOT_ALLOCATION_INDEXES.values())),
+    # 版本 5 在 SQLite 不支援 FTS5 trigram 時會略過；此版本補建，不支援時記錄為延後（其他遷移照常前進），升級 SQLite 後自動建立
+    (12, "補建全文索引", [create_full_text_index(name, *spec, deferrable=True)
+                          for name, spec in FULL_TEXT_INDEXES.items()]),
+    (13, "BOM 成本改用供應商目前價格", BOM_SUPPLIER_COST_SCHEMA),
+    (14, "BOM 變更記錄", BOM_CHANGE_SCHEMA),
+    (15, "低庫存警示改用庫存總量", LOW_STOCK_TOTAL_SCHEMA),
+    (16, "批號來源供應商", LOT_SUPPLIER_SCHEMA),
+    (17, "供應商價格變動記錄 BOM 變更", BOM_PRICE_CHANGE_SCHEMA),
+    (18, "庫存快照依異動差額調整", STOCK_SNAPSHOT_DELTA_SCHEMA),
+]
 
-def create_tables():
-    """建立必要的資料表"""
+def create_tables() -> int:
+    """建立必要的資料表（只套用尚未執行的遷移），回傳目前的結構版本"""
     with get_connection() as conn:
-        cursor = conn.cursor()
-
-        # Create ItemMaster table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS ItemMaster (
-                ItemID INTEGER PRIMARY KEY AUTOINCREMENT,
-                ItemName TEXT NOT NULL,
-                ItemType TEXT NOT NULL,       -- 繼續使用文字欄位而不拆分表格
-                Category TEXT,               -- 繼續使用文字欄位而不拆分表格
-                Unit TEXT,
-                Status TEXT DEFAULT 'active',
-                UNIQUE(ItemName, ItemType)
-             );
-        ''')
-
-        # Create Customer table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Customer (
-                CustomerID INTEGER PRIMARY KEY AUTOINCREMENT,
-                CustomerName TEXT NOT NULL,
-                Address TEXT,
-                Address2 TEXT,
-                TaxID TEXT , 
-                ContactPerson TEXT,
-                Phone TEXT,
-                Email TEXT,
-                UNIQUE(CustomerName, TaxID)  -- 防止相同名稱與稅號的客戶重複
-             );
-        ''')
-
-        # Create Stock table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Stock (
-                StockID INTEGER PRIMARY KEY AUTOINCREMENT,
-                ItemID INTEGER NOT NULL,
-                WarehouseID INTEGER,
-                Quantity REAL NOT NULL CHECK(Quantity >= 0),
-                BatchNo TEXT,
-                ExpireDate DATE,
-                FOREIGN KEY (ItemID) REFERENCES ItemMaster(ItemID),
-                UNIQUE(ItemID, BatchNo, WarehouseID)
-             );
-        ''')
-
-        # Create StockMovement table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS StockMovement (
-                MovementID INTEGER PRIMARY KEY AUTOINCREMENT,
-                ItemID INTEGER NOT NULL,
-                MovementType TEXT NOT NULL,
-                Quantity REAL NOT NULL,
-                MovementDate DATE NOT NULL,
-                RefDocType TEXT,
-                RefDocID INTEGER,
-                BatchNo TEXT,
-                SupplierID INTEGER,  -- 新增欄位
-                FOREIGN KEY (ItemID) REFERENCES ItemMaster(ItemID)
-                FOREIGN KEY (SupplierID) REFERENCES Supplier(SupplierID)
-            );
-        ''')
-
-        # Create Supplier table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Supplier (
-                SupplierID INTEGER PRIMARY KEY AUTOINCREMENT,
-                SupplierName TEXT NOT NULL,
-                Address TEXT,
-                ContactPerson TEXT,
-                Phone TEXT,
-                Email TEXT,
-                Website TEXT,
-                TaxID TEXT
-                
-            );
-        ''')
-
-        # Create SupplierItemMap table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS SupplierItemMap (
-                MappingID INTEGER PRIMARY KEY AUTOINCREMENT,
-                SupplierID INTEGER NOT NULL,
-                ItemID INTEGER NOT NULL,
-                MOQ INTEGER,
-                Price REAL,
-                LeadTime INTEGER,
-                SafetyStockLevel REAL DEFAULT 0.0,  -- 新增安全水位欄位，預設為 0
-                FOREIGN KEY (SupplierID) REFERENCES Supplier(SupplierID),
-                FOREIGN KEY (ItemID) REFERENCES ItemMaster(ItemID)
-                UNIQUE(SupplierID, ItemID)  -- 添加唯一性約束
-            );
-        ''')
-
-        # Create BOMHeader table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS BOMHeader (
-                BOMID INTEGER PRIMARY KEY AUTOINCREMENT,
-                ProductID INTEGER NOT NULL,
-                Version TEXT NOT NULL,
-                EffectiveDate DATE NOT NULL,
-                ProductWeight REAL,   -- 新增的欄位       
-                ExpireDate DATE,
-                Remarks TEXT,
-                FOREIGN KEY (ProductID) REFERENCES ItemMaster(ItemID)
-            );
-        ''')
-
-        # Create BOMDetail table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS BOMDetail (
-                BOMDetailID INTEGER PRIMARY KEY AUTOINCREMENT,
-                BOMID INTEGER NOT NULL,
-                ComponentItemID INTEGER NOT NULL,
-                Quantity REAL NOT NULL CHECK(Quantity > 0),
-                Unit TEXT,
-                ScrapRate REAL CHECK(ScrapRate BETWEEN 0.0 AND 1.0),
-                SupplierID INTEGER,    -- 新增欄位
-                Price REAL,            -- 新增欄位 (存每公克價格)
-                FOREIGN KEY (BOMID) REFERENCES BOMHeader(BOMID),
-                FOREIGN KEY (ComponentItemID) REFERENCES ItemMaster(ItemID),
-                UNIQUE(BOMID, ComponentItemID)
-            );
-        ''')
-
-
-        # Create SalesOrderHeader table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS SalesOrderHeader (
-                OrderID INTEGER PRIMARY KEY AUTOINCREMENT,
-                CustomerID INTEGER NOT NULL,
-                OrderDate DATE NOT NULL,
-                Status TEXT NOT NULL,
-                FOREIGN KEY (CustomerID) REFERENCES Customer(CustomerID)
-            );
-        ''')
-
-        # Create SalesOrderDetail table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS SalesOrderDetail (
-                OrderDetailID INTEGER PRIMARY KEY AUTOINCREMENT,
-                OrderID INTEGER NOT NULL,
-                ItemID INTEGER NOT NULL,
-                Quantity REAL NOT NULL,
-                Price REAL NOT NULL,
-                ShippedQuantity REAL DEFAULT 0.0,
-                IsDeleted BOOLEAN DEFAULT 0,
-                FOREIGN KEY (OrderID) REFERENCES SalesOrderHeader(OrderID),
-                FOREIGN KEY (ItemID) REFERENCES ItemMaster(ItemID),
-                UNIQUE(OrderID, ItemID)  -- 新增約束防止重複商品
-            );
-        ''')
-
-        # Create ProductionOrderHeader table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS ProductionOrderHeader (
-                ProductionOrderID INTEGER PRIMARY KEY AUTOINCREMENT,
-                ProductID INTEGER NOT NULL,
-                OrderDate DATE NOT NULL,
-                Status TEXT NOT NULL,
-                IsDeleted BOOLEAN DEFAULT 0,
-                FOREIGN KEY (ProductID) REFERENCES ItemMaster(ItemID)
-            );
-        ''')
-
-        # Create ProductionOrderDetail table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS ProductionOrderDetail (
-                ProductionDetailID INTEGER PRIMARY KEY AUTOINCREMENT,
-                ProductionOrderID INTEGER NOT NULL,
-                ItemID INTEGER NOT NULL,
-                PlannedQty REAL NOT NULL,
-                ActualQty REAL,
-                FOREIGN KEY (ProductionOrderID) REFERENCES ProductionOrderHeader(ProductionOrderID),
-                FOREIGN KEY (ItemID) REFERENCES ItemMaster(ItemID)
-            );
-        ''')
-
-        # Create PurchaseOrderHeader table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS PurchaseOrderHeader (
-                POID INTEGER PRIMARY KEY AUTOINCREMENT,
-                SupplierID INTEGER NOT NULL,
-                OrderDate DATE NOT NULL,
-                ExpectedDeliveryDate DATE,
-                Status TEXT NOT NULL,
-                FOREIGN KEY (SupplierID) REFERENCES Supplier(SupplierID)
-            );
-        ''')
-
-        # Create PurchaseOrderDetail table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS PurchaseOrderDetail (
-                PODetailID INTEGER PRIMARY KEY AUTOINCREMENT,
-                POID INTEGER NOT NULL,
-                ItemID INTEGER NOT NULL,
-                OrderedQty REAL NOT NULL,
-                ReceivedQty REAL,
-                Price REAL NOT NULL,
-                BatchNo TEXT,
-                ProductionDate DATE,
-                ExpiryDate DATE,
-                FOREIGN KEY (POID) REFERENCES PurchaseOrderHeader(POID),
-                FOREIGN KEY (ItemID) REFERENCES ItemMaster(ItemID)
-            );
-        ''')
-
-
-        # Create ShipmentHeader table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS ShipmentHeader (
-                ShipmentID INTEGER PRIMARY KEY AUTOINCREMENT,
-                OrderID INTEGER NOT NULL,
-                ShipmentDate DATE NOT NULL,
-                Status TEXT NOT NULL,
-                FOREIGN KEY (OrderID) REFERENCES SalesOrderHeader(OrderID)
-            );
-        ''')
-
-        # Create ShipmentDetail table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS ShipmentDetail (
-                ShipmentDetailID INTEGER PRIMARY KEY AUTOINCREMENT,
-                ShipmentID INTEGER NOT NULL,
-                ItemID INTEGER NOT NULL,
-                Quantity REAL NOT NULL,
-                FOREIGN KEY (ShipmentID) REFERENCES ShipmentHeader(ShipmentID),
-                FOREIGN KEY (ItemID) REFERENCES ItemMaster(ItemID)
-            );
-        ''')
-
-        # Create PriceHistory table (optional)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS PriceHistory (
-                PriceHistoryID INTEGER PRIMARY KEY AUTOINCREMENT,
-                ItemID INTEGER NOT NULL,
-                EffectiveDate DATE NOT NULL,
-                Price REAL NOT NULL CHECK(Price > 0),
-                LastUpdated DATETIME DEFAULT CURRENT_TIMESTAMP,  -- 新增此欄位
-                FOREIGN KEY (ItemID) REFERENCES ItemMaster(ItemID)
-            );
-        ''')
-
-        # [新增] 建立 CostHistory 資料表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS CostHistory (
-                CostHistoryID INTEGER PRIMARY KEY AUTOINCREMENT,
-                ProductName TEXT NOT NULL,
-                Price REAL NOT NULL,
-                UpdateTime DATETIME DEFAULT CURRENT_TIMESTAMP
-            );
-        ''')
-        
-        # 添加索引
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_supplier_item_map_supplier ON SupplierItemMap(SupplierID)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_supplier_item_map_item ON SupplierItemMap(ItemID)")
-
-        conn.commit()
+        return apply_migrations(conn, MIGRATIONS)
   
-def initialize_database():
-    """初始化資料庫（集中建立資料表）"""
+def initialize_database() -> str:
+    """初始化資料庫（集中建立資料表），回傳目前使用的效能設定檔"""
     create_tables()
-    print("資料表已初始化完成")
+    print(f"資料表已初始化完成（效能設定檔：{DB_PROFILE}）")
+    return DB_PROFILE
 
 if __name__ == "__main__":
     # 主程式執行初始化
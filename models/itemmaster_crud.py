@@ -1,22 +1,25 @@
 import sqlite3
 from contextlib import contextmanager
-from typing import List, Dict, Optional
+from typing import Iterable, Iterator, List, Dict, Optional, Sequence
 import logging
 from models.erp_database_schema import get_connection, create_tables
+from models.records import DEFAULT_ARRAYSIZE, fetch_all, fetch_one, iter_records
+from models.pagination import Keyset, apply_keyset
+from models.search_crud import match_condition
+from models.bulk import REQUIRED, BulkResult, bulk_insert, row_args
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-def get_items() -> List[Dict]:
+def get_items(conn: sqlite3.Connection = None) -> List[Dict]:
     """取得所有項目"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM ItemMaster")
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return fetch_all(cursor)
     
-def add_item(item_name: str, item_type: str, category: Optional[str], unit: Optional[str]):
+def add_item(item_name: str, item_type: str, category: Optional[str], unit: Optional[str], conn: sqlite3.Connection = None):
     """新增項目"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute('''
@@ -32,9 +35,9 @@ def add_item(item_name: str, item_type: str, category: Optional[str], unit: Opti
 
 
 # === Create ===
-def add_item(item_name, item_type, category, unit):
+def add_item(item_name, item_type, category, unit, conn: sqlite3.Connection = None):
     """新增原料或成品到 ItemMaster"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute(
@@ -47,38 +50,65 @@ def add_item(item_name, item_type, category, unit):
             print(f"新增失敗：{e}")
             raise ValueError("新增原料或成品失敗，可能是唯一性約束衝突")
 
+def bulk_add_items(items: Iterable, on_conflict: Optional[str] = None, conn: sqlite3.Connection = None) -> BulkResult:
+    """
+    批次新增原料或成品，每筆為 (item_name, item_type, category, unit) 或同名參數的 dict。
+    on_conflict="ignore" 略過已存在的 (ItemName, ItemType)；"update" 則更新其 Category 與 Unit。
+    """
+    params = (("item_name", REQUIRED), ("item_type", REQUIRED), ("category", None), ("unit", None))
+
+    def prepare(row):
+        item_name, item_type, category, unit = row_args(row, params)
+        if not item_name or not item_type:
+            raise ValueError("ItemName 與 ItemType 不可為空")
+        return item_name, item_type, category, unit
+
+    return bulk_insert("ItemMaster", ("ItemName", "ItemType", "Category", "Unit"), items, prepare,
+                       on_conflict=on_conflict, conflict_keys=("ItemName", "ItemType"),
+                       update_columns=("Category", "Unit"), conn=conn)
+
         
 # === Read ===
-def get_items(search: str = None, page: int = 1, page_size: int = 0) -> List[Dict]:
-    """获取有效物料数据（支持分页和搜索）"""
-    query = "SELECT * FROM ItemMaster WHERE Status = 'active'"
-    params = []
-    
-    if search:
-        query += " AND ItemName LIKE ?"
-        params.append(f"%{search}%")
-    
-    if page_size > 0:
-        offset = (page - 1) * page_size
-        query += " LIMIT ? OFFSET ?"
-        params.extend([page_size, offset])
-    
-    with get_connection() as conn:
+ITEM_KEYSET = Keyset("ItemID", {"ItemName": "ItemName", "ItemType": "ItemType", "Category": "Category", "Unit": "Unit"},
+                     nullable=("Category", "Unit"))
+
+def iter_items(search: str = None, after_key=None, limit: Optional[int] = None, order_by: Optional[str] = None,
+               search_columns: Sequence[str] = ("ItemName",), arraysize: int = DEFAULT_ARRAYSIZE,
+               chunked: bool = False, conn: sqlite3.Connection = None) -> Iterator:
+    """
+    逐批讀取有效物料；search 比對 search_columns 中任一欄位（預設只比對物料名稱），
+    after_key/limit/order_by 為 keyset 分頁參數（見 models.pagination）
+    """
+    query = "SELECT * FROM ItemMaster"
+    conditions, params = ["Status = 'active'"], []
+
+    with get_connection(conn) as conn:
+        if search:
+            condition, search_params = match_condition("items", search, search_columns, conn=conn)
+            conditions.append(condition)
+            params.extend(search_params)
+
+        query, params = apply_keyset(query, conditions, params, ITEM_KEYSET, order_by, after_key, limit)
+
         cursor = conn.cursor()
+        cursor.arraysize = arraysize
         cursor.execute(query, params)
-        return [dict(zip([col[0] for col in cursor.description], row)) for row in cursor.fetchall()]
+        yield from iter_records(cursor, chunked)
+
+def get_items(search: str = None, after_key=None, limit: Optional[int] = None,
+              order_by: Optional[str] = None, conn: sqlite3.Connection = None) -> List[Dict]:
+    """获取有效物料数据（支持搜索）；after_key/limit/order_by 為 keyset 分頁參數（見 models.pagination）"""
+    return list(iter_items(search, after_key, limit, order_by, conn=conn))
 
-def get_item_by_id(item_id):
+def get_item_by_id(item_id, conn: sqlite3.Connection = None):
     """依 ItemID 查詢單筆原料或成品"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM ItemMaster WHERE ItemID = ? AND Status = 'active'", (item_id,))
-        columns = [col[0] for col in cursor.description]
-        row = cursor.fetchone()
-        return dict(zip(columns, row)) if row else None
+        return fetch_one(cursor)
 
 # === Update ===
-def update_item(item_id, **kwargs):
+def update_item(item_id, conn: sqlite3.Connection = None, **kwargs):
     """更新指定的原料或成品資料，安全處理欄位更新"""
     allowed_fields = {
         "new_name": "ItemName",
@@ -101,15 +131,15 @@ def update_item(item_id, **kwargs):
     query = f"UPDATE ItemMaster SET {', '.join(fields)} WHERE ItemID = ?"
     values.append(item_id)
 
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute(query, tuple(values))
         conn.commit()
 
 # === Delete ===
-def delete_item(item_id, soft_delete=True):
+def delete_item(item_id, soft_delete=True, conn: sqlite3.Connection = None):
     """刪除指定的原料或成品，支援軟刪除"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
 
         if soft_delete:
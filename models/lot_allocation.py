@@ -0,0 +1,92 @@
+import sqlite3
+from datetime import date
+from typing import List, NamedTuple, Optional
+from models.erp_database_schema import get_connection
+
+# === 批號配貨（FEFO，先到期先出） ===
+# 同一品項依 ExpireDate 由近到遠取用 Stock 中仍有數量的批號，一批不夠時拆到下一批；
+# 出貨日已過期的批號不配貨，沒有效期的批號最後才使用。
+# 批號以 idx_stock_fefo（ItemID, ExpireDate，只含 Quantity > 0）依序逐筆讀取，湊足數量即停止，
+# 不需讀取或排序該品項的全部批號。
+# 出貨的 OUT 異動記在批號的 SupplierID 下，與進貨時的 StockBalance / LowStockAlert 為同一組 (ItemID, SupplierID)。
+
+# 有效期的批號依到期日（同日依 StockID）排序，索引本身即為此順序
+_DATED_LOTS = '''
+    SELECT StockID, WarehouseID, BatchNo, ExpireDate, Quantity, SupplierID
+    FROM Stock
+    WHERE ItemID = ? AND Quantity > 0 AND ExpireDate >= ?
+    ORDER BY ExpireDate, StockID
+'''
+
+_UNDATED_LOTS = '''
+    SELECT StockID, WarehouseID, BatchNo, ExpireDate, Quantity, SupplierID
+    FROM Stock
+    WHERE ItemID = ? AND Quantity > 0 AND ExpireDate IS NULL
+    ORDER BY StockID
+'''
+
+
+class LotAllocation(NamedTuple):
+    stock_id: int
+    warehouse_id: Optional[int]
+    batch_no: Optional[str]
+    expire_date: Optional[str]
+    quantity: float
+    supplier_id: Optional[int] = None
+
+
+class InsufficientStockError(ValueError):
+    """可配貨（未過期）的批號數量不足"""
+
+    def __init__(self, item_id: int, requested: float, available: float):
+        self.item_id = item_id
+        self.requested = requested
+        self.available = available
+        super().__init__(f"庫存不足: ItemID={item_id} 需要 {requested:g}，可用 {available:g}")
+
+
+def plan_fefo_allocation(item_id: int, quantity: float, ship_date: Optional[str] = None,
+                         conn: sqlite3.Connection = None) -> List[LotAllocation]:
+    """
+    依 FEFO 規則計算 quantity 要從哪些批號各扣多少（ship_date 預設今天），不修改資料；
+    可用數量不足時拋出 InsufficientStockError
+    """
+    if quantity <= 0:
+        raise ValueError("配貨數量必須為正數")
+    ship_date = ship_date or date.today().isoformat()
+    allocations, remaining = [], quantity
+    with get_connection(conn) as conn:
+        for query, params in ((_DATED_LOTS, (item_id, ship_date)), (_UNDATED_LOTS, (item_id,))):
+            cursor = conn.execute(query, params)
+            try:
+                for stock_id, warehouse_id, batch_no, expire_date, available, supplier_id in cursor:
+                    take = min(available, remaining)
+                    allocations.append(LotAllocation(stock_id, warehouse_id, batch_no, expire_date, take, supplier_id))
+                    remaining -= take
+                    if remaining <= 1e-9:
+                        return allocations
+            finally:
+                cursor.close()
+    raise InsufficientStockError(item_id, quantity, quantity - remaining)
+
+
+def allocate_fefo(item_id: int, quantity: float, ship_date: Optional[str] = None,
+                  conn: sqlite3.Connection = None) -> List[LotAllocation]:
+    """
+    依 FEFO 扣減批號庫存，並為每個批號寫入一筆 OUT 的 StockMovement（日期為出貨日，供應商為批號的供應商）。
+    不提交交易，由呼叫端與其他變更一起提交或回滾。
+    """
+    ship_date = ship_date or date.today().isoformat()
+    with get_connection(conn) as conn:
+        allocations = plan_fefo_allocation(item_id, quantity, ship_date, conn)
+        for lot in allocations:
+            cursor = conn.execute("UPDATE Stock SET Quantity = Quantity - ? WHERE StockID = ? AND Quantity >= ?",
+                                  (lot.quantity, lot.stock_id, lot.quantity))
+            if cursor.rowcount != 1:
+                raise ValueError(f"批號 {lot.batch_no} 的庫存在配貨期間已變動，請重試")
+        conn.executemany('''
+            INSERT INTO StockMovement (ItemID, SupplierID, MovementType, Quantity, MovementDate, BatchNo, WarehouseID)
+            VALUES (?, ?, 'OUT', ?, ?, ?, ?)
+        ''', [(item_id, lot.supplier_id, lot.quantity, ship_date, lot.batch_no, lot.warehouse_id)
+              for lot in allocations])
+        return allocations
@@ -0,0 +1,158 @@
+import logging
+import sqlite3
+from typing import Callable, List, Sequence, Tuple, Union
+
+# 每個遷移為 (版本號, 說明, 步驟清單)；步驟可為 SQL 字串或接收連線的函式
+MigrationStep = Union[str, Callable[[sqlite3.Connection], None]]
+Migration = Tuple[int, str, Sequence[MigrationStep]]
+
+
+class MigrationDeferred(Exception):
+    """遷移步驟目前無法執行（例如 SQLite 缺少所需功能），記錄為延後，下次啟動時單獨重試"""
+
+
+# 延後的遷移記錄在此資料表，沒有延後的遷移時刪除資料表；
+# 啟動時以一次查詢同時讀取 user_version 與此表是否存在
+DEFERRED_TABLE = "SchemaDeferredMigration"
+
+_STATE_QUERY = f"""
+    SELECT user_version, EXISTS (SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = '{DEFERRED_TABLE}')
+    FROM pragma_user_version
+"""
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """讀取資料庫目前的結構版本（PRAGMA user_version）"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def get_deferred_migrations(conn: sqlite3.Connection) -> List[int]:
+    """尚未完成的延後遷移版本號"""
+    version, has_deferred = conn.execute(_STATE_QUERY).fetchone()
+    if not has_deferred:
+        return []
+    return [row[0] for row in conn.execute(f"SELECT Version FROM {DEFERRED_TABLE} ORDER BY Version")]
+
+
+def column_exists(conn: sqlite3.Connection, table: str, column: str) -> bool:
+    """檢查資料表是否已有指定欄位"""
+    return any(row[1] == column for row in conn.execute(f"PRAGMA table_info({table})"))
+
+
+def add_column_if_missing(table: str, column: str, definition: str) -> Callable[[sqlite3.Connection], None]:
+    """產生「欄位不存在才新增」的遷移步驟，供舊資料庫補欄位使用"""
+    def step(conn: sqlite3.Connection):
+        if not column_exists(conn, table, column):
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            logging.info("已補上欄位 %s.%s", table, column)
+    return step
+
+
+def apply_migrations(conn: sqlite3.Connection, migrations: List[Migration]) -> int:
+    """
+    套用尚未執行的遷移，全部在同一個交易內完成。
+    結構已是最新版本且沒有延後的遷移時只執行一次查詢就直接返回。
+    步驟拋出 MigrationDeferred 時回滾該遷移已執行的步驟並記錄到 DEFERRED_TABLE，其餘遷移照常套用、
+    user_version 照常前進；之後每次啟動只重試延後的遷移，不會重跑其他已套用的遷移。
+    """
+    target = migrations[-1][0]
+    current, has_deferred = conn.execute(_STATE_QUERY).fetchone()
+    if current >= target and not has_deferred:
+        return current
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # 取得寫入鎖後再確認一次，避免其他程式已經完成遷移
+        current = get_schema_version(conn)
+        retry = set(get_deferred_migrations(conn))
+        deferred = []
+        for version, description, steps in migrations:
+            if version <= current and version not in retry:
+                continue
+            conn.execute("SAVEPOINT migration")
+            try:
+                for step in steps:
+                    if callable(step):
+                        step(conn)
+                    else:
+                        conn.execute(step)
+            except MigrationDeferred as e:
+                conn.execute("ROLLBACK TO migration")
+                conn.execute("RELEASE migration")
+                logging.warning("延後資料庫遷移 %d: %s（%s）", version, description, e)
+                deferred.append((version, description))
+                continue
+            conn.execute("RELEASE migration")
+            logging.info("已套用資料庫遷移 %d: %s", version, description)
+
+        if deferred:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {DEFERRED_TABLE} "
+                         "(Version INTEGER PRIMARY KEY, Description TEXT NOT NULL)")
+            conn.execute(f"DELETE FROM {DEFERRED_TABLE}")
+            conn.executemany(f"INSERT INTO {DEFERRED_TABLE} (Version, Description) VALUES (?, ?)", deferred)
+        else:
+            conn.execute(f"DROP TABLE IF EXISTS {DEFERRED_TABLE}")
+        version = max(target, current)
+        if version != current:
+            conn.execute(f"PRAGMA user_version = {version}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return version
+
+
+def fts5_trigram_available(conn: sqlite3.Connection) -> bool:
+    """SQLite 是否支援 FTS5 與 trigram 分詞器（3.34 以後且編譯時啟用 FTS5）"""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp._fts5_probe USING fts5(x, tokenize='trigram')")
+    except sqlite3.OperationalError:
+        return False
+    conn.execute("DROP TABLE temp._fts5_probe")
+    return True
+
+
+def create_full_text_index(name: str, table: str, key: str, columns: Sequence[str],
+                           deferrable: bool = False) -> Callable[[sqlite3.Connection], None]:
+    """
+    產生建立 FTS5 外部內容索引（trigram 分詞，可做中文字串中段比對）的遷移步驟，
+    並以觸發器在 table 新增、修改、刪除時同步索引。索引已存在時不重建。
+    SQLite 不支援時略過（查詢端退回 LIKE）；deferrable=True 則拋出 MigrationDeferred，
+    該遷移記錄為延後，SQLite 升級後下次啟動即補建索引。
+    """
+    column_list = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    old_values = ", ".join(f"old.{column}" for column in columns)
+
+    def step(conn: sqlite3.Connection):
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone():
+            return
+        if not fts5_trigram_available(conn):
+            if deferrable:
+                raise MigrationDeferred(f"SQLite 不支援 FTS5 trigram，無法建立全文索引 {name}")
+            logging.warning("SQLite 不支援 FTS5 trigram，略過全文索引 %s", name)
+            return
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {name} USING fts5(
+                {column_list}, content='{table}', content_rowid='{key}', tokenize='trigram'
+            )
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {name}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {name}(rowid, {column_list}) VALUES (new.{key}, {new_values});
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {name}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {name}({name}, rowid, {column_list}) VALUES ('delete', old.{key}, {old_values});
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {name}_au AFTER UPDATE OF {column_list} ON {table} BEGIN
+                INSERT INTO {name}({name}, rowid, {column_list}) VALUES ('delete', old.{key}, {old_values});
+                INSERT INTO {name}(rowid, {column_list}) VALUES (new.{key}, {new_values});
+            END
+        """)
+        # 為既有資料建立索引
+        conn.execute(f"INSERT INTO {name}({name}) VALUES ('rebuild')")
+    return step
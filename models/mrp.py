@@ -0,0 +1,222 @@
+import sqlite3
+from datetime import date
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+from models.erp_database_schema import get_connection
+from models.bom_explosion import explode_boms
+from models.records import fetch_all
+
+# === 物料需求規劃（MRP） ===
+# 1. 毛需求：未結案銷售訂單的未出貨量，需要日為訂單日期。
+# 2. 成品淨需求：有生效 BOM 的成品先扣除成品庫存與在途採購，不足的部分成為計畫生產（當天完成）。
+# 3. 計畫生產依 BOM 多階展開到原料（models.bom_explosion，半成品直接穿透，不另行扣除半成品庫存），
+#    與沒有 BOM 的銷售品項合併為原料毛需求。
+# 4. 原料淨需求：依日期扣除庫存與在途採購（到貨日前的收料才可使用），不足量依 MOQ 向上調整，
+#    下單日 = 需要日 - 供應商前置天數，早於規劃日的標示為逾期。
+# 所有資料以少數幾次整批查詢讀入，淨需求以 NumPy 依（品項, 日期）排序後一次計算，不逐品項查詢。
+# 數量單位沿用各表原本的單位（BOM 用量為每單位成品），不做單位換算。
+
+OPEN_SALES_STATUSES = ("Pending",)
+OPEN_PURCHASE_STATUSES = ("Open", "Partial")
+
+# 新增不足量小於（品項庫存與供需量絕對值總和 × 此比例）時視為浮點誤差，不產生計畫
+_RELATIVE_TOLERANCE = 1e-9
+
+_DEMAND_QUERY = f'''
+    SELECT d.ItemID, date(h.OrderDate) AS NeedDate, SUM(d.Quantity - IFNULL(d.ShippedQuantity, 0.0)) AS Quantity
+    FROM SalesOrderHeader h
+    JOIN SalesOrderDetail d ON d.OrderID = h.OrderID
+    WHERE h.Status IN ({", ".join("?" * len(OPEN_SALES_STATUSES))}) AND IFNULL(d.IsDeleted, 0) = 0
+      AND d.Quantity > IFNULL(d.ShippedQuantity, 0.0)
+    GROUP BY d.ItemID, NeedDate
+'''
+
+# 在途採購：未收量於預計到貨日（未填時為下單日）可用
+_RECEIPT_QUERY = f'''
+    SELECT d.ItemID, date(IFNULL(h.ExpectedDeliveryDate, h.OrderDate)) AS ReceiptDate,
+           SUM(d.OrderedQty - IFNULL(d.ReceivedQty, 0.0)) AS Quantity
+    FROM PurchaseOrderHeader h
+    JOIN PurchaseOrderDetail d ON d.POID = h.POID
+    WHERE h.Status IN ({", ".join("?" * len(OPEN_PURCHASE_STATUSES))}) AND d.OrderedQty > IFNULL(d.ReceivedQty, 0.0)
+    GROUP BY d.ItemID, ReceiptDate
+'''
+
+_STOCK_QUERY = "SELECT ItemID, SUM(Quantity) AS Quantity FROM StockBalance GROUP BY ItemID"
+
+# 每個原料的採購來源：有價格者取最低價，其次依 MappingID
+_SOURCING_QUERY = '''
+    SELECT ItemID, SupplierID, IFNULL(LeadTime, 0) AS LeadTime, IFNULL(MOQ, 0) AS MOQ
+    FROM (
+        SELECT ItemID, SupplierID, LeadTime, MOQ,
+               ROW_NUMBER() OVER (PARTITION BY ItemID ORDER BY Price IS NULL, Price, MappingID) AS Preference
+        FROM SupplierItemMap
+    )
+    WHERE Preference = 1
+'''
+
+# 規劃日生效的 BOM（與 bom_explosion 選擇子 BOM 的規則相同）
+_ACTIVE_BOM_QUERY = '''
+    SELECT ProductID, BOMID
+    FROM (
+        SELECT ProductID, BOMID,
+               ROW_NUMBER() OVER (PARTITION BY ProductID ORDER BY EffectiveDate DESC, BOMID DESC) AS Preference
+        FROM BOMHeader
+        WHERE EffectiveDate <= :as_of AND (ExpireDate IS NULL OR ExpireDate >= :as_of)
+    )
+    WHERE Preference = 1
+'''
+
+
+class PlannedProduction(NamedTuple):
+    item_id: int
+    bom_id: int
+    quantity: float
+    need_date: str
+
+
+class PlannedPurchase(NamedTuple):
+    item_id: int
+    supplier_id: Optional[int]      # 沒有 SupplierItemMap 時為 None
+    quantity: float                 # 依 MOQ 調整後的下單量
+    net_requirement: float          # 調整前的不足量（MOQ 多訂的部分會用來抵後續需求）
+    need_date: str
+    order_date: str
+    lead_time: int
+    past_due: bool                  # 原本的下單日已早於規劃日
+
+
+class MRPPlan(NamedTuple):
+    as_of: str
+    production: List[PlannedProduction]
+    purchases: List[PlannedPurchase]
+
+    def to_rows(self, conn: sqlite3.Connection = None) -> List[Dict]:
+        """計畫採購轉為資料列（含品項與供應商名稱），依下單日、品項排序"""
+        with get_connection(conn) as conn:
+            items = dict(conn.execute("SELECT ItemID, ItemName FROM ItemMaster").fetchall())
+            suppliers = dict(conn.execute("SELECT SupplierID, SupplierName FROM Supplier").fetchall())
+        return [{"ItemID": order.item_id, "ItemName": items.get(order.item_id),
+                 "SupplierID": order.supplier_id, "SupplierName": suppliers.get(order.supplier_id),
+                 "Quantity": order.quantity, "NetRequirement": order.net_requirement,
+                 "NeedDate": order.need_date, "OrderDate": order.order_date,
+                 "LeadTime": order.lead_time, "PastDue": order.past_due}
+                for order in sorted(self.purchases, key=lambda order: (order.order_date, order.item_id))]
+
+
+def _events(rows, sign: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """查詢結果 (ItemID, 日期, 數量) 轉為陣列；需求 sign=-1，供給 sign=1"""
+    rows = [row for row in rows if row[1] is not None]
+    items = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    dates = np.array([row[1] for row in rows], dtype="datetime64[D]").reshape(-1)
+    quantity = np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows)) * sign
+    return items, dates, quantity
+
+
+def _net_requirements(items: np.ndarray, dates: np.ndarray, quantity: np.ndarray,
+                      on_hand: Dict[int, float]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    依品項、日期累計供需（同一天的收料可用於當天需求），回傳每個新增不足量的 (ItemID, 日期, 不足量)。
+    預計庫存 = 目前庫存 + 累計供需；累計不足量 = max(0, -預計庫存的歷史最小值)，
+    每一天的新增不足量即累計不足量的增加部分（逐批補足，lot-for-lot）。
+    """
+    if len(items) == 0:
+        return items, dates, quantity
+    order = np.lexsort((dates, items))
+    items, dates, quantity = items[order], dates[order], quantity[order]
+    days = np.flatnonzero(np.r_[True, (items[1:] != items[:-1]) | (dates[1:] != dates[:-1])])
+    items, dates, quantity = items[days], dates[days], np.add.reduceat(quantity, days)
+
+    starts = np.flatnonzero(np.r_[True, items[1:] != items[:-1]])
+    group = np.cumsum(np.r_[True, items[1:] != items[:-1]]) - 1
+    stock = np.array([on_hand.get(int(item_id), 0.0) for item_id in items[starts]])
+
+    # 各品項分段累計與取最小值，不與其他品項的數值相加（避免大數量品項吃掉小數量品項的精度）
+    lowest = np.empty_like(quantity)
+    for segment, (start, end) in enumerate(zip(starts, np.r_[starts[1:], len(items)])):
+        lowest[start:end] = np.minimum.accumulate(stock[segment] + np.cumsum(quantity[start:end]))
+    shortage = np.maximum(0.0, -lowest)
+    previous = np.r_[0.0, shortage[:-1]]
+    previous[starts] = 0.0
+    increase = shortage - previous
+    # 剛好補足的品項因浮點誤差可能留下極小的不足量，門檻依該品項的供需量級決定
+    scale = np.abs(stock) + np.add.reduceat(np.abs(quantity), starts)
+    mask = increase > _RELATIVE_TOLERANCE * scale[group]
+    return items[mask], dates[mask], increase[mask]
+
+
+def _apply_moq(increase: np.ndarray, items: np.ndarray, moq: np.ndarray) -> np.ndarray:
+    """依 MOQ 決定下單量：不足量小於 MOQ 時訂 MOQ，多出的量依序抵用同品項之後的不足量（不再下單時數量為 0）"""
+    quantity = increase.copy()
+    for index in np.flatnonzero(moq > 0):
+        if index == 0 or items[index] != items[index - 1]:
+            surplus = 0.0
+        if surplus >= increase[index]:
+            surplus -= increase[index]
+            quantity[index] = 0.0
+        else:
+            quantity[index] = max(increase[index] - surplus, moq[index])
+            surplus += quantity[index] - increase[index]
+    return quantity
+
+
+def run_mrp(as_of: Optional[str] = None, conn: sqlite3.Connection = None) -> MRPPlan:
+    """以 as_of（YYYY-MM-DD，預設今天）為規劃日執行一次 MRP，不寫入資料庫"""
+    as_of = as_of or date.today().isoformat()
+    with get_connection(conn) as conn:
+        demand = _events(conn.execute(_DEMAND_QUERY, OPEN_SALES_STATUSES).fetchall(), -1.0)
+        receipts = _events(conn.execute(_RECEIPT_QUERY, OPEN_PURCHASE_STATUSES).fetchall(), 1.0)
+        on_hand = dict(conn.execute(_STOCK_QUERY).fetchall())
+        sourcing = {row["ItemID"]: row for row in fetch_all(conn.execute(_SOURCING_QUERY))}
+        active_boms = dict(conn.execute(_ACTIVE_BOM_QUERY, {"as_of": as_of}).fetchall())
+        demanded_boms = {active_boms[int(item_id)] for item_id in np.unique(demand[0]) if int(item_id) in active_boms}
+        explosions = explode_boms(sorted(demanded_boms), as_of, skip_invalid=True, conn=conn)
+
+    # 成品：demand 中有可展開 BOM 的品項
+    products = np.array([product_id for product_id, bom_id in active_boms.items() if bom_id in explosions],
+                        dtype=np.int64)
+    is_product = np.isin(demand[0], products)
+    product_receipts = np.isin(receipts[0], products)
+    product_items, product_dates, product_qty = _net_requirements(
+        np.r_[demand[0][is_product], receipts[0][product_receipts]],
+        np.r_[demand[1][is_product], receipts[1][product_receipts]],
+        np.r_[demand[2][is_product], receipts[2][product_receipts]],
+        on_hand)
+    production = [PlannedProduction(int(item_id), active_boms[int(item_id)], float(qty), str(need_date))
+                  for item_id, need_date, qty in zip(product_items, product_dates, product_qty)]
+
+    # 展開計畫生產：以 CSR 格式保存各成品的每單位原料用量，再一次依事件展開
+    product_index = {int(product_id): i for i, product_id in enumerate(products)}
+    indptr, components, per_unit = [0], [], []
+    for product_id in products:
+        requirements = explosions[active_boms[int(product_id)]].requirements
+        components.extend(requirements)
+        per_unit.extend(requirements.values())
+        indptr.append(len(components))
+    indptr = np.array(indptr, dtype=np.int64)
+    components = np.array(components, dtype=np.int64)
+    per_unit = np.array(per_unit, dtype=np.float64)
+    rows = np.array([product_index[int(item_id)] for item_id in product_items], dtype=np.int64)
+    counts = indptr[rows + 1] - indptr[rows]
+    event = np.repeat(np.arange(len(rows)), counts)
+    position = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(indptr[rows], counts)
+
+    material_items, material_dates, material_qty = _net_requirements(
+        np.r_[demand[0][~is_product], components[position], receipts[0][~product_receipts]],
+        np.r_[demand[1][~is_product], product_dates[event], receipts[1][~product_receipts]],
+        np.r_[demand[2][~is_product], -product_qty[event] * per_unit[position], receipts[2][~product_receipts]],
+        on_hand)
+
+    source = [sourcing.get(int(item_id)) for item_id in material_items]
+    lead_time = np.array([row["LeadTime"] if row else 0 for row in source], dtype=np.int64)
+    moq = np.array([row["MOQ"] if row else 0 for row in source], dtype=np.float64)
+    order_qty = _apply_moq(material_qty, material_items, moq)
+    order_dates = material_dates - lead_time.astype("timedelta64[D]")
+    today = np.datetime64(as_of[:10], "D")
+    purchases = [
+        PlannedPurchase(int(item_id), row["SupplierID"] if row else None, float(qty), float(net),
+                        str(need_date), str(max(order_date, today)), int(days), bool(order_date < today))
+        for item_id, row, qty, net, need_date, order_date, days
+        in zip(material_items, source, order_qty, material_qty, material_dates, order_dates, lead_time)
+        if qty > 0
+    ]
+    return MRPPlan(as_of, production, purchases)
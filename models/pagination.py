@@ -0,0 +1,114 @@
+from typing import Callable, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+# === Keyset（seek）分頁 ===
+# 以「上一頁最後一列的排序鍵」作為下一頁的起點：WHERE (排序欄, 主鍵) > (?, ?) ORDER BY 排序欄, 主鍵 LIMIT ?
+# 與 LIMIT/OFFSET 不同，深頁不需要先掃過並丟棄前面的資料列，配合索引每頁成本固定。
+
+# iter_keyset 每次向資料庫讀取的筆數
+KEYSET_PAGE_SIZE = 500
+
+
+class Keyset:
+    """
+    一個清單查詢可用的排序欄位與主鍵。
+    columns 為「結果欄位名稱 -> SQL 運算式」，nullable 列出可能為 NULL 的欄位
+    （以 IFNULL(運算式, '') 排序，避免 NULL 在列值比較時讓資料列消失）。
+    key 可為多個欄位的 tuple（例如 JOIN 後一筆來源資料對應多列時），此時 after_key 的主鍵部分依序列出各欄位值。
+    """
+
+    def __init__(self, key, columns: Mapping[str, str], nullable: Sequence[str] = ()):
+        self.key = key
+        self.keys = (key,) if isinstance(key, str) else tuple(key)
+        self.columns = dict(columns)
+        self.nullable = frozenset(nullable)
+        for name in self.keys:
+            self.columns.setdefault(name, name)
+
+    def parse_order_by(self, order_by: Optional[str]) -> Tuple[str, bool]:
+        """order_by 為欄位名稱，前置 '-' 表示遞減；未指定時依主鍵遞增"""
+        if not order_by:
+            return self.keys[0], False
+        descending = order_by.startswith("-")
+        name = order_by.lstrip("-")
+        if name not in self.columns:
+            raise ValueError(f"無效的排序欄位: {name}, 可用欄位為 {sorted(self.columns)}")
+        return name, descending
+
+    def _expression(self, name: str) -> str:
+        expression = self.columns[name]
+        return f"IFNULL({expression}, '')" if name in self.nullable else expression
+
+    def clause(self, order_by: Optional[str] = None, after_key=None) -> Tuple[Optional[str], List, str]:
+        """
+        回傳 (WHERE 條件或 None, 參數, ORDER BY 子句)。
+        after_key 為上一頁 page_key() 的結果；依主鍵排序時也可直接傳入主鍵值。
+        """
+        name, descending = self.parse_order_by(order_by)
+        direction = " DESC" if descending else ""
+        op = "<" if descending else ">"
+        key_expressions = [self.columns[key] for key in self.keys]
+        key_order = ", ".join(f"{expression}{direction}" for expression in key_expressions)
+
+        if name == self.keys[0]:
+            order_sql = f" ORDER BY {key_order}"
+            if after_key is None:
+                return None, [], order_sql
+            if len(self.keys) == 1:
+                if isinstance(after_key, (tuple, list)):
+                    after_key = after_key[-1]
+                return f"{key_expressions[0]} {op} ?", [after_key], order_sql
+            expressions, fields = key_expressions, self.keys
+        else:
+            sort_expression = self._expression(name)
+            order_sql = f" ORDER BY {sort_expression}{direction}, {key_order}"
+            if after_key is None:
+                return None, [], order_sql
+            expressions, fields = [sort_expression] + key_expressions, ("排序值",) + self.keys
+        if not isinstance(after_key, (tuple, list)) or len(after_key) != len(expressions):
+            raise ValueError(f"依 {name} 排序時 after_key 必須為 ({', '.join(fields)})")
+        placeholders = ", ".join("?" for _ in expressions)
+        return f"({', '.join(expressions)}) {op} ({placeholders})", list(after_key), order_sql
+
+    def page_key(self, row, order_by: Optional[str] = None):
+        """取得一列資料的排序鍵，作為下一頁的 after_key"""
+        name, _ = self.parse_order_by(order_by)
+        keys = tuple(row[key] for key in self.keys)
+        if name == self.keys[0]:
+            return keys[0] if len(keys) == 1 else keys
+        value = row[name]
+        if value is None and name in self.nullable:
+            value = ""
+        return (value,) + keys
+
+
+def apply_keyset(query: str, conditions: List[str], params: List, keyset: Keyset, order_by: Optional[str],
+                 after_key, limit: Optional[int], group_by: str = "") -> Tuple[str, List]:
+    """將篩選條件、keyset 起點、GROUP BY、ORDER BY 與 LIMIT 依序接到查詢後面"""
+    where, key_params, order_sql = keyset.clause(order_by, after_key)
+    conditions = list(conditions)
+    params = list(params)
+    if where:
+        conditions.append(where)
+        params.extend(key_params)
+    if conditions:
+        query += " WHERE " + " AND ".join(f"({condition})" for condition in conditions)
+    query += group_by + order_sql
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+    return query, params
+
+
+def iter_keyset(reader: Callable[..., Iterable], keyset: Keyset, order_by: Optional[str] = None,
+                page_size: int = KEYSET_PAGE_SIZE, **filters) -> Iterator:
+    """
+    以 keyset 分頁逐頁呼叫 reader(after_key=..., limit=..., order_by=..., **filters)，逐筆產生資料列。
+    reader 可為 get_* 或 iter_*；每頁讀完即歸還連線，不會在兩頁之間保留開啟中的 cursor。
+    """
+    after_key = None
+    while True:
+        rows = list(reader(after_key=after_key, limit=page_size, order_by=order_by, **filters))
+        yield from rows
+        if len(rows) < page_size:
+            return
+        after_key = keyset.page_key(rows[-1], order_by)
@@ -1,25 +1,28 @@
 import sqlite3
 from datetime import datetime
 from contextlib import contextmanager
-from typing import List, Dict, Optional
+from typing import Iterable, Iterator, List, Dict, Optional
 from datetime import datetime  # 新增此行
 import logging
 from models.erp_database_schema import get_connection, create_tables
+from models.records import DEFAULT_ARRAYSIZE, fetch_all, iter_records
+from models.bulk import REQUIRED, BulkResult, bulk_insert, row_args
+from models.pagination import Keyset, apply_keyset
+from models.search_crud import match_condition
 
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-def get_items() -> List[Dict]:
+def get_items(conn: sqlite3.Connection = None) -> List[Dict]:
     """取得所有項目"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM ItemMaster")
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return fetch_all(cursor)
     
-def add_item(item_name: str, item_type: str, category: Optional[str], unit: Optional[str]):
+def add_item(item_name: str, item_type: str, category: Optional[str], unit: Optional[str], conn: sqlite3.Connection = None):
     """新增項目"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute('''
@@ -34,16 +37,6 @@ def add_item(item_name: str, item_type: str, category: Optional[str], unit: Opti
             raise ValueError("項目插入失敗")
 
 
-# === 資料庫連線管理 ===
-@contextmanager
-def get_connection():
-    conn = sqlite3.connect("erp_system.db")
-    conn.row_factory = sqlite3.Row
-    try:
-        yield conn
-    finally:
-        conn.close()
-
 # === CRUD 功能 ===
 
 def validate_effective_date(effective_date: str) -> str:
@@ -61,10 +54,10 @@ def validate_price(price: float):
     if price <= 0:
         raise ValueError("價格必須大於零")
 
-def add_price_history(item_id: int, effective_date: str, price: float):
+def add_price_history(item_id: int, effective_date: str, price: float, conn: sqlite3.Connection = None):
     validated_date = validate_effective_date(effective_date)
     validate_price(price)
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute('''
@@ -77,13 +70,41 @@ def add_price_history(item_id: int, effective_date: str, price: float):
             logging.error("新增價格歷史失敗: %s", e)
             raise ValueError("項目不存在或數據錯誤")
 
-def get_price_history(search_text: str = None) -> List[Dict]:
-    """取得價格歷史，可選搜索供應商或產品名稱"""
-    with get_connection() as conn:
+def bulk_add_price_history(entries: Iterable, on_conflict: Optional[str] = None, conn: sqlite3.Connection = None) -> BulkResult:
+    """
+    批次新增價格歷史，每筆為 (item_id, effective_date, price) 或同名參數的 dict。
+    PriceHistory 沒有唯一鍵，on_conflict 只接受 None 或 "ignore"。
+    """
+    params = (("item_id", REQUIRED), ("effective_date", REQUIRED), ("price", REQUIRED))
+
+    def prepare(row):
+        item_id, effective_date, price = row_args(row, params)
+        validate_price(price)
+        return item_id, validate_effective_date(effective_date), price
+
+    return bulk_insert("PriceHistory", ("ItemID", "EffectiveDate", "Price"), entries, prepare,
+                       on_conflict=on_conflict, conn=conn)
+
+# 一筆 PriceHistory 會對應到該品項的每個供應商，因此以 (PriceHistoryID, MappingID) 作為分頁主鍵
+PRICE_HISTORY_KEYSET = Keyset(("PriceHistoryID", "MappingID"),
+                              {"PriceHistoryID": "ph.PriceHistoryID", "MappingID": "sim.MappingID",
+                               "SupplierName": "s.SupplierName", "ItemName": "i.ItemName", "Price": "ph.Price",
+                               "EffectiveDate": "ph.EffectiveDate"})
+
+def iter_price_history(search_text: str = None, after_key=None, limit: Optional[int] = None,
+                       order_by: Optional[str] = None, arraysize: int = DEFAULT_ARRAYSIZE, chunked: bool = False,
+                       conn: sqlite3.Connection = None) -> Iterator:
+    """
+    逐批讀取價格歷史，可選搜索供應商或產品名稱；chunked=True 時每次產生一批（list），
+    after_key/limit/order_by 為 keyset 分頁參數（見 models.pagination）
+    """
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
+        cursor.arraysize = arraysize
         query = '''
             SELECT 
                 ph.PriceHistoryID,
+                sim.MappingID,
                 s.SupplierName,
                 i.ItemName,
                 ph.Price,
@@ -94,13 +115,30 @@ def get_price_history(search_text: str = None) -> List[Dict]:
             JOIN Supplier s ON sim.SupplierID = s.SupplierID
             JOIN ItemMaster i ON ph.ItemID = i.ItemID
         '''
-        params = ()
+        conditions, params = [], []
         if search_text:
-            query += " WHERE s.SupplierName LIKE ? OR i.ItemName LIKE ?"
-            params = (f"%{search_text}%", f"%{search_text}%")
-        
+            supplier_match, supplier_params = match_condition("suppliers", search_text, ("SupplierName",),
+                                                              key_expression="s.SupplierID", conn=conn)
+            item_match, item_params = match_condition("items", search_text, ("ItemName",),
+                                                      key_expression="i.ItemID", conn=conn)
+            conditions.append(f"({supplier_match}) OR ({item_match})")
+            # 先以 ItemID 索引縮小價格歷史的範圍（供應商供應的原料或名稱相符的原料），避免整表掃描 PriceHistory
+            supplier_items, supplier_item_params = match_condition("suppliers", search_text, ("SupplierName",),
+                                                                   key_expression="SupplierID", conn=conn)
+            matched_items, matched_item_params = match_condition("items", search_text, ("ItemName",),
+                                                                 key_expression="ItemID", conn=conn)
+            conditions.append(f"ph.ItemID IN (SELECT ItemID FROM SupplierItemMap WHERE {supplier_items} "
+                              f"UNION SELECT ItemID FROM ItemMaster WHERE {matched_items})")
+            params = supplier_params + item_params + supplier_item_params + matched_item_params
+        query, params = apply_keyset(query, conditions, params, PRICE_HISTORY_KEYSET, order_by, after_key, limit)
+
         cursor.execute(query, params)
-        return [dict(row) for row in cursor.fetchall()]
+        yield from iter_records(cursor, chunked)
+
+def get_price_history(search_text: str = None, after_key=None, limit: Optional[int] = None,
+                      order_by: Optional[str] = None, conn: sqlite3.Connection = None) -> List[Dict]:
+    """取得價格歷史，可選搜索供應商或產品名稱；可用 after_key/limit/order_by 分頁"""
+    return list(iter_price_history(search_text, after_key, limit, order_by, conn=conn))
 
 # 新增此函數用於供應商映射觸發的價格記錄
 def add_price_history_from_mapping(
@@ -111,24 +149,16 @@ def add_price_history_from_mapping(
     conn: sqlite3.Connection = None  # 正确接收外部连接
 ):
     """新增價格歷史記錄（支持外部傳入連接）"""
-    should_close = False
-    if conn is None:
-        conn = sqlite3.connect("erp_system.db")
-        conn.execute("PRAGMA foreign_keys = ON")
-        should_close = True
-    try:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute('''
             INSERT INTO PriceHistory (ItemID, EffectiveDate, Price)
             VALUES (?, ?, ?)
         ''', (item_id, effective_date, price))
         conn.commit()
-    finally:
-        if should_close:
-            conn.close()    
 
 ALLOWED_FIELDS = {'price', 'effectivedate'}
-def update_price_history(price_history_id: int, **kwargs):
+def update_price_history(price_history_id: int, conn: sqlite3.Connection = None, **kwargs):
     # 統一將傳入字段名稱轉為小寫
     normalized_kwargs = {k.lower(): v for k, v in kwargs.items()}
     invalid_fields = set(normalized_kwargs.keys()) - ALLOWED_FIELDS
@@ -139,7 +169,7 @@ def update_price_history(price_history_id: int, **kwargs):
     updates = ", ".join(f"{key} = ?" for key in normalized_kwargs.keys())
     params = list(normalized_kwargs.values()) + [price_history_id]
 
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute(f'''
             UPDATE PriceHistory
@@ -148,8 +178,8 @@ def update_price_history(price_history_id: int, **kwargs):
         ''', params)
         conn.commit()
 
-def delete_price_history(price_history_id: int):
-    with get_connection() as conn:
+def delete_price_history(price_history_id: int, conn: sqlite3.Connection = None):
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute('DELETE FROM PriceHistory WHERE PriceHistoryID = ?', (price_history_id,))
         conn.commit()
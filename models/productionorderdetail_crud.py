@@ -3,6 +3,8 @@ from contextlib import contextmanager
 from typing import List, Dict, Optional
 import logging
 from models.erp_database_schema import get_connection, create_tables
+from models.pagination import Keyset, apply_keyset
+from models.records import fetch_all
 from models.productionorderheader_crud import add_production_order
 
 
@@ -10,17 +12,16 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(
 # Valid ItemType for production
 VALID_ITEM_TYPE = "原料"
 
-def get_items() -> List[Dict]:
+def get_items(conn: sqlite3.Connection = None) -> List[Dict]:
     """取得所有項目"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM ItemMaster")
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return fetch_all(cursor)
     
-def add_item(item_name: str, item_type: str, category: Optional[str], unit: Optional[str]):
+def add_item(item_name: str, item_type: str, category: Optional[str], unit: Optional[str], conn: sqlite3.Connection = None):
     """新增項目"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute('''
@@ -35,9 +36,9 @@ def add_item(item_name: str, item_type: str, category: Optional[str], unit: Opti
             raise ValueError("項目插入失敗")
 
 
-def add_production_order_detail(production_order_id: int, item_id: int, planned_qty: float, actual_qty: Optional[float] = None):
+def add_production_order_detail(production_order_id: int, item_id: int, planned_qty: float, actual_qty: Optional[float] = None, conn: sqlite3.Connection = None):
     """新增生產訂單明細"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             # 外鍵檢查
@@ -75,7 +76,7 @@ def add_production_order_detail(production_order_id: int, item_id: int, planned_
             else:
                 raise
 
-def update_production_order_detail(production_detail_id: int, **kwargs):
+def update_production_order_detail(production_detail_id: int, conn: sqlite3.Connection = None, **kwargs):
     """更新生產訂單明細"""
     allowed_fields = {
         "planned_qty": "PlannedQty",
@@ -96,15 +97,15 @@ def update_production_order_detail(production_detail_id: int, **kwargs):
     query = f"UPDATE ProductionOrderDetail SET {', '.join(fields)} WHERE ProductionDetailID = ?"
     values.append(production_detail_id)
 
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute(query, tuple(values))
         conn.commit()
         logging.info("成功更新生產訂單明細: ProductionDetailID=%d", production_detail_id)
 
-def delete_production_order_detail(production_detail_id: int):
+def delete_production_order_detail(production_detail_id: int, conn: sqlite3.Connection = None):
     """刪除指定的生產訂單明細"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute("DELETE FROM ProductionOrderDetail WHERE ProductionDetailID = ?", (production_detail_id,))
@@ -116,27 +117,30 @@ def delete_production_order_detail(production_detail_id: int):
             raise ValueError("資料庫操作失敗") from e
 
 
-def get_production_order_details(order_id: Optional[int] = None, page: int = 1, page_size: int = 100) -> List[Dict]:
-    """取得生產訂單明細，支援分頁查詢"""
-    with get_connection() as conn:
+PRODUCTION_ORDER_DETAIL_KEYSET = Keyset("ProductionDetailID", {"ProductionDetailID": "d.ProductionDetailID",
+                                                                "ItemName": "i.ItemName", "PlannedQty": "d.PlannedQty",
+                                                                "ActualQty": "d.ActualQty"},
+                                        nullable=("ActualQty",))
+
+def get_production_order_details(order_id: Optional[int] = None, after_key=None, limit: Optional[int] = None,
+                                 order_by: Optional[str] = None, conn: sqlite3.Connection = None) -> List[Dict]:
+    """取得生產訂單明細；after_key/limit/order_by 為 keyset 分頁參數（見 models.pagination）"""
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         query = '''
             SELECT d.*, i.ItemName 
             FROM ProductionOrderDetail d
             JOIN ItemMaster i ON d.ItemID = i.ItemID
         '''
-        params = []
+        conditions, params = [], []
         if order_id:
-            query += " WHERE d.ProductionOrderID = ?"
+            conditions.append("d.ProductionOrderID = ?")
             params.append(order_id)
-
-        offset = (page - 1) * page_size
-        query += " LIMIT ? OFFSET ?"
-        params.extend([page_size, offset])
+        query, params = apply_keyset(query, conditions, params, PRODUCTION_ORDER_DETAIL_KEYSET, order_by,
+                                     after_key, limit)
 
         cursor.execute(query, tuple(params))
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return fetch_all(cursor)
 
 if __name__ == "__main__":
     create_tables()
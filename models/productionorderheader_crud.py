@@ -3,22 +3,23 @@ from contextlib import contextmanager
 from typing import List, Dict, Optional
 import logging
 from models.erp_database_schema import get_connection, create_tables
+from models.pagination import Keyset, apply_keyset
+from models.records import fetch_all, fetch_one
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 VALID_STATUSES = {"Pending", "In Progress", "Completed", "Cancelled"}
 
 
-def get_items() -> List[Dict]:
+def get_items(conn: sqlite3.Connection = None) -> List[Dict]:
     """取得所有項目"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM ItemMaster")
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return fetch_all(cursor)
     
-def add_item(item_name: str, item_type: str, category: Optional[str], unit: Optional[str]):
+def add_item(item_name: str, item_type: str, category: Optional[str], unit: Optional[str], conn: sqlite3.Connection = None):
     """新增項目"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute('''
@@ -34,12 +35,12 @@ def add_item(item_name: str, item_type: str, category: Optional[str], unit: Opti
 
 # === CRUD Functions for ProductionOrderHeader ===
 
-def add_production_order(product_id: int, order_date: str, status: str):
+def add_production_order(product_id: int, order_date: str, status: str, conn: sqlite3.Connection = None):
     """新增生產訂單"""
     if status not in VALID_STATUSES:
         raise ValueError(f"無效狀態: {status}, 合法值為 {VALID_STATUSES}")
 
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT 1 FROM ItemMaster WHERE ItemID = ?", (product_id,))
         if not cursor.fetchone():
@@ -59,25 +60,26 @@ def add_production_order(product_id: int, order_date: str, status: str):
             logging.error("插入失敗 (ProductID=%d): %s", product_id, e)
             raise
 
-def get_production_orders(offset: int = 0, limit: int = 100) -> List[Dict]:
-    """取得所有生產訂單，支援分頁"""
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            '''
+PRODUCTION_ORDER_KEYSET = Keyset("ProductionOrderID", {"ProductionOrderID": "h.ProductionOrderID",
+                                                        "OrderDate": "h.OrderDate", "Status": "h.Status",
+                                                        "ItemName": "i.ItemName"})
+
+def get_production_orders(after_key=None, limit: Optional[int] = None, order_by: Optional[str] = None,
+                          conn: sqlite3.Connection = None) -> List[Dict]:
+    """取得所有生產訂單；after_key/limit/order_by 為 keyset 分頁參數（見 models.pagination）"""
+    query, params = apply_keyset('''
             SELECT h.*, i.ItemName
             FROM ProductionOrderHeader h
             JOIN ItemMaster i ON h.ProductID = i.ItemID
-            WHERE h.IsDeleted = 0
-            LIMIT ? OFFSET ?
-            ''', (limit, offset)
-        )
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
-
-def get_production_order_by_id(production_order_id: int) -> Optional[Dict]:
+        ''', ["h.IsDeleted = 0"], [], PRODUCTION_ORDER_KEYSET, order_by, after_key, limit)
+    with get_connection(conn) as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return fetch_all(cursor)
+
+def get_production_order_by_id(production_order_id: int, conn: sqlite3.Connection = None) -> Optional[Dict]:
     """依 ProductionOrderID 查詢單筆生產訂單"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute('''
             SELECT h.*, i.ItemName AS ProductName
@@ -85,11 +87,9 @@ def get_production_order_by_id(production_order_id: int) -> Optional[Dict]:
             JOIN ItemMaster i ON h.ProductID = i.ItemID
             WHERE h.ProductionOrderID = ?
         ''', (production_order_id,))
-        columns = [col[0] for col in cursor.description]
-        row = cursor.fetchone()
-        return dict(zip(columns, row)) if row else None
+        return fetch_one(cursor)
 
-def update_production_order(production_order_id: int, **kwargs):
+def update_production_order(production_order_id: int, conn: sqlite3.Connection = None, **kwargs):
     """更新生產訂單"""
     allowed_fields = {
         "product_id": "ProductID",
@@ -106,10 +106,11 @@ def update_production_order(production_order_id: int, **kwargs):
                 raise ValueError(f"無效狀態: {kwargs[param]}, 合法值為 {VALID_STATUSES}")
 
             if param == "product_id":
-                cursor = get_connection().cursor()
-                cursor.execute("SELECT 1 FROM ItemMaster WHERE ItemID = ?", (kwargs[param],))
-                if not cursor.fetchone():
-                    raise ValueError(f"ProductID {kwargs[param]} 不存在")
+                with get_connection(conn) as check_conn:
+                    cursor = check_conn.cursor()
+                    cursor.execute("SELECT 1 FROM ItemMaster WHERE ItemID = ?", (kwargs[param],))
+                    if not cursor.fetchone():
+                        raise ValueError(f"ProductID {kwargs[param]} 不存在")
 
             fields.append(f"{column} = ?")
             values.append(kwargs[param])
@@ -120,7 +121,7 @@ def update_production_order(production_order_id: int, **kwargs):
     query = f"UPDATE ProductionOrderHeader SET {', '.join(fields)} WHERE ProductionOrderID = ?"
     values.append(production_order_id)
 
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute(query, tuple(values))
@@ -131,9 +132,9 @@ def update_production_order(production_order_id: int, **kwargs):
             logging.error("更新失敗: %s", e)
             raise
 
-def delete_production_order(production_order_id: int):
+def delete_production_order(production_order_id: int, conn: sqlite3.Connection = None):
     """軟刪除指定的生產訂單"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute(
@@ -3,20 +3,20 @@ from contextlib import contextmanager
 from typing import List, Dict, Optional
 import logging
 from models.erp_database_schema import get_connection, create_tables
+from models.records import fetch_all
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-def get_items() -> List[Dict]:
+def get_items(conn: sqlite3.Connection = None) -> List[Dict]:
     """取得所有項目"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM ItemMaster")
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return fetch_all(cursor)
     
-def add_item(item_name: str, item_type: str, category: Optional[str], unit: Optional[str]):
+def add_item(item_name: str, item_type: str, category: Optional[str], unit: Optional[str], conn: sqlite3.Connection = None):
     """新增項目"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute('''
@@ -31,9 +31,9 @@ def add_item(item_name: str, item_type: str, category: Optional[str], unit: Opti
             raise ValueError("項目插入失敗")
 
 # === CRUD Functions ===
-def add_purchase_order_detail(poid: int, item_id: int, ordered_qty: float, price: float):
+def add_purchase_order_detail(poid: int, item_id: int, ordered_qty: float, price: float, conn: sqlite3.Connection = None):
     """新增採購訂單明細"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute('''
             INSERT INTO PurchaseOrderDetail (POID, ItemID, OrderedQty, Price)
@@ -42,17 +42,17 @@ def add_purchase_order_detail(poid: int, item_id: int, ordered_qty: float, price
         conn.commit()
         logging.info("成功新增訂單明細: POID=%d, ItemID=%d", poid, item_id)
 
-def update_purchase_order_detail(podetail_id: int, received_qty: float):
+def update_purchase_order_detail(podetail_id: int, received_qty: float, conn: sqlite3.Connection = None):
     """更新訂單明細的收貨量"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("UPDATE PurchaseOrderDetail SET ReceivedQty = ? WHERE PODetailID = ?", (received_qty, podetail_id))
         conn.commit()
         logging.info("成功更新訂單明細: PODetailID=%d", podetail_id)
 
-def get_purchase_order_details(poid: int) -> List[Dict]:
+def get_purchase_order_details(poid: int, conn: sqlite3.Connection = None) -> List[Dict]:
     """查詢訂單明細"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute('''
             SELECT d.PODetailID, d.OrderedQty, d.ReceivedQty, i.ItemName 
@@ -60,12 +60,11 @@ def get_purchase_order_details(poid: int) -> List[Dict]:
             JOIN ItemMaster i ON d.ItemID = i.ItemID
             WHERE d.POID = ?
         ''', (poid,))
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return fetch_all(cursor)
 
-def delete_purchase_order_detail(podetail_id: int):
+def delete_purchase_order_detail(podetail_id: int, conn: sqlite3.Connection = None):
     """刪除訂單明細"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM PurchaseOrderDetail WHERE PODetailID = ?", (podetail_id,))
         conn.commit()
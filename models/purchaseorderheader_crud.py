@@ -3,20 +3,21 @@ from contextlib import contextmanager
 from typing import List, Dict, Optional
 import logging
 from models.erp_database_schema import get_connection, create_tables
+from models.pagination import Keyset, apply_keyset
+from models.records import fetch_all
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-def get_items() -> List[Dict]:
+def get_items(conn: sqlite3.Connection = None) -> List[Dict]:
     """取得所有項目"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM ItemMaster")
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return fetch_all(cursor)
     
-def add_item(item_name: str, item_type: str, category: Optional[str], unit: Optional[str]):
+def add_item(item_name: str, item_type: str, category: Optional[str], unit: Optional[str], conn: sqlite3.Connection = None):
     """新增項目"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute('''
@@ -32,9 +33,9 @@ def add_item(item_name: str, item_type: str, category: Optional[str], unit: Opti
 
 
 # === CRUD Functions ===
-def add_purchase_order(supplier_id: int, order_date: str, status: str) -> int:
+def add_purchase_order(supplier_id: int, order_date: str, status: str, conn: sqlite3.Connection = None) -> int:
     """新增採購訂單"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute('''
@@ -49,9 +50,9 @@ def add_purchase_order(supplier_id: int, order_date: str, status: str) -> int:
             logging.error("新增訂單失敗: %s", e)
             raise ValueError("供應商不存在或訂單狀態不正確")
 
-def update_purchase_order(poid: int, status: str):
+def update_purchase_order(poid: int, status: str, conn: sqlite3.Connection = None):
     """更新採購訂單狀態"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT Status FROM PurchaseOrderHeader WHERE POID = ?", (poid,))
         old_status = cursor.fetchone()[0]
@@ -61,21 +62,25 @@ def update_purchase_order(poid: int, status: str):
         conn.commit()
         logging.info("成功更新訂單狀態: POID=%d, Status=%s", poid, status)
 
-def get_purchase_orders() -> List[Dict]:
-    """查詢所有訂單"""
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
+PURCHASE_ORDER_KEYSET = Keyset("POID", {"POID": "h.POID", "OrderDate": "h.OrderDate", "Status": "h.Status",
+                                        "SupplierName": "s.SupplierName"})
+
+def get_purchase_orders(after_key=None, limit: Optional[int] = None, order_by: Optional[str] = None,
+                        conn: sqlite3.Connection = None) -> List[Dict]:
+    """查詢所有訂單；after_key/limit/order_by 為 keyset 分頁參數（見 models.pagination）"""
+    query, params = apply_keyset('''
             SELECT h.POID, h.OrderDate, h.Status, s.SupplierName 
             FROM PurchaseOrderHeader h
             JOIN Supplier s ON h.SupplierID = s.SupplierID
-        ''')
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        ''', [], [], PURCHASE_ORDER_KEYSET, order_by, after_key, limit)
+    with get_connection(conn) as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return fetch_all(cursor)
 
-def delete_purchase_order(poid: int):
+def delete_purchase_order(poid: int, conn: sqlite3.Connection = None):
     """刪除採購訂單"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM PurchaseOrderHeader WHERE POID = ?", (poid,))
         conn.commit()
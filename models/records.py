@@ -0,0 +1,230 @@
+import keyword
+import sqlite3
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Type
+
+# === 資料列物件 ===
+# 以 __slots__ 儲存欄位，不為每一列建立 dict；同時實作 Mapping 介面，
+# 原本 row["ItemName"]、row.get(...)、row.items() 的寫法都不需修改。
+
+# 逐批讀取時每次 fetchmany 的筆數
+DEFAULT_ARRAYSIZE = 1000
+
+_RECORD_CLASSES: Dict[Tuple[str, ...], Type["Record"]] = {}   # 欄位順序 -> 資料列類別
+
+
+def _build_init(fields: Tuple[str, ...]):
+    """依欄位產生 __init__（與 namedtuple 相同做法，避免逐欄 setattr 的迴圈開銷）"""
+    args = ", ".join(fields)
+    body = "".join(f"\n    self.{name} = {name}" for name in fields)
+    namespace = {}
+    exec(f"def __init__(self, {args}):{body}\n    self._extra = None", namespace)
+    return namespace["__init__"]
+
+
+class Record(Mapping):
+    """資料列基底類別：欄位為屬性，也可用字典方式存取"""
+    __slots__ = ("_extra",)   # 查詢結果以外另外附加的鍵值（例如 UI 計算欄位），需要時才建立
+    _fields: Tuple[str, ...] = ()
+    _field_set = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        fields = tuple(cls.__dict__.get("__slots__", ()))
+        cls._fields = fields
+        cls._field_set = frozenset(fields)
+        cls.__init__ = _build_init(fields)
+        _RECORD_CLASSES.setdefault(fields, cls)
+
+    # === Mapping 介面 ===
+    def __getitem__(self, key):
+        if key in self._field_set:
+            return getattr(self, key)
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in self._field_set:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __contains__(self, key):
+        return key in self._field_set or (self._extra is not None and key in self._extra)
+
+    def __iter__(self):
+        yield from self._fields
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self):
+        return len(self._fields) + (len(self._extra) if self._extra else 0)
+
+    def __repr__(self):
+        values = ", ".join(f"{key}={value!r}" for key, value in self.items())
+        return f"{type(self).__name__}({values})"
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        self._extra = None
+        for key, value in state.items():
+            self[key] = value
+
+    def to_dict(self) -> Dict:
+        """轉為一般 dict"""
+        return dict(self.items())
+
+    def copy(self) -> "Record":
+        """複製一筆資料列（與 dict.copy 相同為淺複製）"""
+        clone = type(self)(*(getattr(self, name) for name in self._fields))
+        if self._extra:
+            clone._extra = dict(self._extra)
+        return clone
+
+
+# === 各資料表的資料列類別（欄位順序與 SELECT * 相同）===
+
+class ItemRecord(Record):
+    __slots__ = ("ItemID", "ItemName", "ItemType", "Category", "Unit", "Status")
+
+
+class CustomerRecord(Record):
+    __slots__ = ("CustomerID", "CustomerName", "Address", "Address2", "TaxID", "ContactPerson", "Phone", "Email")
+
+
+class StockRecord(Record):
+    __slots__ = ("StockID", "ItemID", "WarehouseID", "Quantity", "BatchNo", "ExpireDate", "SupplierID")
+
+
+class StockMovementRecord(Record):
+    __slots__ = ("MovementID", "ItemID", "MovementType", "Quantity", "MovementDate",
+                 "RefDocType", "RefDocID", "BatchNo", "SupplierID", "WarehouseID")
+
+
+class SupplierRecord(Record):
+    __slots__ = ("SupplierID", "SupplierName", "Address", "ContactPerson", "Phone", "Email", "Website", "TaxID")
+
+
+class SupplierItemMapRecord(Record):
+    __slots__ = ("MappingID", "SupplierID", "ItemID", "MOQ", "Price", "LeadTime", "SafetyStockLevel")
+
+
+class BOMHeaderRecord(Record):
+    __slots__ = ("BOMID", "ProductID", "Version", "EffectiveDate", "ProductWeight", "ExpireDate", "Remarks")
+
+
+class BOMDetailRecord(Record):
+    __slots__ = ("BOMDetailID", "BOMID", "ComponentItemID", "Quantity", "Unit", "ScrapRate", "SupplierID", "Price")
+
+
+class SalesOrderHeaderRecord(Record):
+    __slots__ = ("OrderID", "CustomerID", "OrderDate", "Status")
+
+
+class SalesOrderDetailRecord(Record):
+    __slots__ = ("OrderDetailID", "OrderID", "ItemID", "Quantity", "Price", "ShippedQuantity", "IsDeleted")
+
+
+class ProductionOrderHeaderRecord(Record):
+    __slots__ = ("ProductionOrderID", "ProductID", "OrderDate", "Status", "IsDeleted")
+
+
+class ProductionOrderDetailRecord(Record):
+    __slots__ = ("ProductionDetailID", "ProductionOrderID", "ItemID", "PlannedQty", "ActualQty")
+
+
+class PurchaseOrderHeaderRecord(Record):
+    __slots__ = ("POID", "SupplierID", "OrderDate", "ExpectedDeliveryDate", "Status")
+
+
+class PurchaseOrderDetailRecord(Record):
+    __slots__ = ("PODetailID", "POID", "ItemID", "OrderedQty", "ReceivedQty", "Price",
+                 "BatchNo", "ProductionDate", "ExpiryDate")
+
+
+class ShipmentHeaderRecord(Record):
+    __slots__ = ("ShipmentID", "OrderID", "ShipmentDate", "Status")
+
+
+class ShipmentDetailRecord(Record):
+    __slots__ = ("ShipmentDetailID", "ShipmentID", "ItemID", "Quantity")
+
+
+class PriceHistoryRecord(Record):
+    __slots__ = ("PriceHistoryID", "ItemID", "EffectiveDate", "Price", "LastUpdated")
+
+
+class CostHistoryRecord(Record):
+    __slots__ = ("CostHistoryID", "ProductName", "Price", "UpdateTime")
+
+
+# === 依查詢結果取得資料列類別 ===
+
+def _valid_field(name: str) -> bool:
+    return name.isidentifier() and not keyword.iskeyword(name) and not name.startswith("_") and not hasattr(Record, name)
+
+
+def record_class(columns: Sequence[str]) -> Optional[Type[Record]]:
+    """
+    依欄位順序取得資料列類別：資料表已有定義時沿用，其餘（JOIN、別名）動態建立並快取。
+    欄位名稱無法當作屬性（例如 COUNT(*)、重複欄位）時回傳 None，呼叫端改用 dict。
+    """
+    columns = tuple(columns)
+    cls = _RECORD_CLASSES.get(columns)
+    if cls is not None:
+        return cls
+    if len(set(columns)) != len(columns) or not all(_valid_field(name) for name in columns):
+        return None
+    return type("Row", (Record,), {"__slots__": columns})
+
+
+def cursor_columns(cursor: sqlite3.Cursor) -> Tuple[str, ...]:
+    return tuple(col[0] for col in cursor.description)
+
+
+def make_records(cursor: sqlite3.Cursor, rows: List[tuple]) -> List:
+    """將 fetchall/fetchmany 取得的 tuple 轉為資料列物件"""
+    columns = cursor_columns(cursor)
+    cls = record_class(columns)
+    if cls is None:
+        return [dict(zip(columns, row)) for row in rows]
+    return [cls(*row) for row in rows]
+
+
+def fetch_all(cursor: sqlite3.Cursor) -> List:
+    """讀取剩餘所有資料列"""
+    return make_records(cursor, cursor.fetchall())
+
+
+def fetch_one(cursor: sqlite3.Cursor):
+    """讀取一筆資料列，沒有資料時回傳 None"""
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return make_records(cursor, [row])[0]
+
+
+def iter_records(cursor: sqlite3.Cursor, chunked: bool = False) -> Iterator:
+    """
+    以 cursor.arraysize 為單位 fetchmany，逐筆（或 chunked=True 時逐批 list）產生資料列，
+    不會一次把整個結果集載入記憶體。
+    """
+    columns = cursor_columns(cursor)
+    cls = record_class(columns)
+    while True:
+        rows = cursor.fetchmany()
+        if not rows:
+            return
+        if cls is None:
+            batch = [dict(zip(columns, row)) for row in rows]
+        else:
+            batch = [cls(*row) for row in rows]
+        if chunked:
+            yield batch
+        else:
+            yield from batch
@@ -1,22 +1,25 @@
 import sqlite3
 from contextlib import contextmanager
-from typing import List, Dict, Optional
+from typing import Iterable, List, Dict, Optional
 import logging
 from models.erp_database_schema import get_connection, create_tables
+from models.records import fetch_all
+from models.pagination import Keyset, apply_keyset
+from models.bulk import REQUIRED, BulkResult, bulk_insert, row_args
+from models.lot_allocation import LotAllocation, allocate_fefo
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-def get_items() -> List[Dict]:
+def get_items(conn: sqlite3.Connection = None) -> List[Dict]:
     """取得所有項目"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM ItemMaster")
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return fetch_all(cursor)
     
-def add_item(item_name: str, item_type: str, category: Optional[str], unit: Optional[str]):
+def add_item(item_name: str, item_type: str, category: Optional[str], unit: Optional[str], conn: sqlite3.Connection = None):
     """新增項目"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute('''
@@ -31,7 +34,7 @@ def add_item(item_name: str, item_type: str, category: Optional[str], unit: Opti
             raise ValueError("項目插入失敗")
 
 # === CRUD Functions ===
-def add_sales_order_detail(order_id: int, item_id: int, quantity: float, price: float, shipped_quantity: float = 0.0):
+def add_sales_order_detail(order_id: int, item_id: int, quantity: float, price: float, shipped_quantity: float = 0.0, conn: sqlite3.Connection = None):
     """新增銷售訂單明細，並驗證業務邏輯"""
     if shipped_quantity > quantity:
         raise ValueError("已發貨數量不可超過訂購數量")
@@ -40,7 +43,7 @@ def add_sales_order_detail(order_id: int, item_id: int, quantity: float, price:
     if price <= 0:
         raise ValueError("價格必須為正數")
 
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute('''
@@ -52,28 +55,52 @@ def add_sales_order_detail(order_id: int, item_id: int, quantity: float, price:
         except sqlite3.IntegrityError as e:
             handle_integrity_error(e)
 
-def get_sales_order_details(order_id: Optional[int] = None, offset: int = 0, limit: int = 100) -> List[Dict]:
-    """取得銷售訂單明細，支援分頁與篩選"""
-    with get_connection() as conn:
+def bulk_add_sales_order_details(details: Iterable, on_conflict: Optional[str] = None, conn: sqlite3.Connection = None) -> BulkResult:
+    """
+    批次新增銷售訂單明細，每筆為 (order_id, item_id, quantity, price, shipped_quantity) 或同名參數的 dict。
+    on_conflict="update" 時同一訂單的重複商品改為更新數量與價格，已軟刪除的明細會恢復。
+    """
+    params = (("order_id", REQUIRED), ("item_id", REQUIRED), ("quantity", REQUIRED), ("price", REQUIRED),
+              ("shipped_quantity", 0.0))
+
+    def prepare(row):
+        order_id, item_id, quantity, price, shipped_quantity = row_args(row, params)
+        if quantity is None or quantity <= 0:
+            raise ValueError("數量必須為正數")
+        if price is None or price <= 0:
+            raise ValueError("價格必須為正數")
+        if shipped_quantity > quantity:
+            raise ValueError("已發貨數量不可超過訂購數量")
+        return order_id, item_id, quantity, price, shipped_quantity, 0
+
+    return bulk_insert("SalesOrderDetail", ("OrderID", "ItemID", "Quantity", "Price", "ShippedQuantity", "IsDeleted"),
+                       details, prepare, on_conflict=on_conflict, conflict_keys=("OrderID", "ItemID"),
+                       update_columns=("Quantity", "Price", "ShippedQuantity", "IsDeleted"), conn=conn)
+
+SALES_ORDER_DETAIL_KEYSET = Keyset("OrderDetailID", {"OrderDetailID": "d.OrderDetailID", "OrderID": "d.OrderID",
+                                                    "ItemName": "i.ItemName", "Quantity": "d.Quantity",
+                                                    "Price": "d.Price"})
+
+def get_sales_order_details(order_id: Optional[int] = None, after_key=None, limit: Optional[int] = None,
+                            order_by: Optional[str] = None, conn: sqlite3.Connection = None) -> List[Dict]:
+    """取得銷售訂單明細，支援篩選；after_key/limit/order_by 為 keyset 分頁參數（見 models.pagination）"""
+    query = '''
+        SELECT d.*, i.ItemName 
+        FROM SalesOrderDetail d
+        JOIN ItemMaster i ON d.ItemID = i.ItemID
+    '''
+    conditions, params = ["d.IsDeleted = 0"], []
+    if order_id:
+        conditions.append("d.OrderID = ?")
+        params.append(order_id)
+    query, params = apply_keyset(query, conditions, params, SALES_ORDER_DETAIL_KEYSET, order_by, after_key, limit)
+
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
-        query = '''
-            SELECT d.*, i.ItemName 
-            FROM SalesOrderDetail d
-            JOIN ItemMaster i ON d.ItemID = i.ItemID
-            WHERE d.IsDeleted = 0
-        '''
-        params = []
-        if order_id:
-            query += " AND d.OrderID = ?"
-            params.append(order_id)
-        query += " LIMIT ? OFFSET ?"
-        params.extend([limit, offset])
-
         cursor.execute(query, tuple(params))
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return fetch_all(cursor)
 
-def update_sales_order_detail(order_detail_id: int, **kwargs):
+def update_sales_order_detail(order_detail_id: int, conn: sqlite3.Connection = None, **kwargs):
     """更新銷售訂單明細"""
     allowed_fields = {
         "quantity": "Quantity",
@@ -94,73 +121,77 @@ def update_sales_order_detail(order_detail_id: int, **kwargs):
     query = f"UPDATE SalesOrderDetail SET {', '.join(fields)} WHERE OrderDetailID = ? AND IsDeleted = 0"
     values.append(order_detail_id)
 
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute(query, tuple(values))
         conn.commit()
         logging.info("成功更新訂單明細: OrderDetailID=%d", order_detail_id)
 
-def delete_sales_order_detail(order_detail_id: int):
+def delete_sales_order_detail(order_detail_id: int, conn: sqlite3.Connection = None):
     """軟刪除指定的訂單明細"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("UPDATE SalesOrderDetail SET IsDeleted = 1 WHERE OrderDetailID = ?", (order_detail_id,))
         conn.commit()
         logging.info("已刪除訂單明細: OrderDetailID=%d", order_detail_id)
 
-def ship_order_detail(order_detail_id: int, shipped_qty: float):
-    """發貨並自動扣減庫存"""
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        
-        # 1. 取得訂單明細與庫存信息
-        cursor.execute('''
-            SELECT d.ItemID, d.Quantity, d.ShippedQuantity, s.Quantity AS StockQuantity
-            FROM SalesOrderDetail d
-            JOIN Stock s ON d.ItemID = s.ItemID
-            WHERE d.OrderDetailID = ? AND d.IsDeleted = 0
-        ''', (order_detail_id,))
-        row = cursor.fetchone()
-
-        if not row:
-            raise ValueError("訂單明細或庫存記錄不存在")
-
-        item_id, order_qty, shipped_qty_current, stock_qty = row
-
-        # 2. 驗證發貨數量
-        if shipped_qty_current + shipped_qty > order_qty:
-            raise ValueError("發貨數量超過訂購數量")
-        if stock_qty < shipped_qty:
-            raise ValueError("庫存不足")
-
-        # 3. 更新已發貨數量與扣減庫存
+def ship_order_detail(order_detail_id: int, shipped_qty: float, ship_date: Optional[str] = None,
+                      conn: sqlite3.Connection = None) -> List[LotAllocation]:
+    """
+    發貨並依先到期先出（FEFO）扣減批號庫存，一批不足時拆到多個批號，每個批號寫入一筆出庫異動；
+    更新已發貨數量、扣庫存與異動記錄在同一個交易內完成。回傳各批號的配貨結果
+    """
+    with get_connection(conn) as conn:
+        owns_transaction = not conn.in_transaction
+        if owns_transaction:
+            conn.execute("BEGIN IMMEDIATE")
         try:
+            cursor = conn.cursor()
+
+            # 1. 取得訂單明細
             cursor.execute('''
-                UPDATE SalesOrderDetail 
-                SET ShippedQuantity = ShippedQuantity + ? 
+                SELECT ItemID, Quantity, ShippedQuantity
+                FROM SalesOrderDetail
+                WHERE OrderDetailID = ? AND IsDeleted = 0
+            ''', (order_detail_id,))
+            row = cursor.fetchone()
+            if not row:
+                raise ValueError("訂單明細不存在")
+            item_id, order_qty, shipped_qty_current = row
+
+            # 2. 驗證發貨數量
+            if (shipped_qty_current or 0.0) + shipped_qty > order_qty:
+                raise ValueError("發貨數量超過訂購數量")
+
+            # 3. 依 FEFO 扣減批號並記錄異動，再更新已發貨數量
+            allocations = allocate_fefo(item_id, shipped_qty, ship_date, conn)
+            cursor.execute('''
+                UPDATE SalesOrderDetail
+                SET ShippedQuantity = IFNULL(ShippedQuantity, 0) + ?
                 WHERE OrderDetailID = ?
             ''', (shipped_qty, order_detail_id))
-
-            cursor.execute('''
-                UPDATE Stock 
-                SET Quantity = Quantity - ? 
-                WHERE ItemID = ?
-            ''', (shipped_qty, item_id))
-
-            conn.commit()
-            logging.info("成功發貨並扣減庫存: OrderDetailID=%d, ShippedQty=%.2f", order_detail_id, shipped_qty)
+            if owns_transaction:
+                conn.commit()
+        except ValueError:
+            if owns_transaction:
+                conn.rollback()
+            raise
         except sqlite3.Error as e:
-            conn.rollback()
+            if owns_transaction:
+                conn.rollback()
             logging.error("發貨失敗: %s", e)
-            raise RuntimeError("發貨操作失敗")
+            raise RuntimeError("發貨操作失敗") from e
+
+    logging.info("成功發貨並扣減庫存: OrderDetailID=%d, ShippedQty=%.2f, 批號數=%d",
+                 order_detail_id, shipped_qty, len(allocations))
+    return allocations
 
-def get_stock_by_item(item_id: int) -> List[Dict]:
+def get_stock_by_item(item_id: int, conn: sqlite3.Connection = None) -> List[Dict]:
     """依據 ItemID 查詢庫存記錄"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM Stock WHERE ItemID = ?", (item_id,))
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return fetch_all(cursor)
 
 
 # === Helper Function ===
@@ -1,8 +1,11 @@
 import sqlite3
 from contextlib import contextmanager
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional
 import logging
 from models.erp_database_schema import get_connection, create_tables
+from models.records import DEFAULT_ARRAYSIZE, fetch_all, fetch_one, iter_records
+from models.pagination import Keyset, apply_keyset
+from models.search_crud import match_condition
 from models.customer_crud import add_customer
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -11,12 +14,12 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(
 
 VALID_STATUSES = {"Pending", "Shipped", "Cancelled", "Delivered"}
 
-def add_sales_order(customer_id: int, order_date: str, status: str):
+def add_sales_order(customer_id: int, order_date: str, status: str, conn: sqlite3.Connection = None):
     """新增銷售訂單記錄"""
     if status not in VALID_STATUSES:
         raise ValueError(f"無效狀態: {status}, 合法值為 {VALID_STATUSES}")
 
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT 1 FROM Customer WHERE CustomerID = ?", (customer_id,))
         if not cursor.fetchone():
@@ -33,25 +36,48 @@ def add_sales_order(customer_id: int, order_date: str, status: str):
             logging.error("新增訂單失敗: %s", e)
             raise ValueError("資料庫操作失敗") from e
 
-def get_sales_orders() -> List[Dict]:
-    """取得所有銷售訂單記錄，包括客戶名稱與成品明細"""
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
+SALES_ORDER_KEYSET = Keyset("OrderID", {"OrderID": "s.OrderID", "OrderDate": "s.OrderDate",
+                                        "CustomerName": "c.CustomerName", "Status": "s.Status"})
+
+def iter_sales_orders(search_text: Optional[str] = None, after_key=None, limit: Optional[int] = None,
+                      order_by: Optional[str] = None, arraysize: int = DEFAULT_ARRAYSIZE, chunked: bool = False,
+                      conn: sqlite3.Connection = None) -> Iterator:
+    """
+    逐批讀取銷售訂單記錄，包括客戶名稱與成品明細；search_text 比對客戶名稱或訂單 ID，
+    after_key/limit/order_by 為 keyset 分頁參數（見 models.pagination）
+    """
+    query = '''
             SELECT s.OrderID, s.CustomerID, c.CustomerName, s.OrderDate, s.Status,
                    GROUP_CONCAT(i.ItemName || ' ' || d.Quantity || ' ' || i.Unit, '; ') AS Items
             FROM SalesOrderHeader s
             JOIN Customer c ON s.CustomerID = c.CustomerID
             LEFT JOIN SalesOrderDetail d ON s.OrderID = d.OrderID
             LEFT JOIN ItemMaster i ON d.ItemID = i.ItemID
-            GROUP BY s.OrderID, s.CustomerID, c.CustomerName, s.OrderDate, s.Status
-        ''')
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    '''
+    conditions, params = [], []
+
+    with get_connection(conn) as conn:
+        if search_text:
+            customer_match, customer_params = match_condition("customers", search_text, ("CustomerName",),
+                                                              key_expression="c.CustomerID", conn=conn)
+            conditions.append(f"({customer_match}) OR CAST(s.OrderID AS TEXT) LIKE ?")
+            params.extend(customer_params + [f"%{search_text}%"])
+        query, params = apply_keyset(query, conditions, params, SALES_ORDER_KEYSET, order_by, after_key, limit,
+                                     group_by=" GROUP BY s.OrderID, s.CustomerID, c.CustomerName, s.OrderDate, s.Status")
+
+        cursor = conn.cursor()
+        cursor.arraysize = arraysize
+        cursor.execute(query, params)
+        yield from iter_records(cursor, chunked)
+
+def get_sales_orders(search_text: Optional[str] = None, after_key=None, limit: Optional[int] = None,
+                     order_by: Optional[str] = None, conn: sqlite3.Connection = None) -> List[Dict]:
+    """取得銷售訂單記錄，包括客戶名稱與成品明細；可用 after_key/limit/order_by 分頁"""
+    return list(iter_sales_orders(search_text, after_key, limit, order_by, conn=conn))
 
-def get_sales_order_by_id(order_id: int) -> Optional[Dict]:
+def get_sales_order_by_id(order_id: int, conn: sqlite3.Connection = None) -> Optional[Dict]:
     """依 OrderID 查詢銷售訂單記錄，包括客戶名稱"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute('''
             SELECT s.OrderID, s.CustomerID, c.CustomerName, s.OrderDate, s.Status
@@ -59,11 +85,9 @@ def get_sales_order_by_id(order_id: int) -> Optional[Dict]:
             JOIN Customer c ON s.CustomerID = c.CustomerID
             WHERE s.OrderID = ?
         ''', (order_id,))
-        columns = [col[0] for col in cursor.description]
-        row = cursor.fetchone()
-        return dict(zip(columns, row)) if row else None
+        return fetch_one(cursor)
 
-def update_sales_order(order_id: int, **kwargs):
+def update_sales_order(order_id: int, conn: sqlite3.Connection = None, **kwargs):
     """更新銷售訂單記錄，允許安全更新"""
     allowed_fields = {
         "customer_id": "CustomerID",
@@ -84,7 +108,7 @@ def update_sales_order(order_id: int, **kwargs):
     query = f"UPDATE SalesOrderHeader SET {', '.join(fields)} WHERE OrderID = ?"
     values.append(order_id)
 
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute(query, tuple(values))
@@ -94,9 +118,9 @@ def update_sales_order(order_id: int, **kwargs):
             logging.error("更新訂單失敗: %s", e)
             raise ValueError("資料庫操作失敗") from e
 
-def delete_sales_order(order_id: int):
+def delete_sales_order(order_id: int, conn: sqlite3.Connection = None):
     """刪除指定的銷售訂單"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             # 自動刪除關聯明細
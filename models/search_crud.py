@@ -0,0 +1,141 @@
+import sqlite3
+import weakref
+from typing import FrozenSet, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+from models.erp_database_schema import FULL_TEXT_INDEXES, get_connection
+from models.records import fetch_all
+from models.unit_of_work import Session
+
+# trigram 分詞至少需要三個字元，較短的搜尋詞退回 LIKE（掃描主檔資料表）。
+# 兩個字的中文詞（如「麵粉」）無法改用 trigram 前綴查詢：詞位於欄位結尾時（「低筋麵粉」）
+# 沒有任何 trigram 以它開頭，前綴查詢會漏掉這些資料列，因此仍以 LIKE 比對以保證結果完整。
+MIN_FTS_TERM_LENGTH = 3
+
+# 每條連線已建立的全文索引名稱。索引只在啟動時的遷移建立，同一條連線只需查一次 sqlite_master；
+# 以弱參照為鍵，連線關閉後快取自動移除（非連線池建立的連線無法弱參照，每次查詢）
+_fts_indexes = weakref.WeakKeyDictionary()
+
+
+class SearchTarget(NamedTuple):
+    index: str                  # FTS5 索引名稱（見 erp_database_schema.FULL_TEXT_INDEXES）
+    table: str
+    key: str
+    columns: Tuple[str, ...]    # 索引欄位
+    title: str                  # search() 結果的顯示欄位
+    where: str = ""             # search() 的額外條件，資料表別名為 t
+
+
+def _target(index: str, title: str, where: str = "") -> SearchTarget:
+    table, key, columns = FULL_TEXT_INDEXES[index]
+    return SearchTarget(index, table, key, tuple(columns), title, where)
+
+
+SEARCH_TARGETS = {
+    "items": _target("ItemSearch", "ItemName", "t.Status = 'active'"),
+    "customers": _target("CustomerSearch", "CustomerName"),
+    "suppliers": _target("SupplierSearch", "SupplierName"),
+    "boms": _target("BOMSearch", "Version"),
+}
+
+
+def _get_target(kind: str) -> SearchTarget:
+    if kind not in SEARCH_TARGETS:
+        raise ValueError(f"無效的搜尋類別: {kind}, 可用類別為 {sorted(SEARCH_TARGETS)}")
+    return SEARCH_TARGETS[kind]
+
+
+def _existing_fts_indexes(conn: sqlite3.Connection) -> FrozenSet[str]:
+    """連線所在資料庫已建立的全文索引名稱（依連線快取）"""
+    key = conn.unit.conn if isinstance(conn, Session) else conn
+    try:
+        return _fts_indexes[key]
+    except KeyError:
+        cacheable = True
+    except TypeError:
+        cacheable = False
+    placeholders = ", ".join("?" for _ in FULL_TEXT_INDEXES)
+    rows = conn.execute(f"SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ({placeholders})",
+                        list(FULL_TEXT_INDEXES)).fetchall()
+    indexes = frozenset(row[0] for row in rows)
+    if cacheable:
+        _fts_indexes[key] = indexes
+    return indexes
+
+
+def fts_enabled(kind: str, conn: sqlite3.Connection = None) -> bool:
+    """資料庫是否已建立該類別的全文索引（SQLite 不支援 FTS5 trigram 時遷移會延後建立）"""
+    index = _get_target(kind).index
+    with get_connection(conn) as conn:
+        return index in _existing_fts_indexes(conn)
+
+
+def fts_query(term: str, columns: Optional[Sequence[str]] = None) -> str:
+    """將使用者輸入轉為 FTS5 查詢：整段視為一個片語（trigram 下即子字串比對），可限定欄位"""
+    phrase = '"' + term.replace('"', '""') + '"'
+    if columns:
+        return "{" + " ".join(columns) + "} : " + phrase
+    return phrase
+
+
+def _use_fts(kind: str, term: str, conn: Optional[sqlite3.Connection]) -> bool:
+    return len(term) >= MIN_FTS_TERM_LENGTH and fts_enabled(kind, conn)
+
+
+def match_condition(kind: str, term: str, columns: Optional[Sequence[str]] = None,
+                    key_expression: Optional[str] = None, conn: sqlite3.Connection = None) -> Tuple[str, List]:
+    """
+    產生「columns 任一欄包含 term」的 WHERE 條件與參數，供 CRUD 讀取函式組合查詢。
+    key_expression 為外部查詢中對應主鍵的運算式（例如 JOIN 時的 "s.SupplierID"）；
+    未指定時表示直接查詢該資料表本身。三個字以上使用全文索引，否則退回 LIKE（見 MIN_FTS_TERM_LENGTH）。
+    """
+    target = _get_target(kind)
+    columns = tuple(columns or target.columns)
+    invalid = set(columns) - set(target.columns)
+    if invalid:
+        raise ValueError(f"無效的搜尋欄位: {', '.join(sorted(invalid))}")
+
+    if _use_fts(kind, term, conn):
+        return (f"{key_expression or target.key} IN (SELECT rowid FROM {target.index} WHERE {target.index} MATCH ?)",
+                [fts_query(term, columns)])
+
+    like = " OR ".join(f"{column} LIKE ?" for column in columns)
+    params = [f"%{term}%"] * len(columns)
+    if key_expression is None:
+        return like, params
+    return f"{key_expression} IN (SELECT {target.key} FROM {target.table} WHERE {like})", params
+
+
+def search(term: str, kinds: Optional[Iterable[str]] = None, limit: int = 20,
+           conn: sqlite3.Connection = None) -> List:
+    """
+    跨物料、客戶、供應商與 BOM 的統一搜尋，回傳 Kind、ID、Title、Rank、Prefix 欄位的資料列。
+    以標題開頭符合者優先，其次依 bm25 相關度（數值越小越相關）排序。
+    """
+    term = (term or "").strip()
+    if not term:
+        return []
+    hits = []
+    with get_connection(conn) as conn:
+        for kind in kinds or SEARCH_TARGETS:
+            target = _get_target(kind)
+            conditions = [f"({target.where})"] if target.where else []
+            if _use_fts(kind, term, conn):
+                rank = f"bm25({target.index})"
+                source = f"{target.index} JOIN {target.table} t ON t.{target.key} = {target.index}.rowid"
+                conditions.append(f"{target.index} MATCH ?")
+                params = [fts_query(term)]
+            else:
+                rank = "0.0"
+                source = f"{target.table} t"
+                conditions.append("(" + " OR ".join(f"t.{column} LIKE ?" for column in target.columns) + ")")
+                params = [f"%{term}%"] * len(target.columns)
+            cursor = conn.execute(f"""
+                SELECT ? AS Kind, t.{target.key} AS ID, t.{target.title} AS Title, {rank} AS Rank,
+                       instr(lower(t.{target.title}), lower(?)) = 1 AS Prefix
+                FROM {source}
+                WHERE {" AND ".join(conditions)}
+                ORDER BY Prefix DESC, Rank, ID
+                LIMIT ?
+            """, [kind, term, *params, limit])
+            hits.extend(fetch_all(cursor))
+    hits.sort(key=lambda hit: (-hit["Prefix"], hit["Rank"]))
+    return hits[:limit]
@@ -3,20 +3,20 @@ from contextlib import contextmanager
 from typing import List, Dict, Optional
 import logging
 from models.erp_database_schema import get_connection, create_tables
+from models.records import fetch_all
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-def get_items() -> List[Dict]:
+def get_items(conn: sqlite3.Connection = None) -> List[Dict]:
     """取得所有項目"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM ItemMaster")
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return fetch_all(cursor)
     
-def add_item(item_name: str, item_type: str, category: Optional[str], unit: Optional[str]):
+def add_item(item_name: str, item_type: str, category: Optional[str], unit: Optional[str], conn: sqlite3.Connection = None):
     """新增項目"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute('''
@@ -32,12 +32,12 @@ def add_item(item_name: str, item_type: str, category: Optional[str], unit: Opti
 
 
 # === CRUD Functions ===
-def add_shipment_detail(shipment_id: int, item_id: int, quantity: float):
+def add_shipment_detail(shipment_id: int, item_id: int, quantity: float, conn: sqlite3.Connection = None):
     """新增出貨明細"""
     if quantity <= 0:
         raise ValueError("數量必須大於零")
 
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute('''
@@ -50,19 +50,19 @@ def add_shipment_detail(shipment_id: int, item_id: int, quantity: float):
             logging.error("新增出貨明細失敗: %s", e)
             raise ValueError("出貨單或項目不存在") from e
 
-def get_shipment_details(shipment_id: int) -> list:
+def get_shipment_details(shipment_id: int, conn: sqlite3.Connection = None) -> list:
     """取得指定出貨單的明細"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM ShipmentDetail WHERE ShipmentID = ?", (shipment_id,))
         return cursor.fetchall()
 
-def update_shipment_detail(shipment_detail_id: int, quantity: float):
+def update_shipment_detail(shipment_detail_id: int, quantity: float, conn: sqlite3.Connection = None):
     """更新出貨明細"""
     if quantity <= 0:
         raise ValueError("數量必須大於零")
 
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute('''
             UPDATE ShipmentDetail
@@ -71,9 +71,9 @@ def update_shipment_detail(shipment_detail_id: int, quantity: float):
         ''', (quantity, shipment_detail_id))
         conn.commit()
 
-def delete_shipment_detail(shipment_detail_id: int):
+def delete_shipment_detail(shipment_detail_id: int, conn: sqlite3.Connection = None):
     """刪除出貨明細"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM ShipmentDetail WHERE ShipmentDetailID = ?", (shipment_detail_id,))
         conn.commit()
@@ -4,21 +4,22 @@ from contextlib import contextmanager
 from typing import List, Dict, Optional
 import logging
 from models.erp_database_schema import get_connection, create_tables
+from models.pagination import Keyset, apply_keyset
+from models.records import fetch_all
 
 VALID_SHIPMENT_STATUSES = {"pending", "shipped", "canceled"}
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-def get_items() -> List[Dict]:
+def get_items(conn: sqlite3.Connection = None) -> List[Dict]:
     """取得所有項目"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM ItemMaster")
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return fetch_all(cursor)
     
-def add_item(item_name: str, item_type: str, category: Optional[str], unit: Optional[str]):
+def add_item(item_name: str, item_type: str, category: Optional[str], unit: Optional[str], conn: sqlite3.Connection = None):
     """新增項目"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute('''
@@ -35,7 +36,7 @@ def add_item(item_name: str, item_type: str, category: Optional[str], unit: Opti
 
 
 # === CRUD Functions ===    
-def add_shipment(order_id: int, shipment_date: str, status: str):
+def add_shipment(order_id: int, shipment_date: str, status: str, conn: sqlite3.Connection = None):
     """新增出貨單"""
     # 日期格式驗證
     try:
@@ -47,7 +48,7 @@ def add_shipment(order_id: int, shipment_date: str, status: str):
     if status not in VALID_SHIPMENT_STATUSES:
         raise ValueError(f"無效的狀態: {status}")
 
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute('''
@@ -61,16 +62,20 @@ def add_shipment(order_id: int, shipment_date: str, status: str):
             logging.error("新增出貨單失敗: %s", e)
             raise ValueError("訂單不存在或數據格式錯誤") from e
 
-def get_shipments() -> list:
-    """取得所有出貨單"""
-    with get_connection() as conn:
+SHIPMENT_KEYSET = Keyset("ShipmentID", {"OrderID": "OrderID", "ShipmentDate": "ShipmentDate", "Status": "Status"})
+
+def get_shipments(after_key=None, limit: Optional[int] = None, order_by: Optional[str] = None,
+                  conn: sqlite3.Connection = None) -> List[Dict]:
+    """取得所有出貨單；after_key/limit/order_by 為 keyset 分頁參數（見 models.pagination）"""
+    query, params = apply_keyset("SELECT * FROM ShipmentHeader", [], [], SHIPMENT_KEYSET, order_by, after_key, limit)
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM ShipmentHeader")
-        return cursor.fetchall()
+        cursor.execute(query, params)
+        return fetch_all(cursor)
 
 ALLOWED_HEADER_FIELDS = {'ShipmentDate', 'Status', 'TrackingNumber'}
 
-def update_shipment(shipment_id: int, **kwargs):
+def update_shipment(shipment_id: int, conn: sqlite3.Connection = None, **kwargs):
     invalid_fields = set(kwargs.keys()) - ALLOWED_HEADER_FIELDS
     if invalid_fields:
         raise ValueError(f"非法字段: {', '.join(invalid_fields)}")
@@ -79,7 +84,7 @@ def update_shipment(shipment_id: int, **kwargs):
     updates = ", ".join(f"{key} = ?" for key in kwargs.keys())
     params = list(kwargs.values()) + [shipment_id]
 
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute(f'''
             UPDATE ShipmentHeader
@@ -88,9 +93,9 @@ def update_shipment(shipment_id: int, **kwargs):
         ''', params)
         conn.commit()
 
-def delete_shipment(shipment_id: int):
+def delete_shipment(shipment_id: int, conn: sqlite3.Connection = None):
     """刪除出貨單"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM ShipmentHeader WHERE ShipmentID = ?", (shipment_id,))
         conn.commit()
@@ -1,22 +1,23 @@
 import sqlite3
 from contextlib import contextmanager
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional
 import logging
 from models.erp_database_schema import get_connection, create_tables
+from models.records import DEFAULT_ARRAYSIZE, fetch_all, iter_records
+from models.pagination import Keyset, apply_keyset
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-def get_items() -> List[Dict]:
+def get_items(conn: sqlite3.Connection = None) -> List[Dict]:
     """取得所有項目"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM ItemMaster")
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return fetch_all(cursor)
     
-def add_item(item_name: str, item_type: str, category: Optional[str], unit: Optional[str]):
+def add_item(item_name: str, item_type: str, category: Optional[str], unit: Optional[str], conn: sqlite3.Connection = None):
     """新增項目"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute('''
@@ -31,14 +32,16 @@ def add_item(item_name: str, item_type: str, category: Optional[str], unit: Opti
             raise ValueError("項目插入失敗")
 
 # === CRUD Functions for Stock ===
-def add_stock(item_id, warehouse_id, quantity, batch_no, expire_date):
-    """新增庫存記錄，捕捉唯一性衝突並處理事務回滾"""
-    with get_connection() as conn:
+def add_stock(item_id, warehouse_id, quantity, batch_no, expire_date, supplier_id=None,
+              conn: sqlite3.Connection = None):
+    """新增庫存記錄（supplier_id 為批號的來源供應商），捕捉唯一性衝突並處理事務回滾"""
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute(
-                "INSERT INTO Stock (ItemID, WarehouseID, Quantity, BatchNo, ExpireDate) VALUES (?, ?, ?, ?, ?)",
-                (item_id, warehouse_id, quantity, batch_no, expire_date)
+                "INSERT INTO Stock (ItemID, WarehouseID, Quantity, BatchNo, ExpireDate, SupplierID) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (item_id, warehouse_id, quantity, batch_no, expire_date, supplier_id)
             )
             conn.commit()
         except sqlite3.IntegrityError as e:
@@ -46,30 +49,41 @@ def add_stock(item_id, warehouse_id, quantity, batch_no, expire_date):
             print(f"唯一性衝突錯誤: {e}")
             raise ValueError("庫存記錄插入失敗，可能是唯一性約束衝突")
 
-def get_stocks():
-    """取得所有庫存記錄，返回字典格式"""
-    with get_connection() as conn:
+STOCK_KEYSET = Keyset("StockID", {"ItemID": "ItemID", "WarehouseID": "WarehouseID", "Quantity": "Quantity",
+                                   "BatchNo": "BatchNo", "ExpireDate": "ExpireDate", "SupplierID": "SupplierID"},
+                      nullable=("WarehouseID", "BatchNo", "ExpireDate", "SupplierID"))
+
+def iter_stocks(after_key=None, limit: Optional[int] = None, order_by: Optional[str] = None,
+                arraysize: int = DEFAULT_ARRAYSIZE, chunked: bool = False, conn: sqlite3.Connection = None) -> Iterator:
+    """逐批讀取庫存記錄；chunked=True 時每次產生一批（list），after_key/limit/order_by 為 keyset 分頁參數"""
+    query, params = apply_keyset("SELECT * FROM Stock", [], [], STOCK_KEYSET, order_by, after_key, limit)
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM Stock")
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        cursor.arraysize = arraysize
+        cursor.execute(query, params)
+        yield from iter_records(cursor, chunked)
+
+def get_stocks(after_key=None, limit: Optional[int] = None, order_by: Optional[str] = None,
+               conn: sqlite3.Connection = None):
+    """取得庫存記錄，返回字典格式；可用 after_key/limit/order_by 分頁"""
+    return list(iter_stocks(after_key, limit, order_by, conn=conn))
 
-def get_stock_by_item(item_id):
+def get_stock_by_item(item_id, conn: sqlite3.Connection = None):
     """依 ItemID 查詢庫存記錄"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM Stock WHERE ItemID = ?", (item_id,))
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return fetch_all(cursor)
 
-def update_stock(stock_id, **kwargs):
+def update_stock(stock_id, conn: sqlite3.Connection = None, **kwargs):
     """更新庫存記錄，允許 0 值並處理安全更新"""
     allowed_fields = {
         "new_item_id": "ItemID",
         "new_warehouse_id": "WarehouseID",
         "new_quantity": "Quantity",
         "new_batch_no": "BatchNo",
-        "new_expire_date": "ExpireDate"
+        "new_expire_date": "ExpireDate",
+        "new_supplier_id": "SupplierID"
     }
     fields = []
     values = []
@@ -85,14 +99,14 @@ def update_stock(stock_id, **kwargs):
     query = f"UPDATE Stock SET {', '.join(fields)} WHERE StockID = ?"
     values.append(stock_id)
 
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute(query, tuple(values))
         conn.commit()
 
-def adjust_stock(stock_id, delta_quantity):
+def adjust_stock(stock_id, delta_quantity, conn: sqlite3.Connection = None):
     """調整庫存數量，防止負庫存"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute(
@@ -105,9 +119,9 @@ def adjust_stock(stock_id, delta_quantity):
             print(f"庫存調整失敗: {e}")
             raise ValueError("庫存調整失敗，可能導致負庫存")
 
-def delete_stock(stock_id):
+def delete_stock(stock_id, conn: sqlite3.Connection = None):
     """刪除指定的庫存記錄"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM Stock WHERE StockID = ?", (stock_id,))
         conn.commit()
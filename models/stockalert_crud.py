@@ -0,0 +1,91 @@
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from models.erp_database_schema import LOW_STOCK_REBUILD, get_connection
+from models.records import fetch_all
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# LowStockAlert 由 StockTotal 與 SupplierItemMap 的觸發器維護（見 erp_database_schema.LOW_STOCK_TOTAL_SCHEMA），
+# 每筆異動只比對受影響的 (ItemID, SupplierID) 總量。讀取端先比對 LowStockAlertRevision，
+# 版本未變時不需讀取警示清單。
+
+def get_low_stock_revision(conn: sqlite3.Connection = None) -> int:
+    """警示清單的版本號，有組合加入或移出警示時遞增"""
+    with get_connection(conn) as conn:
+        row = conn.execute("SELECT Revision FROM LowStockAlertRevision WHERE ID = 1").fetchone()
+        return row[0] if row else 0
+
+def get_low_stock_alerts(conn: sqlite3.Connection = None) -> List[Dict]:
+    """目前低於安全水位的 (ItemID, SupplierID)，含名稱、庫存量、安全水位與缺口（Shortage），缺口大的在前"""
+    with get_connection(conn) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT a.ItemID, NULLIF(a.SupplierID, 0) AS SupplierID, i.ItemName, p.SupplierName,
+                   a.Quantity AS StockQuantity, a.SafetyStockLevel, a.SafetyStockLevel - a.Quantity AS Shortage
+            FROM LowStockAlert a
+            LEFT JOIN ItemMaster i ON i.ItemID = a.ItemID
+            LEFT JOIN Supplier p ON p.SupplierID = a.SupplierID
+            ORDER BY Shortage DESC, a.ItemID, a.SupplierID
+        ''')
+        return fetch_all(cursor)
+
+def get_low_stock_alerts_if_changed(revision: Optional[int],
+                                    conn: sqlite3.Connection = None) -> Optional[Tuple[int, List[Dict]]]:
+    """版本號與 revision 不同時回傳 (新版本號, 警示清單)，相同時回傳 None（只讀取一列）"""
+    with get_connection(conn) as conn:
+        current = get_low_stock_revision(conn)
+        if current == revision:
+            return None
+        return current, get_low_stock_alerts(conn)
+
+def rebuild_low_stock_alerts(conn: sqlite3.Connection = None) -> int:
+    """
+    依 StockBalance 重新計算各 (ItemID, SupplierID) 總量並重建全部警示，回傳警示筆數。
+    正常情況下觸發器已保持同步，僅在資料修復或重建庫存餘額後使用。
+    """
+    with get_connection(conn) as conn:
+        for statement in LOW_STOCK_REBUILD:
+            conn.execute(statement)
+        conn.commit()
+        count = conn.execute("SELECT COUNT(*) FROM LowStockAlert").fetchone()[0]
+        logging.info("已重建低庫存警示：%d 筆", count)
+        return count
+
+
+class AlertChange(NamedTuple):
+    """兩次檢查之間警示清單的變化，鍵為 (ItemID, SupplierID)"""
+    added: List[Dict]
+    removed: List[Tuple[int, Optional[int]]]
+
+
+class LowStockMonitor:
+    """
+    保存目前的低庫存組合，poll() 只在版本號改變時讀取警示清單並回報新增與解除的組合。
+    可在背景執行緒定期呼叫（例如發送通知），多執行緒共用時以鎖保護。
+    """
+
+    def __init__(self):
+        self.revision: Optional[int] = None
+        self.alerts: Dict[Tuple[int, Optional[int]], Dict] = {}
+        self._lock = threading.Lock()
+
+    def poll(self, conn: sqlite3.Connection = None) -> Optional[AlertChange]:
+        with self._lock:
+            changed = get_low_stock_alerts_if_changed(self.revision, conn)
+            if changed is None:
+                return None
+            self.revision, rows = changed
+            alerts = {(row["ItemID"], row["SupplierID"]): row for row in rows}
+            change = AlertChange([row for key, row in alerts.items() if key not in self.alerts],
+                                 [key for key in self.alerts if key not in alerts])
+            self.alerts = alerts
+            return change
+
+    def __len__(self):
+        return len(self.alerts)
+
+if __name__ == "__main__":
+    # 復原用：python -m models.stockalert_crud
+    rebuild_low_stock_alerts()
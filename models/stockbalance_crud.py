@@ -0,0 +1,107 @@
+import sqlite3
+import logging
+from typing import Dict, List, Optional
+from models.erp_database_schema import STOCK_BALANCE_REBUILD, get_connection
+from models.records import fetch_all
+from models.search_crud import match_condition
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# StockBalance 由 StockMovement 的觸發器維護（見 erp_database_schema.STOCK_BALANCE_SCHEMA），
+# 未指定的 SupplierID / WarehouseID / BatchNo 在表中存為 0 / 0 / ''，此模組讀取時轉回 NULL
+
+def get_stock_balances(item_id: Optional[int] = None, supplier_id: Optional[int] = None,
+                       conn: sqlite3.Connection = None) -> List[Dict]:
+    """取得各 (ItemID, SupplierID, WarehouseID, BatchNo) 的庫存餘額"""
+    query = '''
+        SELECT ItemID, NULLIF(SupplierID, 0) AS SupplierID, NULLIF(WarehouseID, 0) AS WarehouseID,
+               NULLIF(BatchNo, '') AS BatchNo, Quantity
+        FROM StockBalance
+    '''
+    conditions, params = [], []
+    if item_id is not None:
+        conditions.append("ItemID = ?")
+        params.append(item_id)
+    if supplier_id is not None:
+        conditions.append("SupplierID = ?")
+        params.append(supplier_id)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY ItemID, SupplierID, WarehouseID, BatchNo"
+    with get_connection(conn) as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return fetch_all(cursor)
+
+def get_stock_summary(search_text: Optional[str] = None, conn: sqlite3.Connection = None) -> List[Dict]:
+    """
+    依 ItemID、SupplierID 彙總庫存量（StockQuantity），結果與彙總整份 StockMovement 相同，
+    但只讀取餘額表；search_text 比對物品或供應商名稱
+    """
+    query = '''
+        SELECT ItemID, NULLIF(SupplierID, 0) AS SupplierID, SUM(Quantity) AS StockQuantity
+        FROM StockBalance
+    '''
+    params = []
+    with get_connection(conn) as conn:
+        if search_text:
+            item_match, item_params = match_condition("items", search_text, ("ItemName",),
+                                                      key_expression="ItemID", conn=conn)
+            supplier_match, supplier_params = match_condition("suppliers", search_text, ("SupplierName",),
+                                                              key_expression="SupplierID", conn=conn)
+            query += f" WHERE ({item_match}) OR ({supplier_match})"
+            params.extend(item_params + supplier_params)
+        query += " GROUP BY ItemID, SupplierID"
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return fetch_all(cursor)
+
+def get_stock_levels(search_text: Optional[str] = None, conn: sqlite3.Connection = None) -> List[Dict]:
+    """
+    依 ItemID、SupplierID 彙總庫存量，並以同一次查詢帶出物品與供應商名稱、安全水位（未設定為 0）
+    及 BelowSafety（庫存低於安全水位為 1）；低於安全水位的排在前面。search_text 同 get_stock_summary
+    """
+    query = '''
+        SELECT s.ItemID, NULLIF(s.SupplierID, 0) AS SupplierID, i.ItemName, p.SupplierName, s.StockQuantity,
+               IFNULL(m.SafetyStockLevel, 0.0) AS SafetyStockLevel,
+               s.StockQuantity < IFNULL(m.SafetyStockLevel, 0.0) AS BelowSafety
+        FROM (
+            SELECT ItemID, SupplierID, SUM(Quantity) AS StockQuantity
+            FROM StockBalance
+            {where}
+            GROUP BY ItemID, SupplierID
+        ) s
+        LEFT JOIN SupplierItemMap m ON m.SupplierID = s.SupplierID AND m.ItemID = s.ItemID
+        LEFT JOIN ItemMaster i ON i.ItemID = s.ItemID
+        LEFT JOIN Supplier p ON p.SupplierID = s.SupplierID
+        ORDER BY BelowSafety DESC, s.ItemID, s.SupplierID
+    '''
+    where, params = "", []
+    with get_connection(conn) as conn:
+        if search_text:
+            item_match, item_params = match_condition("items", search_text, ("ItemName",),
+                                                      key_expression="ItemID", conn=conn)
+            supplier_match, supplier_params = match_condition("suppliers", search_text, ("SupplierName",),
+                                                              key_expression="SupplierID", conn=conn)
+            where = f"WHERE ({item_match}) OR ({supplier_match})"
+            params.extend(item_params + supplier_params)
+        cursor = conn.cursor()
+        cursor.execute(query.format(where=where), params)
+        return fetch_all(cursor)
+
+def rebuild_stock_balance(conn: sqlite3.Connection = None) -> int:
+    """
+    依 StockMovement 重新計算全部庫存餘額，回傳餘額筆數。
+    正常情況下觸發器已保持同步，僅在資料修復或停用觸發器大量匯入後使用。
+    """
+    with get_connection(conn) as conn:
+        for statement in STOCK_BALANCE_REBUILD:
+            conn.execute(statement)
+        conn.commit()
+        count = conn.execute("SELECT COUNT(*) FROM StockBalance").fetchone()[0]
+        logging.info("已重建庫存餘額：%d 筆", count)
+        return count
+
+if __name__ == "__main__":
+    # 復原用：python -m models.stockbalance_crud
+    rebuild_stock_balance()
@@ -1,22 +1,25 @@
 import sqlite3
 from contextlib import contextmanager
-from typing import List, Dict, Optional
+from typing import Iterable, Iterator, List, Dict, Optional
 import logging
 from models.erp_database_schema import get_connection, create_tables
+from models.records import DEFAULT_ARRAYSIZE, fetch_all, iter_records
+from models.pagination import Keyset, apply_keyset
+from models.search_crud import match_condition
+from models.bulk import REQUIRED, BulkResult, bulk_insert, row_args
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-def get_items() -> List[Dict]:
+def get_items(conn: sqlite3.Connection = None) -> List[Dict]:
     """取得所有項目"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM ItemMaster")
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return fetch_all(cursor)
     
-def add_item(item_name: str, item_type: str, category: Optional[str], unit: Optional[str]):
+def add_item(item_name: str, item_type: str, category: Optional[str], unit: Optional[str], conn: sqlite3.Connection = None):
     """新增項目"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute('''
@@ -32,15 +35,16 @@ def add_item(item_name: str, item_type: str, category: Optional[str], unit: Opti
     
 # === CRUD Functions for StockMovement ===
 
-def add_stock_movement(item_id: int, supplier_id: int, movement_type: str, quantity: float, movement_date: str, batch_no: str):
-    """新增庫存移動記錄"""
-    with get_connection() as conn:
+def add_stock_movement(item_id: int, supplier_id: int, movement_type: str, quantity: float, movement_date: str, batch_no: str,
+                       warehouse_id: Optional[int] = None, conn: sqlite3.Connection = None):
+    """新增庫存移動記錄；StockBalance 由觸發器在同一交易內更新"""
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute('''
-                INSERT INTO StockMovement (ItemID, SupplierID, MovementType, Quantity, MovementDate, BatchNo)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (item_id, supplier_id, movement_type, quantity, movement_date, batch_no))
+                INSERT INTO StockMovement (ItemID, SupplierID, MovementType, Quantity, MovementDate, BatchNo, WarehouseID)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (item_id, supplier_id, movement_type, quantity, movement_date, batch_no, warehouse_id))
             conn.commit()
             logging.info("成功新增庫存移動記錄")
         except sqlite3.IntegrityError as e:
@@ -48,17 +52,61 @@ def add_stock_movement(item_id: int, supplier_id: int, movement_type: str, quant
             logging.error("唯一性約束失敗: %s", e)
             raise ValueError("庫存移動記錄插入失敗")
 
-def get_stock_movements() -> List[Dict]:
-    """取得所有庫存移動記錄，返回字典格式"""
-    with get_connection() as conn:
+def bulk_add_stock_movements(movements: Iterable, on_conflict: Optional[str] = None, conn: sqlite3.Connection = None) -> BulkResult:
+    """
+    批次新增庫存移動記錄，每筆為 (item_id, supplier_id, movement_type, quantity, movement_date, batch_no[, warehouse_id])
+    或同名參數的 dict。StockMovement 沒有唯一鍵，on_conflict 只接受 None 或 "ignore"。
+    """
+    params = (("item_id", REQUIRED), ("supplier_id", None), ("movement_type", REQUIRED),
+              ("quantity", REQUIRED), ("movement_date", REQUIRED), ("batch_no", None), ("warehouse_id", None))
+
+    def prepare(row):
+        item_id, supplier_id, movement_type, quantity, movement_date, batch_no, warehouse_id = row_args(row, params)
+        if movement_type not in ("IN", "OUT"):
+            raise ValueError(f"無效的移動類型: {movement_type}")
+        if quantity is None or quantity <= 0:
+            raise ValueError("數量必須為正數")
+        return item_id, supplier_id, movement_type, quantity, movement_date, batch_no, warehouse_id
+
+    return bulk_insert("StockMovement", ("ItemID", "SupplierID", "MovementType", "Quantity", "MovementDate", "BatchNo",
+                                         "WarehouseID"),
+                       movements, prepare, on_conflict=on_conflict, conn=conn)
+
+STOCK_MOVEMENT_KEYSET = Keyset("MovementID", {"MovementDate": "MovementDate", "MovementType": "MovementType",
+                                              "Quantity": "Quantity", "ItemID": "ItemID", "BatchNo": "BatchNo"},
+                               nullable=("BatchNo",))
+
+def iter_stock_movements(item_search: Optional[str] = None, after_key=None, limit: Optional[int] = None,
+                         order_by: Optional[str] = None, arraysize: int = DEFAULT_ARRAYSIZE, chunked: bool = False,
+                         conn: sqlite3.Connection = None) -> Iterator:
+    """
+    逐批讀取庫存移動記錄；item_search 比對物品名稱，chunked=True 時每次產生一批（list），
+    after_key/limit/order_by 為 keyset 分頁參數（見 models.pagination）
+    """
+    query = "SELECT * FROM StockMovement"
+    conditions, params = [], []
+
+    with get_connection(conn) as conn:
+        if item_search:
+            condition, search_params = match_condition("items", item_search, ("ItemName",),
+                                                       key_expression="ItemID", conn=conn)
+            conditions.append(condition)
+            params.extend(search_params)
+        query, params = apply_keyset(query, conditions, params, STOCK_MOVEMENT_KEYSET, order_by, after_key, limit)
+
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM StockMovement")
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        cursor.arraysize = arraysize
+        cursor.execute(query, params)
+        yield from iter_records(cursor, chunked)
+
+def get_stock_movements(item_search: Optional[str] = None, after_key=None, limit: Optional[int] = None,
+                        order_by: Optional[str] = None, conn: sqlite3.Connection = None) -> List[Dict]:
+    """取得庫存移動記錄，返回字典格式；可用 after_key/limit/order_by 分頁"""
+    return list(iter_stock_movements(item_search, after_key, limit, order_by, conn=conn))
 
-def update_stock_movement(movement_id: int, item_id: int, supplier_id: int, movement_type: str, quantity: float, movement_date: str, batch_no: str):
+def update_stock_movement(movement_id: int, item_id: int, supplier_id: int, movement_type: str, quantity: float, movement_date: str, batch_no: str, conn: sqlite3.Connection = None):
     """更新庫存移動記錄"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute('''
             UPDATE StockMovement
@@ -71,9 +119,9 @@ def update_stock_movement(movement_id: int, item_id: int, supplier_id: int, move
             conn.commit()
             logging.info("成功更新庫存移動記錄: MovementID = %d", movement_id)
 
-def delete_stock_movement(movement_id: int):
+def delete_stock_movement(movement_id: int, conn: sqlite3.Connection = None):
     """刪除庫存移動記錄"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM StockMovement WHERE MovementID = ?", (movement_id,))
         if cursor.rowcount == 0:
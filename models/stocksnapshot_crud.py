@@ -0,0 +1,145 @@
+import sqlite3
+import logging
+import calendar
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Union
+from models.erp_database_schema import SNAPSHOT_ZERO, get_connection
+from models.records import fetch_all
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# 快照保存某日結束時的庫存（見 erp_database_schema.STOCK_SNAPSHOT_SCHEMA）。
+# 任一日期的庫存 = 該日之前最近一次快照 + 快照日之後到該日為止的異動，
+# 異動以 idx_stockmovement_date 依日期範圍讀取，查詢成本與帳本總長度無關。
+# 沒有快照時基準日為 ''，即從第一筆異動開始累加。
+# 補登、修改、刪除快照日以前的異動時，觸發器依差額調整之後各快照中受影響的鍵（版本 18）。
+# 快照與查詢結果都不包含數量為零的鍵。
+
+_BALANCE_AS_OF = f'''
+    SELECT ItemID, SupplierID, WarehouseID, BatchNo, SUM(Quantity) AS Quantity
+    FROM (
+        SELECT ItemID, SupplierID, WarehouseID, BatchNo, Quantity
+        FROM StockSnapshot
+        WHERE SnapshotDate = :base {{item_filter}}
+        UNION ALL
+        SELECT ItemID, IFNULL(SupplierID, 0), IFNULL(WarehouseID, 0), IFNULL(BatchNo, ''),
+               CASE MovementType WHEN 'IN' THEN Quantity WHEN 'OUT' THEN -Quantity ELSE 0 END
+        FROM StockMovement
+        WHERE MovementDate > :base AND MovementDate <= :as_of {{item_filter}}
+    )
+    GROUP BY ItemID, SupplierID, WarehouseID, BatchNo
+    HAVING ABS(SUM(Quantity)) >= {SNAPSHOT_ZERO}
+'''
+
+def _as_text(value: Union[str, date]) -> str:
+    return value.isoformat() if isinstance(value, date) else value
+
+def _base_snapshot(conn: sqlite3.Connection, as_of: str, inclusive: bool = True) -> str:
+    """as_of 當天（inclusive=False 時為之前）或之前最近一次快照的日期，沒有則為 ''"""
+    operator = "<=" if inclusive else "<"
+    row = conn.execute(f"SELECT MAX(SnapshotDate) FROM StockSnapshotHeader WHERE SnapshotDate {operator} ?",
+                       (as_of,)).fetchone()
+    return row[0] or ""
+
+def get_snapshot_dates(conn: sqlite3.Connection = None) -> List[str]:
+    """已建立的快照日期（由舊到新）"""
+    with get_connection(conn) as conn:
+        return [row[0] for row in conn.execute("SELECT SnapshotDate FROM StockSnapshotHeader ORDER BY SnapshotDate")]
+
+def create_stock_snapshot(snapshot_date: Union[str, date], conn: sqlite3.Connection = None) -> int:
+    """
+    建立（或重建）snapshot_date 當天結束時的庫存快照，回傳快照筆數。
+    以前一次快照加上其後的異動累加，不需重新掃描整份帳本。
+    """
+    snapshot_date = _as_text(snapshot_date)
+    with get_connection(conn) as conn:
+        base = _base_snapshot(conn, snapshot_date, inclusive=False)
+        conn.execute("DELETE FROM StockSnapshot WHERE SnapshotDate = ?", (snapshot_date,))
+        conn.execute("INSERT OR REPLACE INTO StockSnapshotHeader (SnapshotDate) VALUES (?)", (snapshot_date,))
+        cursor = conn.execute(
+            "INSERT INTO StockSnapshot (SnapshotDate, ItemID, SupplierID, WarehouseID, BatchNo, Quantity) "
+            "SELECT :as_of, * FROM (" + _BALANCE_AS_OF.format(item_filter="") + ")",
+            {"base": base, "as_of": snapshot_date})
+        conn.commit()
+        logging.info("已建立庫存快照 %s：%d 筆（基準 %s）", snapshot_date, cursor.rowcount, base or "無")
+        return cursor.rowcount
+
+def _period_ends(start: date, until: date, interval: Union[str, int]) -> List[date]:
+    """start 到 until（含）之間的結算日：interval 為 "month" 時取每月月底，整數則為每隔幾天"""
+    ends = []
+    if interval == "month":
+        year, month = start.year, start.month
+        while True:
+            end = date(year, month, calendar.monthrange(year, month)[1])
+            if end > until:
+                break
+            ends.append(end)
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    else:
+        if interval <= 0:
+            raise ValueError("快照間隔天數必須大於 0")
+        end = start + timedelta(days=interval - 1)
+        while end <= until:
+            ends.append(end)
+            end += timedelta(days=interval)
+    return ends
+
+def create_periodic_snapshots(interval: Union[str, int] = "month", until: Union[str, date, None] = None,
+                              conn: sqlite3.Connection = None) -> List[str]:
+    """
+    從第一筆異動開始，依 interval（"month" 或天數）補建缺少的快照，回傳新建立的快照日期。
+    until 預設為昨天（當天仍可能有異動）；可由排程定期執行，已存在的快照不會重建。
+    """
+    until = date.fromisoformat(_as_text(until)) if until else date.today() - timedelta(days=1)
+    with get_connection(conn) as conn:
+        first = conn.execute("SELECT MIN(MovementDate) FROM StockMovement").fetchone()[0]
+        if first is None:
+            return []
+        existing = set(get_snapshot_dates(conn))
+        created = []
+        for end in _period_ends(date.fromisoformat(first[:10]), until, interval):
+            if end.isoformat() not in existing:
+                create_stock_snapshot(end, conn)
+                created.append(end.isoformat())
+        return created
+
+def get_stock_as_of(as_of: Union[str, date], item_id: Optional[int] = None,
+                    conn: sqlite3.Connection = None) -> List[Dict]:
+    """
+    取得 as_of 當天結束時各 (ItemID, SupplierID, WarehouseID, BatchNo) 的庫存，
+    格式同 stockbalance_crud.get_stock_balances（未指定的欄位為 NULL），數量為零的鍵不列出
+    """
+    as_of = _as_text(as_of)
+    params = {"as_of": as_of}
+    item_filter = ""
+    if item_id is not None:
+        item_filter = "AND ItemID = :item_id"
+        params["item_id"] = item_id
+    query = f'''
+        SELECT ItemID, NULLIF(SupplierID, 0) AS SupplierID, NULLIF(WarehouseID, 0) AS WarehouseID,
+               NULLIF(BatchNo, '') AS BatchNo, Quantity
+        FROM ({_BALANCE_AS_OF.format(item_filter=item_filter)})
+        ORDER BY ItemID, SupplierID, WarehouseID, BatchNo
+    '''
+    with get_connection(conn) as conn:
+        params["base"] = _base_snapshot(conn, as_of)
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return fetch_all(cursor)
+
+def delete_stock_snapshots(before: Union[str, date, None] = None, conn: sqlite3.Connection = None) -> int:
+    """刪除 before 之前（未指定則全部）的快照，回傳刪除的快照數"""
+    condition, params = "", ()
+    if before is not None:
+        condition, params = " WHERE SnapshotDate < ?", (_as_text(before),)
+    with get_connection(conn) as conn:
+        conn.execute("DELETE FROM StockSnapshot" + condition, params)
+        cursor = conn.execute("DELETE FROM StockSnapshotHeader" + condition, params)
+        conn.commit()
+        return cursor.rowcount
+
+if __name__ == "__main__":
+    # 排程用：python -m models.stocksnapshot_crud [間隔天數]，未指定時每月月底建立一次
+    import sys
+    created = create_periodic_snapshots(int(sys.argv[1]) if len(sys.argv) > 1 else "month")
+    print("新建立的快照:", created)
@@ -1,22 +1,25 @@
 import sqlite3
 import re
 from contextlib import contextmanager
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional
 import logging
 from models.erp_database_schema import get_connection, create_tables
+from models.records import DEFAULT_ARRAYSIZE, fetch_all, fetch_one, iter_records
+from models.pagination import Keyset, apply_keyset
+from models.search_crud import match_condition
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 # === CRUD Functions for Supplier ===
 
-def add_supplier(supplier_name: str, address: Optional[str] = None, contact_person: Optional[str] = None, phone: Optional[str] = None, email: Optional[str] = None, website: Optional[str] = None, tax_id: Optional[str] = None):
+def add_supplier(supplier_name: str, address: Optional[str] = None, contact_person: Optional[str] = None, phone: Optional[str] = None, email: Optional[str] = None, website: Optional[str] = None, tax_id: Optional[str] = None, conn: sqlite3.Connection = None):
     """新增供應商記錄，允許 Email 欄位為空白"""
     if email:  # 只有當 Email 不為空時才進行驗證
         if not re.match(r"[^@]+@[^@]+\.[^@]+", email):
             logging.warning("無效的 Email 格式: %s", email)
             return False  # Email 格式錯誤時 return False
 
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute('''
@@ -34,41 +37,51 @@ def add_supplier(supplier_name: str, address: Optional[str] = None, contact_pers
             logging.error("資料庫操作失敗: %s", e)
             raise RuntimeError("供應商記錄插入失敗")
     
-def get_suppliers(search_text: Optional[str] = None,) -> List[Dict]:
+SUPPLIER_KEYSET = Keyset("SupplierID", {"SupplierName": "SupplierName", "TaxID": "TaxID",
+                                         "ContactPerson": "ContactPerson", "Phone": "Phone"},
+                         nullable=("TaxID", "ContactPerson", "Phone"))
+
+def iter_suppliers(search_text: Optional[str] = None, after_key=None, limit: Optional[int] = None,
+                   order_by: Optional[str] = None, arraysize: int = DEFAULT_ARRAYSIZE, chunked: bool = False,
+                   conn: sqlite3.Connection = None) -> Iterator:
+    """逐批讀取供應商資料；after_key/limit/order_by 為 keyset 分頁參數（見 models.pagination）"""
     query = "SELECT SupplierID, SupplierName, ContactPerson, Phone, Address,TaxID, Email ,Website FROM Supplier"
-    params = []
+    conditions, params = [], []
 
-    if search_text:
-        query += " WHERE SupplierName LIKE ? OR Phone LIKE ?"
-        search_pattern = f"%{search_text}%"
-        params.extend([search_pattern, search_pattern])
+    with get_connection(conn) as conn:
+        if search_text:
+            condition, search_params = match_condition("suppliers", search_text, ("SupplierName", "Phone"), conn=conn)
+            conditions.append(condition)
+            params.extend(search_params)
 
-    query += " ORDER BY SupplierID"
+        query, params = apply_keyset(query, conditions, params, SUPPLIER_KEYSET, order_by, after_key, limit)
 
-    with get_connection() as conn:
         cursor = conn.cursor()
-        try:
-            cursor.execute(query, params)
-            columns = [col[0] for col in cursor.description]
-            return [dict(zip(columns, row)) for row in cursor.fetchall()]
-        except sqlite3.Error as e:
-            print(f"數據庫查詢錯誤: {e}")
-            return []
-
-def get_supplier_by_id(supplier_id: int) -> Optional[Dict]:
+        cursor.arraysize = arraysize
+        cursor.execute(query, params)
+        yield from iter_records(cursor, chunked)
+
+def get_suppliers(search_text: Optional[str] = None, after_key=None, limit: Optional[int] = None,
+                  order_by: Optional[str] = None, conn: sqlite3.Connection = None) -> List[Dict]:
+    try:
+        return list(iter_suppliers(search_text, after_key, limit, order_by, conn=conn))
+    except sqlite3.Error as e:
+        print(f"數據庫查詢錯誤: {e}")
+        return []
+
+def get_supplier_by_id(supplier_id: int, conn: sqlite3.Connection = None) -> Optional[Dict]:
     """依 SupplierID 查詢供應商記錄"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM Supplier WHERE SupplierID = ?", (supplier_id,))
-        columns = [col[0] for col in cursor.description]
-        row = cursor.fetchone()
+        row = fetch_one(cursor)
         if row:
-            return dict(zip(columns, row))
+            return row
         else:
             logging.warning("查無供應商記錄: SupplierID = %d", supplier_id)
             return None
 
-def update_supplier(supplier_id: int, **kwargs):
+def update_supplier(supplier_id: int, conn: sqlite3.Connection = None, **kwargs):
     """更新供應商記錄，允許安全更新"""
     allowed_fields = {
         "supplier_name": "SupplierName",
@@ -94,7 +107,7 @@ def update_supplier(supplier_id: int, **kwargs):
     query = f"UPDATE Supplier SET {', '.join(fields)} WHERE SupplierID = ?"
     values.append(supplier_id)
 
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute(query, tuple(values))
         if cursor.rowcount == 0:
@@ -103,8 +116,8 @@ def update_supplier(supplier_id: int, **kwargs):
             conn.commit()
             logging.info("成功更新供應商: SupplierID = %d", supplier_id)
 
-def delete_supplier(supplier_id: int):
-    with get_connection() as conn:
+def delete_supplier(supplier_id: int, conn: sqlite3.Connection = None):
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
 
         # ✅ 修正表名，查詢 `PurchaseOrderHeader` 是否仍有該供應商的訂單
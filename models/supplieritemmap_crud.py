@@ -1,8 +1,12 @@
 import sqlite3
 from contextlib import contextmanager
-from typing import List, Dict, Optional
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Tuple
 import logging
 from models.erp_database_schema import get_connection, create_tables
+from models.records import fetch_all, fetch_one
+from models.pagination import Keyset, apply_keyset
+from models.search_crud import match_condition
 from models.supplier_crud import add_supplier
 from models.pricehistory_crud import add_price_history_from_mapping  # 新增此行
 from datetime import datetime  # 新增此行
@@ -10,17 +14,16 @@ from datetime import datetime  # 新增此行
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-def get_items() -> List[Dict]:
+def get_items(conn: sqlite3.Connection = None) -> List[Dict]:
     """取得所有項目"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM ItemMaster")
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return fetch_all(cursor)
     
-def add_item(item_name: str, item_type: str, category: Optional[str], unit: Optional[str]):
+def add_item(item_name: str, item_type: str, category: Optional[str], unit: Optional[str], conn: sqlite3.Connection = None):
     """新增項目"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute('''
@@ -36,9 +39,9 @@ def add_item(item_name: str, item_type: str, category: Optional[str], unit: Opti
 
 # === CRUD Functions for SupplierItemMap ===
 
-def add_supplier_item_mapping(supplier_id: int, item_id: int, moq: Optional[int] = None, price: Optional[float] = None, lead_time: Optional[int] = None, safety_stock_level: Optional[float] = 0.0):
+def add_supplier_item_mapping(supplier_id: int, item_id: int, moq: Optional[int] = None, price: Optional[float] = None, lead_time: Optional[int] = None, safety_stock_level: Optional[float] = 0.0, conn: sqlite3.Connection = None):
     """新增供應商與項目關聯記錄，檢查外鍵是否存在"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
 
         # 檢查 SupplierID 是否存在
@@ -80,23 +83,41 @@ def add_supplier_item_mapping(supplier_id: int, item_id: int, moq: Optional[int]
             else:
                 raise
 
-def get_supplier_item_mappings() -> List[Dict]:
-    """取得所有供應商與項目關聯記錄"""
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
+SUPPLIER_ITEM_MAP_KEYSET = Keyset("MappingID", {"MappingID": "m.MappingID", "SupplierName": "s.SupplierName",
+                                                "ItemName": "i.ItemName", "MOQ": "m.MOQ", "Price": "m.Price",
+                                                "LeadTime": "m.LeadTime", "SafetyStockLevel": "m.SafetyStockLevel"},
+                                  nullable=("MOQ", "Price", "LeadTime", "SafetyStockLevel"))
+
+def get_supplier_item_mappings(search_text: Optional[str] = None, after_key=None, limit: Optional[int] = None,
+                               order_by: Optional[str] = None, conn: sqlite3.Connection = None) -> List[Dict]:
+    """
+    取得供應商與項目關聯記錄；search_text 比對供應商名稱或項目名稱（在 SQL 中篩選），
+    after_key/limit/order_by 為 keyset 分頁參數（見 models.pagination）
+    """
+    query = '''
             SELECT m.MappingID, m.SupplierID, s.SupplierName, m.ItemID, i.ItemName, 
                    m.MOQ, m.Price, m.LeadTime, m.SafetyStockLevel
             FROM SupplierItemMap m
             JOIN Supplier s ON m.SupplierID = s.SupplierID
             JOIN ItemMaster i ON m.ItemID = i.ItemID
-        ''')
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        '''
+    conditions, params = [], []
+    with get_connection(conn) as conn:
+        if search_text:
+            supplier_match, supplier_params = match_condition("suppliers", search_text, ("SupplierName",),
+                                                              key_expression="m.SupplierID", conn=conn)
+            item_match, item_params = match_condition("items", search_text, ("ItemName",),
+                                                      key_expression="m.ItemID", conn=conn)
+            conditions.append(f"({supplier_match}) OR ({item_match})")
+            params.extend(supplier_params + item_params)
+        query, params = apply_keyset(query, conditions, params, SUPPLIER_ITEM_MAP_KEYSET, order_by, after_key, limit)
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return fetch_all(cursor)
 
-def get_supplier_item_mapping_by_id(mapping_id: int) -> Optional[Dict]:
+def get_supplier_item_mapping_by_id(mapping_id: int, conn: sqlite3.Connection = None) -> Optional[Dict]:
     """依 MappingID 查詢單筆供應商與項目關聯記錄"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute('''
             SELECT m.MappingID, m.SupplierID, s.SupplierName, m.ItemID, i.ItemName, 
@@ -106,11 +127,9 @@ def get_supplier_item_mapping_by_id(mapping_id: int) -> Optional[Dict]:
             JOIN ItemMaster i ON m.ItemID = i.ItemID
             WHERE m.MappingID = ?
         ''', (mapping_id,))
-        columns = [col[0] for col in cursor.description]
-        row = cursor.fetchone()
-        return dict(zip(columns, row)) if row else None
+        return fetch_one(cursor)
 
-def update_supplier_item_mapping(mapping_id: int, **kwargs):
+def update_supplier_item_mapping(mapping_id: int, conn: sqlite3.Connection = None, **kwargs):
     """更新供應商與項目關聯記錄"""
     allowed_fields = {
         "supplier_id": "SupplierID",
@@ -134,7 +153,7 @@ def update_supplier_item_mapping(mapping_id: int, **kwargs):
     query = f"UPDATE SupplierItemMap SET {', '.join(fields)} WHERE MappingID = ?"
     values.append(mapping_id)
 
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         logging.info(f"正在更新記錄: MappingID={mapping_id}, 更新欄位={fields}, 值={values[:-1]}")
         cursor.execute(query, tuple(values))
@@ -153,9 +172,9 @@ def update_supplier_item_mapping(mapping_id: int, **kwargs):
         conn.commit()
         logging.info("成功更新供應商項目映射記錄: MappingID = %d", mapping_id)
 
-def delete_supplier_item_mapping(mapping_id: int) -> bool:
+def delete_supplier_item_mapping(mapping_id: int, conn: sqlite3.Connection = None) -> bool:
     """刪除指定的供應商與項目關聯記錄，並返回是否成功"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM SupplierItemMap WHERE MappingID = ?", (mapping_id,))
         if cursor.rowcount == 0:
@@ -165,9 +184,9 @@ def delete_supplier_item_mapping(mapping_id: int) -> bool:
         logging.info("已刪除供應商項目映射記錄: MappingID = %d", mapping_id)
         return True
     
-def get_safety_stock_level(item_id: int, supplier_id: int) -> float:
+def get_safety_stock_level(item_id: int, supplier_id: int, conn: sqlite3.Connection = None) -> float:
     """取得某個 Item 和 Supplier 的安全水位"""
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute('''
             SELECT SafetyStockLevel 
@@ -177,12 +196,12 @@ def get_safety_stock_level(item_id: int, supplier_id: int) -> float:
         result = cursor.fetchone()
         return result[0] if result else 0.0
     
-def get_latest_supplier_price(supplier_id: int, item_id: int):
+def get_latest_supplier_price(supplier_id: int, item_id: int, conn: sqlite3.Connection = None):
     """
     取得指定供應商與品項最新的價格（以每 kg 記錄），若找不到則回傳 None。
     此函式從 SupplierItemMap 表中根據 MappingID 由大到小排序，取最新的一筆價格。
     """
-    with get_connection() as conn:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute(
             """
@@ -199,6 +218,37 @@ def get_latest_supplier_price(supplier_id: int, item_id: int):
         else:
             return None
 
+# 每次查詢的 (SupplierID, ItemID) 組數，每組兩個參數
+PRICE_LOOKUP_BATCH_SIZE = 500
+
+def get_latest_supplier_prices(pairs: Iterable[Tuple[int, int]],
+                               conn: sqlite3.Connection = None) -> Dict[Tuple[int, int], Optional[float]]:
+    """
+    批次版的 get_latest_supplier_price：以 VALUES 清單與 SupplierItemMap 連結，一次取得多組
+    (SupplierID, ItemID) 的最新價格（每 kg），回傳 {(SupplierID, ItemID): Price}；沒有對應記錄的組合不在結果中。
+    每 PRICE_LOOKUP_BATCH_SIZE 組查詢一次，一般配方只需要一次查詢。
+    """
+    pending = iter(list(dict.fromkeys((supplier_id, item_id) for supplier_id, item_id in pairs)))
+    prices = {}
+    with get_connection(conn) as conn:
+        while True:
+            batch = list(islice(pending, PRICE_LOOKUP_BATCH_SIZE))
+            if not batch:
+                break
+            values = ", ".join("(?, ?)" for _ in batch)
+            cursor = conn.execute(f"""
+                WITH wanted(SupplierID, ItemID) AS (VALUES {values})
+                SELECT w.SupplierID, w.ItemID,
+                       (SELECT m.Price FROM SupplierItemMap m
+                        WHERE m.SupplierID = w.SupplierID AND m.ItemID = w.ItemID
+                        ORDER BY m.MappingID DESC LIMIT 1) AS Price
+                FROM wanted w
+                WHERE EXISTS (SELECT 1 FROM SupplierItemMap m WHERE m.SupplierID = w.SupplierID AND m.ItemID = w.ItemID)
+            """, [value for pair in batch for value in pair])
+            for supplier_id, item_id, price in cursor.fetchall():
+                prices[(supplier_id, item_id)] = price
+    return prices
+
 
 
 # === 測試範例 ===
@@ -0,0 +1,101 @@
+import logging
+import sqlite3
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+
+class Session:
+    """
+    工作單元內 CRUD 函式拿到的連線代理。
+    commit() 不立即提交，延後到工作單元結束；rollback() 只回滾本次呼叫（savepoint）的變更。
+    其餘屬性與方法皆轉交給實際的 sqlite3.Connection。
+    """
+    __slots__ = ("_unit", "_savepoint")
+
+    def __init__(self, unit: "UnitOfWork", savepoint: Optional[str] = None):
+        object.__setattr__(self, "_unit", unit)
+        object.__setattr__(self, "_savepoint", savepoint)
+
+    @property
+    def unit(self) -> "UnitOfWork":
+        return self._unit
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        if self._savepoint is None:
+            self._unit.conn.rollback()
+        else:
+            self._unit.conn.execute(f"ROLLBACK TO {self._savepoint}")
+        self._unit.run_after_rollback()
+
+    def __getattr__(self, name):
+        return getattr(self._unit.conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._unit.conn, name, value)
+
+
+class UnitOfWork:
+    """一個執行緒上跨多個 CRUD 呼叫的交易；每個 CRUD 呼叫各自在一個 savepoint 內執行"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self._counter = 0
+        self._after_commit: List[Callable[[], None]] = []
+        self._after_rollback: List[Callable[[], None]] = []
+
+    @contextmanager
+    def scope(self):
+        """開啟一個 savepoint，例外時回滾到此處，正常結束則併入外層交易"""
+        self._counter += 1
+        name = f"uow_{self._counter}"
+        self.conn.execute(f"SAVEPOINT {name}")
+        try:
+            yield Session(self, name)
+        except BaseException:
+            self._rollback_to(name)
+            self.run_after_rollback()
+            raise
+        else:
+            self._release(name)
+
+    def _rollback_to(self, name: str):
+        try:
+            self.conn.execute(f"ROLLBACK TO {name}")
+            self.conn.execute(f"RELEASE {name}")
+        except sqlite3.OperationalError:
+            # 外層 savepoint 已先結束（例如逐批讀取的 generator 晚於呼叫端結束）
+            pass
+
+    def _release(self, name: str):
+        try:
+            self.conn.execute(f"RELEASE {name}")
+        except sqlite3.OperationalError:
+            pass
+
+    def after_commit(self, callback: Callable[[], None]):
+        """登記交易提交後才執行的動作（例如通知 UI 或清除快取），回滾時不執行"""
+        self._after_commit.append(callback)
+
+    def run_after_commit(self):
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                logging.exception("交易提交後的回呼執行失敗")
+
+    def after_rollback(self, callback: Callable[[], None]):
+        """登記交易或 savepoint 回滾後執行的動作（例如清除依未提交資料建立的快取），同一動作只登記一次"""
+        if callback not in self._after_rollback:
+            self._after_rollback.append(callback)
+
+    def run_after_rollback(self):
+        callbacks, self._after_rollback = self._after_rollback, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                logging.exception("交易回滾後的回呼執行失敗")
@@ -0,0 +1,139 @@
+import sqlite3
+from typing import Dict, Iterable, List, Mapping, Optional
+import numpy as np
+from models.erp_database_schema import get_connection
+from models.bom_explosion import explode_boms
+from models.records import fetch_all
+
+# === What-if 成本試算 ===
+# 將所有 BOM 多階展開到原料，整理成稀疏矩陣（BOM × 原料，COO 格式）：
+#   quantity[k]：第 rows[k] 個 BOM 需要第 cols[k] 種原料的量
+#   cost[k]：    同一格目前的成本（用量 × 明細單價，單價與 BOMCost 相同；同一原料在多條明細上的單價可能不同）
+# 情境只改變原料價格，新成本 = Σ cost × 漲跌倍率 + Σ quantity × 指定單價，以 np.bincount 一次算完所有 BOM。
+# 試算完全在記憶體中進行，不寫入資料庫。
+
+
+class WhatIfResult:
+    """一次情境試算的結果，各陣列與 CostModel.bom_ids 依序對應"""
+
+    def __init__(self, model: "CostModel", new_cost: np.ndarray):
+        self.model = model
+        self.base_cost = model.base_cost
+        self.new_cost = new_cost
+        self.delta = new_cost - model.base_cost
+
+    @property
+    def delta_pct(self) -> np.ndarray:
+        """成本變動百分比；目前成本為 0 的 BOM 為 NaN"""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(self.base_cost != 0, self.delta / self.base_cost * 100.0, np.nan)
+
+    def to_rows(self, changed_only: bool = False) -> List[Dict]:
+        """轉為資料列（BOMID、ProductID、ProductName、Version、BaseCost、NewCost、Delta、DeltaPct），依變動金額由大到小"""
+        order = np.argsort(-np.abs(self.delta), kind="stable")
+        if changed_only:
+            order = order[self.delta[order] != 0]
+        delta_pct = self.delta_pct
+        rows = []
+        for i in order:
+            info = self.model.products[i]
+            rows.append({"BOMID": int(self.model.bom_ids[i]), "ProductID": info["ProductID"],
+                         "ProductName": info["ProductName"], "Version": info["Version"],
+                         "BaseCost": float(self.base_cost[i]), "NewCost": float(self.new_cost[i]),
+                         "Delta": float(self.delta[i]),
+                         "DeltaPct": None if np.isnan(delta_pct[i]) else float(delta_pct[i])})
+        return rows
+
+
+class CostModel:
+    """BOM × 原料的用量與成本矩陣；以 load() 從資料庫建立後可重複套用不同價格情境"""
+
+    def __init__(self, bom_ids: np.ndarray, components: np.ndarray, rows: np.ndarray, cols: np.ndarray,
+                 quantity: np.ndarray, cost: np.ndarray, products: List[Dict]):
+        self.bom_ids = bom_ids
+        self.components = components
+        self.rows = rows
+        self.cols = cols
+        self.quantity = quantity
+        self.cost = cost
+        self.products = products
+        self._component_index = {int(item_id): i for i, item_id in enumerate(components)}
+        self.base_cost = self._sum_by_bom(cost)
+
+    @classmethod
+    def load(cls, bom_ids: Optional[Iterable[int]] = None, as_of: Optional[str] = None,
+             conn: sqlite3.Connection = None) -> "CostModel":
+        """展開 bom_ids（預設為全部 BOM）並建立矩陣；無法展開（循環）的 BOM 會被略過"""
+        with get_connection(conn) as conn:
+            cursor = conn.execute('''
+                SELECT h.BOMID, h.ProductID, IFNULL(i.ItemName, '') AS ProductName, h.Version
+                FROM BOMHeader h LEFT JOIN ItemMaster i ON i.ItemID = h.ProductID
+                ORDER BY h.BOMID
+            ''')
+            headers = {row["BOMID"]: row for row in fetch_all(cursor)}
+            if bom_ids is not None:
+                headers = {bom_id: headers[bom_id] for bom_id in dict.fromkeys(bom_ids) if bom_id in headers}
+            explosions = explode_boms(headers, as_of, skip_invalid=True, conn=conn)
+
+        cells: Dict[tuple, List[float]] = {}     # (BOM 列號, ItemID) -> [用量, 成本]
+        products = []
+        for row_index, explosion in enumerate(explosions.values()):
+            header = headers[explosion.bom_id]
+            products.append({"ProductID": header["ProductID"], "ProductName": header["ProductName"],
+                             "Version": header["Version"]})
+            for line in explosion.lines:
+                if line.sub_bom_id is not None:
+                    continue
+                cell = cells.setdefault((row_index, line.component_item_id), [0.0, 0.0])
+                cell[0] += line.quantity
+                cell[1] += line.quantity * (line.price or 0.0)
+
+        components = np.array(sorted({item_id for _, item_id in cells}), dtype=np.int64)
+        component_index = {int(item_id): i for i, item_id in enumerate(components)}
+        keys = list(cells)
+        values = np.array([cells[key] for key in keys], dtype=np.float64).reshape(-1, 2)
+        return cls(
+            bom_ids=np.fromiter(explosions, dtype=np.int64, count=len(explosions)),
+            components=components,
+            rows=np.fromiter((key[0] for key in keys), dtype=np.int64, count=len(keys)),
+            cols=np.fromiter((component_index[key[1]] for key in keys), dtype=np.int64, count=len(keys)),
+            quantity=values[:, 0],
+            cost=values[:, 1],
+            products=products,
+        )
+
+    def _sum_by_bom(self, values: np.ndarray) -> np.ndarray:
+        return np.bincount(self.rows, weights=values, minlength=len(self.bom_ids))
+
+    def evaluate(self, price_changes: Optional[Mapping[int, float]] = None,
+                 prices: Optional[Mapping[int, float]] = None) -> WhatIfResult:
+        """
+        套用價格情境：price_changes 為 原料 ItemID -> 漲跌比例（0.12 表示漲 12%，-0.05 表示跌 5%），
+        prices 為 原料 ItemID -> 新單價（每 g，所有明細統一改用此價格，優先於 price_changes）。
+        不在矩陣中的原料（沒有 BOM 用到）會被忽略。
+        """
+        factor = np.ones(len(self.components))
+        override = np.zeros(len(self.components))
+        overridden = np.zeros(len(self.components), dtype=bool)
+        for item_id, change in (price_changes or {}).items():
+            index = self._component_index.get(item_id)
+            if index is not None:
+                factor[index] = 1.0 + change
+        for item_id, price in (prices or {}).items():
+            index = self._component_index.get(item_id)
+            if index is not None:
+                factor[index] = 0.0
+                override[index] = price
+                overridden[index] = True
+
+        weights = self.cost * factor[self.cols]
+        if overridden.any():
+            weights += self.quantity * override[self.cols]
+        return WhatIfResult(self, self._sum_by_bom(weights))
+
+
+def what_if(price_changes: Optional[Mapping[int, float]] = None, prices: Optional[Mapping[int, float]] = None,
+            bom_ids: Optional[Iterable[int]] = None, as_of: Optional[str] = None,
+            conn: sqlite3.Connection = None) -> WhatIfResult:
+    """建立 CostModel 並套用單一情境；要比較多個情境時請直接重複使用 CostModel.evaluate()"""
+    return CostModel.load(bom_ids, as_of, conn).evaluate(price_changes, prices)
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# 設定專案根目錄
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from models import erp_database_schema
+
+
+@pytest.fixture
+def erp_db(tmp_path, monkeypatch):
+    """使用暫存資料庫執行測試，結束後關閉連線池"""
+    monkeypatch.setattr(erp_database_schema, "DB_NAME", str(tmp_path / "erp_test.db"))
+    erp_database_schema.close_connections()
+    erp_database_schema.create_tables()
+    yield erp_database_schema.DB_NAME
+    erp_database_schema.close_connections()
@@ -0,0 +1,137 @@
+import pytest
+
+from models.erp_database_schema import get_connection
+from models.itemmaster_crud import add_item
+from models.supplier_crud import add_supplier
+from models.supplieritemmap_crud import (add_supplier_item_mapping, update_supplier_item_mapping,
+                                         delete_supplier_item_mapping)
+from models.bomheader_crud import add_bom_header, update_bom_header, delete_bom_header, get_bom_cost_summary
+from models.bomdetail_crud import add_bom_detail, update_bom_detail, delete_bom_detail, get_bom_details
+from models.bomcost_crud import get_bom_cost, get_bom_costs, rebuild_bom_costs
+from models.bom_explosion import clear_explosion_cache, explode_bom
+from models.what_if import what_if
+
+
+@pytest.fixture
+def bom(erp_db):
+    add_item("成品A", "成品", None, "g")
+    add_item("原料A", "原料", None, "g")
+    add_item("原料B", "原料", None, "g")
+    add_supplier("供應商A")
+    add_supplier_item_mapping(1, 2, price=100.0)
+    bom_id = add_bom_header(1, "V1", "2025-01-01", 200.0)
+    add_bom_detail(bom_id, 2, 50, "%", supplier_id=1, price=0.1)
+    add_bom_detail(bom_id, 3, 10, "g", price=0.5)
+    return bom_id
+
+
+def test_cost_follows_detail_changes(bom):
+    cost = get_bom_cost(bom)
+    assert cost["TotalCost"] == pytest.approx(200 * 0.5 * 0.1 + 10 * 0.5)
+    assert cost["CostPerGram"] == pytest.approx(15.0 / 200)
+
+    update_bom_detail(2, quantity=20)
+    assert get_bom_cost(bom)["TotalCost"] == pytest.approx(20.0)
+    delete_bom_detail(2)
+    assert get_bom_cost(bom)["TotalCost"] == pytest.approx(10.0)
+
+
+def test_cost_follows_weight_and_supplier_price(bom):
+    update_bom_header(bom, new_product_weight=400.0)
+    assert get_bom_cost(bom)["TotalCost"] == pytest.approx(400 * 0.5 * 0.1 + 5.0)
+    # 供應商價格以每 kg 記錄，成本換算為每 g 單價計算
+    update_supplier_item_mapping(1, price=300.0)
+    assert get_bom_cost(bom)["TotalCost"] == pytest.approx(400 * 0.5 * 0.3 + 5.0)
+    assert get_bom_cost_summary()[0]["TotalPrice"] == pytest.approx(65.0)
+
+    update_bom_header(bom, new_product_weight=None)
+    assert get_bom_cost(bom)["CostPerGram"] is None
+
+
+def test_supplier_price_change_leaves_bom_details_alone(bom):
+    old_bom = add_bom_header(1, "V0", "2024-01-01", 100.0)
+    add_bom_detail(old_bom, 2, 10, "g", supplier_id=1, price=0.05)     # 歷史版本自行記錄的單價
+    with get_connection() as conn:
+        revision = conn.execute("SELECT Revision FROM BOMRevision").fetchone()[0]
+
+    update_supplier_item_mapping(1, price=300.0)
+    assert [d["Price"] for d in get_bom_details(old_bom)] == [0.05]
+    assert get_bom_cost(old_bom)["TotalCost"] == pytest.approx(10 * 0.3)
+    assert get_bom_cost(bom)["TotalCost"] == pytest.approx(200 * 0.5 * 0.3 + 5.0)
+    # 明細不改寫，只記錄引用此供應商價格的 BOM 有變更（展開快取據此失效）
+    with get_connection() as conn:
+        assert conn.execute("SELECT Revision FROM BOMRevision").fetchone()[0] == revision + 1
+        assert conn.execute("SELECT BOMID, ProductID FROM BOMChange WHERE Revision > ? ORDER BY BOMID",
+                            (revision,)).fetchall() == [(bom, 0), (old_bom, 0)]
+
+    # 供應商不再供應時退回明細自己的單價
+    delete_supplier_item_mapping(1)
+    assert get_bom_cost(old_bom)["TotalCost"] == pytest.approx(10 * 0.05)
+    assert get_bom_cost(bom)["TotalCost"] == pytest.approx(200 * 0.5 * 0.1 + 5.0)
+
+
+def test_cost_paths_agree_on_supplier_price(erp_db):
+    clear_explosion_cache()
+    add_item("成品A", "成品", None, "g")
+    add_item("原料A", "原料", None, "g")
+    add_supplier("供應商A")
+    add_supplier_item_mapping(1, 2, price=50.0)
+    bom_id = add_bom_header(1, "V1", "2025-01-01", 100.0)
+    add_bom_detail(bom_id, 2, 50, "%", supplier_id=1, price=0.05)
+
+    def totals():
+        return (get_bom_cost_summary()[0]["TotalPrice"], explode_bom(bom_id, "2025-06-01").total_cost,
+                float(what_if(as_of="2025-06-01").base_cost[0]))
+
+    assert totals() == pytest.approx((2.5, 2.5, 2.5))
+    update_supplier_item_mapping(1, price=100.0)
+    assert totals() == pytest.approx((5.0, 5.0, 5.0))
+    delete_supplier_item_mapping(1)
+    assert totals() == pytest.approx((2.5, 2.5, 2.5))
+
+
+def test_rebuild_matches_trigger_maintained_costs(bom):
+    maintained = [(c["BOMID"], c["TotalCost"], c["CostPerGram"]) for c in get_bom_costs()]
+    with get_connection() as conn:
+        conn.execute("UPDATE BOMCost SET TotalCost = 0")
+        conn.commit()
+    assert rebuild_bom_costs() == 1
+    assert [(c["BOMID"], c["TotalCost"], c["CostPerGram"]) for c in get_bom_costs([bom])] == maintained
+    assert get_bom_costs([]) == []
+
+
+def test_deleting_bom_removes_cost(bom):
+    delete_bom_detail(1)
+    delete_bom_detail(2)
+    delete_bom_header(bom)
+    assert get_bom_cost(bom) is None
+
+
+def test_bom_cost_summary_rolls_up_in_one_query(erp_db):
+    add_item("成品A", "成品", None, "g")
+    add_item("原料A", "原料", None, "g")
+    add_item("原料B", "原料", None, "g")
+    add_bom_header(1, "V1", "2025-01-01", 200.0, remarks="試產")
+    add_bom_header(1, "V2", "2025-01-01", None)
+    add_bom_header(1, "V3", "2025-01-01", 50.0)
+    # 百分比明細依產品重量換算，其他單位直接以數量計算
+    add_bom_detail(1, 2, 25, "%", price=0.1)
+    add_bom_detail(1, 3, 10, "g", price=0.5)
+    add_bom_detail(2, 2, 50, "%", price=0.1)
+    add_bom_detail(2, 3, 4, "g", price=2.0)
+
+    with get_connection() as conn:
+        statements = []
+        conn.set_trace_callback(statements.append)
+        try:
+            rows = get_bom_cost_summary(conn=conn)
+        finally:
+            conn.set_trace_callback(None)
+    assert len(statements) == 1
+    assert [(r["BOMID"], r["ProductName"], r["ProductWeight"], r["TotalPrice"], r["Remarks"]) for r in rows] == [
+        (1, "成品A", 200.0, 200.0 * 0.25 * 0.1 + 10 * 0.5, "試產"),
+        (2, "成品A", 0.0, 8.0, None),
+        (3, "成品A", 50.0, 0.0, None),
+    ]
+    assert [r["BOMID"] for r in get_bom_cost_summary("試產")] == [1]
+    assert [r["BOMID"] for r in get_bom_cost_summary(order_by="ProductWeight", limit=2)] == [3, 1]
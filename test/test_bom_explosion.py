@@ -0,0 +1,190 @@
+import time
+
+import pytest
+
+from models.erp_database_schema import get_connection, unit_of_work
+from models.itemmaster_crud import add_item
+from models.bomheader_crud import add_bom_header
+from models.bomdetail_crud import add_bom_detail, update_bom_detail
+from models.supplier_crud import add_supplier
+from models.bomcost_crud import get_bom_cost
+from models.bom_explosion import (BOMCycleError, _WHERE_USED_QUERY, affected_products, clear_explosion_cache,
+                                  explode_bom, explode_boms, where_used)
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    clear_explosion_cache()
+    yield
+    clear_explosion_cache()
+
+
+def seed_three_levels():
+    for name, kind in [("蛋糕", "成品"), ("奶油霜", "半成品"), ("糖粉", "原料"), ("奶油", "原料"), ("麵粉", "原料")]:
+        add_item(name, kind, None, "g")
+    cake = add_bom_header(1, "V1", "2025-01-01", 500.0)
+    add_bom_detail(cake, 5, 60, "%", price=0.02)        # 麵粉 300 g
+    add_bom_detail(cake, 2, 100, "g", price=1.0)        # 奶油霜 100 g（半成品，單價不計入）
+    frosting = add_bom_header(2, "V1", "2025-01-01", 200.0)
+    add_bom_detail(frosting, 3, 50, "%", price=0.05)    # 糖粉 100 g / 200 g
+    add_bom_detail(frosting, 4, 100, "g", price=0.3)    # 奶油 100 g / 200 g
+    return cake, frosting
+
+
+def test_explodes_sub_assemblies_to_raw_materials(erp_db):
+    cake, frosting = seed_three_levels()
+    explosion = explode_bom(cake, "2025-06-01")
+    assert explosion.depth == 2
+    assert explosion.requirements == pytest.approx({5: 300.0, 3: 50.0, 4: 50.0})
+    assert explosion.total_cost == pytest.approx(300 * 0.02 + 50 * 0.05 + 50 * 0.3)
+    assert [(line.level, line.component_item_id, line.sub_bom_id) for line in explosion.lines] == [
+        (1, 2, frosting), (1, 5, None), (2, 3, None), (2, 4, None)]
+    # 單階 BOM 與 BOMCost 一致
+    assert explode_bom(frosting).total_cost == pytest.approx(get_bom_cost(frosting)["TotalCost"])
+
+
+def test_sub_assembly_version_follows_as_of_date(erp_db):
+    cake, frosting = seed_three_levels()
+    newer = add_bom_header(2, "V2", "2025-07-01", 100.0)
+    add_bom_detail(newer, 4, 100, "g", price=0.3)
+    assert explode_bom(cake, "2025-06-01").requirements[4] == pytest.approx(50.0)
+    assert explode_bom(cake, "2025-07-01").requirements == pytest.approx({5: 300.0, 4: 100.0})
+
+
+def test_cache_is_invalidated_by_bom_changes(erp_db):
+    cake, frosting = seed_three_levels()
+    first = explode_bom(cake, "2025-06-01")
+    assert explode_bom(cake, "2025-06-01") is first
+    update_bom_detail(4, quantity=200)
+    assert explode_bom(cake, "2025-06-01").requirements[4] == pytest.approx(100.0)
+
+
+def test_cache_is_keyed_by_database(erp_db, tmp_path, monkeypatch):
+    from models import erp_database_schema
+
+    seed_three_levels()
+    update_bom_detail(4, quantity=200)
+    assert explode_bom(1, "2025-06-01").requirements[4] == pytest.approx(100.0)
+
+    # 另一個資料庫的 BOMRevision 恰好相同，不可沿用前一個資料庫的展開結果
+    monkeypatch.setattr(erp_database_schema, "DB_NAME", str(tmp_path / "other.db"))
+    erp_database_schema.close_connections()
+    erp_database_schema.create_tables()
+    seed_three_levels()
+    update_bom_detail(4, quantity=300)
+    assert explode_bom(1, "2025-06-01").requirements[4] == pytest.approx(150.0)
+
+
+def test_cache_drops_explosions_of_rolled_back_changes(erp_db):
+    cake, frosting = seed_three_levels()
+    explode_bom(cake, "2025-06-01")
+    with pytest.raises(RuntimeError):
+        with unit_of_work():
+            update_bom_detail(4, quantity=200)
+            assert explode_bom(cake, "2025-06-01").requirements[4] == pytest.approx(100.0)
+            raise RuntimeError("中斷")
+    update_bom_detail(3, quantity=50)       # 其他寫入使 BOMRevision 回到交易中的值
+    assert explode_bom(cake, "2025-06-01").requirements[4] == pytest.approx(50.0)
+
+
+def test_shared_sub_assembly_is_expanded_once(erp_db):
+    cake, frosting = seed_three_levels()
+    add_item("杯子蛋糕", "成品", None, "g")
+    cupcake = add_bom_header(6, "V1", "2025-01-01", 50.0)
+    add_bom_detail(cupcake, 2, 20, "g")         # 同樣用到奶油霜
+    explode_bom(cake, "2025-06-01")
+
+    with get_connection() as conn:
+        statements = []
+        conn.set_trace_callback(statements.append)
+        try:
+            explosion = explode_bom(cupcake, "2025-06-01", conn=conn)
+        finally:
+            conn.set_trace_callback(None)
+    # 只讀取杯子蛋糕自己的一階明細，奶油霜沿用快取的展開結果
+    assert sum("LEFT JOIN BOMDetail" in statement for statement in statements) == 1
+    assert explosion.requirements == pytest.approx({3: 10.0, 4: 10.0})
+    assert [(line.level, line.component_item_id, line.path) for line in explosion.lines] == [
+        (1, 2, (cupcake,)), (2, 3, (cupcake, frosting)), (2, 4, (cupcake, frosting))]
+
+
+def test_cache_keeps_explosions_of_unrelated_boms(erp_db):
+    cake, frosting = seed_three_levels()
+    add_item("餅乾", "成品", None, "g")
+    cookie = add_bom_header(6, "V1", "2025-01-01", 100.0)
+    add_bom_detail(cookie, 5, 80, "%", price=0.02)
+    first = explode_boms([cake, cookie], "2025-06-01")
+
+    update_bom_detail(1, quantity=50)            # 只改蛋糕
+    second = explode_boms([cake, cookie], "2025-06-01")
+    assert second[cookie] is first[cookie]
+    assert second[cake] is not first[cake] and second[cake].requirements[5] == pytest.approx(250.0)
+    assert explode_bom(frosting, "2025-06-01") is not None
+
+    # 半成品新增版本時，引用它的成品改用新版本重新展開
+    newer = add_bom_header(2, "V2", "2025-05-01", 100.0)
+    add_bom_detail(newer, 4, 100, "g", price=0.3)
+    third = explode_boms([cake, cookie], "2025-06-01")
+    assert third[cookie] is first[cookie]
+    assert third[cake].requirements == pytest.approx({5: 250.0, 4: 100.0})
+
+
+def test_cycles_are_reported(erp_db):
+    cake, frosting = seed_three_levels()
+    add_bom_detail(frosting, 1, 10, "g")      # 奶油霜又用到蛋糕
+    with pytest.raises(BOMCycleError) as excinfo:
+        explode_bom(cake, "2025-06-01")
+    assert excinfo.value.path == [cake, frosting, cake]
+
+
+def test_thousands_of_products_explode_quickly(erp_db):
+    with get_connection() as conn:
+        conn.executemany("INSERT INTO ItemMaster (ItemName, ItemType, Unit) VALUES (?, '原料', 'g')",
+                         [(f"原料{i}",) for i in range(50)])
+        conn.executemany("INSERT INTO ItemMaster (ItemName, ItemType, Unit) VALUES (?, '成品', 'g')",
+                         [(f"成品{i}",) for i in range(2000)])
+        conn.executemany("INSERT INTO BOMHeader (ProductID, Version, EffectiveDate, ProductWeight) "
+                         "VALUES (?, 'V1', '2025-01-01', 100)", [(51 + i,) for i in range(2000)])
+        # 每個成品用 3 種原料，並以上一個成品作為半成品（最深 5 階）
+        details = []
+        for i in range(2000):
+            details += [(i + 1, 1 + (i + k) % 50, 10.0, 0.01) for k in range(3)]
+            if i % 5:
+                details.append((i + 1, 51 + i - 1, 20.0, None))
+        conn.executemany("INSERT INTO BOMDetail (BOMID, ComponentItemID, Quantity, Unit, Price) "
+                         "VALUES (?, ?, ?, '%', ?)", details)
+        conn.commit()
+
+    started = time.perf_counter()
+    explosions = explode_boms(range(1, 2001), "2025-06-01")
+    elapsed = time.perf_counter() - started
+    assert len(explosions) == 2000
+    assert max(explosion.depth for explosion in explosions.values()) == 5
+    assert elapsed < 2.0
+    assert explode_boms(range(1, 2001), "2025-06-01")[5] is explosions[5]
+
+
+def test_where_used_walks_up_through_sub_assemblies(erp_db):
+    cake, frosting = seed_three_levels()
+    rows = where_used(3)        # 糖粉
+    assert [(row["Level"], row["BOMID"], row["ProductName"]) for row in rows] == [
+        (1, frosting, "奶油霜"), (2, cake, "蛋糕")]
+    assert [row["BOMID"] for row in where_used(3, direct_only=True)] == [frosting]
+    assert affected_products(3) == [2, 1]
+    assert where_used(3, as_of="2024-12-31") == []
+
+
+def test_where_used_by_supplier(erp_db):
+    cake, frosting = seed_three_levels()
+    add_supplier("供應商A")
+    add_bom_detail(cake, 4, 5, "g", supplier_id=1)
+    assert [row["BOMID"] for row in where_used(4, supplier_id=1)] == [cake]
+    assert [row["BOMID"] for row in where_used(4)] == [cake, frosting, cake]
+
+
+def test_where_used_seeks_component_index(erp_db):
+    query = _WHERE_USED_QUERY.format(seed_filter="", version_filter="", max_depth=5)
+    with get_connection() as conn:
+        plan = [row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + query, {"item_id": 1})]
+    assert sum("USING INDEX idx_bomdetail_component" in detail for detail in plan) == 2
+    assert not any(detail.startswith("SCAN d") for detail in plan)
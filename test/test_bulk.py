@@ -0,0 +1,79 @@
+import pytest
+
+from models.erp_database_schema import get_connection
+from models.itemmaster_crud import add_item, bulk_add_items, get_items
+from models.stockmovement_crud import bulk_add_stock_movements, get_stock_movements
+from models.bomheader_crud import add_bom_header
+from models.bomdetail_crud import bulk_add_bom_details, get_bom_details
+from models.customer_crud import add_customer
+from models.salesorderheader_crud import add_sales_order
+from models.salesorderdetail_crud import bulk_add_sales_order_details, get_sales_order_details
+from models.pricehistory_crud import bulk_add_price_history
+
+
+def test_bulk_add_stock_movements_single_commit(erp_db):
+    add_item("原料A", "原料", "食品添加物", "kg")
+    statements = []
+    with get_connection() as conn:
+        conn.set_trace_callback(statements.append)
+        result = bulk_add_stock_movements((1, None, "IN", i + 1, "2025-01-01", f"B{i}") for i in range(20))
+        conn.set_trace_callback(None)
+    assert result.ok and result.affected == 20
+    assert statements.count("COMMIT") == 1
+    assert len(get_stock_movements()) == 20
+
+
+def test_bulk_add_reports_row_errors_without_aborting(erp_db):
+    add_item("原料A", "原料", "食品添加物", "kg")
+    result = bulk_add_stock_movements([
+        (1, None, "IN", 10, "2025-01-01", "B1"),
+        (1, None, "MOVE", 5, "2025-01-01", "B2"),           # 驗證失敗
+        (999, None, "IN", 5, "2025-01-01", "B3"),           # 外鍵失敗
+        {"item_id": 1, "movement_type": "OUT", "quantity": 3, "movement_date": "2025-01-02"},
+    ])
+    assert result.affected == 2
+    assert [error.index for error in result.errors] == [1, 2]
+    assert "外鍵" in result.errors[1].message
+    assert [row["Quantity"] for row in get_stock_movements()] == [10, 3]
+
+
+def test_bulk_add_items_on_conflict(erp_db):
+    add_item("原料A", "原料", "食品添加物", "kg")
+    rows = [("原料A", "原料", "香料", "g"), ("原料B", "原料", None, "kg")]
+
+    result = bulk_add_items(rows)
+    assert result.affected == 1 and "唯一性" in result.errors[0].message
+
+    result = bulk_add_items(rows, on_conflict="ignore")
+    assert result.ok and result.affected == 0
+
+    result = bulk_add_items(rows, on_conflict="update")
+    assert result.ok
+    assert {item["ItemName"]: item["Unit"] for item in get_items()} == {"原料A": "g", "原料B": "kg"}
+
+
+def test_bulk_upsert_bom_and_sales_details(erp_db):
+    add_item("成品A", "成品", "食品", "箱")
+    add_item("原料B", "原料", "食品添加物", "g")
+    add_bom_header(1, "V1", "2025-01-01", 100.0)
+    bulk_add_bom_details([(1, 2, 40.0, "%")])
+    bulk_add_bom_details([(1, 2, 60.0, "%", 0.1, None, 0.5)], on_conflict="update")
+    detail = get_bom_details(bom_id=1)[0]
+    assert (detail["Quantity"], detail["Price"]) == (60.0, 0.5)
+
+    add_customer("客戶A", tax_id="1")
+    add_sales_order(1, "2025-01-01", "Pending")
+    bulk_add_sales_order_details([(1, 1, 5, 100.0)])
+    with get_connection() as conn:
+        conn.execute("UPDATE SalesOrderDetail SET IsDeleted = 1")
+        conn.commit()
+    bulk_add_sales_order_details([(1, 1, 8, 90.0)], on_conflict="update")
+    assert [(d["Quantity"], d["Price"]) for d in get_sales_order_details(order_id=1)] == [(8, 90.0)]
+
+
+def test_bulk_add_price_history_rejects_update_mode(erp_db):
+    add_item("原料A", "原料", "食品添加物", "kg")
+    with pytest.raises(ValueError):
+        bulk_add_price_history([(1, "2025-01-01", 10.0)], on_conflict="update")
+    result = bulk_add_price_history([(1, "2025-01-01", 10.0), (1, "2025/01/02", 10.0), (1, "2025-01-03", -1)])
+    assert result.affected == 1 and [error.index for error in result.errors] == [1, 2]
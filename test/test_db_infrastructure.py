@@ -0,0 +1,182 @@
+import sqlite3
+import threading
+
+import pytest
+
+from models import erp_database_schema
+from models.erp_database_schema import (get_connection, get_pool, get_pool_stats, set_db_profile, initialize_database,
+                                        unit_of_work, after_commit)
+from models.itemmaster_crud import add_item, get_items
+
+
+# === 連線池 ===
+def test_main_thread_reuses_connection(erp_db):
+    with get_connection() as first:
+        pass
+    with get_connection() as second:
+        pass
+    assert first is second
+    stats = get_pool_stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] >= 1
+
+
+def test_nested_calls_share_connection(erp_db):
+    with get_connection() as outer:
+        with get_connection() as inner:
+            assert inner is outer
+
+
+def test_uncommitted_changes_rolled_back_on_release(erp_db):
+    with get_connection() as conn:
+        conn.execute("INSERT INTO ItemMaster (ItemName, ItemType) VALUES ('未提交', '原料')")
+    assert get_items() == []
+
+
+def test_worker_threads_are_bounded(erp_db):
+    pool = get_pool()
+    pool.max_worker_connections = 2
+    add_item("原料A", "原料", None, "g")
+    barrier = threading.Barrier(4)
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(len(get_items()))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == [1, 1, 1, 1]
+    assert get_pool_stats()["worker_connections"] <= 2
+
+
+def test_close_defers_main_connection_in_use(tmp_path):
+    from models.connection_pool import ConnectionPool
+
+    pool = ConnectionPool(str(tmp_path / "pool.db"))
+    with pool.connection() as conn:
+        pool.close()
+        assert conn.execute("SELECT 1").fetchone() == (1,)     # 使用中的主連線不會被關閉
+    assert pool.stats()["worker_connections"] == 0
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")                                # 歸還時才關閉
+    with pytest.raises(RuntimeError):
+        with pool.connection():
+            pass
+
+
+# === 效能設定檔 ===
+def test_desktop_profile_enables_wal(erp_db, monkeypatch):
+    monkeypatch.setattr(erp_database_schema, "DB_PROFILE", "desktop")
+    with get_connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+
+
+def test_switch_profile(erp_db, monkeypatch):
+    monkeypatch.setattr(erp_database_schema, "DB_PROFILE", "desktop")
+    assert set_db_profile("shared-drive") == "shared-drive"
+    assert initialize_database() == "shared-drive"
+    with get_connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    with pytest.raises(ValueError):
+        set_db_profile("turbo")
+
+
+# === 結構遷移 ===
+def test_create_tables_skips_when_current(erp_db):
+    version = erp_database_schema.create_tables()
+    assert version == erp_database_schema.MIGRATIONS[-1][0]
+
+    statements = []
+    with get_connection() as conn:
+        conn.set_trace_callback(statements.append)
+        try:
+            assert erp_database_schema.create_tables() == version
+        finally:
+            conn.set_trace_callback(None)
+    queries = [sql for sql in statements if not sql.startswith("--")]    # "--" 為查詢內部的子語句
+    assert len(queries) == 1 and "user_version" in queries[0]
+
+
+def test_legacy_database_gets_missing_columns(tmp_path, monkeypatch):
+    import sqlite3
+    db_path = str(tmp_path / "legacy.db")
+    legacy = sqlite3.connect(db_path)
+    legacy.execute("""
+        CREATE TABLE StockMovement (
+            MovementID INTEGER PRIMARY KEY AUTOINCREMENT,
+            ItemID INTEGER NOT NULL,
+            MovementType TEXT NOT NULL,
+            Quantity REAL NOT NULL,
+            MovementDate DATE NOT NULL,
+            BatchNo TEXT
+        )
+    """)
+    legacy.commit()
+    legacy.close()
+
+    monkeypatch.setattr(erp_database_schema, "DB_NAME", db_path)
+    erp_database_schema.close_connections()
+    try:
+        erp_database_schema.create_tables()
+        with get_connection() as conn:
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(StockMovement)")]
+        assert "SupplierID" in columns
+    finally:
+        erp_database_schema.close_connections()
+
+
+# === 工作單元 ===
+def test_unit_of_work_commits_once(erp_db):
+    statements = []
+    with unit_of_work() as session:
+        session.set_trace_callback(statements.append)
+        add_item("原料A", "原料", "食品添加物", "kg")
+        add_item("原料B", "原料", "食品添加物", "kg", conn=session)
+        session.set_trace_callback(None)
+    assert statements.count("COMMIT") == 0
+    assert len(get_items()) == 2
+
+
+def test_unit_of_work_rolls_back_everything_on_error(erp_db):
+    committed = []
+    with pytest.raises(RuntimeError):
+        with unit_of_work():
+            add_item("原料A", "原料", "食品添加物", "kg")
+            after_commit(lambda: committed.append(True))
+            raise RuntimeError("中斷")
+    assert get_items() == []
+    assert committed == []
+
+
+def test_failed_call_inside_unit_of_work_only_undoes_itself(erp_db):
+    with unit_of_work():
+        add_item("原料A", "原料", "食品添加物", "kg")
+        with pytest.raises(ValueError):
+            add_item("原料A", "原料", "食品添加物", "kg")   # 唯一性衝突，crud 內部會 rollback
+        add_item("原料B", "原料", "食品添加物", "kg")
+    assert sorted(item["ItemName"] for item in get_items()) == ["原料A", "原料B"]
+
+
+def test_nested_unit_of_work_uses_savepoint(erp_db):
+    with unit_of_work():
+        add_item("原料A", "原料", "食品添加物", "kg")
+        with pytest.raises(RuntimeError):
+            with unit_of_work():
+                add_item("原料B", "原料", "食品添加物", "kg")
+                raise RuntimeError("內層失敗")
+    assert [item["ItemName"] for item in get_items()] == ["原料A"]
+
+
+def test_after_commit_runs_after_outer_commit(erp_db):
+    seen = []
+    with unit_of_work():
+        add_item("原料A", "原料", "食品添加物", "kg")
+        after_commit(lambda: seen.append(len(get_items())))
+        assert seen == []
+    assert seen == [1]
@@ -0,0 +1,113 @@
+import pytest
+
+from models.erp_database_schema import get_connection, unit_of_work
+from models.itemmaster_crud import add_item
+from models.customer_crud import add_customer
+from models.supplier_crud import add_supplier
+from models.supplieritemmap_crud import add_supplier_item_mapping
+from models.stockmovement_crud import add_stock_movement
+from models.stockalert_crud import get_low_stock_alerts
+from models.stock_crud import add_stock
+from models.salesorderheader_crud import add_sales_order
+from models.salesorderdetail_crud import add_sales_order_detail, ship_order_detail
+from models.stockbalance_crud import get_stock_balances
+from models.lot_allocation import InsufficientStockError, plan_fefo_allocation
+
+
+def seed():
+    add_item("牛奶", "原料", None, "瓶")
+    add_item("砂糖", "原料", None, "g")
+    add_customer("客戶A")
+    add_supplier("供應商A")
+    add_supplier("供應商B")
+    add_stock(1, 1, 5, "L-OLD", "2025-01-31", 1)     # 出貨時已過期
+    add_stock(1, 1, 4, "L-B", "2025-03-31", 1)
+    add_stock(1, 2, 3, "L-A", "2025-02-28", 2)
+    add_stock(1, 1, 10, "L-NONE", None)              # 沒有效期，最後使用；未記錄供應商
+    add_stock(2, 1, 50, "S-1", "2025-02-01")         # 其他品項不受影響
+    add_sales_order(1, "2025-02-01", "Pending")
+    add_sales_order_detail(1, 1, 20, 30.0)
+
+
+def lots():
+    with get_connection() as conn:
+        return dict(conn.execute("SELECT BatchNo, Quantity FROM Stock").fetchall())
+
+
+def test_ship_splits_across_lots_first_expired_first(erp_db):
+    seed()
+    allocations = ship_order_detail(1, 9, "2025-02-10")
+    assert [(lot.batch_no, lot.quantity) for lot in allocations] == [("L-A", 3), ("L-B", 4), ("L-NONE", 2)]
+    assert lots() == {"L-OLD": 5, "L-B": 0, "L-A": 0, "L-NONE": 8, "S-1": 50}
+
+    with get_connection() as conn:
+        movements = conn.execute('''
+            SELECT ItemID, SupplierID, MovementType, Quantity, MovementDate, BatchNo, WarehouseID
+            FROM StockMovement ORDER BY MovementID
+        ''').fetchall()
+        shipped = conn.execute("SELECT ShippedQuantity FROM SalesOrderDetail WHERE OrderDetailID = 1").fetchone()[0]
+    assert [tuple(row) for row in movements] == [(1, 2, "OUT", 3, "2025-02-10", "L-A", 2),
+                                                 (1, 1, "OUT", 4, "2025-02-10", "L-B", 1),
+                                                 (1, None, "OUT", 2, "2025-02-10", "L-NONE", 1)]
+    assert shipped == 9
+    assert {(row["SupplierID"], row["WarehouseID"], row["BatchNo"]): row["Quantity"]
+            for row in get_stock_balances(item_id=1)} == {(None, 1, "L-NONE"): -2, (1, 1, "L-B"): -4,
+                                                          (2, 2, "L-A"): -3}
+
+
+def test_insufficient_stock_rolls_back_everything(erp_db):
+    seed()
+    before = lots()
+    with pytest.raises(InsufficientStockError) as error:
+        ship_order_detail(1, 18, "2025-02-10")
+    assert error.value.available == 17
+    assert lots() == before
+    with get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM StockMovement").fetchone()[0] == 0
+        assert conn.execute("SELECT ShippedQuantity FROM SalesOrderDetail").fetchone()[0] == 0
+
+    with pytest.raises(ValueError, match="超過訂購數量"):
+        ship_order_detail(1, 21, "2025-02-10")
+
+
+def test_ship_inside_unit_of_work_commits_with_caller(erp_db):
+    seed()
+    with pytest.raises(RuntimeError):
+        with unit_of_work():
+            ship_order_detail(1, 2, "2025-02-10")
+            raise RuntimeError("呼叫端失敗")
+    assert lots()["L-A"] == 3
+    with unit_of_work():
+        ship_order_detail(1, 2, "2025-02-10")
+    assert lots()["L-A"] == 1
+
+
+def test_allocation_reads_lots_through_fefo_index(erp_db):
+    seed()
+    with get_connection() as conn:
+        assert [lot.batch_no for lot in plan_fefo_allocation(1, 1, "2025-01-15", conn)] == ["L-OLD"]
+        plans = [row[3] for row in conn.execute('''
+            EXPLAIN QUERY PLAN
+            SELECT StockID FROM Stock WHERE ItemID = 1 AND Quantity > 0 AND ExpireDate >= '2025-02-10'
+            ORDER BY ExpireDate, StockID
+        ''')]
+    assert any("idx_stock_fefo" in detail for detail in plans)
+    assert not any("TEMP B-TREE" in detail for detail in plans)
+
+
+def test_shipment_is_booked_against_the_lot_supplier(erp_db):
+    add_item("牛奶", "原料", None, "瓶")
+    add_supplier("供應商A")
+    add_supplier_item_mapping(1, 1, safety_stock_level=5.0)
+    add_stock_movement(1, 1, "IN", 10, "2025-01-01", "L-1", 1)
+    add_stock(1, 1, 10, "L-1", "2025-12-31", 1)
+    add_customer("客戶A")
+    add_sales_order(1, "2025-02-01", "Pending")
+    add_sales_order_detail(1, 1, 8, 30.0)
+
+    allocations = ship_order_detail(1, 8, "2025-02-10")
+    assert [(lot.batch_no, lot.supplier_id) for lot in allocations] == [("L-1", 1)]
+    assert [(row["SupplierID"], row["WarehouseID"], row["BatchNo"], row["Quantity"])
+            for row in get_stock_balances(item_id=1)] == [(1, 1, "L-1", 2.0)]
+    assert [(row["ItemID"], row["SupplierID"], row["StockQuantity"], row["SafetyStockLevel"])
+            for row in get_low_stock_alerts()] == [(1, 1, 2.0, 5.0)]
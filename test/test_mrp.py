@@ -0,0 +1,161 @@
+import time
+
+import numpy as np
+import pytest
+
+from models.erp_database_schema import get_connection
+from models.itemmaster_crud import add_item
+from models.customer_crud import add_customer
+from models.supplier_crud import add_supplier
+from models.supplieritemmap_crud import add_supplier_item_mapping
+from models.bomheader_crud import add_bom_header
+from models.bomdetail_crud import add_bom_detail
+from models.salesorderheader_crud import add_sales_order
+from models.salesorderdetail_crud import add_sales_order_detail
+from models.purchaseorderheader_crud import add_purchase_order
+from models.purchaseorderdetail_crud import add_purchase_order_detail
+from models.stockmovement_crud import add_stock_movement
+from models.bom_explosion import clear_explosion_cache
+from models.mrp import _net_requirements, run_mrp
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    clear_explosion_cache()
+    yield
+    clear_explosion_cache()
+
+
+def seed():
+    # 每個蛋糕：麵粉 300 g、奶油霜 100 g（糖粉 50 g + 奶油 50 g）
+    for name, kind in [("蛋糕", "成品"), ("奶油霜", "半成品"), ("糖粉", "原料"), ("奶油", "原料"), ("麵粉", "原料")]:
+        add_item(name, kind, None, "g")
+    cake = add_bom_header(1, "V1", "2025-01-01", 500.0)
+    add_bom_detail(cake, 5, 60, "%")
+    add_bom_detail(cake, 2, 100, "g")
+    frosting = add_bom_header(2, "V1", "2025-01-01", 200.0)
+    add_bom_detail(frosting, 3, 50, "%")
+    add_bom_detail(frosting, 4, 100, "g")
+
+    add_customer("客戶A")
+    add_supplier("供應商A")
+    add_supplier("供應商B")
+    add_supplier_item_mapping(1, 5, moq=2000, price=50.0, lead_time=7)
+    add_supplier_item_mapping(1, 4, price=10.0, lead_time=3)
+    add_supplier_item_mapping(2, 4, price=8.0, lead_time=15)       # 較便宜，採用此供應商
+
+    add_sales_order(1, "2025-03-10", "Pending")
+    add_sales_order_detail(1, 1, 10, 100.0)
+    add_sales_order(1, "2025-03-20", "Pending")
+    add_sales_order_detail(2, 1, 5, 100.0)
+    add_sales_order_detail(2, 3, 200, 1.0)                          # 直接銷售原料
+    add_sales_order(1, "2025-03-05", "Shipped")
+    add_sales_order_detail(3, 1, 99, 100.0)                         # 已出貨，不計入
+
+    add_stock_movement(1, None, "IN", 3, "2025-02-01", None)        # 蛋糕庫存 3
+    add_stock_movement(5, 1, "IN", 1000, "2025-02-01", None)        # 麵粉庫存 1000
+    poid = add_purchase_order(1, "2025-03-01", "Open")
+    add_purchase_order_detail(poid, 5, 1000, 50.0)
+    closed = add_purchase_order(1, "2025-03-01", "Closed")
+    add_purchase_order_detail(closed, 5, 5000, 50.0)
+    with get_connection() as conn:
+        conn.execute("UPDATE PurchaseOrderHeader SET ExpectedDeliveryDate = '2025-03-15' WHERE POID = ?", (poid,))
+        conn.commit()
+    return cake
+
+
+def test_plan_nets_stock_receipts_and_rounds_to_moq(erp_db):
+    cake = seed()
+    plan = run_mrp("2025-03-01")
+
+    assert [(p.item_id, p.bom_id, p.quantity, p.need_date) for p in plan.production] == [
+        (1, cake, 7.0, "2025-03-10"), (1, cake, 5.0, "2025-03-20")]
+
+    purchases = {(p.item_id, p.need_date): p for p in plan.purchases}
+    assert set(purchases) == {(5, "2025-03-10"), (3, "2025-03-10"), (3, "2025-03-20"),
+                              (4, "2025-03-10"), (4, "2025-03-20")}
+    # 麵粉：3/10 需要 2100，庫存 1000 → 缺 1100，依 MOQ 訂 2000；3/15 到貨 1000，3/20 再缺 500 由多訂的量抵用
+    flour = purchases[(5, "2025-03-10")]
+    assert (flour.supplier_id, flour.quantity, flour.net_requirement, flour.order_date, flour.past_due) == \
+        (1, 2000.0, pytest.approx(1100.0), "2025-03-03", False)
+    # 糖粉：沒有採購來源；3/20 含直接銷售的 200 g
+    assert purchases[(3, "2025-03-10")][1:3] == (None, pytest.approx(350.0))
+    assert purchases[(3, "2025-03-20")][1:3] == (None, pytest.approx(450.0))
+    # 奶油：前置 15 天，3/10 的需求已來不及（逾期）
+    butter = purchases[(4, "2025-03-10")], purchases[(4, "2025-03-20")]
+    assert [(p.supplier_id, p.quantity, p.order_date, p.past_due) for p in butter] == [
+        (2, pytest.approx(350.0), "2025-03-01", True), (2, pytest.approx(250.0), "2025-03-05", False)]
+
+    rows = plan.to_rows()
+    assert rows[0]["OrderDate"] == "2025-03-01" and rows[0]["ItemName"] in ("奶油", "糖粉")
+    assert {row["SupplierName"] for row in rows} == {"供應商A", "供應商B", None}
+
+
+def test_no_open_demand_plans_nothing(erp_db):
+    seed()
+    with get_connection() as conn:
+        conn.execute("UPDATE SalesOrderHeader SET Status = 'Delivered'")
+        conn.commit()
+    plan = run_mrp("2025-03-01")
+    assert plan.production == [] and plan.purchases == []
+
+
+def test_exactly_covered_items_plan_nothing_next_to_huge_quantities():
+    count = 3000
+    day = np.datetime64("2025-01-01", "D")
+    # 每個品項：收料 0.3，之後分兩天需求 0.1、0.2（浮點累計約為 -2.8e-17）；最後一個品項數量為 1e12 級
+    items = np.repeat(np.arange(1, count + 1), 3)
+    dates = np.tile([day, day + 1, day + 2], count)
+    quantity = np.tile([0.3, -0.1, -0.2], count)
+    items = np.r_[items, count + 1, count + 1, count + 2]
+    dates = np.r_[dates, day, day + 1, day + 1]
+    quantity = np.r_[quantity, 3e12, -3e12, -5.0]
+
+    short_items, short_dates, shortage = _net_requirements(items, dates, quantity, {count + 2: 2.0})
+    assert short_items.tolist() == [count + 2]
+    assert short_dates.tolist() == [day + 1]
+    assert shortage.tolist() == [3.0]
+
+
+def test_thousands_of_skus_plan_in_seconds(erp_db):
+    rng = np.random.default_rng(5)
+    materials, products = 3000, 500
+    with get_connection() as conn:
+        conn.execute("INSERT INTO Customer (CustomerName) VALUES ('客戶A')")
+        conn.execute("INSERT INTO Supplier (SupplierName) VALUES ('供應商A')")
+        conn.executemany("INSERT INTO ItemMaster (ItemName, ItemType, Unit) VALUES (?, '原料', 'g')",
+                         [(f"原料{i}",) for i in range(materials)])
+        conn.executemany("INSERT INTO ItemMaster (ItemName, ItemType, Unit) VALUES (?, '成品', 'g')",
+                         [(f"成品{i}",) for i in range(products)])
+        conn.executemany("INSERT INTO BOMHeader (ProductID, Version, EffectiveDate, ProductWeight) "
+                         "VALUES (?, 'V1', '2025-01-01', 100)", [(materials + 1 + i,) for i in range(products)])
+        bom = [(i + 1, 1 + (i * 13 + k) % materials) for i in range(products) for k in range(10)]
+        conn.executemany("INSERT INTO BOMDetail (BOMID, ComponentItemID, Quantity, Unit) VALUES (?, ?, 10, '%')", bom)
+        conn.executemany("INSERT INTO SupplierItemMap (SupplierID, ItemID, LeadTime, MOQ, Price) VALUES (1, ?, 5, 0, 1)",
+                         [(i + 1,) for i in range(materials)])
+        conn.executemany("INSERT INTO StockMovement (ItemID, MovementType, Quantity, MovementDate) "
+                         "VALUES (?, 'IN', ?, '2025-01-01')", [(i + 1, 100.0) for i in range(materials)])
+        orders = []
+        for order_id in range(1, 3001):
+            conn.execute("INSERT INTO SalesOrderHeader (CustomerID, OrderDate, Status) VALUES (1, ?, 'Pending')",
+                         (f"2025-04-{1 + order_id % 28:02d}",))
+            product = materials + 1 + int(rng.integers(products))
+            orders.append((order_id, product, float(rng.integers(1, 20))))
+        conn.executemany("INSERT INTO SalesOrderDetail (OrderID, ItemID, Quantity, Price) VALUES (?, ?, ?, 1)", orders)
+        conn.commit()
+
+    started = time.perf_counter()
+    plan = run_mrp("2025-03-01")
+    elapsed = time.perf_counter() - started
+    assert elapsed < 5.0
+
+    # 沒有成品庫存與 MOQ 時，每個原料的總訂購量 = 總毛需求 - 庫存
+    gross = np.zeros(materials + 1)
+    for _, product, qty in orders:
+        for k in range(10):
+            gross[1 + ((product - materials - 1) * 13 + k) % materials] += qty * 10.0
+    ordered = np.zeros(materials + 1)
+    for purchase in plan.purchases:
+        ordered[purchase.item_id] += purchase.quantity
+    assert ordered == pytest.approx(np.maximum(0.0, gross - 100.0))
+    assert sum(p.quantity for p in plan.production) == pytest.approx(sum(qty for _, _, qty in orders))
@@ -0,0 +1,111 @@
+import pytest
+
+from models.erp_database_schema import get_connection
+from models.pagination import iter_keyset
+from models.customer_crud import CUSTOMER_KEYSET, add_customer, get_customers
+from models.itemmaster_crud import add_item
+from models.stockmovement_crud import STOCK_MOVEMENT_KEYSET, add_stock_movement, get_stock_movements
+from models.salesorderheader_crud import SALES_ORDER_KEYSET, add_sales_order, get_sales_orders
+from models.supplier_crud import add_supplier
+from models.supplieritemmap_crud import add_supplier_item_mapping
+from models.pricehistory_crud import PRICE_HISTORY_KEYSET, add_price_history, get_price_history
+from models.productionorderheader_crud import PRODUCTION_ORDER_KEYSET, add_production_order, get_production_orders
+from models.productionorderdetail_crud import (PRODUCTION_ORDER_DETAIL_KEYSET, add_production_order_detail,
+                                               get_production_order_details)
+
+
+def seed_customers():
+    # 名稱重複與電話為 NULL 的資料都必須在分頁時完整出現
+    for i, name in enumerate(["客戶C", "客戶A", "客戶B", "客戶A", "客戶C"]):
+        add_customer(name, tax_id=str(i), phone=None if i % 2 else f"09{i}")
+
+
+def walk(reader, keyset, order_by, limit, **filters):
+    rows, after_key = [], None
+    while True:
+        page = reader(after_key=after_key, limit=limit, order_by=order_by, **filters)
+        rows.extend(page)
+        if len(page) < limit:
+            return rows
+        after_key = keyset.page_key(page[-1], order_by)
+
+
+@pytest.mark.parametrize("order_by", [None, "CustomerName", "-CustomerName", "Phone", "-Phone"])
+def test_pages_match_full_sorted_result(erp_db, order_by):
+    seed_customers()
+    expected = get_customers(order_by=order_by)
+    assert len(expected) == 5
+    pages = walk(get_customers, CUSTOMER_KEYSET, order_by, limit=2)
+    assert [c["CustomerID"] for c in pages] == [c["CustomerID"] for c in expected]
+    assert list(iter_keyset(get_customers, CUSTOMER_KEYSET, order_by, page_size=2)) == expected
+
+
+def test_sorting_happens_in_sql(erp_db):
+    seed_customers()
+    names = [(c["CustomerName"], c["CustomerID"]) for c in get_customers(order_by="-CustomerName")]
+    assert names == sorted(names, reverse=True)
+    # 篩選條件與 keyset 條件同時生效
+    page = get_customers("客戶A", after_key=("客戶A", 2), order_by="CustomerName")
+    assert [c["CustomerID"] for c in page] == [4]
+
+
+def test_invalid_order_by_is_rejected(erp_db):
+    with pytest.raises(ValueError):
+        get_stock_movements(order_by="Quantity; DROP TABLE StockMovement")
+    with pytest.raises(ValueError):
+        get_stock_movements(order_by="MovementDate", after_key=5)
+
+
+def test_grouped_reader_pages_by_order_date(erp_db):
+    add_customer("客戶A", tax_id="1")
+    for day in ["2025-01-03", "2025-01-01", "2025-01-02", "2025-01-01"]:
+        add_sales_order(1, day, "Pending")
+    rows = walk(get_sales_orders, SALES_ORDER_KEYSET, "OrderDate", limit=1)
+    assert [(o["OrderDate"], o["OrderID"]) for o in rows] == [
+        ("2025-01-01", 2), ("2025-01-01", 4), ("2025-01-02", 3), ("2025-01-03", 1)]
+
+
+@pytest.mark.parametrize("order_by", [None, "-Price", "SupplierName"])
+def test_joined_reader_pages_by_composite_key(erp_db, order_by):
+    # 每筆價格歷史對應到品項的兩個供應商，單靠 PriceHistoryID 無法唯一定位一列
+    add_item("麵粉", "原料", None, "g")
+    add_supplier("供應商A")
+    add_supplier("供應商B")
+    add_supplier_item_mapping(1, 1, price=10.0)
+    add_supplier_item_mapping(2, 1, price=12.0)
+    for day, price in [("2025-01-01", 30.0), ("2025-02-01", 20.0), ("2025-03-01", 30.0)]:
+        add_price_history(1, day, price)
+    expected = get_price_history(order_by=order_by)
+    assert len({row["PriceHistoryID"] for row in expected}) < len(expected)
+    assert len({(row["PriceHistoryID"], row["MappingID"]) for row in expected}) == len(expected)
+    assert walk(get_price_history, PRICE_HISTORY_KEYSET, order_by, limit=4) == expected
+    assert walk(get_price_history, PRICE_HISTORY_KEYSET, order_by, limit=1) == expected
+
+
+def test_production_readers_page_without_offset(erp_db):
+    add_item("成品A", "成品", None, "g")
+    add_item("原料A", "原料", None, "g")
+    for day in ["2025-01-02", "2025-01-01", "2025-01-02"]:
+        add_production_order(1, day, "Pending")
+    for qty in [3, 1, 2]:
+        add_production_order_detail(1, 2, qty)
+    rows = walk(get_production_orders, PRODUCTION_ORDER_KEYSET, "OrderDate", limit=2)
+    assert [(o["OrderDate"], o["ProductionOrderID"]) for o in rows] == [
+        ("2025-01-01", 2), ("2025-01-02", 1), ("2025-01-02", 3)]
+    details = walk(get_production_order_details, PRODUCTION_ORDER_DETAIL_KEYSET, "-PlannedQty", limit=2, order_id=1)
+    assert [d["PlannedQty"] for d in details] == [3, 2, 1]
+
+
+def test_seek_uses_index_without_sorting(erp_db):
+    add_item("原料A", "原料", None, "kg")
+    add_stock_movement(1, None, "IN", 1, "2025-01-01", "B1")
+    statements = []
+    with get_connection() as conn:
+        conn.set_trace_callback(statements.append)
+        try:
+            get_stock_movements(after_key=("2025-01-01", 1), limit=50, order_by="MovementDate")
+        finally:
+            conn.set_trace_callback(None)
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {statements[-1]}")]
+    assert any("idx_stockmovement_date" in detail for detail in plan), plan
+    assert not any("TEMP B-TREE" in detail for detail in plan), plan
@@ -0,0 +1,195 @@
+import importlib
+import inspect
+import pkgutil
+import re
+
+import pytest
+
+import models
+from models import erp_database_schema
+from models.erp_database_schema import get_connection
+from models.itemmaster_crud import add_item, delete_item
+from models.customer_crud import add_customer, delete_customer
+from models.supplier_crud import add_supplier, delete_supplier
+from models.stock_crud import add_stock, adjust_stock
+from models.stockmovement_crud import add_stock_movement, delete_stock_movement
+from models.supplieritemmap_crud import add_supplier_item_mapping
+from models.bomheader_crud import add_bom_header
+from models.bomdetail_crud import add_bom_detail, get_bom_details
+from models.costhistory_crud import add_cost_history
+from models.salesorderheader_crud import add_sales_order, delete_sales_order
+from models.salesorderdetail_crud import add_sales_order_detail, ship_order_detail
+from models.purchaseorderheader_crud import add_purchase_order
+from models.purchaseorderdetail_crud import add_purchase_order_detail
+from models.shipmentheader_crud import add_shipment
+from models.shipmentdetail_crud import add_shipment_detail
+from models.productionorderheader_crud import add_production_order
+from models.productionorderdetail_crud import add_production_order_detail
+
+# 資料量會持續成長的表，查詢時不允許整表掃描
+LARGE_TABLES = {
+    "Stock", "StockMovement", "SupplierItemMap", "BOMHeader", "BOMDetail",
+    "SalesOrderHeader", "SalesOrderDetail", "PurchaseOrderHeader", "PurchaseOrderDetail",
+    "ShipmentHeader", "ShipmentDetail", "ProductionOrderDetail", "PriceHistory", "CostHistory",
+}
+
+# models/*_crud.py 中以這些前綴命名的公開函式都會被追蹤，之後新增的 CRUD 模組也自動納入
+TRACED_PREFIXES = ("get_", "iter_", "update_")
+
+# 刻意讀取整張表的函式（模組.函式）：沒有篩選條件、由清單頁面以 keyset 分頁逐頁讀取的清單
+WHOLE_TABLE_READERS = {
+    "stock_crud.get_stocks", "stock_crud.iter_stocks",
+    "purchaseorderheader_crud.get_purchase_orders",
+    "shipmentheader_crud.get_shipments",
+}
+
+# 依參數名稱提供的引數；有預設值的篩選參數也一併帶入，讓讀取函式走篩選路徑
+ARGUMENTS = {
+    "item_id": 1, "supplier_id": 1, "customer_id": 1, "stock_id": 1, "movement_id": 1,
+    "mapping_id": 1, "price_history_id": 1, "bom_id": 1, "bom_detail_id": 1, "order_id": 1,
+    "order_detail_id": 1, "poid": 1, "podetail_id": 1, "shipment_id": 1, "shipment_detail_id": 1,
+    "production_order_id": 1, "production_detail_id": 1, "bom_ids": [1], "pairs": [(1, 2)],
+    "search": "成品A", "search_text": "成品A", "search_term": "客戶A", "item_search": "成品A",
+    "product_name": "成品A", "as_of": "2025-06-30", "revision": 0,
+    "movement_type": "IN", "quantity": 5.0, "movement_date": "2025-01-01", "batch_no": "B001",
+    "received_qty": 1.0, "status": "Closed",
+}
+
+# 以 **kwargs 指定欄位的更新函式要寫入的欄位
+UPDATE_FIELDS = {
+    "update_bom_detail": {"quantity": 40.0},
+    "update_bom_header": {"new_remarks": "調整"},
+    "update_customer": {"phone": "0911222333"},
+    "update_item": {"new_unit": "kg"},
+    "update_price_history": {"price": 55.0},
+    "update_production_order": {"status": "Pending"},
+    "update_production_order_detail": {"actual_qty": 5.0},
+    "update_sales_order": {"status": "Pending"},
+    "update_sales_order_detail": {"price": 120.0},
+    "update_shipment": {"Status": "shipped"},
+    "update_stock": {"new_quantity": 90},
+    "update_supplier": {"phone": "0222333444"},
+    "update_supplier_item_mapping": {"price": 55.0},
+}
+
+# 自動產生的呼叫之外，其他有篩選條件的讀寫路徑
+EXTRA_CALLS = {
+    "itemmaster_crud.delete_item(hard)": lambda: pytest.raises(Exception, delete_item, 1, soft_delete=False),
+    "customer_crud.delete_customer": lambda: delete_customer(1),
+    "supplier_crud.delete_supplier": lambda: delete_supplier(1),
+    "stock_crud.adjust_stock": lambda: adjust_stock(1, 1),
+    "stockmovement_crud.delete_stock_movement": lambda: delete_stock_movement(999),
+    "bomdetail_crud.get_bom_details(component)": lambda: get_bom_details(component_item_id=2),
+    "salesorderheader_crud.delete_sales_order": lambda: delete_sales_order(999),
+    "salesorderdetail_crud.ship_order_detail": lambda: ship_order_detail(1, 1.0, "2025-01-02"),
+}
+
+
+def crud_functions():
+    """models 下所有 *_crud 模組中要追蹤的讀取與更新函式，鍵為 模組.函式"""
+    functions = {}
+    for module_info in pkgutil.iter_modules(models.__path__):
+        if not module_info.name.endswith("_crud"):
+            continue
+        module = importlib.import_module(f"models.{module_info.name}")
+        for name, function in vars(module).items():
+            if (inspect.isfunction(function) and function.__module__ == module.__name__
+                    and name.startswith(TRACED_PREFIXES)):
+                functions[f"{module_info.name}.{name}"] = function
+    return functions
+
+
+def generated_call(function):
+    """依參數名稱組出呼叫；必要參數沒有對應引數時讓測試失敗，提醒補上 ARGUMENTS 或 UPDATE_FIELDS"""
+    kwargs = {}
+    for parameter in inspect.signature(function).parameters.values():
+        if parameter.kind is parameter.VAR_KEYWORD:
+            assert function.__name__ in UPDATE_FIELDS, f"{function.__name__} 需要在 UPDATE_FIELDS 指定更新欄位"
+            kwargs.update(UPDATE_FIELDS[function.__name__])
+        elif parameter.name in ARGUMENTS:
+            kwargs[parameter.name] = ARGUMENTS[parameter.name]
+        else:
+            assert parameter.default is not parameter.empty, f"{function.__name__} 的參數 {parameter.name} 沒有測試引數"
+
+    def call():
+        result = function(**kwargs)
+        if inspect.isgenerator(result):
+            list(result)
+    return call
+
+
+CRUD_FUNCTIONS = crud_functions()
+TRACED_CALLS = {
+    **{name: generated_call(function) for name, function in CRUD_FUNCTIONS.items()
+       if name not in WHOLE_TABLE_READERS},
+    **EXTRA_CALLS,
+}
+
+TABLE_ALIAS = re.compile(r"\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+SQL_KEYWORDS = {"WHERE", "JOIN", "LEFT", "INNER", "ON", "SET", "GROUP", "ORDER", "LIMIT", "VALUES"}
+
+
+def seed_data():
+    add_item("成品A", "成品", "食品", "箱")
+    add_item("原料B", "原料", "食品添加物", "g")
+    add_customer("客戶A", tax_id="12345678")
+    add_supplier("供應商A")
+    add_supplier_item_mapping(1, 2, moq=100, price=50.0, lead_time=7)
+    add_stock(1, 1, 100, "B001", "2030-12-31")
+    add_stock_movement(1, 1, "IN", 10, "2025-01-01", "B001")
+    add_bom_header(1, "V1", "2025-01-01", 100.0)
+    add_bom_detail(1, 2, 50.0, "%", 0.0, 1, 0.05)
+    add_sales_order(1, "2025-01-01", "Pending")
+    add_sales_order_detail(1, 1, 10.0, 100.0)
+    poid = add_purchase_order(1, "2025-01-01", "Open")
+    add_purchase_order_detail(poid, 2, 100.0, 50.0)
+    add_shipment(1, "2025-01-02", "pending")
+    add_shipment_detail(1, 1, 1.0)
+    add_production_order(1, "2025-01-01", "Pending")
+    add_production_order_detail(1, 2, 10.0)
+    add_cost_history("成品A", 30.0)
+
+
+def full_table_scans(conn, sql):
+    """回傳查詢計畫中整表掃描（未使用索引）的大型資料表"""
+    aliases = {}
+    for table, alias in TABLE_ALIAS.findall(sql):
+        aliases[table] = table
+        if alias and alias.upper() not in SQL_KEYWORDS:
+            aliases[alias] = table
+    scanned = set()
+    for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}"):
+        detail = row[3]
+        match = re.match(r"SCAN (\w+)", detail)
+        if match and "INDEX" not in detail:
+            table = aliases.get(match.group(1), match.group(1))
+            if table in LARGE_TABLES:
+                scanned.add(table)
+    return scanned
+
+
+def test_hot_path_indexes_exist(erp_db):
+    with get_connection() as conn:
+        names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert set(erp_database_schema.HOT_PATH_INDEXES) <= names
+
+
+@pytest.mark.parametrize("name", sorted(TRACED_CALLS))
+def test_crud_queries_avoid_full_scans(erp_db, name):
+    seed_data()
+    statements = []
+    with get_connection() as conn:
+        conn.set_trace_callback(statements.append)
+        try:
+            TRACED_CALLS[name]()
+        finally:
+            conn.set_trace_callback(None)
+
+        queries = [sql for sql in statements if sql.lstrip().split(None, 1)[0].upper() in ("SELECT", "UPDATE", "DELETE", "WITH")]
+        assert queries, f"{name} 沒有執行任何查詢"
+        for sql in queries:
+            assert not full_table_scans(conn, sql), f"{name} 整表掃描: {sql}"
+
+
+def test_whole_table_readers_exist():
+    assert WHOLE_TABLE_READERS <= set(CRUD_FUNCTIONS)
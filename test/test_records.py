@@ -0,0 +1,90 @@
+import pickle
+
+from models.erp_database_schema import get_connection, get_pool
+from models.records import ItemRecord, Record, StockMovementRecord, StockRecord, record_class
+from models.itemmaster_crud import add_item, get_items, get_item_by_id
+from models.supplieritemmap_crud import add_supplier_item_mapping, get_supplier_item_mappings
+from models.supplier_crud import add_supplier
+from models.stock_crud import add_stock, get_stock_by_item, get_stocks, iter_stocks
+from models.stockmovement_crud import add_stock_movement, iter_stock_movements, get_stock_movements
+
+
+def test_table_rows_use_slots_records(erp_db):
+    add_item("原料A", "原料", "食品添加物", "kg")
+    item = get_item_by_id(1)
+    assert type(item) is ItemRecord
+    assert not hasattr(item, "__dict__")
+    assert item.ItemName == item["ItemName"] == "原料A"
+    assert item == {"ItemID": 1, "ItemName": "原料A", "ItemType": "原料",
+                    "Category": "食品添加物", "Unit": "kg", "Status": "active"}
+    assert get_items()[0] == item
+
+    add_stock_movement(1, None, "IN", 5, "2025-01-01", "B1", warehouse_id=2)
+    movement = get_stock_movements()[0]
+    assert type(movement) is StockMovementRecord
+    assert movement.WarehouseID == 2 and movement.BatchNo == "B1"
+
+    add_supplier("供應商A")
+    add_stock(1, 2, 5, "B1", "2025-12-31", 1)
+    stock = get_stocks()[0]
+    assert type(stock) is StockRecord
+    assert stock.SupplierID == 1 and stock.WarehouseID == 2
+    assert type(get_stock_by_item(1)[0]) is StockRecord
+
+
+def test_record_behaves_like_dict():
+    item = ItemRecord(1, "原料A", "原料", None, "kg", "active")
+    assert item.get("Category", "無") is None
+    assert item.get("Missing", "無") == "無"
+    assert "Unit" in item and "Missing" not in item
+    assert list(item.keys())[:2] == ["ItemID", "ItemName"]
+
+    item["Unit"] = "g"
+    item["StockQuantity"] = 5
+    assert item.Unit == "g"
+    assert item["StockQuantity"] == 5 and len(item) == 7
+    assert dict(item)["StockQuantity"] == 5
+    assert item.copy() == item
+    assert pickle.loads(pickle.dumps(item)) == item
+
+
+def test_join_rows_get_cached_dynamic_class(erp_db):
+    add_item("原料A", "原料", "食品添加物", "kg")
+    add_supplier("供應商A")
+    add_supplier_item_mapping(1, 1, moq=10, price=5.0, lead_time=3)
+    row = get_supplier_item_mappings()[0]
+    assert isinstance(row, Record)
+    assert row["SupplierName"] == "供應商A"
+    assert record_class(tuple(row.keys())) is type(row)
+
+
+def test_unnamed_columns_fall_back_to_dict():
+    assert record_class(("COUNT(*)",)) is None
+    assert record_class(("ItemID", "ItemID")) is None
+    assert record_class(("keys",)) is None
+
+
+# === 逐批讀取 ===
+def test_iter_stock_movements_streams_in_chunks(erp_db):
+    add_item("原料A", "原料", "食品添加物", "kg")
+    for i in range(5):
+        add_stock_movement(1, None, "IN", i + 1, "2025-01-01", f"B{i}")
+
+    chunks = list(iter_stock_movements(arraysize=2, chunked=True))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert [row["Quantity"] for row in iter_stock_movements(arraysize=2)] == [1, 2, 3, 4, 5]
+    assert get_stock_movements() == [row for chunk in chunks for row in chunk]
+
+
+def test_generator_outliving_caller_keeps_connection(erp_db):
+    add_item("原料A", "原料", "食品添加物", "kg")
+    add_stock(1, 1, 10, "B1", None)
+    add_stock(1, 1, 20, "B2", None)
+
+    rows = iter_stocks(arraysize=1)
+    with get_connection() as conn:
+        first = next(rows)
+    # 呼叫端的區塊已結束，generator 仍持有連線，可以繼續讀取
+    assert get_pool().current_connection() is conn
+    assert [first["Quantity"]] + [row["Quantity"] for row in rows] == [10, 20]
+    assert get_pool().current_connection() is None
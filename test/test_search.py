@@ -0,0 +1,139 @@
+from models import erp_database_schema, migrations
+from models.erp_database_schema import get_connection
+from models.itemmaster_crud import add_item, get_items, iter_items, update_item, delete_item
+from models.customer_crud import add_customer, get_customers
+from models.supplier_crud import add_supplier
+from models.bomheader_crud import add_bom_header, get_bom_headers
+from models.stockmovement_crud import add_stock_movement, get_stock_movements, iter_stock_movements
+from models.search_crud import fts_enabled, match_condition, search
+
+
+def item_ids(rows):
+    return [row["ItemID"] for row in rows]
+
+
+def test_cjk_terms_match_mid_string(erp_db):
+    add_item("有機高筋麵粉", "原料", None, "kg")
+    add_item("低筋麵粉", "原料", None, "kg")
+    add_item("砂糖", "原料", None, "kg")
+    assert fts_enabled("items")
+    assert item_ids(get_items("高筋麵粉")) == [1]
+    assert item_ids(get_items("筋麵粉")) == [1, 2]
+    # 少於三個字時退回 LIKE，結果仍然一致
+    assert item_ids(get_items("麵粉")) == [1, 2]
+    assert item_ids(get_items("糖")) == [3]
+
+
+def test_triggers_keep_index_in_sync(erp_db):
+    add_item("黑芝麻粉", "原料", None, "kg")
+    add_item("白芝麻粉", "原料", None, "kg")
+    update_item(1, new_name="黑豆粉末")
+    assert item_ids(get_items("芝麻粉")) == [2]
+    assert item_ids(get_items("黑豆粉")) == [1]
+    delete_item(2, soft_delete=False)
+    with get_connection() as conn:
+        assert conn.execute("SELECT rowid FROM ItemSearch WHERE ItemSearch MATCH '芝麻粉'").fetchall() == []
+
+
+def test_search_ranks_prefix_matches_first(erp_db):
+    add_customer("台北烘焙坊", tax_id="1")
+    add_customer("烘焙坊", tax_id="2", contact_person="王烘焙坊")
+    add_supplier("烘焙坊原料行")
+    add_item("烘焙坊專用粉", "原料", None, "kg")
+    add_bom_header(1, "烘焙坊v1", "2025-01-01", 1.0)
+
+    hits = search("烘焙坊")
+    assert {(hit["Kind"], hit["ID"]) for hit in hits} == {
+        ("customers", 1), ("customers", 2), ("suppliers", 1), ("items", 1), ("boms", 1)}
+    assert [hit["Prefix"] for hit in hits] == sorted((hit["Prefix"] for hit in hits), reverse=True)
+    assert ("customers", 1) == (hits[-1]["Kind"], hits[-1]["ID"])
+    assert [hit["ID"] for hit in search("烘焙坊", kinds=["customers"], limit=1)] == [2]
+    assert search("  ") == []
+
+
+def test_readers_combine_fts_with_joins(erp_db):
+    add_item("全麥吐司", "成品", None, "條")
+    add_bom_header(1, "A", "2025-01-01", 1.0, remarks="無添加配方")
+    add_bom_header(1, "B", "2025-01-01", 1.0)
+    add_customer("全麥食品行", tax_id="1", phone="0912345678")
+    assert [b["BOMID"] for b in get_bom_headers("全麥吐")] == [1, 2]
+    assert [b["BOMID"] for b in get_bom_headers("無添加")] == [1]
+    assert [c["CustomerID"] for c in get_customers("2345")] == [1]
+    # 短搜尋詞退回 LIKE 時同樣以子查詢比對其他資料表
+    add_supplier("全麥供應商")
+    add_stock_movement(1, 1, "IN", 10, "2025-01-01", "B1")
+    assert [m["MovementID"] for m in get_stock_movements("吐司")] == [1]
+    # 特殊字元不會被當成 FTS5 語法
+    assert get_customers('全麥" OR "x') == []
+
+
+def test_fts_check_is_cached_per_connection(erp_db):
+    with get_connection() as conn:
+        statements = []
+        conn.set_trace_callback(statements.append)
+        try:
+            for _ in range(3):
+                match_condition("items", "高筋麵粉", conn=conn)
+                match_condition("customers", "烘焙坊", conn=conn)
+        finally:
+            conn.set_trace_callback(None)
+    assert sum("sqlite_master" in statement for statement in statements) <= 1
+
+
+def test_fts_migration_is_retried_when_trigram_becomes_available(tmp_path, monkeypatch):
+    monkeypatch.setattr(erp_database_schema, "DB_NAME", str(tmp_path / "no_fts.db"))
+    monkeypatch.setattr(migrations, "fts5_trigram_available", lambda conn: False)
+    erp_database_schema.close_connections()
+    try:
+        latest = erp_database_schema.MIGRATIONS[-1][0]
+        fts_version = next(version for version, name, _ in erp_database_schema.MIGRATIONS if name == "補建全文索引")
+        assert erp_database_schema.create_tables() == latest            # 其他遷移照常前進
+        add_item("低筋麵粉", "原料", None, "kg")
+        assert not fts_enabled("items")
+        assert item_ids(get_items("筋麵粉")) == [1]                   # 退回 LIKE
+
+        # 再次啟動只重試延後的遷移，不重跑之後的遷移（例如重算 BOM 成本與低庫存警示）
+        statements = []
+        with get_connection() as conn:
+            assert migrations.get_deferred_migrations(conn) == [fts_version]
+            conn.set_trace_callback(statements.append)
+            try:
+                assert erp_database_schema.create_tables() == latest
+            finally:
+                conn.set_trace_callback(None)
+            assert migrations.get_deferred_migrations(conn) == [fts_version]
+        assert statements and not any("BOMCost" in sql or "LowStockAlert" in sql for sql in statements)
+
+        monkeypatch.undo()
+        monkeypatch.setattr(erp_database_schema, "DB_NAME", str(tmp_path / "no_fts.db"))
+        erp_database_schema.close_connections()
+        assert erp_database_schema.create_tables() == latest
+        assert fts_enabled("items")
+        with get_connection() as conn:
+            assert migrations.get_deferred_migrations(conn) == []
+            assert conn.execute("SELECT rowid FROM ItemSearch WHERE ItemSearch MATCH '筋麵粉'").fetchall() == [(1,)]
+    finally:
+        erp_database_schema.close_connections()
+
+
+def test_match_uses_virtual_table_instead_of_scan(erp_db):
+    with get_connection() as conn:
+        condition, params = match_condition("customers", "烘焙坊", ("CustomerName",), conn=conn)
+        plan = conn.execute(f"EXPLAIN QUERY PLAN SELECT * FROM Customer WHERE {condition}", params).fetchall()
+    details = [row[-1] for row in plan]
+    assert any("CustomerSearch VIRTUAL TABLE INDEX" in detail for detail in details)
+    assert "SCAN Customer" not in details
+
+
+def test_list_readers_filter_in_sql(erp_db):
+    add_item("原料A", "原料", "食品添加物", "kg")
+    add_item("原料B", "原料", "食品添加物", "kg")
+    add_stock_movement(1, None, "IN", 1, "2025-01-01", "B1")
+    add_stock_movement(2, None, "IN", 2, "2025-01-01", "B2")
+    assert [row["ItemID"] for row in iter_stock_movements("原料B")] == [2]
+    assert [row["ItemName"] for row in iter_items("B")] == ["原料B"]
+
+    add_bom_header(1, "V1", "2025-01-01", 100.0, remarks="試產")
+    add_bom_header(2, "V2", "2025-01-01", 100.0)
+    assert [bom["BOMID"] for bom in get_bom_headers("試產")] == [1]
+    assert [bom["BOMID"] for bom in get_bom_headers("原料B")] == [2]
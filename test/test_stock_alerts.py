@@ -0,0 +1,120 @@
+import random
+
+from models.erp_database_schema import get_connection
+from models.itemmaster_crud import add_item
+from models.supplier_crud import add_supplier
+from models.supplieritemmap_crud import (add_supplier_item_mapping, update_supplier_item_mapping,
+                                         delete_supplier_item_mapping)
+from models.stockmovement_crud import add_stock_movement, bulk_add_stock_movements, delete_stock_movement
+from models.stockbalance_crud import get_stock_levels, rebuild_stock_balance
+from models.stockalert_crud import (LowStockMonitor, get_low_stock_alerts, get_low_stock_revision,
+                                    rebuild_low_stock_alerts)
+
+
+def below_safety_keys():
+    """以完整的批次查詢重新比對（與觸發器維護的警示比對用）"""
+    return {(row["ItemID"], row["SupplierID"]) for row in get_stock_levels() if row["BelowSafety"]}
+
+
+def alert_keys():
+    return {(row["ItemID"], row["SupplierID"]) for row in get_low_stock_alerts()}
+
+
+def test_stock_levels_join_safety_and_sort_below_first(erp_db):
+    add_item("麵粉", "原料", None, "g")
+    add_item("砂糖", "原料", None, "g")
+    add_supplier("供應商A")
+    add_supplier_item_mapping(1, 2, safety_stock_level=50.0)
+    add_stock_movement(1, 1, "IN", 10, "2025-01-01", None)
+    add_stock_movement(2, 1, "IN", 20, "2025-01-01", "B1")
+    add_stock_movement(2, 1, "IN", 20, "2025-01-01", "B2")
+    add_stock_movement(1, None, "OUT", 5, "2025-01-01", None)
+
+    rows = get_stock_levels()
+    assert [(row["ItemName"], row["SupplierName"], row["StockQuantity"], row["SafetyStockLevel"], row["BelowSafety"])
+            for row in rows] == [("麵粉", None, -5.0, 0.0, 1), ("砂糖", "供應商A", 40.0, 50.0, 1),
+                                 ("麵粉", "供應商A", 10.0, 0.0, 0)]
+    assert [row["ItemID"] for row in get_stock_levels("砂糖")] == [2]
+
+
+def test_alerts_follow_movements_and_safety_changes(erp_db):
+    for name in ["麵粉", "砂糖", "奶油", "雞蛋"]:
+        add_item(name, "原料", None, "g")
+    add_supplier("供應商A")
+    add_supplier("供應商B")
+    rng = random.Random(11)
+    mappings = {}
+    for item_id in range(1, 5):
+        for supplier_id in (1, 2):
+            add_supplier_item_mapping(supplier_id, item_id, safety_stock_level=rng.choice([0.0, 20.0, 80.0]))
+            mappings[(item_id, supplier_id)] = len(mappings) + 1
+
+    for step in range(120):
+        action = rng.random()
+        if action < 0.7:
+            add_stock_movement(rng.randint(1, 4), rng.choice([None, 1, 2]), rng.choice(["IN", "IN", "OUT"]),
+                               rng.randint(1, 40), "2025-01-01", rng.choice([None, "B1"]))
+        elif action < 0.85:
+            with get_connection() as conn:
+                movement_id = conn.execute("SELECT MovementID FROM StockMovement ORDER BY RANDOM() LIMIT 1").fetchone()
+            if movement_id:
+                delete_stock_movement(movement_id[0])
+        else:
+            update_supplier_item_mapping(rng.choice(list(mappings.values())),
+                                         safety_stock_level=rng.choice([0.0, 30.0, 100.0]))
+        assert alert_keys() == below_safety_keys(), f"第 {step} 步"
+    with get_connection() as conn:
+        totals = dict(((item_id, supplier_id), quantity) for item_id, supplier_id, quantity
+                      in conn.execute("SELECT ItemID, SupplierID, Quantity FROM StockTotal"))
+        assert totals == dict(((item_id, supplier_id), quantity) for item_id, supplier_id, quantity in conn.execute(
+            "SELECT ItemID, SupplierID, SUM(Quantity) FROM StockBalance GROUP BY ItemID, SupplierID"))
+
+    delete_supplier_item_mapping(mappings[(1, 1)])
+    bulk_add_stock_movements([(3, 2, "OUT", 500, "2025-01-02", None)])
+    assert alert_keys() == below_safety_keys()
+    rebuild_stock_balance()
+    assert alert_keys() == below_safety_keys()
+    expected = alert_keys()
+    assert rebuild_low_stock_alerts() == len(expected)
+    assert alert_keys() == expected
+
+
+def test_revision_changes_only_with_membership(erp_db):
+    add_item("麵粉", "原料", None, "g")
+    add_supplier("供應商A")
+    add_supplier_item_mapping(1, 1, safety_stock_level=100.0)
+    monitor = LowStockMonitor()
+    assert monitor.poll() == ([], [])
+
+    add_stock_movement(1, 1, "IN", 30, "2025-01-01", None)
+    change = monitor.poll()
+    assert [(row["ItemID"], row["SupplierID"], row["StockQuantity"]) for row in change.added] == [(1, 1, 30.0)]
+    assert change.removed == []
+
+    revision = get_low_stock_revision()
+    add_stock_movement(1, 1, "IN", 30, "2025-01-02", None)       # 仍低於安全水位，只更新數量
+    assert get_low_stock_revision() == revision
+    assert monitor.poll() is None
+    assert get_low_stock_alerts()[0]["StockQuantity"] == 60.0
+
+    update_supplier_item_mapping(1, safety_stock_level=50.0)
+    assert monitor.poll() == ([], [(1, 1)])
+    assert len(monitor) == 0
+
+
+def test_alert_triggers_keep_totals_without_reaggregating(erp_db):
+    add_item("麵粉", "原料", None, "g")
+    add_supplier("供應商A")
+    add_supplier_item_mapping(1, 1, safety_stock_level=500.0)
+    bulk_add_stock_movements([(1, 1, "IN", 10, "2025-01-01", f"B{batch}") for batch in range(40)])
+    with get_connection() as conn:
+        triggers = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'lowstock%'")
+        assert all("SUM(" not in sql.upper() for _, sql in triggers)
+        assert conn.execute("SELECT Quantity, BalanceCount FROM StockTotal").fetchall() == [(400.0, 40)]
+    assert [(row["ItemID"], row["SupplierID"], row["StockQuantity"]) for row in get_low_stock_alerts()] == [(1, 1, 400.0)]
+
+    with get_connection() as conn:
+        for (movement_id,) in conn.execute("SELECT MovementID FROM StockMovement").fetchall():
+            delete_stock_movement(movement_id)
+        assert conn.execute("SELECT COUNT(*) FROM StockTotal").fetchone()[0] == 0
+    assert get_low_stock_alerts() == []
@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+from models.erp_database_schema import get_connection
+from models.itemmaster_crud import add_item
+from models.supplier_crud import add_supplier
+from models.stockmovement_crud import (add_stock_movement, bulk_add_stock_movements, update_stock_movement,
+                                       delete_stock_movement)
+from models.stockbalance_crud import get_stock_balances, get_stock_summary, rebuild_stock_balance
+
+
+def ledger_totals():
+    """直接彙總 StockMovement（與餘額表比對用）"""
+    with get_connection() as conn:
+        rows = conn.execute('''
+            SELECT ItemID, SupplierID,
+                   SUM(CASE WHEN MovementType = 'IN' THEN Quantity ELSE 0 END) -
+                   SUM(CASE WHEN MovementType = 'OUT' THEN Quantity ELSE 0 END)
+            FROM StockMovement GROUP BY ItemID, SupplierID
+        ''').fetchall()
+    return {(item_id, supplier_id): pytest.approx(quantity) for item_id, supplier_id, quantity in rows}
+
+
+def summary_totals(search_text=None):
+    return {(row["ItemID"], row["SupplierID"]): row["StockQuantity"] for row in get_stock_summary(search_text)}
+
+
+def test_balance_tracks_every_write(erp_db):
+    for name in ["麵粉", "砂糖", "奶油"]:
+        add_item(name, "原料", None, "g")
+    add_supplier("供應商A")
+    add_supplier("供應商B")
+    rng = random.Random(7)
+    for _ in range(60):
+        add_stock_movement(rng.randint(1, 3), rng.choice([None, 1, 2]), rng.choice(["IN", "OUT"]),
+                           rng.randint(1, 50), "2025-01-01", rng.choice([None, "B1", "B2"]),
+                           warehouse_id=rng.choice([None, 1]))
+    bulk_add_stock_movements([(1, 1, "IN", 5, "2025-01-02", "B3"), (2, None, "OUT", 2, "2025-01-02", None)])
+    for movement_id in rng.sample(range(1, 61), 20):
+        update_stock_movement(movement_id, rng.randint(1, 3), rng.choice([None, 1, 2]), rng.choice(["IN", "OUT"]),
+                              rng.randint(1, 50), "2025-01-03", rng.choice([None, "B1"]))
+    for movement_id in rng.sample(range(1, 63), 25):
+        delete_stock_movement(movement_id)
+
+    assert summary_totals() == ledger_totals()
+    with get_connection() as conn:
+        maintained = conn.execute("SELECT * FROM StockBalance ORDER BY 1, 2, 3, 4").fetchall()
+    assert rebuild_stock_balance() == len(maintained)
+    with get_connection() as conn:
+        rebuilt = conn.execute("SELECT * FROM StockBalance ORDER BY 1, 2, 3, 4").fetchall()
+    assert [row[:4] + (row[5],) for row in rebuilt] == [row[:4] + (row[5],) for row in maintained]
+    assert [row[4] for row in rebuilt] == pytest.approx([row[4] for row in maintained])
+
+
+def test_balance_keys_and_cleanup(erp_db):
+    add_item("麵粉", "原料", None, "g")
+    add_supplier("供應商A")
+    add_stock_movement(1, 1, "IN", 10, "2025-01-01", "B1", warehouse_id=2)
+    add_stock_movement(1, None, "IN", 4, "2025-01-01", None)
+    add_stock_movement(1, None, "OUT", 1, "2025-01-02", None)
+    assert [(b["SupplierID"], b["WarehouseID"], b["BatchNo"], b["Quantity"]) for b in get_stock_balances(1)] == [
+        (None, None, None, 3.0), (1, 2, "B1", 10.0)]
+    assert summary_totals("供應商A") == {(1, 1): 10.0}
+    assert summary_totals("麵粉") == {(1, 1): 10.0, (1, None): 3.0}
+    # 某個鍵的異動全部刪除後，餘額列也會移除
+    delete_stock_movement(1)
+    assert [b["SupplierID"] for b in get_stock_balances(1)] == [None]
+
+
+def test_summary_reads_balance_not_ledger(erp_db):
+    with get_connection() as conn:
+        statements = []
+        conn.set_trace_callback(statements.append)
+        try:
+            get_stock_summary("麵粉原料", conn=conn)
+        finally:
+            conn.set_trace_callback(None)
+    assert any("FROM StockBalance" in statement for statement in statements)
+    assert not any("StockMovement" in statement for statement in statements)
@@ -0,0 +1,130 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from models.erp_database_schema import get_connection
+from models.itemmaster_crud import add_item
+from models.stockmovement_crud import bulk_add_stock_movements, add_stock_movement, delete_stock_movement
+from models.stocksnapshot_crud import (create_periodic_snapshots, create_stock_snapshot, delete_stock_snapshots,
+                                       get_snapshot_dates, get_stock_as_of)
+
+
+def ledger_as_of(as_of, item_id=None):
+    """直接彙總 as_of 以前的全部異動（與快照結果比對用）"""
+    with get_connection() as conn:
+        rows = conn.execute('''
+            SELECT ItemID, SupplierID, WarehouseID, BatchNo,
+                   SUM(CASE MovementType WHEN 'IN' THEN Quantity WHEN 'OUT' THEN -Quantity ELSE 0 END)
+            FROM StockMovement
+            WHERE MovementDate <= ? AND (? IS NULL OR ItemID = ?)
+            GROUP BY IFNULL(ItemID, 0), IFNULL(SupplierID, 0), IFNULL(WarehouseID, 0), IFNULL(BatchNo, '')
+            HAVING SUM(CASE MovementType WHEN 'IN' THEN Quantity WHEN 'OUT' THEN -Quantity ELSE 0 END) != 0
+        ''', (as_of, item_id, item_id)).fetchall()
+    return {tuple(row[:4]): pytest.approx(row[4]) for row in rows}
+
+
+def snapshot_rows(snapshot_date):
+    with get_connection() as conn:
+        rows = conn.execute("SELECT ItemID, SupplierID, WarehouseID, BatchNo, Quantity FROM StockSnapshot "
+                            "WHERE SnapshotDate = ?", (snapshot_date,)).fetchall()
+    return {tuple(row[:4]): row[4] for row in rows}
+
+
+def as_of_totals(as_of, item_id=None):
+    return {(row["ItemID"], row["SupplierID"], row["WarehouseID"], row["BatchNo"]): row["Quantity"]
+            for row in get_stock_as_of(as_of, item_id)}
+
+
+@pytest.fixture
+def ledger(erp_db):
+    for name in ["麵粉", "砂糖", "奶油"]:
+        add_item(name, "原料", None, "g")
+    rng = random.Random(3)
+    start = date(2023, 1, 1)
+    bulk_add_stock_movements([
+        (rng.randint(1, 3), rng.choice([None, 1, 2]), rng.choice(["IN", "IN", "OUT"]), rng.randint(1, 100),
+         (start + timedelta(days=rng.randrange(3 * 365))).isoformat(), rng.choice([None, "B1"]))
+        for _ in range(600)
+    ])
+    return rng
+
+
+def test_as_of_matches_full_ledger(ledger):
+    created = create_periodic_snapshots("month", until="2025-12-31")
+    assert len(created) == 36
+    assert created[0] == "2023-01-31" and created[-1] == "2025-12-31"
+    assert create_periodic_snapshots("month", until="2025-12-31") == []
+    for as_of in ["2022-12-31", "2023-01-31", "2023-06-15", "2024-02-29", "2025-07-01", "2026-01-01"]:
+        assert as_of_totals(as_of) == ledger_as_of(as_of)
+        assert as_of_totals(as_of, item_id=2) == ledger_as_of(as_of, 2)
+
+
+def test_interval_snapshots_and_rebuild(ledger):
+    created = create_periodic_snapshots(90, until="2023-12-31")
+    assert created == ["2023-03-31", "2023-06-29", "2023-09-27", "2023-12-26"]
+    assert as_of_totals("2023-10-01") == ledger_as_of("2023-10-01")
+    # 重建同一天的快照不會重複累加
+    create_stock_snapshot("2023-06-29")
+    assert as_of_totals("2023-06-29") == ledger_as_of("2023-06-29")
+    assert delete_stock_snapshots("2023-07-01") == 2
+    assert get_snapshot_dates() == ["2023-09-27", "2023-12-26"]
+    assert as_of_totals("2023-12-31") == ledger_as_of("2023-12-31")
+    with pytest.raises(ValueError):
+        create_periodic_snapshots(0)
+
+
+def test_backdated_movements_adjust_later_snapshots(ledger):
+    create_periodic_snapshots("month", until="2024-12-31")
+    dates = get_snapshot_dates()
+    before = {snapshot_date: snapshot_rows(snapshot_date) for snapshot_date in dates}
+    add_stock_movement(1, None, "IN", 1000, "2024-03-10", None)
+    with get_connection() as conn:
+        movement_id = conn.execute("SELECT MAX(MovementID) FROM StockMovement").fetchone()[0]
+
+    # 快照全部保留，只有該日期起的快照中 (1, 0, 0, '') 這個鍵增加 1000
+    assert get_snapshot_dates() == dates
+    key = (1, 0, 0, "")
+    for snapshot_date in dates:
+        expected = dict(before[snapshot_date])
+        if snapshot_date >= "2024-03-10":
+            expected[key] = expected.get(key, 0) + 1000
+        assert snapshot_rows(snapshot_date) == pytest.approx(expected)
+    assert as_of_totals("2024-06-30") == ledger_as_of("2024-06-30")
+
+    delete_stock_movement(movement_id)
+    assert get_snapshot_dates() == dates
+    for snapshot_date in dates:
+        assert snapshot_rows(snapshot_date) == pytest.approx(before[snapshot_date])
+    assert as_of_totals("2024-12-31") == ledger_as_of("2024-12-31")
+
+    # 快照之後的異動不影響既有快照
+    add_stock_movement(1, None, "OUT", 5, "2025-01-05", None)
+    assert snapshot_rows("2024-12-31") == pytest.approx(before["2024-12-31"])
+
+
+def test_snapshot_drops_keys_that_reach_zero(erp_db):
+    add_item("麵粉", "原料", None, "g")
+    add_stock_movement(1, None, "IN", 10, "2024-01-05", "B1")
+    add_stock_movement(1, None, "IN", 4, "2024-01-06", "B2")
+    create_stock_snapshot("2024-01-31")
+    assert snapshot_rows("2024-01-31") == {(1, 0, 0, "B1"): 10, (1, 0, 0, "B2"): 4}
+
+    add_stock_movement(1, None, "OUT", 10, "2024-01-20", "B1")     # 補登後 B1 歸零
+    assert get_snapshot_dates() == ["2024-01-31"]
+    assert snapshot_rows("2024-01-31") == {(1, 0, 0, "B2"): 4}
+    assert as_of_totals("2024-01-31") == {(1, None, None, "B2"): 4}
+
+    # 重建時也不保存零庫存的鍵
+    create_stock_snapshot("2024-01-31")
+    assert snapshot_rows("2024-01-31") == {(1, 0, 0, "B2"): 4}
+
+
+def test_delta_replay_uses_movement_date_index(ledger):
+    create_periodic_snapshots("month", until="2025-12-31")
+    with get_connection() as conn:
+        plan = conn.execute('''
+            EXPLAIN QUERY PLAN
+            SELECT * FROM StockMovement WHERE MovementDate > '2025-06-30' AND MovementDate <= '2025-07-15'
+        ''').fetchall()
+    assert any("idx_stockmovement_date" in row[3] for row in plan)
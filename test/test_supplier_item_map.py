@@ -0,0 +1,42 @@
+from models.erp_database_schema import get_connection
+from models.itemmaster_crud import add_item
+from models.supplier_crud import add_supplier
+from models.supplieritemmap_crud import (add_supplier_item_mapping, get_latest_supplier_price,
+                                         get_latest_supplier_prices, get_supplier_item_mappings)
+
+
+def test_latest_supplier_prices_in_one_query(erp_db):
+    for i in range(1, 61):
+        add_item(f"原料{i}", "原料", None, "g")
+    add_supplier("供應商A")
+    add_supplier("供應商B")
+    for item_id in range(1, 61):
+        add_supplier_item_mapping(1 + item_id % 2, item_id, price=float(item_id))
+    pairs = [(1 + item_id % 2, item_id) for item_id in range(1, 61)] + [(1, 1), (2, 999)]
+
+    with get_connection() as conn:
+        statements = []
+        conn.set_trace_callback(statements.append)
+        try:
+            prices = get_latest_supplier_prices(pairs, conn=conn)
+        finally:
+            conn.set_trace_callback(None)
+    assert len(statements) == 1
+    assert len(prices) == 60
+    assert all(prices[pair] == get_latest_supplier_price(*pair) for pair in pairs[:60])
+    assert (1, 1) not in prices and (2, 999) not in prices
+    assert get_latest_supplier_prices([]) == {}
+
+
+def test_mappings_filter_by_supplier_or_item_name(erp_db):
+    add_item("麵粉", "原料", None, "g")
+    add_item("砂糖", "原料", None, "g")
+    add_supplier("大成麵粉廠")
+    add_supplier("台糖公司")
+    add_supplier_item_mapping(1, 1, price=10.0)
+    add_supplier_item_mapping(2, 2, price=20.0)
+    add_supplier_item_mapping(2, 1, price=12.0)
+
+    assert len(get_supplier_item_mappings()) == 3
+    assert {m["MappingID"] for m in get_supplier_item_mappings("麵粉")} == {1, 3}
+    assert [m["ItemName"] for m in get_supplier_item_mappings("台糖公司")] == ["砂糖", "麵粉"]
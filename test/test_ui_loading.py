@@ -0,0 +1,307 @@
+import os
+import sys
+import time
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtWidgets = pytest.importorskip("PyQt5.QtWidgets")
+
+from PyQt5.QtCore import Qt
+
+from models.erp_database_schema import get_connection, get_pool
+from models.itemmaster_crud import ITEM_KEYSET, add_item, bulk_add_items, get_items, iter_items
+from ui.async_query import QueryRunner
+from ui.deferred_load import DeferredLoadMixin
+from ui.lazy_tabs import LazyTabWidget
+from ui.search_controller import SearchController
+from ui.table_model import Column, LazyTableModel
+
+
+@pytest.fixture(scope="module")
+def qapp():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv[:1])
+
+
+class CountingPage(DeferredLoadMixin, QtWidgets.QWidget):
+    def __init__(self):
+        super().__init__()
+        self.loads = 0
+
+    def load_data(self):
+        self.loads += 1
+
+
+def test_page_loads_on_show_only_when_stale(erp_db, qapp):
+    page = CountingPage()
+    assert page.loads == 0
+    page.show()
+    assert page.loads == 1
+    page.hide()
+    page.show()
+    assert page.loads == 1          # 資料未變更，不重新查詢
+    page.hide()
+    add_item("原料A", "原料", "食品添加物", "kg")
+    page.show()
+    assert page.loads == 2
+
+
+def test_lazy_tabs_build_pages_on_first_activation(erp_db, qapp):
+    tabs = LazyTabWidget()
+    tabs.add_lazy_tab("ui.customer_page", "CustomerPage", "客戶管理")
+    tabs.add_lazy_tab("ui.supplier_page", "SupplierPage", "供應商管理")
+    assert list(tabs.build_times) == ["CustomerPage"]
+    assert tabs.page("SupplierPage") is None
+
+    tabs.setCurrentIndex(1)
+    assert tabs.currentWidget() is tabs.page("SupplierPage")
+    assert tabs.tabText(1) == "供應商管理"
+
+
+# === 背景查詢 ===
+SLOW_QUERY = """
+    WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 100000000)
+    SELECT COUNT(*) FROM n
+"""
+
+
+def _slow_count():
+    with get_connection() as conn:
+        return conn.execute(SLOW_QUERY).fetchone()[0]
+
+
+def _wait(qapp, condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        qapp.processEvents()
+        time.sleep(0.01)
+    return condition()
+
+
+def test_new_request_cancels_running_query(erp_db, qapp):
+    runner = QueryRunner()
+    results, errors, busy = [], [], []
+    runner.busy_changed.connect(busy.append)
+
+    runner.submit("load", _slow_count, on_result=results.append, on_error=errors.append)
+    time.sleep(0.2)   # 讓慢查詢開始執行
+    runner.submit("load", get_items, on_result=results.append, on_error=errors.append)
+
+    assert _wait(qapp, lambda: not runner.is_busy())
+    assert results == [[]] and errors == []
+    assert busy[0] is True and busy[-1] is False
+
+
+def test_cancel_interrupts_query_and_drops_result(erp_db, qapp):
+    runner = QueryRunner()
+    results = []
+    runner.submit("load", _slow_count, on_result=results.append)
+    time.sleep(0.2)
+    started = time.monotonic()
+    runner.cancel("load")
+    assert not runner.is_busy()
+    # 被中斷的查詢應很快歸還連線，執行緒池得以清空
+    assert runner.thread_pool.waitForDone(5000)
+    assert time.monotonic() - started < 5
+    qapp.processEvents()
+    assert results == []
+
+
+# === 表格模型 ===
+def test_lazy_model_fetches_in_batches(erp_db, qapp):
+    bulk_add_items([(f"原料{i:03d}", "原料", "食品添加物", "kg") for i in range(450)])
+    model = LazyTableModel([Column("ID", "ItemID"), Column("物料名稱", "ItemName")], batch_size=200)
+    model.set_source(lambda: iter_items())
+    assert model.rowCount() == 0 and model.canFetchMore()
+
+    sizes = []
+    while model.canFetchMore():
+        model.fetchMore()
+        sizes.append(model.rowCount())
+    assert sizes == [200, 400, 450]
+    assert model.index(449, 1).data() == "原料449"
+    assert model.headerData(1, Qt.Horizontal) == "物料名稱"
+    # 讀完後 generator 結束，連線深度歸零
+    assert get_pool().current_connection() is None
+
+
+def test_lazy_model_reset_releases_pending_source(erp_db, qapp):
+    bulk_add_items([(f"原料{i}", "原料", None, "kg") for i in range(10)])
+    model = LazyTableModel([Column("ID", "ItemID")], batch_size=3)
+    model.set_source(lambda: iter_items())
+    model.fetchMore()
+    assert get_pool().current_connection() is not None   # 尚未讀完，generator 持有連線
+    model.set_rows([{"ItemID": 99}])
+    assert get_pool().current_connection() is None
+    assert model.row_at(0)["ItemID"] == 99 and not model.canFetchMore()
+
+
+def test_header_sort_requeries_in_sql(erp_db, qapp):
+    bulk_add_items([("原料B", "原料", None, "kg"), ("原料C", "原料", None, "kg"), ("原料A", "原料", None, "kg")])
+    model = LazyTableModel([Column("ID", "ItemID", sort="ItemID"), Column("物料名稱", "ItemName", sort="ItemName"),
+                            Column("單位", lambda item: item["Unit"])], batch_size=2)
+    model.set_query(iter_items, ITEM_KEYSET)
+    model.sort(1, Qt.DescendingOrder)
+    assert model.order_by == "-ItemName" and model.rowCount() == 0
+    while model.canFetchMore():
+        model.fetchMore()
+    assert [model.index(row, 1).data() for row in range(3)] == ["原料C", "原料B", "原料A"]
+    model.sort(2, Qt.AscendingOrder)    # 沒有排序欄位的欄不重新查詢
+    assert model.order_by == "-ItemName" and model.rowCount() == 3
+
+
+def test_lazy_model_reads_pages_on_runner(erp_db, qapp):
+    bulk_add_items([(f"原料{i}", "原料", None, "kg") for i in range(5)])
+    runner = QueryRunner()
+    model = LazyTableModel([Column("ID", "ItemID", sort="ItemID")], batch_size=2, runner=runner)
+    model.set_query(iter_items, ITEM_KEYSET)
+    assert model.rowCount() == 0 and not model.canFetchMore()    # 第一頁正在背景讀取
+    assert _wait(qapp, lambda: model.rowCount() == 2)
+    while model.canFetchMore() or runner.is_busy():
+        model.fetchMore()
+        qapp.processEvents()
+    assert [model.row_at(row)["ItemID"] for row in range(5)] == [1, 2, 3, 4, 5]
+
+    model.sort(0, Qt.DescendingOrder)
+    model.set_rows([])          # 重設時取消尚未回來的分頁，舊結果不會加入表格
+    assert not runner.is_busy()
+    qapp.processEvents()
+    assert model.rowCount() == 0
+
+
+def test_customer_page_loads_on_runner(erp_db, qapp):
+    from models.customer_crud import add_customer
+    from ui.customer_page import CustomerPage
+
+    add_customer("客戶A", "台北市", phone="0912345678")
+    page = CustomerPage()
+    page.load_data()
+    assert page.model.rowCount() == 0 and page.runner.is_busy()
+    assert _wait(qapp, lambda: page.model.rowCount() == 1)
+    assert page.model.row_at(0)["CustomerName"] == "客戶A"
+
+
+def test_stale_reload_keeps_search_filter(erp_db, qapp):
+    from models.customer_crud import add_customer
+    from ui.customer_page import CustomerPage
+
+    add_customer("客戶A", "台北市", phone="0912345678")
+    add_customer("客戶B", "高雄市", phone="0987654321")
+    page = CustomerPage()
+    assert page.refresh_if_stale()
+    assert _wait(qapp, lambda: page.model.rowCount() == 2)
+    page.search_input.setText("客戶A")
+    page.search.flush()
+    assert _wait(qapp, lambda: page.model.rowCount() == 1)
+
+    add_customer("客戶C", "台中市", phone="0922333444")     # 其他分頁寫入
+    assert page.refresh_if_stale()
+    assert _wait(qapp, lambda: not page.runner.is_busy())
+    assert [page.model.row_at(row)["CustomerName"] for row in range(page.model.rowCount())] == ["客戶A"]
+
+
+def test_table_widget_pages_load_on_runner(erp_db, qapp):
+    from models.costhistory_crud import add_cost_history
+    from models.supplier_crud import add_supplier
+    from models.supplieritemmap_crud import add_supplier_item_mapping
+    from ui.bomhistory_page import CostHistoryPage
+    from ui.pricehistorypage import PriceHistoryPage
+    from ui.SupplierItemMapPage import SupplierItemMapPage
+    from ui.supplier_page import SupplierPage
+
+    add_item("麵粉", "原料", None, "g")
+    add_supplier("供應商A")
+    add_supplier_item_mapping(1, 1, price=12.5, safety_stock_level=3.0)
+    add_cost_history("麵包", 30.0)
+    for page_class, text in [(SupplierItemMapPage, "3.00"), (PriceHistoryPage, "12.50"), (CostHistoryPage, "$30.0"),
+                            (SupplierPage, "供應商A")]:
+        page = page_class()
+        page.load_data()
+        assert _wait(qapp, lambda: page.model.rowCount() == 1), page_class
+        row = [page.model.index(0, column).data() for column in range(page.model.columnCount())]
+        assert text in row
+
+
+# === 搜尋延遲觸發 ===
+def test_search_waits_for_typing_to_pause(qapp):
+    line_edit = QtWidgets.QLineEdit()
+    searches = []
+    search = SearchController(line_edit, searches.append, delay_ms=50)
+    for text in ["原", "原料", "原料A "]:
+        line_edit.setText(text)
+        qapp.processEvents()
+    assert searches == [] and search.is_pending()
+
+    assert _wait(qapp, lambda: searches)
+    time.sleep(0.1)
+    qapp.processEvents()
+    assert searches == ["原料A"]
+
+    line_edit.setText("  ")
+    search.flush()                  # Enter 立即搜尋，空白視為不篩選
+    assert searches == ["原料A", None] and not search.is_pending()
+
+
+def test_where_used_page_lists_parent_boms(erp_db, qapp):
+    from models.itemmaster_crud import add_item
+    from models.bomheader_crud import add_bom_header
+    from models.bomdetail_crud import add_bom_detail
+    from ui.where_used_page import WhereUsedPage
+
+    add_item("成品A", "成品", None, "g")
+    add_item("原料A", "原料", None, "g")
+    add_bom_detail(add_bom_header(1, "V1", "2025-01-01", 100.0), 2, 50, "%")
+    page = WhereUsedPage()
+    page.load_data("原料A")
+    page.item_model.fetchMore()
+    page.item_table.selectRow(0)
+    assert _wait(qapp, lambda: page.model.rowCount() == 1)
+    assert page.model.row_at(0)["ProductName"] == "成品A"
+    page.runner.cancel_all()
+
+
+def test_bom_dialog_total_uses_current_supplier_price(erp_db, qapp):
+    from models.supplier_crud import add_supplier
+    from models.supplieritemmap_crud import add_supplier_item_mapping, update_supplier_item_mapping
+    from models.bomheader_crud import add_bom_header
+    from models.bomdetail_crud import add_bom_detail
+    from ui.bom_page import BOMDialog
+
+    add_item("成品A", "成品", None, "g")
+    add_item("原料A", "原料", None, "g")
+    add_supplier("供應商A")
+    add_supplier_item_mapping(1, 2, price=50.0)
+    add_bom_detail(add_bom_header(1, "V1", "2025-01-01", 100.0), 2, 50, "%", supplier_id=1, price=0.05)
+    update_supplier_item_mapping(1, price=100.0)
+    dialog = BOMDialog(bom_id=1)
+    assert dialog.total_label.text() == "總成本：5.00"
+    assert dialog.detail_tree.topLevelItem(0).text(6) == "0.1000"
+
+
+def test_low_stock_badge_reloads_only_when_alerts_change(erp_db, qapp):
+    from models.itemmaster_crud import add_item
+    from models.supplier_crud import add_supplier
+    from models.supplieritemmap_crud import add_supplier_item_mapping
+    from models.stockmovement_crud import add_stock_movement
+    from ui.low_stock_badge import LowStockBadge
+
+    add_item("麵粉", "原料", None, "g")
+    add_supplier("供應商A")
+    add_supplier_item_mapping(1, 1, safety_stock_level=100.0)
+    add_stock_movement(1, 1, "IN", 30, "2025-01-01", None)
+    badge = LowStockBadge(interval_ms=60000)
+    changes = []
+    badge.alerts_changed.connect(changes.append)
+    assert _wait(qapp, lambda: len(changes) == 1)
+    assert [alert["ItemName"] for alert in changes[0]] == ["麵粉"]
+    assert "1 項" in badge.text() and not badge.isHidden()
+
+    badge.refresh()
+    assert _wait(qapp, lambda: not badge.runner.is_busy())
+    assert len(changes) == 1      # 版本號未變，不重新讀取清單
+
+    add_stock_movement(1, 1, "IN", 100, "2025-01-02", None)
+    badge.refresh()
+    assert _wait(qapp, lambda: len(changes) == 2)
+    assert changes[1] == [] and badge.isHidden()
+    badge.timer.stop()
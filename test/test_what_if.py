@@ -0,0 +1,78 @@
+import time
+
+import numpy as np
+import pytest
+
+from models.erp_database_schema import get_connection
+from models.itemmaster_crud import add_item
+from models.bomheader_crud import add_bom_header
+from models.bomdetail_crud import add_bom_detail
+from models.bom_explosion import clear_explosion_cache
+from models.what_if import CostModel, what_if
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    clear_explosion_cache()
+    yield
+    clear_explosion_cache()
+
+
+def seed():
+    for name, kind in [("蛋糕", "成品"), ("奶油霜", "半成品"), ("糖粉", "原料"), ("奶油", "原料"), ("麵粉", "原料")]:
+        add_item(name, kind, None, "g")
+    cake = add_bom_header(1, "V1", "2025-01-01", 500.0)
+    add_bom_detail(cake, 5, 60, "%", price=0.02)        # 麵粉 300 g
+    add_bom_detail(cake, 2, 100, "g", price=1.0)        # 奶油霜 100 g
+    frosting = add_bom_header(2, "V1", "2025-01-01", 200.0)
+    add_bom_detail(frosting, 3, 50, "%", price=0.05)    # 糖粉 100 g
+    add_bom_detail(frosting, 4, 100, "g", price=0.3)    # 奶油 100 g
+    return cake, frosting
+
+
+def test_scenario_propagates_through_sub_assemblies(erp_db):
+    cake, frosting = seed()
+    model = CostModel.load(as_of="2025-06-01")
+    assert list(model.bom_ids) == [cake, frosting]
+    assert model.base_cost == pytest.approx([6.0 + 2.5 + 15.0, 5.0 + 30.0])
+
+    result = model.evaluate({4: 0.12, 5: -0.05})
+    assert result.delta == pytest.approx([15.0 * 0.12 - 6.0 * 0.05, 30.0 * 0.12])
+    rows = result.to_rows()
+    assert [row["BOMID"] for row in rows] == [frosting, cake]
+    assert rows[0]["DeltaPct"] == pytest.approx(30.0 * 0.12 / 35.0 * 100)
+
+    # 指定新單價優先於漲跌比例
+    assert model.evaluate({3: 1.0}, prices={3: 0.1}).new_cost == pytest.approx([23.5 + 2.5, 35.0 + 5.0])
+    assert model.evaluate({999: 0.5}).delta == pytest.approx([0.0, 0.0])
+
+
+def test_what_if_does_not_write(erp_db):
+    cake, _ = seed()
+    with get_connection() as conn:
+        before = conn.execute("SELECT SUM(Price) FROM BOMDetail").fetchone()[0]
+        result = what_if({3: 0.5}, bom_ids=[cake], as_of="2025-06-01", conn=conn)
+        assert conn.execute("SELECT SUM(Price) FROM BOMDetail").fetchone()[0] == before
+    assert result.to_rows(changed_only=True)[0]["Delta"] == pytest.approx(1.25)
+
+
+def test_thousands_of_boms_evaluate_in_milliseconds(erp_db):
+    with get_connection() as conn:
+        conn.executemany("INSERT INTO ItemMaster (ItemName, ItemType, Unit) VALUES (?, '原料', 'g')",
+                         [(f"原料{i}",) for i in range(300)])
+        conn.executemany("INSERT INTO ItemMaster (ItemName, ItemType, Unit) VALUES (?, '成品', 'g')",
+                         [(f"成品{i}",) for i in range(3000)])
+        conn.executemany("INSERT INTO BOMHeader (ProductID, Version, EffectiveDate, ProductWeight) "
+                         "VALUES (?, 'V1', '2025-01-01', 100)", [(301 + i,) for i in range(3000)])
+        conn.executemany("INSERT INTO BOMDetail (BOMID, ComponentItemID, Quantity, Unit, Price) VALUES (?, ?, 10, '%', 0.01)",
+                         [(i + 1, 1 + (i * 7 + k) % 300) for i in range(3000) for k in range(8)])
+        conn.commit()
+    model = CostModel.load(as_of="2025-06-01")
+    changes = {item_id: 0.1 for item_id in range(1, 301, 3)}
+
+    started = time.perf_counter()
+    result = model.evaluate(changes)
+    elapsed = time.perf_counter() - started
+    assert elapsed < 0.05
+    expected = np.array([sum(0.1 * 0.1 for k in range(8) if (i * 7 + k) % 300 % 3 == 0) for i in range(3000)])
+    assert result.delta == pytest.approx(expected)
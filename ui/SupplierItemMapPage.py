@@ -1,18 +1,19 @@
-from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableWidget,
-                            QTableWidgetItem, QPushButton, QLineEdit, QHeaderView,
-                            QMessageBox, QMenu, QAbstractItemView)
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLineEdit, QLabel,
+                            QMessageBox, QMenu)
 from PyQt5.QtCore import Qt
-from models.supplieritemmap_crud import (get_supplier_item_mappings, delete_supplier_item_mapping,
-                                        get_supplier_item_mapping_by_id, get_connection)
+from models.supplieritemmap_crud import get_supplier_item_mappings, delete_supplier_item_mapping
 from ui.dialogs.supplieritemmap_dialog import SupplierItemMapDialog
-from PyQt5.QtGui import QKeySequence
-from PyQt5.QtWidgets import QApplication
+from ui.deferred_load import DeferredLoadMixin
+from ui.search_controller import SearchController
+from ui.async_query import QueryRunner
+from ui.table_model import Column, DataTableView, LazyTableModel
 
-class SupplierItemMapPage(QWidget):
+class SupplierItemMapPage(DeferredLoadMixin, QWidget):
     def __init__(self):
         super().__init__()
+        self.runner = QueryRunner(self)
+        self.runner.busy_changed.connect(self.set_loading)
         self.setup_ui()
-        self.load_data()
 
     def setup_ui(self):
         main_layout = QVBoxLayout(self)
@@ -34,78 +35,42 @@ class SupplierItemMapPage(QWidget):
         
         self.search_input = QLineEdit(self)
         self.search_input.setPlaceholderText("输入供应商或产品搜索...")
-        self.search_input.textChanged.connect(self.search_mappings)
+        self.search = SearchController(self.search_input, self.load_data)
         tool_layout.addWidget(self.search_input)
+
+        self.loading_label = QLabel("載入中…", self)
+        self.loading_label.hide()
+        tool_layout.addWidget(self.loading_label)
         
         main_layout.addLayout(tool_layout)
         
-# 關聯表格
-        self.table = QTableWidget(self)
-        self.table.setColumnCount(7)  # 新增安全水位欄位
-        self.table.setHorizontalHeaderLabels(["ID", "供應商名稱", "產品名稱", "價格", "MOQ", "交期", "安全水位"])
-        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        # 關聯表格
+        self.model = LazyTableModel([
+            Column("ID", "MappingID"),
+            Column("供應商名稱", "SupplierName"),
+            Column("產品名稱", "ItemName"),
+            Column("價格", lambda m: m["Price"] or ""),
+            Column("MOQ", lambda m: m["MOQ"] or ""),
+            Column("交期", lambda m: m["LeadTime"] or ""),
+            Column("安全水位", "SafetyStockLevel", lambda level: f"{level:.2f}"),   # 顯示安全水位
+        ], self)
+        self.table = DataTableView(self.model, self)
         self.table.setContextMenuPolicy(Qt.CustomContextMenu)
         self.table.customContextMenuRequested.connect(self.show_context_menu)
-        
-        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
-        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
-        self.table.cellClicked.connect(self.select_row)
 
         main_layout.addWidget(self.table)
 
-    def select_row(self, row, column):
-        self.table.selectRow(row)
-
-    def keyPressEvent(self, event):
-        if event.matches(QKeySequence.Copy):
-            selected = self.table.selectedItems()
-            if selected:
-                clipboard = QApplication.clipboard()
-                clipboard.setText(selected[0].text())
-
     def load_data(self, search_text=None):
-        self.table.setRowCount(0)
-        
-        # 更新查詢以包含 SafetyStockLevel
-        with get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT m.MappingID, m.SupplierID, s.SupplierName, m.ItemID, i.ItemName, 
-                    m.MOQ, m.Price, m.LeadTime, m.SafetyStockLevel
-                FROM SupplierItemMap m
-                JOIN Supplier s ON m.SupplierID = s.SupplierID
-                JOIN ItemMaster i ON m.ItemID = i.ItemID
-            ''')
-            columns = [col[0] for col in cursor.description]
-            mappings = [dict(zip(columns, row)) for row in cursor.fetchall()]
-        
-        if search_text:
-            search = search_text.lower()
-            mappings = [m for m in mappings if 
-                        search in m["SupplierName"].lower() or 
-                        search in m["ItemName"].lower()]
-
-        for row, mapping in enumerate(mappings):
-            self.table.insertRow(row)
-            self.table.setItem(row, 0, QTableWidgetItem(str(mapping["MappingID"])))
-            self.table.setItem(row, 1, QTableWidgetItem(mapping["SupplierName"]))
-            self.table.setItem(row, 2, QTableWidgetItem(mapping["ItemName"]))
-            self.table.setItem(row, 3, QTableWidgetItem(str(mapping["Price"] or "")))
-            self.table.setItem(row, 4, QTableWidgetItem(str(mapping["MOQ"] or ""))) 
-            self.table.setItem(row, 5, QTableWidgetItem(str(mapping["LeadTime"] or "")))
-            self.table.setItem(row, 6, QTableWidgetItem(f"{mapping['SafetyStockLevel']:.2f}"))  # 顯示安全水位
+        """在背景查詢關聯（搜尋在 SQL 中處理），完成後才更新表格"""
+        self.runner.submit("load", get_supplier_item_mappings, search_text, on_result=self.model.set_rows)
 
-    def search_mappings(self):
-        search_text = self.search_input.text().strip()
-        self.load_data(search_text)
+    def set_loading(self, loading):
+        self.loading_label.setVisible(loading)
+        self.table.setEnabled(not loading)
 
     def get_selected_id(self):
-        selected_row = self.table.currentRow()
-        if selected_row == -1:
-            return None
-        item = self.table.item(selected_row, 0)
-        return int(item.text()) if item else None
+        mapping = self.table.current_record()
+        return mapping["MappingID"] if mapping else None
 
     def add_mapping(self):
         dialog = SupplierItemMapDialog(self)
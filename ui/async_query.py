@@ -0,0 +1,149 @@
+import itertools
+import logging
+import sqlite3
+import threading
+from typing import Callable, Dict, Optional
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from models.erp_database_schema import get_connection, get_pool
+
+
+class _TaskSignals(QObject):
+    # 由工作執行緒發出，Qt 會以 queued connection 轉交給 GUI 執行緒
+    succeeded = pyqtSignal(int, object)
+    failed = pyqtSignal(int, object)
+
+
+class _QueryTask(QRunnable):
+    """在工作執行緒上以連線池的連線執行一次查詢；取消時中斷正在執行的 SQL"""
+
+    def __init__(self, request_id: int, func: Callable, args, kwargs, signals: _TaskSignals):
+        super().__init__()
+        self.request_id = request_id
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = signals
+        self.cancelled = False
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            if self._conn is not None:
+                # 只在任務仍持有連線時中斷，避免誤中斷已歸還給其他任務的連線
+                self._conn.interrupt()
+
+    def run(self):
+        if self.cancelled:
+            return
+        try:
+            with get_connection() as conn:
+                with self._lock:
+                    if self.cancelled:
+                        return
+                    self._conn = conn
+                try:
+                    # func 內的 CRUD 呼叫會沿用同一條連線（同執行緒巢狀）
+                    result = self.func(*self.args, **self.kwargs)
+                finally:
+                    with self._lock:
+                        self._conn = None
+        except sqlite3.OperationalError as e:
+            if self.cancelled:
+                logging.info("查詢 #%d 已取消: %s", self.request_id, e)
+                return
+            self.signals.failed.emit(self.request_id, e)
+            return
+        except Exception as e:
+            if not self.cancelled:
+                self.signals.failed.emit(self.request_id, e)
+            return
+        if not self.cancelled:
+            self.signals.succeeded.emit(self.request_id, result)
+
+
+class QueryRunner(QObject):
+    """
+    在背景執行 CRUD 讀取並以 signal 回傳結果給 GUI 執行緒。
+    每個 channel 同時只保留最新的一個請求，新請求會取消（interrupt）同 channel 尚未完成的舊請求，
+    舊請求的結果即使已經算出也會被丟棄。
+    """
+    busy_changed = pyqtSignal(bool)
+
+    def __init__(self, parent=None, thread_pool: Optional[QThreadPool] = None):
+        super().__init__(parent)
+        self.thread_pool = thread_pool or _shared_thread_pool()
+        self._ids = itertools.count(1)
+        self._active: Dict[str, _QueryTask] = {}       # channel -> 目前的任務
+        self._callbacks: Dict[int, tuple] = {}          # request id -> (channel, on_result, on_error)
+        self._signals = _TaskSignals()
+        self._signals.succeeded.connect(self._on_succeeded)
+        self._signals.failed.connect(self._on_failed)
+
+    def submit(self, channel: str, func: Callable, *args, on_result: Callable = None,
+               on_error: Callable = None, **kwargs) -> int:
+        """在背景執行 func(*args, **kwargs)，完成後在 GUI 執行緒呼叫 on_result(result)"""
+        self.cancel(channel)
+        request_id = next(self._ids)
+        task = _QueryTask(request_id, func, args, kwargs, self._signals)
+        was_busy = self.is_busy()
+        self._active[channel] = task
+        self._callbacks[request_id] = (channel, on_result, on_error)
+        self.thread_pool.start(task)
+        if not was_busy:
+            self.busy_changed.emit(True)
+        return request_id
+
+    def cancel(self, channel: str):
+        """取消 channel 上尚未完成的請求"""
+        task = self._active.pop(channel, None)
+        if task is None:
+            return
+        self._callbacks.pop(task.request_id, None)
+        task.cancel()
+        if not self.is_busy():
+            self.busy_changed.emit(False)
+
+    def cancel_all(self):
+        for channel in list(self._active):
+            self.cancel(channel)
+
+    def is_busy(self, channel: Optional[str] = None) -> bool:
+        return channel in self._active if channel is not None else bool(self._active)
+
+    def _finish(self, request_id: int):
+        entry = self._callbacks.pop(request_id, None)
+        if entry is None:
+            return None     # 已被取消或取代
+        channel = entry[0]
+        self._active.pop(channel, None)
+        if not self.is_busy():
+            self.busy_changed.emit(False)
+        return entry
+
+    def _on_succeeded(self, request_id: int, result):
+        entry = self._finish(request_id)
+        if entry and entry[1] is not None:
+            entry[1](result)
+
+    def _on_failed(self, request_id: int, error):
+        entry = self._finish(request_id)
+        if entry is None:
+            return
+        if entry[2] is not None:
+            entry[2](error)
+        else:
+            logging.error("背景查詢失敗: %s", error)
+
+
+_thread_pool = None
+
+
+def _shared_thread_pool() -> QThreadPool:
+    """所有頁面共用的執行緒池，執行緒數不超過連線池的工作連線上限"""
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = QThreadPool()
+        _thread_pool.setMaxThreadCount(get_pool().max_worker_connections)
+    return _thread_pool
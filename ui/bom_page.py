@@ -1,17 +1,17 @@
+import sqlite3
 import sys
 from PyQt5.QtWidgets import (
-    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
-    QPushButton, QLineEdit, QHeaderView, QMessageBox, QMenu, QAbstractItemView,
+    QApplication, QWidget, QVBoxLayout, QHBoxLayout,
+    QPushButton, QLineEdit, QMessageBox, QMenu,
     QDialog, QFormLayout, QComboBox, QSpinBox, QDoubleSpinBox, QTreeWidget, QTreeWidgetItem,
     QLabel, QDateEdit
 )
 from PyQt5.QtCore import Qt, QDate
-from PyQt5.QtGui import QKeySequence
 
 # 後端 CRUD 模組匯入（假設這些模組已實作）
 from models.bomheader_crud import (
     get_bom_headers, add_bom_header, update_bom_header,
-    delete_bom_header, get_bom_header_by_id
+    delete_bom_header, get_bom_header_by_id, get_bom_cost_summary
 )
 from models.bomdetail_crud import (
     get_bom_details, add_bom_detail, update_bom_detail, delete_bom_detail
@@ -19,14 +19,20 @@ from models.bomdetail_crud import (
 from models.itemmaster_crud import get_items, get_item_by_id
 from models.supplier_crud import get_suppliers
 # 新增：假設此函式可以根據供應商與品項取得最新價格（單位 kg）
-from models.supplieritemmap_crud import get_latest_supplier_price
+from models.supplieritemmap_crud import get_latest_supplier_price, get_latest_supplier_prices
 from models.costhistory_crud import add_cost_history
+from models.erp_database_schema import unit_of_work
+from ui.deferred_load import DeferredLoadMixin
+from ui.search_controller import SearchController
+from ui.async_query import QueryRunner
+from ui.table_model import Column, DataTableView, LazyTableModel
 # ===================== BOM 主檔管理頁面 =====================
-class BOMPage(QWidget):
+class BOMPage(DeferredLoadMixin, QWidget):
     def __init__(self):
         super().__init__()
+        self.runner = QueryRunner(self)
+        self.runner.busy_changed.connect(self.set_loading)
         self.setup_ui()
-        self.load_data()
 
     def setup_ui(self):
         main_layout = QVBoxLayout(self)
@@ -47,86 +53,48 @@ class BOMPage(QWidget):
 
         self.search_input = QLineEdit(self)
         self.search_input.setPlaceholderText("輸入產品名稱或版本搜索...")
-        self.search_input.textChanged.connect(self.search_bom)
+        self.search = SearchController(self.search_input, self.load_data)
         tool_layout.addWidget(self.search_input)
 
+        self.loading_label = QLabel("載入中…", self)
+        self.loading_label.hide()
+        tool_layout.addWidget(self.loading_label)
+
         main_layout.addLayout(tool_layout)
 
         # 修改 1：更新表格欄位為「BOM ID」、「產品名稱」、「重量」、「價格」、「備註」
-        self.table = QTableWidget(self)
-        self.table.setColumnCount(5)
-        self.table.setHorizontalHeaderLabels(["BOM ID", "產品名稱", "重量", "價格", "備註"])
-        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
-        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
-        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.model = LazyTableModel([
+            Column("BOM ID", "BOMID"),
+            Column("產品名稱", "ProductName"),
+            Column("重量", "ProductWeight", lambda weight: f"{weight:.2f} g"),
+            Column("價格", "TotalPrice", lambda price: f"{price:.2f}"),
+            Column("備註", "Remarks"),
+        ], self)
+        self.table = DataTableView(self.model, self)
         self.table.setContextMenuPolicy(Qt.CustomContextMenu)
         self.table.customContextMenuRequested.connect(self.show_context_menu)
-        self.table.cellClicked.connect(self.select_row)
 
         main_layout.addWidget(self.table)
 
-    def select_row(self, row, column):
-        self.table.selectRow(row)
-
-    def keyPressEvent(self, event):
-        if event.matches(QKeySequence.Copy):
-            selected = self.table.selectedItems()
-            if selected:
-                QApplication.clipboard().setText(selected[0].text())
-
     def load_data(self, search_text=None):
-        self.table.setRowCount(0)
-        bom_headers = get_bom_headers()  # 取得 BOMHeader 列表，包含 BOMID、ProductID、Version、EffectiveDate、Remarks、ProductWeight 等欄位
-        if search_text:
-            search_text = search_text.lower()
-            filtered_boms = []
-            for bom in bom_headers:
-                # 透過 ProductID 取得產品名稱
-                product = get_item_by_id(bom["ProductID"])
-                product_name = product["ItemName"] if product else ""
-                # 如果搜尋文字存在於產品名稱、版本或備註中，就加入過濾結果中
-                if (search_text in product_name.lower() or 
-                    search_text in bom.get("Version", "").lower() or 
-                    search_text in bom.get("Remarks", "").lower()):
-                    filtered_boms.append(bom)
-            bom_headers = filtered_boms
-
-        for row, bom in enumerate(bom_headers):
-            self.table.insertRow(row)
-            self.table.setItem(row, 0, QTableWidgetItem(str(bom["BOMID"])))
-            product = get_item_by_id(bom["ProductID"])
-            product_name = product["ItemName"] if product else ""
-            self.table.setItem(row, 1, QTableWidgetItem(product_name))
-            product_weight = bom.get("ProductWeight") or 0.0
-            self.table.setItem(row, 2, QTableWidgetItem(f"{product_weight:.2f} g"))
-
-            # 計算總價格
-            details = get_bom_details(bom_id=bom["BOMID"])
-            total_price = 0.0
-            for detail in details:
-                percentage = detail["Quantity"]
-                unit = detail.get("Unit", "%")
-                if unit == "%":
-                    actual_qty = product_weight * (percentage / 100.0)
-                else:
-                    actual_qty = percentage
-                price = detail.get("Price", 0)
-                total_price += actual_qty * price
-            self.table.setItem(row, 3, QTableWidgetItem(f"{total_price:.2f}"))
-            self.table.setItem(row, 4, QTableWidgetItem(bom.get("Remarks", "")))
+        """在背景查詢 BOM 與成本，完成後才更新表格；輸入新的搜尋字時會取消前一次查詢"""
+        self.runner.submit("load", self.fetch_bom_rows, search_text, on_result=self.populate_table)
 
+    def set_loading(self, loading):
+        self.loading_label.setVisible(loading)
+        self.table.setEnabled(not loading)
 
-    def search_bom(self):
-        search_text = self.search_input.text().strip()
-        self.load_data(search_text)
+    def fetch_bom_rows(self, search_text=None):
+        """在工作執行緒執行：只查詢資料，不可操作任何元件"""
+        # 產品名稱與總成本由單一彙總查詢算出；產品名稱、版本或備註的搜尋也在 SQL 中處理
+        return get_bom_cost_summary(search_text)
+
+    def populate_table(self, rows):
+        self.model.set_rows(rows)
 
     def get_selected_id(self):
-        selected_row = self.table.currentRow()
-        if selected_row == -1:
-            return None
-        item = self.table.item(selected_row, 0)
-        return int(item.text()) if item else None
+        bom = self.table.current_record()
+        return bom["BOMID"] if bom else None
 
     def add_bom(self):
         dialog = BOMDialog(self)
@@ -175,6 +143,7 @@ class BOMDialog(QDialog):
         # BOM header 資料與明細列表
         self.bom_data = {}
         self.detail_list = []  # 每筆為字典，參考 BOMDetail 欄位
+        self.supplier_prices = {}  # (SupplierID, ComponentItemID) -> 目前價格（每 kg）
         self.setup_ui()
         if self.bom_id:
             self.load_bom_data()
@@ -291,8 +260,22 @@ class BOMDialog(QDialog):
         self.refresh_detail_tree()
         self.calculate_total_cost()
 
+    def refresh_supplier_prices(self):
+        """以一次查詢取得明細所用 (SupplierID, ComponentItemID) 的目前價格（每 kg）"""
+        pairs = [(detail["SupplierID"], detail["ComponentItemID"])
+                 for detail in self.detail_list if detail.get("SupplierID")]
+        self.supplier_prices = get_latest_supplier_prices(pairs) if pairs else {}
+
+    def line_price(self, detail):
+        """明細的每 g 單價：與 BOMCost 相同，有供應商目前價格時使用該價格，否則使用明細上的單價"""
+        price_per_kg = self.supplier_prices.get((detail.get("SupplierID"), detail.get("ComponentItemID")))
+        if price_per_kg is not None:
+            return price_per_kg / 1000.0
+        return detail.get("Price") or 0.0
+
     def refresh_detail_tree(self):
         self.detail_tree.clear()
+        self.refresh_supplier_prices()
         product_weight = self.product_weight_input.value()  # 產品重量 (g)
         for detail in self.detail_list:
             item = QTreeWidgetItem()
@@ -311,12 +294,12 @@ class BOMDialog(QDialog):
             item.setText(2, f"{actual_qty:.2f}")
             # 單位顯示
             item.setText(3, detail.get("Unit", "%"))
-            item.setText(4, f"{detail.get('ScrapRate', 0):.2f}")
+            item.setText(4, f"{detail.get('ScrapRate') or 0:.2f}")
             # 供應商欄位：若有則顯示 ID
             supplier = f"ID:{detail['SupplierID']}" if detail.get("SupplierID") else ""
             item.setText(5, supplier)
-            # 單價：這裡已換算為每 g 的價格（若原始記錄為每 kg，則需除以 1000）
-            price = detail.get("Price", 0)
+            # 單價：每 g 的價格（供應商價格以每 kg 記錄，已除以 1000）
+            price = self.line_price(detail)
             item.setText(6, f"{price:.4f}")
             # 小計 = 實際用量 * 單價
             subtotal = actual_qty * price
@@ -332,8 +315,9 @@ class BOMDialog(QDialog):
                 actual_qty = product_weight * (percentage / 100.0)
             else:
                 actual_qty = percentage
-            total += actual_qty * detail.get("Price", 0)
+            total += actual_qty * self.line_price(detail)
         self.total_label.setText(f"總成本：{total:.2f}")
+        return total
 
     def add_detail(self):
         dialog = BOMDetailDialog(self)
@@ -383,41 +367,22 @@ class BOMDialog(QDialog):
      # [新增] 一鍵自動抓取價格
     def fetch_all_prices(self):
 
-        # 注意：get_latest_supplier_price 回傳的是「每公斤」的價格，需要除以 1000 變成 每克 價格。
+        # 注意：get_latest_supplier_prices 回傳的是「每公斤」的價格，需要除以 1000 變成 每克 價格。
+        # 所有明細的價格以一次查詢取得；沒有指定供應商的明細略過
+        pairs = [(detail["SupplierID"], detail["ComponentItemID"])
+                 for detail in self.detail_list if detail.get("SupplierID")]
+        latest_prices = get_latest_supplier_prices(pairs)
         updated_count = 0
         for detail in self.detail_list:
-            supplier_id = detail.get("SupplierID")
-            component_id = detail.get("ComponentItemID")
-
-            # 若明細沒有指定 supplier_id，則略過
-            if not supplier_id:
-                continue
-
-            latest_price_per_kg = get_latest_supplier_price(supplier_id, component_id)
+            latest_price_per_kg = latest_prices.get((detail.get("SupplierID"), detail.get("ComponentItemID")))
             if latest_price_per_kg is not None:
                 # 轉換成 每 g
-                price_per_g = latest_price_per_kg / 1000.0
-                detail["Price"] = price_per_g
-
-                # 寫入 CostHistory
-                # 取得組件名稱
-                comp_item = get_item_by_id(component_id)
-                product_name = comp_item["ItemName"] if comp_item else f"ItemID:{component_id}"
-
+                detail["Price"] = latest_price_per_kg / 1000.0
                 updated_count += 1
 
-        total = 0.0  # 初始化 total 變數
-        product_weight = self.product_weight_input.value()
-        for detail in self.detail_list:
-            percentage = detail["Quantity"]
-            if detail.get("Unit", "%") == "%":
-                actual_qty = product_weight * (percentage / 100.0)
-            else:
-                actual_qty = percentage
-            total += actual_qty * detail.get("Price", 0)
-        
         # 更新總成本顯示
-        self.total_label.setText(f"總成本：{total:.2f}")
+        self.supplier_prices = latest_prices
+        total = self.calculate_total_cost()
         
         # 取得產品名稱
         product_id = self.product_combo.currentData()
@@ -448,51 +413,43 @@ class BOMDialog(QDialog):
         effective_date = self.effective_date_input.date().toString("yyyy-MM-dd")
         remarks = self.remarks_input.text().strip()
 
-        if self.bom_id:
-            # 更新 BOM header
-            update_bom_header(self.bom_id,
-                              new_product_id=product_id,
-                              new_version=version,
-                              new_effective_date=effective_date,
-                              new_product_weight=product_weight,
-                              new_remarks=remarks)
-            # 【修改重點】：先刪除現有 BOM 明細，避免重複新增
-            existing_details = get_bom_details(bom_id=self.bom_id)
-            for d in existing_details:
-                delete_bom_detail(d["BOMDetailID"])
-            
-            # 【修改重點】：過濾 self.detail_list，避免重複同一組件的明細
-            unique_details = {}
-            for detail in self.detail_list:
-                comp_id = detail["ComponentItemID"]
-                if comp_id not in unique_details:
-                    unique_details[comp_id] = detail
-            for detail in unique_details.values():
-                add_bom_detail(self.bom_id,
-                               detail["ComponentItemID"],
-                               detail["Quantity"],
-                               detail.get("Unit", "%"),
-                               detail.get("ScrapRate"),
-                               detail.get("SupplierID"),    # 新增
-                               detail.get("Price"))         # 新增
-        else:
-            # 新增模式：類似處理，先過濾重複明細
-            add_bom_header(product_id, version, effective_date, product_weight, remarks=remarks)
-            new_bom = get_bom_headers()[-1]
-            new_bom_id = new_bom["BOMID"]
-            unique_details = {}
-            for detail in self.detail_list:
-                comp_id = detail["ComponentItemID"]
-                if comp_id not in unique_details:
-                    unique_details[comp_id] = detail
-            for detail in unique_details.values():
-                add_bom_detail(new_bom_id,
-                               detail["ComponentItemID"],
-                               detail["Quantity"],
-                               detail.get("Unit", "%"),
-                               detail.get("ScrapRate"),
-                               detail.get("SupplierID"),    # 新增
-                               detail.get("Price"))         # 新增
+        # 過濾 self.detail_list，避免重複同一組件的明細
+        unique_details = {}
+        for detail in self.detail_list:
+            comp_id = detail["ComponentItemID"]
+            if comp_id not in unique_details:
+                unique_details[comp_id] = detail
+
+        # 表頭與所有明細在同一個交易內儲存，任何一步失敗都整批回滾
+        try:
+            with unit_of_work() as session:
+                if self.bom_id:
+                    bom_id = self.bom_id
+                    update_bom_header(bom_id,
+                                      conn=session,
+                                      new_product_id=product_id,
+                                      new_version=version,
+                                      new_effective_date=effective_date,
+                                      new_product_weight=product_weight,
+                                      new_remarks=remarks)
+                    # 先刪除現有 BOM 明細，避免重複新增
+                    for d in get_bom_details(bom_id=bom_id, conn=session):
+                        delete_bom_detail(d["BOMDetailID"], conn=session)
+                else:
+                    bom_id = add_bom_header(product_id, version, effective_date, product_weight,
+                                            remarks=remarks, conn=session)
+                for detail in unique_details.values():
+                    add_bom_detail(bom_id,
+                                   detail["ComponentItemID"],
+                                   detail["Quantity"],
+                                   detail.get("Unit", "%"),
+                                   detail.get("ScrapRate"),
+                                   detail.get("SupplierID"),
+                                   detail.get("Price"),
+                                   conn=session)
+        except (ValueError, sqlite3.Error) as e:
+            QMessageBox.warning(self, "錯誤", f"儲存 BOM 失敗：{e}")
+            return
         super().accept()
 
 
@@ -1,18 +1,20 @@
-from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableWidget,
-                            QTableWidgetItem, QPushButton, QLineEdit, QHeaderView,
-                            QMessageBox, QMenu, QAbstractItemView)
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLineEdit, QLabel,
+                            QMessageBox, QMenu)
 from PyQt5.QtCore import Qt
-from models.customer_crud import get_customers, delete_customer
+from models.customer_crud import CUSTOMER_KEYSET, iter_customers, delete_customer
 from ui.dialogs.customer_dialog import CustomerDialog
 from PyQt5.QtWidgets import QInputDialog, QLineEdit
-from PyQt5.QtGui import QKeySequence
-from PyQt5.QtWidgets import QApplication
+from ui.deferred_load import DeferredLoadMixin
+from ui.search_controller import SearchController
+from ui.async_query import QueryRunner
+from ui.table_model import Column, DataTableView, LazyTableModel
 
-class CustomerPage(QWidget):
+class CustomerPage(DeferredLoadMixin, QWidget):
     def __init__(self):
         super().__init__()
+        self.runner = QueryRunner(self)
+        self.runner.busy_changed.connect(self.set_loading)
         self.setup_ui()
-        self.load_data()
         
 
 
@@ -37,28 +39,28 @@ class CustomerPage(QWidget):
         
         self.search_input = QLineEdit(self)
         self.search_input.setPlaceholderText("输入姓名或电话搜索...")
-        self.search_input.textChanged.connect(self.search_customers)
+        self.search = SearchController(self.search_input, self.load_data)
         tool_layout.addWidget(self.search_input)
+
+        self.loading_label = QLabel("載入中…", self)
+        self.loading_label.hide()
+        tool_layout.addWidget(self.loading_label)
         
         main_layout.addLayout(tool_layout)
         
-        # 客户表格
-        self.table = QTableWidget(self)
-        self.table.setColumnCount(7)
-        self.table.setHorizontalHeaderLabels(["ID", "客戶名稱", "統一編號", "聯絡人", "電話", "地址", "送貨地址", "狀態"])
-        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        # 客户表格（捲動到底時才以 keyset 分頁向資料庫多取一頁，點選標題由 SQL 排序）
+        self.model = LazyTableModel([
+            Column("ID", "CustomerID", sort="CustomerID"),
+            Column("客戶名稱", "CustomerName", sort="CustomerName"),
+            Column("統一編號", "TaxID", sort="TaxID"),
+            Column("聯絡人", "ContactPerson", sort="ContactPerson"),
+            Column("電話", "Phone", sort="Phone"),
+            Column("地址", "Address"),
+            Column("送貨地址", "Address2"),
+        ], self, runner=self.runner)
+        self.table = DataTableView(self.model, self)
         self.table.setContextMenuPolicy(Qt.CustomContextMenu)
         self.table.customContextMenuRequested.connect(self.show_context_menu)
-        
-        # 讓表格變成唯讀模式
-        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)  # 禁止直接編輯
-        self.table.setSelectionMode(QAbstractItemView.SingleSelection)  # 允許點選單個儲存格
-        self.table.setSelectionBehavior(QAbstractItemView.SelectItems)  # 允許點選儲存格內容
-        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
-
-        # ✅ 讓點擊任意欄位時，都選取該行
-        self.table.cellClicked.connect(self.select_row)
 
         main_layout.addWidget(self.table)
 
@@ -67,49 +69,19 @@ class CustomerPage(QWidget):
         # 2. 按钮图标：可使用QIcon添加图标
         # 3. 搜索框样式：可设置圆角边框
 
-    def select_row(self, row, column):
-        """ 當點擊表格的任何欄位時，確保整行被選取 """
-        self.table.selectRow(row)  # 讓整行變成選取狀態
-
-    def keyPressEvent(self, event):
-        """ 允許 Ctrl+C / Command+C 複製選取的儲存格內容 """
-        if event.matches(QKeySequence.Copy):
-            selected = self.table.selectedItems()
-            if selected:
-                clipboard = QApplication.clipboard()
-                clipboard.setText(selected[0].text())  # 複製選取儲存格的內容
-    
     def load_data(self, search_text=None):
-        self.table.setRowCount(0)
-        customers = get_customers(search_text)
-        
-        for row, customer in enumerate(customers):
-            self.table.insertRow(row)
-            self.table.setItem(row, 0, QTableWidgetItem(str(customer.get("CustomerID", ""))))
-            self.table.setItem(row, 1, QTableWidgetItem(customer.get("CustomerName", "")))
-            self.table.setItem(row, 2, QTableWidgetItem(customer.get("TaxID", "")))
-            self.table.setItem(row, 3, QTableWidgetItem(customer.get("ContactPerson", "")))
-            self.table.setItem(row, 4, QTableWidgetItem(customer.get("Phone", "")))
-            self.table.setItem(row, 5, QTableWidgetItem(customer.get("Address", "")))
-            self.table.setItem(row, 6, QTableWidgetItem(customer.get("Address2", "")))
-
-            self.table.viewport().update()  # ✅ 確保 UI 立即刷新
-    
-    def search_customers(self):
-        search_text = self.search_input.text().strip()
-        self.load_data(search_text)
+        self.model.set_query(iter_customers, CUSTOMER_KEYSET, search_term=search_text)
     
+    def set_loading(self, loading):
+        # 分頁在背景逐頁讀取，讀取期間表格仍可捲動與選取
+        self.loading_label.setVisible(loading)
+
     def get_selected_id(self):
         """ 取得使用者目前選取的行的 CustomerID """
-        selected_row = self.table.currentRow()  # 取得當前選取的行
-        if selected_row == -1:
+        customer = self.table.current_record()
+        if customer is None:
             return None  # 沒有選擇行時返回 None
-
-        item = self.table.item(selected_row, 0)  # 假設 ID 是第一欄（索引 0）
-        if item:
-            return int(item.text())  # 返回 CustomerID
-
-        return None
+        return customer["CustomerID"]
 
 
     
@@ -0,0 +1,33 @@
+from models.erp_database_schema import get_data_version
+
+
+class DeferredLoadMixin:
+    """
+    分頁顯示時才載入資料。
+    頁面在建構時不再呼叫 load_data()，改為第一次顯示、或資料庫自上次載入後有變更時才重新查詢。
+    使用方式：class CustomerPage(DeferredLoadMixin, QWidget)
+    """
+    _loaded_version = None
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh_if_stale()
+
+    def mark_stale(self):
+        """強制下次顯示時重新載入"""
+        self._loaded_version = None
+
+    def refresh_if_stale(self) -> bool:
+        """資料過期時重新載入，返回是否有執行 load_data"""
+        version = get_data_version()
+        if version == self._loaded_version:
+            return False
+        # 有搜尋框的頁面以目前的搜尋文字重新載入，避免外部寫入後清掉篩選條件
+        search = getattr(self, "search", None)
+        if search is not None:
+            self.load_data(search.text)
+        else:
+            self.load_data()
+        # 以載入後的版本為準，load_data 本身的寫入不會造成下次重複載入
+        self._loaded_version = get_data_version()
+        return True
@@ -1,18 +1,20 @@
-from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableWidget,
-                            QTableWidgetItem, QPushButton, QLineEdit, QHeaderView,
-                            QMessageBox, QMenu, QAbstractItemView)
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLineEdit, QLabel,
+                            QMessageBox, QMenu)
 from PyQt5.QtCore import Qt
-from models.itemmaster_crud import get_items, delete_item
+from models.itemmaster_crud import ITEM_KEYSET, iter_items, delete_item
 from ui.dialogs.itemmaster_dialog import ItemDialog
 from PyQt5.QtWidgets import QInputDialog, QLineEdit
-from PyQt5.QtGui import QKeySequence
-from PyQt5.QtWidgets import QApplication
+from ui.deferred_load import DeferredLoadMixin
+from ui.search_controller import SearchController
+from ui.async_query import QueryRunner
+from ui.table_model import Column, DataTableView, LazyTableModel
 
-class ItemMasterPage(QWidget):
+class ItemMasterPage(DeferredLoadMixin, QWidget):
     def __init__(self):
         super().__init__()
+        self.runner = QueryRunner(self)
+        self.runner.busy_changed.connect(self.set_loading)
         self.setup_ui()
-        self.load_data()
 
     def setup_ui(self):
         main_layout = QVBoxLayout(self)
@@ -34,69 +36,43 @@ class ItemMasterPage(QWidget):
         
         self.search_input = QLineEdit(self)
         self.search_input.setPlaceholderText("輸入物料名稱或類型搜索...")
-        self.search_input.textChanged.connect(self.search_items)
+        self.search = SearchController(self.search_input, self.load_data)
         tool_layout.addWidget(self.search_input)
+
+        self.loading_label = QLabel("載入中…", self)
+        self.loading_label.hide()
+        tool_layout.addWidget(self.loading_label)
         
         main_layout.addLayout(tool_layout)
         
         # 表格
-        self.table = QTableWidget(self)
-        self.table.setColumnCount(5)
-        self.table.setHorizontalHeaderLabels(["ID", "物料名稱", "類型", "類別", "單位"])
-        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.model = LazyTableModel([
+            Column("ID", "ItemID", sort="ItemID"),
+            Column("物料名稱", "ItemName", sort="ItemName"),
+            Column("類型", "ItemType", sort="ItemType"),
+            Column("類別", "Category", sort="Category"),
+            Column("單位", "Unit", sort="Unit"),
+        ], self, runner=self.runner)
+        self.table = DataTableView(self.model, self)
         self.table.setContextMenuPolicy(Qt.CustomContextMenu)
         self.table.customContextMenuRequested.connect(self.show_context_menu)
-        
-        # 表格配置
-        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
-        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
-        self.table.cellClicked.connect(self.select_row)
     
         main_layout.addWidget(self.table)
 
-    def select_row(self, row, column):
-        self.table.selectRow(row)
-
-    def keyPressEvent(self, event):
-        if event.matches(QKeySequence.Copy):
-            selected = self.table.selectedItems()
-            if selected:
-                clipboard = QApplication.clipboard()
-                clipboard.setText(selected[0].text())
-
     def load_data(self, search_text=None):
-        self.table.setRowCount(0)
-        items = get_items()
-        
-        # 前端搜索过滤
-        if search_text:
-            search_text = search_text.lower()
-            items = [item for item in items 
-                    if search_text in item.get("ItemName", "").lower() 
-                    or search_text in item.get("ItemType", "").lower()]
-        
-        for row, item in enumerate(items):
-            self.table.insertRow(row)
-            self.table.setItem(row, 0, QTableWidgetItem(str(item.get("ItemID", ""))))
-            self.table.setItem(row, 1, QTableWidgetItem(item.get("ItemName", "")))
-            self.table.setItem(row, 2, QTableWidgetItem(item.get("ItemType", "")))
-            self.table.setItem(row, 3, QTableWidgetItem(item.get("Category", "")))
-            self.table.setItem(row, 4, QTableWidgetItem(item.get("Unit", "")))
+        # 搜尋與排序交給 SQL 處理，資料列在捲動時才逐頁讀取
+        self.model.set_query(iter_items, ITEM_KEYSET, search=search_text, search_columns=("ItemName", "ItemType"))
 
-    def search_items(self):
-        search_text = self.search_input.text().strip()
-        self.load_data(search_text)
+    def set_loading(self, loading):
+        # 分頁在背景逐頁讀取，讀取期間表格仍可捲動與選取
+        self.loading_label.setVisible(loading)
 
     def get_selected_id(self):
-        selected_row = self.table.currentRow()
-        if selected_row == -1:
+        item = self.table.current_record()
+        if item is None:
             QMessageBox.warning(self, "錯誤", "請先選擇要刪除的物料")
             return None
-        item = self.table.item(selected_row, 0)
-        if not item:
-            return None
-        return int(item.text())
+        return item["ItemID"]
 
     def add_item(self):
         dialog = ItemDialog(self)
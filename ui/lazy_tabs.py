@@ -0,0 +1,53 @@
+import importlib
+import logging
+import time
+from typing import Dict, Optional, Tuple
+from PyQt5.QtWidgets import QTabWidget, QWidget
+
+
+class LazyTabWidget(QTabWidget):
+    """
+    延遲建立分頁：加入時只放空白佔位元件，第一次切換到該分頁才 import 模組並建立頁面。
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._factories: Dict[QWidget, Tuple[str, str]] = {}   # 佔位元件 -> (模組, 類別)
+        self._pages: Dict[str, QWidget] = {}
+        self.build_times: Dict[str, float] = {}                 # 頁面名稱 -> 建立耗時（秒）
+        self.currentChanged.connect(self._ensure_page)
+
+    def add_lazy_tab(self, module: str, class_name: str, title: str) -> int:
+        """登記一個分頁，module / class_name 為頁面類別所在位置，例如 ("ui.bom_page", "BOMPage")"""
+        placeholder = QWidget()
+        self._factories[placeholder] = (module, class_name)
+        index = self.addTab(placeholder, title)
+        # 第一個分頁加入時 currentChanged 已觸發，此時工廠尚未登記，需補建
+        if index == self.currentIndex():
+            self._ensure_page(index)
+        return index
+
+    def page(self, class_name: str) -> Optional[QWidget]:
+        """取得已建立的頁面（尚未建立則為 None）"""
+        return self._pages.get(class_name)
+
+    def _ensure_page(self, index: int):
+        placeholder = self.widget(index)
+        factory = self._factories.pop(placeholder, None)
+        if factory is None:
+            return
+        module, class_name = factory
+        start = time.perf_counter()
+        page_class = getattr(importlib.import_module(module), class_name)
+        page = page_class()
+        self.build_times[class_name] = time.perf_counter() - start
+        logging.info("建立分頁 %s 耗時 %.1f ms", class_name, self.build_times[class_name] * 1000)
+
+        title = self.tabText(index)
+        self.blockSignals(True)
+        self.removeTab(index)
+        self.insertTab(index, page, title)
+        self.setCurrentIndex(index)
+        self.blockSignals(False)
+        placeholder.deleteLater()
+        self._pages[class_name] = page
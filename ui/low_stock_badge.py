@@ -0,0 +1,48 @@
+from PyQt5.QtCore import QTimer, pyqtSignal
+from PyQt5.QtWidgets import QLabel
+from models.stockalert_crud import get_low_stock_alerts_if_changed
+from ui.async_query import QueryRunner
+
+POLL_INTERVAL_MS = 5000     # 檢查警示版本號的間隔；版本未變時每次只讀取一列
+TOOLTIP_LIMIT = 20
+
+
+class LowStockBadge(QLabel):
+    """狀態列上的低庫存徽章：顯示低於安全水位的組合數，滑鼠停留列出明細，點擊發出 clicked"""
+    alerts_changed = pyqtSignal(list)
+    clicked = pyqtSignal()
+
+    def __init__(self, parent=None, interval_ms: int = POLL_INTERVAL_MS):
+        super().__init__(parent)
+        self.revision = None
+        self.alerts = []
+        self.runner = QueryRunner(self)
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(interval_ms)
+        self.hide()
+        QTimer.singleShot(0, self.refresh)
+
+    def refresh(self):
+        """在背景比對版本號，有變動時才讀取警示清單"""
+        if not self.runner.is_busy("poll"):
+            self.runner.submit("poll", get_low_stock_alerts_if_changed, self.revision, on_result=self.apply)
+
+    def apply(self, changed):
+        if changed is None:
+            return
+        self.revision, self.alerts = changed
+        self.setText(f"⚠ 低於安全水位：{len(self.alerts)} 項")
+        self.setStyleSheet("color: #c00000; font-weight: bold;")
+        lines = [f"{alert['ItemName'] or '未知物品'} / {alert['SupplierName'] or '未指定供應商'}："
+                 f"{alert['StockQuantity']:.2f} < {alert['SafetyStockLevel']:.2f}"
+                 for alert in self.alerts[:TOOLTIP_LIMIT]]
+        if len(self.alerts) > TOOLTIP_LIMIT:
+            lines.append(f"……另有 {len(self.alerts) - TOOLTIP_LIMIT} 項")
+        self.setToolTip("\n".join(lines))
+        self.setVisible(bool(self.alerts))
+        self.alerts_changed.emit(self.alerts)
+
+    def mousePressEvent(self, event):
+        self.clicked.emit()
+        super().mousePressEvent(event)
@@ -1,16 +1,17 @@
-from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableWidget,
-                            QTableWidgetItem, QPushButton, QLineEdit, QHeaderView,
-                            QMessageBox, QMenu, QAbstractItemView)
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLineEdit, QLabel, QMessageBox, QMenu
 from PyQt5.QtCore import Qt
 from models.pricehistory_crud import get_price_history, delete_price_history
-from PyQt5.QtGui import QKeySequence
-from PyQt5.QtWidgets import QApplication
+from ui.deferred_load import DeferredLoadMixin
+from ui.search_controller import SearchController
+from ui.async_query import QueryRunner
+from ui.table_model import Column, DataTableView, LazyTableModel
 
-class PriceHistoryPage(QWidget):
+class PriceHistoryPage(DeferredLoadMixin, QWidget):
     def __init__(self):
         super().__init__()
+        self.runner = QueryRunner(self)
+        self.runner.busy_changed.connect(self.set_loading)
         self.setup_ui()
-        self.load_data()
 
     def setup_ui(self):
         main_layout = QVBoxLayout(self)
@@ -19,47 +20,45 @@ class PriceHistoryPage(QWidget):
         search_layout = QHBoxLayout()
         self.search_input = QLineEdit(self)
         self.search_input.setPlaceholderText("輸入供應商或產品名稱搜索...")
-        self.search_input.textChanged.connect(self.search_history)
+        self.search = SearchController(self.search_input, self.load_data)
         search_layout.addWidget(self.search_input)
         
         # 刪除按鈕
         self.btn_delete = QPushButton("刪除記錄", self)
         self.btn_delete.clicked.connect(self.delete_history)
         search_layout.addWidget(self.btn_delete)
+
+        self.loading_label = QLabel("載入中…", self)
+        self.loading_label.hide()
+        search_layout.addWidget(self.loading_label)
         
         main_layout.addLayout(search_layout)
         
         # 表格
-        self.table = QTableWidget(self)
-        self.table.setColumnCount(6)
-        self.table.setHorizontalHeaderLabels(["ID", "供應商", "產品", "價格", "生效日期", "最後更新"])
-        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.model = LazyTableModel([
+            Column("ID", "PriceHistoryID"),
+            Column("供應商", "SupplierName"),
+            Column("產品", "ItemName"),
+            Column("價格", "Price", lambda price: f"{price:.2f}"),
+            Column("生效日期", "EffectiveDate"),
+            Column("最後更新", "LastUpdated"),
+        ], self)
+        self.table = DataTableView(self.model, self)
         self.table.setContextMenuPolicy(Qt.CustomContextMenu)
         self.table.customContextMenuRequested.connect(self.show_context_menu)
-        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
         main_layout.addWidget(self.table)
 
     def load_data(self, search_text=None):
-        self.table.setRowCount(0)
-        history = get_price_history(search_text)
-        for row, record in enumerate(history):
-            self.table.insertRow(row)
-            self.table.setItem(row, 0, QTableWidgetItem(str(record["PriceHistoryID"])))
-            self.table.setItem(row, 1, QTableWidgetItem(record["SupplierName"]))
-            self.table.setItem(row, 2, QTableWidgetItem(record["ItemName"]))
-            self.table.setItem(row, 3, QTableWidgetItem(f"{record['Price']:.2f}"))
-            self.table.setItem(row, 4, QTableWidgetItem(record["EffectiveDate"]))
-            self.table.setItem(row, 5, QTableWidgetItem(record["LastUpdated"]))
+        """在背景查詢價格歷史，完成後才更新表格"""
+        self.runner.submit("load", get_price_history, search_text, on_result=self.model.set_rows)
 
-    def search_history(self):
-        self.load_data(self.search_input.text().strip())
+    def set_loading(self, loading):
+        self.loading_label.setVisible(loading)
+        self.table.setEnabled(not loading)
 
     def get_selected_id(self):
-        selected_row = self.table.currentRow()
-        if selected_row == -1:
-            return None
-        return int(self.table.item(selected_row, 0).text())
+        record = self.table.current_record()
+        return record["PriceHistoryID"] if record else None
 
     def delete_history(self):
         history_id = self.get_selected_id()
@@ -1,16 +1,19 @@
-from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, 
-                            QPushButton, QLineEdit, QHeaderView, QAbstractItemView, QMessageBox, QMenu)
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLineEdit, QLabel, QMessageBox, QMenu
 from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QKeySequence
-from models.salesorderheader_crud import get_sales_orders, delete_sales_order, get_sales_order_by_id
+from models.salesorderheader_crud import SALES_ORDER_KEYSET, iter_sales_orders, delete_sales_order, get_sales_order_by_id
 from ui.dialogs.salesorder_dialog import SalesOrderDialog
 from ui.dialogs.salesorder_detail_dialog import SalesOrderDetailDialog
+from ui.deferred_load import DeferredLoadMixin
+from ui.search_controller import SearchController
+from ui.async_query import QueryRunner
+from ui.table_model import Column, DataTableView, LazyTableModel
 
-class SalesOrderPage(QWidget):
+class SalesOrderPage(DeferredLoadMixin, QWidget):
     def __init__(self):
         super().__init__()
+        self.runner = QueryRunner(self)
+        self.runner.busy_changed.connect(self.set_loading)
         self.setup_ui()
-        self.load_data()
 
     def setup_ui(self):
         main_layout = QVBoxLayout(self)
@@ -30,58 +33,38 @@ class SalesOrderPage(QWidget):
 
         self.search_input = QLineEdit(self)
         self.search_input.setPlaceholderText("輸入客戶名稱或訂單 ID 搜索...")
-        self.search_input.textChanged.connect(self.search_orders)
+        self.search = SearchController(self.search_input, self.load_data)
         tool_layout.addWidget(self.search_input)
 
+        self.loading_label = QLabel("載入中…", self)
+        self.loading_label.hide()
+        tool_layout.addWidget(self.loading_label)
+
         main_layout.addLayout(tool_layout)
 
-        self.table = QTableWidget(self)
-        self.table.setColumnCount(5)
-        self.table.setHorizontalHeaderLabels(["訂單 ID", "客戶名稱", "日期", "成品與數量", "狀態"])  # 對調順序
-        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
-        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
-        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.model = LazyTableModel([
+            Column("訂單 ID", "OrderID", sort="OrderID"),
+            Column("客戶名稱", "CustomerName", sort="CustomerName"),
+            Column("日期", "OrderDate", sort="OrderDate"),
+            Column("成品與數量", lambda o: o["Items"] or "無明細"),
+            Column("狀態", "Status", sort="Status"),
+        ], self, runner=self.runner)
+        self.table = DataTableView(self.model, self)
         self.table.setContextMenuPolicy(Qt.CustomContextMenu)
         self.table.customContextMenuRequested.connect(self.show_context_menu)
-        self.table.cellClicked.connect(self.select_row)
-        self.table.cellDoubleClicked.connect(self.show_detail)
+        self.table.doubleClicked.connect(lambda index: self.show_detail())
         main_layout.addWidget(self.table)
 
-    def select_row(self, row, column):
-        self.table.selectRow(row)
-
-    def keyPressEvent(self, event):
-        if event.matches(QKeySequence.Copy):
-            selected = self.table.selectedItems()
-            if selected:
-                QApplication.clipboard().setText(selected[0].text())
-
     def load_data(self, search_text=None):
-        self.table.setRowCount(0)
-        orders = get_sales_orders()
-        
-        if search_text:
-            search_text = search_text.lower()
-            orders = [o for o in orders if search_text in o["CustomerName"].lower() or search_text in str(o["OrderID"])]
-
-        for row, order in enumerate(orders):
-            self.table.insertRow(row)
-            self.table.setItem(row, 0, QTableWidgetItem(str(order["OrderID"])))
-            self.table.setItem(row, 1, QTableWidgetItem(order["CustomerName"]))
-            self.table.setItem(row, 2, QTableWidgetItem(order["OrderDate"]))
-            self.table.setItem(row, 3, QTableWidgetItem(order["Items"] or "無明細"))  # 成品與數量
-            self.table.setItem(row, 4, QTableWidgetItem(order["Status"]))  # 狀態
-
-    def search_orders(self):
-        self.load_data(self.search_input.text().strip())
+        self.model.set_query(iter_sales_orders, SALES_ORDER_KEYSET, search_text=search_text)
+
+    def set_loading(self, loading):
+        # 分頁在背景逐頁讀取，讀取期間表格仍可捲動與選取
+        self.loading_label.setVisible(loading)
 
     def get_selected_id(self):
-        selected_row = self.table.currentRow()
-        if selected_row == -1:
-            return None
-        item = self.table.item(selected_row, 0)
-        return int(item.text()) if item else None
+        order = self.table.current_record()
+        return order["OrderID"] if order else None
 
     def add_order(self):
         dialog = SalesOrderDialog(self)
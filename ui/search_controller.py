@@ -0,0 +1,39 @@
+from typing import Callable, Optional
+from PyQt5.QtCore import QObject, QTimer
+from PyQt5.QtWidgets import QLineEdit
+
+# 停止輸入多久後才送出搜尋（毫秒）
+SEARCH_DELAY_MS = 300
+
+
+class SearchController(QObject):
+    """
+    搜尋框的延遲觸發：輸入期間每次按鍵只重新計時，停止輸入 delay_ms 後才呼叫一次 callback(text)；
+    按 Enter 立即搜尋。text 為去除空白後的字串，空字串傳入 None（表示不篩選）。
+    篩選條件應由 callback 交給 CRUD 讀取函式在 SQL 中處理，不在 Python 過濾整份資料。
+    """
+
+    def __init__(self, line_edit: QLineEdit, callback: Callable[[Optional[str]], None],
+                 delay_ms: int = SEARCH_DELAY_MS, parent: QObject = None):
+        super().__init__(parent or line_edit)
+        self.line_edit = line_edit
+        self.callback = callback
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay_ms)
+        self.timer.timeout.connect(self.flush)
+        line_edit.textChanged.connect(self.timer.start)
+        line_edit.returnPressed.connect(self.flush)
+
+    @property
+    def text(self) -> Optional[str]:
+        """目前搜尋框內的條件"""
+        return self.line_edit.text().strip() or None
+
+    def is_pending(self) -> bool:
+        return self.timer.isActive()
+
+    def flush(self):
+        """立即執行尚未送出的搜尋"""
+        self.timer.stop()
+        self.callback(self.text)
@@ -1,15 +1,17 @@
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QLineEdit, QHeaderView, QAbstractItemView
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QLabel
 from PyQt5.QtGui import QColor
-from models.erp_database_schema import get_connection
-from models.itemmaster_crud import get_items
-from models.supplier_crud import get_suppliers
-from models.supplieritemmap_crud import get_safety_stock_level
+from models.stockbalance_crud import get_stock_levels
+from ui.deferred_load import DeferredLoadMixin
+from ui.search_controller import SearchController
+from ui.async_query import QueryRunner
+from ui.table_model import Column, DataTableView, LazyTableModel
 
-class StockPage(QWidget):
+class StockPage(DeferredLoadMixin, QWidget):
     def __init__(self):
         super().__init__()
+        self.runner = QueryRunner(self)
+        self.runner.busy_changed.connect(self.set_loading)
         self.setup_ui()
-        self.load_data()
 
     def setup_ui(self):
         main_layout = QVBoxLayout(self)
@@ -18,74 +20,56 @@ class StockPage(QWidget):
         tool_layout = QHBoxLayout()
         self.search_input = QLineEdit(self)
         self.search_input.setPlaceholderText("搜尋物品名稱或供應商...")
-        self.search_input.textChanged.connect(self.search_stock)
+        self.search = SearchController(self.search_input, self.load_data)
         tool_layout.addWidget(self.search_input)
 
+        self.loading_label = QLabel("載入中…", self)
+        self.loading_label.hide()
+        tool_layout.addWidget(self.loading_label)
+
         main_layout.addLayout(tool_layout)
 
         # 庫存表格
-        self.table = QTableWidget(self)
-        self.table.setColumnCount(4)  # 新增安全水位欄位
-        self.table.setHorizontalHeaderLabels(["物品名稱", "供應商", "庫存量", "安全水位"])
-        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
-        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.model = LazyTableModel([
+            Column("物品名稱", "ItemName"),
+            Column("供應商", "SupplierName"),
+            Column("庫存量", "StockQuantity", lambda qty: f"{qty:.2f}"),
+            Column("安全水位", "SafetyStockLevel", lambda level: f"{level:.2f}"),   # 新增安全水位欄位
+        ], self, background=self.row_background)
+        self.table = DataTableView(self.model, self)
         main_layout.addWidget(self.table)
 
-    def calculate_stock(self):
-        """計算每個 Item 和 Supplier 的庫存量，並加入安全水位"""
-        with get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT ItemID, SupplierID,
-                       SUM(CASE WHEN MovementType = 'IN' THEN Quantity ELSE 0 END) -
-                       SUM(CASE WHEN MovementType = 'OUT' THEN Quantity ELSE 0 END) AS StockQuantity
-                FROM StockMovement
-                GROUP BY ItemID, SupplierID
-                HAVING StockQuantity IS NOT NULL
-            ''')
-            stock_data = [dict(zip(["ItemID", "SupplierID", "StockQuantity"], row)) for row in cursor.fetchall()]
-            
-            # 加入安全水位
-            for stock in stock_data:
-                stock["SafetyStockLevel"] = get_safety_stock_level(stock["ItemID"], stock["SupplierID"])
-            return stock_data
+    def calculate_stock(self, search_text=None):
+        """取得每個 Item 和 Supplier 的庫存量與安全水位（一次查詢 StockBalance 與 SupplierItemMap），低於安全水位的排在前面"""
+        return get_stock_levels(search_text)
 
     def load_data(self, search_text=None):
-        self.table.setRowCount(0)
-        stock_data = self.calculate_stock()
-        items = {item["ItemID"]: item["ItemName"] for item in get_items()}
-        suppliers = {sup["SupplierID"]: sup["SupplierName"] for sup in get_suppliers()}
-
-        # 過濾搜尋結果
-        if search_text:
-            search_text = search_text.lower()
-            stock_data = [s for s in stock_data if 
-                          search_text in items.get(s["ItemID"], "").lower() or 
-                          search_text in suppliers.get(s["SupplierID"], "").lower()]
-
-        # 按庫存量與安全水位比較進行排序，低於安全水位的優先
-        stock_data.sort(key=lambda x: x["StockQuantity"] < x["SafetyStockLevel"], reverse=True)
+        """在背景查詢庫存，完成後才更新表格；輸入新的搜尋字時會取消前一次查詢"""
+        self.runner.submit("load", self.fetch_stock_data, search_text, on_result=self.populate_table)
 
-        for row, stock in enumerate(stock_data):
-            self.table.insertRow(row)
-            item_name = items.get(stock["ItemID"], "未知物品")
-            supplier_name = suppliers.get(stock["SupplierID"], "未知供應商")
-            stock_qty = stock["StockQuantity"]
-            safety_level = stock["SafetyStockLevel"]
+    def set_loading(self, loading):
+        self.loading_label.setVisible(loading)
+        self.table.setEnabled(not loading)
 
-            self.table.setItem(row, 0, QTableWidgetItem(item_name))
-            self.table.setItem(row, 1, QTableWidgetItem(supplier_name))
-            self.table.setItem(row, 2, QTableWidgetItem(f"{stock_qty:.2f}"))
-            self.table.setItem(row, 3, QTableWidgetItem(f"{safety_level:.2f}"))
+    def fetch_stock_data(self, search_text=None):
+        """在工作執行緒執行：只查詢資料，不可操作任何元件"""
+        stock_data = self.calculate_stock(search_text)   # 搜尋、名稱與排序都在 SQL 中處理
+        for stock in stock_data:
+            if stock["ItemName"] is None:
+                stock["ItemName"] = "未知物品"
+            if stock["SupplierName"] is None:
+                stock["SupplierName"] = "未知供應商"
+        return stock_data
 
-            # 如果庫存低於安全水位，設為紅色背景
-            if stock_qty < safety_level:
-                for col in range(4):
-                    self.table.item(row, col).setBackground(QColor(255, 0, 0, 100))  # 半透明紅色
+    def populate_table(self, stock_data):
+        self.model.set_rows(stock_data)
 
-    def search_stock(self):
-        self.load_data(self.search_input.text().strip())
+    @staticmethod
+    def row_background(stock):
+        # 如果庫存低於安全水位，設為紅色背景
+        if stock["BelowSafety"]:
+            return QColor(255, 0, 0, 100)  # 半透明紅色
+        return None
 
 if __name__ == "__main__":
     from PyQt5.QtWidgets import QApplication
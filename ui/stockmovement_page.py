@@ -1,14 +1,21 @@
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QTableWidget, QTableWidgetItem, QLineEdit, QAbstractItemView, QHeaderView, QMessageBox
-from models.stockmovement_crud import add_stock_movement, get_stock_movements, update_stock_movement, delete_stock_movement
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLineEdit, QLabel, QMessageBox
+from models.stockmovement_crud import STOCK_MOVEMENT_KEYSET, add_stock_movement, iter_stock_movements, update_stock_movement, delete_stock_movement
 from models.itemmaster_crud import get_items
 from models.supplier_crud import get_suppliers
 from ui.dialogs.stockmovement_dialog import StockMovementDialog
+from ui.deferred_load import DeferredLoadMixin
+from ui.search_controller import SearchController
+from ui.async_query import QueryRunner
+from ui.table_model import Column, DataTableView, LazyTableModel
 
-class StockMovementPage(QWidget):
+class StockMovementPage(DeferredLoadMixin, QWidget):
     def __init__(self):
         super().__init__()
+        self.item_names = {}
+        self.supplier_names = {}
+        self.runner = QueryRunner(self)
+        self.runner.busy_changed.connect(self.set_loading)
         self.setup_ui()
-        self.load_data()
 
     def setup_ui(self):
         main_layout = QVBoxLayout(self)
@@ -29,45 +36,45 @@ class StockMovementPage(QWidget):
 
         self.search_input = QLineEdit(self)
         self.search_input.setPlaceholderText("搜尋物品名稱...")
-        self.search_input.textChanged.connect(self.search_movement)
+        self.search = SearchController(self.search_input, self.load_data)
         tool_layout.addWidget(self.search_input)
 
+        self.loading_label = QLabel("載入中…", self)
+        self.loading_label.hide()
+        tool_layout.addWidget(self.loading_label)
+
         main_layout.addLayout(tool_layout)
 
         # 表格
-        self.table = QTableWidget(self)
-        self.table.setColumnCount(7)
-        self.table.setHorizontalHeaderLabels(["移動ID", "物品名稱", "供應商", "類型", "數量", "日期", "批次號"])
-        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
-        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
-        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.model = LazyTableModel([
+            Column("移動ID", "MovementID", sort="MovementID"),
+            Column("物品名稱", lambda m: self.item_names.get(m["ItemID"], "未知物品")),
+            Column("供應商", lambda m: self.supplier_names.get(m["SupplierID"], "未知供應商")),
+            Column("類型", "MovementType", sort="MovementType"),
+            Column("數量", "Quantity", lambda qty: f"{qty:.2f}", sort="Quantity"),
+            Column("日期", "MovementDate", sort="MovementDate"),
+            Column("批次號", "BatchNo", sort="BatchNo"),
+        ], self, runner=self.runner)
+        self.table = DataTableView(self.model, self)
         main_layout.addWidget(self.table)
 
     def load_data(self, search_text=None):
-        self.table.setRowCount(0)
-        movements = get_stock_movements()
-        items = {item["ItemID"]: item["ItemName"] for item in get_items()}
-        suppliers = {sup["SupplierID"]: sup["SupplierName"] for sup in get_suppliers()}
-
-        if search_text:
-            search_text = search_text.lower()
-            movements = [m for m in movements if search_text in items.get(m["ItemID"], "").lower()]
-
-        for row, movement in enumerate(movements):
-            self.table.insertRow(row)
-            self.table.setItem(row, 0, QTableWidgetItem(str(movement["MovementID"])))
-            item_name = items.get(movement["ItemID"], "未知物品")
-            supplier_name = suppliers.get(movement.get("SupplierID"), "未知供應商")
-            self.table.setItem(row, 1, QTableWidgetItem(item_name))
-            self.table.setItem(row, 2, QTableWidgetItem(supplier_name))
-            self.table.setItem(row, 3, QTableWidgetItem(movement["MovementType"]))
-            self.table.setItem(row, 4, QTableWidgetItem(f"{movement['Quantity']:.2f}"))
-            self.table.setItem(row, 5, QTableWidgetItem(movement["MovementDate"]))
-            self.table.setItem(row, 6, QTableWidgetItem(movement.get("BatchNo", "")))
-
-    def search_movement(self):
-        self.load_data(self.search_input.text().strip())
+        # 物品與供應商名稱表只有主檔大小，移動記錄則在捲動時才逐頁讀取；兩者都在背景查詢
+        self.runner.submit("load", self.fetch_names, on_result=lambda names: self.populate_table(names, search_text))
+
+    def fetch_names(self):
+        """在工作執行緒執行：只查詢資料，不可操作任何元件"""
+        item_names = {item["ItemID"]: item["ItemName"] for item in get_items()}
+        supplier_names = {sup["SupplierID"]: sup["SupplierName"] for sup in get_suppliers()}
+        return item_names, supplier_names
+
+    def populate_table(self, names, search_text=None):
+        self.item_names, self.supplier_names = names
+        self.model.set_query(iter_stock_movements, STOCK_MOVEMENT_KEYSET, item_search=search_text)
+
+    def set_loading(self, loading):
+        # 分頁在背景逐頁讀取，讀取期間表格仍可捲動與選取
+        self.loading_label.setVisible(loading)
 
     def add_movement(self):
         dialog = StockMovementDialog(self)
@@ -84,15 +91,11 @@ class StockMovementPage(QWidget):
             self.load_data()
 
     def edit_movement(self):
-        selected_row = self.table.currentRow()
-        if selected_row == -1:
+        movement = self.table.current_record()
+        if movement is None:
             QMessageBox.warning(self, "警告", "請先選擇要編輯的移動記錄")
             return
-        movement_id = int(self.table.item(selected_row, 0).text())
-        movement = next((m for m in get_stock_movements() if m["MovementID"] == movement_id), None)
-        if not movement:
-            QMessageBox.warning(self, "錯誤", "找不到該移動記錄")
-            return
+        movement_id = movement["MovementID"]
         dialog = StockMovementDialog(self, movement)
         if dialog.exec_():
             updated_data = dialog.get_movement_data()
@@ -100,11 +103,11 @@ class StockMovementPage(QWidget):
             self.load_data()
 
     def delete_movement(self):
-        selected_row = self.table.currentRow()
-        if selected_row == -1:
+        movement = self.table.current_record()
+        if movement is None:
             QMessageBox.warning(self, "警告", "請先選擇要刪除的移動記錄")
             return
-        movement_id = int(self.table.item(selected_row, 0).text())
+        movement_id = movement["MovementID"]
         confirm = QMessageBox.question(self, "確認刪除", "確定要刪除此移動記錄嗎？", QMessageBox.Yes | QMessageBox.No)
         if confirm == QMessageBox.Yes:
             delete_stock_movement(movement_id)
@@ -1,18 +1,21 @@
-from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableWidget,
-                            QTableWidgetItem, QPushButton, QLineEdit, QHeaderView,QLabel,
-                            QMessageBox, QMenu, QAbstractItemView)
-from PyQt5.QtCore import Qt
-from models.supplier_crud import get_suppliers, delete_supplier
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLineEdit, QLabel,
+                            QMessageBox, QMenu)
+from PyQt5.QtCore import Qt, QUrl
+from PyQt5.QtGui import QDesktopServices
+from models.supplier_crud import SUPPLIER_KEYSET, iter_suppliers, delete_supplier
 from ui.dialogs.supplier_dialog import SupplierDialog
-from PyQt5.QtWidgets import QInputDialog, QLineEdit
-from PyQt5.QtGui import QKeySequence
-from PyQt5.QtWidgets import QApplication
+from PyQt5.QtWidgets import QInputDialog
+from ui.deferred_load import DeferredLoadMixin
+from ui.search_controller import SearchController
+from ui.async_query import QueryRunner
+from ui.table_model import Column, DataTableView, LazyTableModel
 
-class SupplierPage(QWidget):
+class SupplierPage(DeferredLoadMixin, QWidget):
     def __init__(self):
         super().__init__()
+        self.runner = QueryRunner(self)
+        self.runner.busy_changed.connect(self.set_loading)
         self.setup_ui()
-        self.load_data()
 
     def setup_ui(self):
         main_layout = QVBoxLayout(self)
@@ -34,80 +37,49 @@ class SupplierPage(QWidget):
         
         self.search_input = QLineEdit(self)
         self.search_input.setPlaceholderText("輸入名稱或電話搜索...")
-        self.search_input.textChanged.connect(self.search_suppliers)
+        self.search = SearchController(self.search_input, self.load_data)
         tool_layout.addWidget(self.search_input)
+
+        self.loading_label = QLabel("載入中…", self)
+        self.loading_label.hide()
+        tool_layout.addWidget(self.loading_label)
         
         main_layout.addLayout(tool_layout)
         
-        # 供應商表格
-        self.table = QTableWidget(self)
-        self.table.setColumnCount(6)
-        self.table.setHorizontalHeaderLabels(["ID", "供應商名稱", "統一編號", "聯絡人", "電話", "網站"])
-        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        # 供應商表格（捲動到底時才以 keyset 分頁在背景多取一頁）
+        self.model = LazyTableModel([
+            Column("ID", "SupplierID", sort="SupplierID"),
+            Column("供應商名稱", "SupplierName", sort="SupplierName"),
+            Column("統一編號", "TaxID", sort="TaxID"),
+            Column("聯絡人", "ContactPerson", sort="ContactPerson"),
+            Column("電話", "Phone", sort="Phone"),
+            Column("網站", lambda s: (s["Website"] or "").strip()),
+        ], self, runner=self.runner)
+        self.table = DataTableView(self.model, self)
         self.table.setContextMenuPolicy(Qt.CustomContextMenu)
         self.table.customContextMenuRequested.connect(self.show_context_menu)
-        
-        
-        # 表格配置
-        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
-        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
-        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
-        self.table.cellClicked.connect(self.select_row)
+        self.table.doubleClicked.connect(self.open_website)
 
         main_layout.addWidget(self.table)
 
-    def select_row(self, row, column):
-        self.table.selectRow(row)
-
-    def keyPressEvent(self, event):
-        if event.matches(QKeySequence.Copy):
-            selected = self.table.selectedItems()
-            if selected:
-                clipboard = QApplication.clipboard()
-                clipboard.setText(selected[0].text())
-
     def load_data(self, search_text=None):
-        self.table.setRowCount(0)
-        suppliers = get_suppliers(search_text) or [] # ✅ [修改] 傳入 search_text 以啟用搜尋功能
+        self.model.set_query(iter_suppliers, SUPPLIER_KEYSET, search_text=search_text)
 
-        if not suppliers:  # ✅ 如果沒有找到供應商，顯示提示，不讓程式崩潰
-            QMessageBox.information(self, "搜尋結果", "沒有找到符合條件的供應商！")
-            return  # ✅ 防止後續程式繼續執行，導致錯誤
-        
-        for row, supplier in enumerate(suppliers):
-            if supplier is None:  # ✅ 確保 supplier 不是 None
-                continue
-
-            self.table.insertRow(row)
-            self.table.setItem(row, 0, QTableWidgetItem(str(supplier.get("SupplierID", ""))))
-            self.table.setItem(row, 1, QTableWidgetItem(supplier.get("SupplierName", "")))
-            self.table.setItem(row, 2, QTableWidgetItem(supplier.get("TaxID", "")))
-            self.table.setItem(row, 3, QTableWidgetItem(supplier.get("ContactPerson", "")))
-            self.table.setItem(row, 4, QTableWidgetItem(supplier.get("Phone", "")))
-
-       # ✅ 設定超連結網址
-            website_url = (supplier.get("Website") or "").strip()
-        if website_url:
-            website_label = QLabel()
-            website_label.setText(f'<a href="{website_url}">{website_url}</a>')  # 確保網址是 HTML 格式
-            website_label.setOpenExternalLinks(True)  # ✅ 允許點擊直接開啟外部網站
-            website_label.setTextInteractionFlags(Qt.TextBrowserInteraction)  # 允許點擊
-            website_label.setStyleSheet("color: blue; text-decoration: underline;")  # 設定藍色連結
-            self.table.setCellWidget(row, 5, website_label)  # ✅ 將 QLabel 放入表格
-        
-        self.table.viewport().update()  # 確保 UI 立即刷新  
+    def set_loading(self, loading):
+        # 分頁在背景逐頁讀取，讀取期間表格仍可捲動與選取
+        self.loading_label.setVisible(loading)
 
-    def search_suppliers(self):
-        search_text = self.search_input.text().strip()
-        self.load_data(search_text)
+    def open_website(self, index):
+        # ✅ 雙擊網站欄直接開啟外部網站
+        if index.column() != 5:
+            return
+        website_url = index.data()
+        if website_url:
+            QDesktopServices.openUrl(QUrl.fromUserInput(website_url))
 
     def get_selected_id(self):
-        selected_row = self.table.currentRow()
-        if selected_row == -1:
-            return None
-        item = self.table.item(selected_row, 0)
-        return int(item.text()) if item else None
+        supplier = self.table.current_record()
+        return supplier["SupplierID"] if supplier else None
 
     def add_supplier(self):
         dialog = SupplierDialog(self)
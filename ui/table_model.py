@@ -0,0 +1,242 @@
+import logging
+import sqlite3
+from itertools import islice
+from typing import Callable, Iterable, List, Optional, Sequence, Union
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PyQt5.QtGui import QKeySequence
+from PyQt5.QtWidgets import QAbstractItemView, QApplication, QHeaderView, QTableView
+from models.pagination import Keyset, iter_keyset
+
+# 每次 fetchMore 從資料來源取出的筆數
+FETCH_BATCH_SIZE = 200
+
+
+class Column:
+    """表格欄位：標題、取值方式（欄位名稱或函式）、顯示格式與排序欄位（keyset 的欄位名稱）"""
+    __slots__ = ("title", "key", "format", "sort")
+
+    def __init__(self, title: str, key: Union[str, Callable], format: Optional[Callable] = None,
+                 sort: Optional[str] = None):
+        self.title = title
+        self.key = key
+        self.format = format
+        self.sort = sort
+
+    def value(self, row):
+        return self.key(row) if callable(self.key) else row.get(self.key)
+
+    def text(self, row) -> str:
+        value = self.value(row)
+        if self.format is not None:
+            return self.format(value)
+        return "" if value is None else str(value)
+
+
+class LazyTableModel(QAbstractTableModel):
+    """
+    唯讀表格模型：資料列在 data() 被呼叫時才轉成文字，不為每個儲存格建立元件。
+    set_query() 以 keyset 分頁逐頁呼叫 CRUD 讀取函式，set_source() 則接受任意產生資料列的函式；
+    view 捲動到底時透過 canFetchMore/fetchMore 每次多取 batch_size 筆。
+    點選欄位標題排序時以 order_by 重新查詢，由 SQL 排序而不在 Python 排序已載入的資料。
+    指定 runner（ui.async_query.QueryRunner）時，set_query 的每一頁改在工作執行緒讀取，
+    結果回到 GUI 執行緒才加入表格，捲動與搜尋不會因查詢而卡住畫面。
+    """
+
+    # runner 上讀取分頁使用的 channel，新查詢會取消同 channel 尚未完成的舊分頁
+    PAGE_CHANNEL = "page"
+
+    def __init__(self, columns: Sequence[Column], parent=None, batch_size: int = FETCH_BATCH_SIZE,
+                 background: Optional[Callable] = None, runner=None):
+        super().__init__(parent)
+        self.columns = list(columns)
+        self.batch_size = batch_size
+        self.background = background    # row -> QColor 或 None
+        self.runner = runner
+        self._rows: List = []
+        self._iterator = None
+        self._query = None      # (reader, keyset, filters)
+        self._after_key = None  # runner 模式下一頁的 keyset 起點
+        self._has_more = False  # runner 模式是否還有下一頁
+        self._pending = False   # runner 模式是否有分頁正在讀取
+        self.order_by: Optional[str] = None
+
+    # === 資料來源 ===
+    def set_query(self, reader: Callable, keyset: Keyset, **filters):
+        """以 keyset 分頁讀取 reader 的結果，filters 為 reader 的篩選參數"""
+        self._query = (reader, keyset, filters)
+        self._reload()
+
+    def _reload(self):
+        reader, keyset, filters = self._query
+        order_by = self.order_by
+        if self.runner is not None:
+            self.beginResetModel()
+            self._reset_source()
+            self._rows = []
+            self._after_key = None
+            self._has_more = True
+            self.endResetModel()
+            self._request_page()
+            return
+        self.set_source(lambda: iter_keyset(reader, keyset, order_by, page_size=self.batch_size, **filters),
+                        keep_query=True)
+
+    def set_source(self, source: Callable[[], Iterable], keep_query: bool = False):
+        """改用新的資料來源並清空目前資料，第一批在 view 需要時才讀取"""
+        if not keep_query:
+            self._query = None
+        self.beginResetModel()
+        self._reset_source()
+        self._rows = []
+        self._iterator = iter(source())
+        self.endResetModel()
+
+    def set_rows(self, rows: Iterable):
+        """直接顯示已取得的資料列（例如背景查詢的結果）"""
+        self._query = None
+        self.beginResetModel()
+        self._reset_source()
+        self._rows = list(rows)
+        self.endResetModel()
+
+    def close(self):
+        """停止讀取並釋放資料來源持有的連線"""
+        self._reset_source()
+
+    def _reset_source(self):
+        self._close_iterator()
+        if self._pending:
+            self.runner.cancel(self.PAGE_CHANNEL)
+            self._pending = False
+        self._has_more = False
+
+    def _request_page(self):
+        """在 runner 的工作執行緒讀取下一頁"""
+        reader, keyset, filters = self._query
+        self._pending = True
+        self.runner.submit(self.PAGE_CHANNEL, _read_page, reader, self._after_key, self.batch_size,
+                           self.order_by, filters, on_result=self._append_page, on_error=self._page_failed)
+
+    def _append_page(self, rows):
+        self._pending = False
+        if len(rows) < self.batch_size:
+            self._has_more = False
+        else:
+            self._after_key = self._query[1].page_key(rows[-1], self.order_by)
+        self._insert_rows(rows)
+
+    def _page_failed(self, error):
+        logging.error("讀取表格資料失敗: %s", error)
+        self._pending = False
+        self._has_more = False
+
+    def _close_iterator(self):
+        iterator, self._iterator = self._iterator, None
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
+
+    def row_at(self, row: int):
+        """取得第 row 列的資料，超出範圍時回傳 None"""
+        if 0 <= row < len(self._rows):
+            return self._rows[row]
+        return None
+
+    # === QAbstractTableModel ===
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            return self.columns[index.column()].text(row)
+        if role == Qt.BackgroundRole and self.background is not None:
+            return self.background(row)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.columns[section].title
+        return str(section + 1)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        if not 0 <= column < len(self.columns) or self.columns[column].sort is None:
+            return
+        name = self.columns[column].sort
+        self.order_by = name if order == Qt.AscendingOrder else f"-{name}"
+        if self._query is not None:
+            self._reload()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return False
+        if self.runner is not None and self._query is not None:
+            return self._has_more and not self._pending
+        return self._iterator is not None
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        if self.runner is not None and self._query is not None:
+            self._request_page()
+            return
+        try:
+            batch = list(islice(self._iterator, self.batch_size))
+        except sqlite3.Error as e:
+            logging.error("讀取表格資料失敗: %s", e)
+            batch = []
+            self._close_iterator()
+        if len(batch) < self.batch_size:
+            self._close_iterator()
+        self._insert_rows(batch)
+
+    def _insert_rows(self, batch: List):
+        if batch:
+            first = len(self._rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(batch) - 1)
+            self._rows.extend(batch)
+            self.endInsertRows()
+
+
+def _read_page(reader: Callable, after_key, limit: int, order_by: Optional[str], filters: dict) -> List:
+    """在工作執行緒執行：讀出 keyset 分頁的一頁資料"""
+    return list(reader(after_key=after_key, limit=limit, order_by=order_by, **filters))
+
+
+class DataTableView(QTableView):
+    """套用各頁面共用設定（整列選取、唯讀、欄寬延展）的 QTableView；有可排序欄位時開啟標題排序"""
+
+    def __init__(self, model: LazyTableModel, parent=None):
+        super().__init__(parent)
+        self.setModel(model)
+        self.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        if any(column.sort for column in model.columns):
+            self.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+            self.setSortingEnabled(True)
+        self.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+
+    def currentRow(self) -> int:
+        index = self.currentIndex()
+        return index.row() if index.isValid() else -1
+
+    def current_record(self):
+        """目前選取列的資料，沒有選取時回傳 None"""
+        return self.model().row_at(self.currentRow())
+
+    def keyPressEvent(self, event):
+        # Ctrl+C / Command+C 複製目前儲存格的內容
+        if event.matches(QKeySequence.Copy):
+            index = self.currentIndex()
+            if index.isValid():
+                QApplication.clipboard().setText(index.data())
+            return
+        super().keyPressEvent(event)
@@ -0,0 +1,84 @@
+from datetime import date
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QLabel, QCheckBox, QSplitter
+from models.itemmaster_crud import ITEM_KEYSET, iter_items
+from models.bom_explosion import where_used
+from ui.deferred_load import DeferredLoadMixin
+from ui.search_controller import SearchController
+from ui.async_query import QueryRunner
+from ui.table_model import Column, DataTableView, LazyTableModel
+
+
+class WhereUsedPage(DeferredLoadMixin, QWidget):
+    """BOM 反查：選擇元件後列出直接或經由半成品間接用到它的所有 BOM"""
+
+    def __init__(self):
+        super().__init__()
+        self.runner = QueryRunner(self)
+        self.runner.busy_changed.connect(self.set_loading)
+        self.setup_ui()
+
+    def setup_ui(self):
+        main_layout = QVBoxLayout(self)
+
+        # 搜尋工具列
+        tool_layout = QHBoxLayout()
+        self.search_input = QLineEdit(self)
+        self.search_input.setPlaceholderText("輸入元件名稱搜尋...")
+        self.search = SearchController(self.search_input, self.load_data)
+        tool_layout.addWidget(self.search_input)
+
+        self.active_only = QCheckBox("只看目前生效的 BOM 版本", self)
+        self.active_only.toggled.connect(self.load_where_used)
+        tool_layout.addWidget(self.active_only)
+
+        self.loading_label = QLabel("載入中…", self)
+        self.loading_label.hide()
+        tool_layout.addWidget(self.loading_label)
+
+        main_layout.addLayout(tool_layout)
+
+        splitter = QSplitter(Qt.Horizontal, self)
+
+        # 左側：元件清單
+        self.item_model = LazyTableModel([
+            Column("ID", "ItemID", sort="ItemID"),
+            Column("元件名稱", "ItemName", sort="ItemName"),
+            Column("類型", "ItemType", sort="ItemType"),
+        ], self)
+        self.item_table = DataTableView(self.item_model, self)
+        self.item_table.selectionModel().currentRowChanged.connect(self.load_where_used)
+        splitter.addWidget(self.item_table)
+
+        # 右側：反查結果
+        self.model = LazyTableModel([
+            Column("階層", "Level"),
+            Column("BOM ID", "BOMID"),
+            Column("產品名稱", "ProductName"),
+            Column("版本", "Version"),
+            Column("使用元件", "ComponentName"),
+            Column("用量", "Quantity", lambda qty: f"{qty:.2f}"),
+            Column("單位", "Unit"),
+        ], self)
+        self.table = DataTableView(self.model, self)
+        splitter.addWidget(self.table)
+        splitter.setStretchFactor(1, 2)
+
+        main_layout.addWidget(splitter)
+
+    def load_data(self, search_text=None):
+        self.item_model.set_query(iter_items, ITEM_KEYSET, search=search_text)
+        self.model.set_rows([])
+
+    def set_loading(self, loading):
+        self.loading_label.setVisible(loading)
+
+    def load_where_used(self, *args):
+        """在背景反查目前選取的元件；切換元件時會取消前一次查詢"""
+        item = self.item_table.current_record()
+        if item is None:
+            self.runner.cancel("where_used")
+            self.model.set_rows([])
+            return
+        as_of = date.today().isoformat() if self.active_only.isChecked() else None
+        self.runner.submit("where_used", where_used, item["ItemID"], as_of, on_result=self.model.set_rows)